@@ -0,0 +1,112 @@
+"""
+SkySQL Intelligence Admission Control
+Bounded concurrency, bounded queues and deadlines per endpoint class
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class Rejected(Exception):
+    """Raised when a request is shed instead of admitted"""
+
+    def __init__(self, endpoint_class, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.endpoint_class = endpoint_class
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class EndpointClass:
+    """
+    Concurrency limit with a bounded FIFO wait queue for one class of endpoints
+
+    Up to `max_concurrent` requests run at once. Up to `max_queue` more wait
+    for a slot for at most `queue_timeout` seconds. A request arriving to a
+    full queue is rejected at once (429); one that waits too long is
+    rejected with 503. Admitted requests get `deadline` seconds in total,
+    counted from arrival, for their database work.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout, deadline):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self._active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.deadline_exceeded = 0
+        self.max_queue_depth = 0
+        self._wait_total = 0.0
+        self._service_total = 0.0
+        self._completed = 0
+
+    def _retry_after(self):
+        """Seconds until a newly queued request would likely be served"""
+        service = self._service_total / self._completed if self._completed else 1.0
+        return max(1, round(service * (len(self._waiters) + 1) / max(self.max_concurrent, 1)))
+
+    def acquire(self):
+        """Block until admitted; returns the request's absolute deadline (time.monotonic)"""
+        arrived = time.monotonic()
+        with self._lock:
+            if self._active < self.max_concurrent:
+                self._active += 1
+                self.admitted += 1
+                return arrived + self.deadline
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise Rejected(self.name, 429, f"{self.name} queue is full", self._retry_after())
+            granted = threading.Event()
+            self._waiters.append(granted)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+
+        if not granted.wait(self.queue_timeout):
+            with self._lock:
+                if not granted.is_set():
+                    self._waiters.remove(granted)
+                    self.rejected_timeout += 1
+                    raise Rejected(self.name, 503, f"{self.name} queue wait exceeded", self._retry_after())
+        with self._lock:
+            self.admitted += 1
+            self._wait_total += time.monotonic() - arrived
+        return arrived + self.deadline
+
+    def release(self, service_seconds):
+        """Free a slot, handing it straight to the oldest waiter (FIFO)"""
+        with self._lock:
+            self._completed += 1
+            self._service_total += service_seconds
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._active -= 1
+
+    def record_deadline_exceeded(self):
+        with self._lock:
+            self.deadline_exceeded += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout_seconds": self.queue_timeout,
+                "deadline_seconds": self.deadline,
+                "active": self._active,
+                "queue_depth": len(self._waiters),
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_queue_timeout": self.rejected_timeout,
+                "deadline_exceeded": self.deadline_exceeded,
+                "avg_queue_wait_ms": round(self._wait_total / self.admitted * 1000, 2) if self.admitted else 0.0,
+                "avg_service_ms": round(self._service_total / self._completed * 1000, 2) if self._completed else 0.0
+            }
@@ -4,17 +4,50 @@ Professional Airline Efficiency Analytics Platform
 COMPLETE FIXED VERSION - All Endpoints Working
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, g, has_app_context
 from flask_cors import CORS
-import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError, OperationalError
 import random
 import math
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import hmac
+import json
 import logging
+import os
 import sys
+import time
 from decimal import Decimal
 
+from admission import EndpointClass, Rejected
+from change_feed import ChangeFeed
+from circuit_breaker import CircuitBreaker, ResponseCache
+from code_dictionary import CodeDictionary
+from cold_storage import ColdStore
+from columnar import Columns
+from db_pool import RowStream
+from profiler import ProfilingSession
+from sketches import SketchStore
+from storage import backend_from_env
+from temporal import TemporalIndex, parse_as_of
+from timeseries import MetricsPyramid
+from shared_cache import TableVersionWatcher, cache_from_env
+from sharding import ShardMap, merge_aggregates, merge_sorted, merge_sorted_columns, merge_streams
+from single_flight import SingleFlight, WaitTimeout
+from fleet_simulator import FleetSimulator
+from forecasting import SERIES as FORECAST_SERIES, ForecastEngine
+from geo import GeoIndex
+from leaderboard import METRICS as LEADERBOARD_METRICS, WINDOWS as LEADERBOARD_WINDOWS, RouteLeaderboards
+from query_registry import QUERIES
+from route_graph import RouteGraph
+from row_counts import RowCounts
+from warmup import WarmupCoordinator
+from weather import WeatherEnricher, provider_from_env
+
+# Reference point for startup and time-to-ready measurements
+PROCESS_START = time.perf_counter()
+
 # Professional logging configuration
 logging.basicConfig(
     level=logging.INFO,
@@ -31,7 +64,10 @@ CORS(app)
 class DatabaseManager:
     """
     Professional MariaDB database management
-    Enhanced error handling and connection management
+    Pooled connections, circuit breaking, cached prepared statements and
+    airline sharding of routes/flight_performance with scatter-gather reads
+    SKYSQL_BACKEND=embedded runs the same schema and queries on in-process
+    SQLite databases instead of the MariaDB server
     """
     
     def __init__(self):
@@ -43,55 +79,651 @@ class DatabaseManager:
             "database": "skysql_intelligence",
             "port": 3306,
             "charset": 'utf8mb4',
-            "autocommit": True
+            "autocommit": True,
+            "connection_timeout": 3
         }
+        self.backend = backend_from_env()
+        # Single shard unless SKYSQL_SHARDS describes an airline partitioning;
+        # each shard has its own pool and circuit breaker
+        self.shards = ShardMap.from_env(self.db_config, backend=self.backend)
+        self._fanout = ThreadPoolExecutor(max_workers=max(4, 2 * len(self.shards)),
+                                          thread_name_prefix="shard-fanout")
+        # Identical concurrent reads share one execution
+        self.single_flight = SingleFlight()
+    
+    @property
+    def is_sharded(self):
+        return len(self.shards) > 1
+    
+    @property
+    def breaker(self):
+        """Circuit breaker of the primary shard"""
+        return self.shards.primary.breaker
+    
+    @property
+    def pool(self):
+        """Connection pool of the primary shard"""
+        return self.shards.primary.pool
+    
+    def circuit_open(self):
+        """True if any shard is currently failing fast"""
+        return any(shard.breaker.state == CircuitBreaker.OPEN for shard in self.shards)
+    
+    def retry_after(self):
+        return max(shard.breaker.retry_after() for shard in self.shards)
+    
+    def status_snapshot(self):
+        """Breaker and pool state per shard for health reporting"""
+        return {
+            shard.name: {
+                "airlines": sorted(shard.airlines) if shard.airlines else "default",
+                "storage": shard.backend.describe(shard.db_config),
+                "circuit_breaker": shard.breaker.snapshot(),
+                "connection_pool": shard.pool.stats()
+            }
+            for shard in self.shards
+        }
+    
+    def _shard(self, shard):
+        if shard is None:
+            return self.shards.primary
+        if isinstance(shard, str):
+            return self.shards.get(shard)
+        return shard
+    
+    def _mark_degraded(self):
+        """Flag the current request as having hit a database failure"""
+        if has_app_context():
+            g.db_degraded = True
     
     def get_connection(self):
         """Establish database connection with robust error handling"""
+        if not self.breaker.allow_request():
+            logger.warning("Database circuit open - skipping connection attempt")
+            self._mark_degraded()
+            return None
         try:
-            conn = mysql.connector.connect(**self.db_config)
+            conn = self.backend.connect(self.db_config)
+            self.breaker.record_success()
             logger.info("Database connection established successfully")
             return conn
         except Error as e:
+            self.breaker.record_failure()
+            self._mark_degraded()
             logger.error(f"Database connection failed: {e}")
             return None
     
-    def execute_query(self, query, params=None, fetch=True):
+    def _remaining(self):
+        """Seconds left before the current request's admission deadline, or None"""
+        if has_app_context() and g.get('request_deadline') is not None:
+            return g.request_deadline - time.monotonic()
+        return None
+    
+    def _deadline_exceeded(self):
+        if not g.get('deadline_exceeded'):
+            g.deadline_exceeded = True
+            g.admission_class.record_deadline_exceeded()
+        self._mark_degraded()
+    
+    def _acquire(self, shard):
+        """Check out a pooled connection, or None if the shard is unavailable"""
+        remaining = self._remaining()
+        if remaining is not None and remaining <= 0:
+            logger.warning(f"Request deadline passed - skipping query on shard {shard.name}")
+            self._deadline_exceeded()
+            return None
+        if not shard.breaker.allow_request():
+            logger.warning(f"Database circuit open for shard {shard.name} - skipping query")
+            self._mark_degraded()
+            return None
+        try:
+            return shard.pool.acquire(timeout=remaining)
+        except (Error, TimeoutError) as e:
+            if isinstance(e, Error):
+                shard.breaker.record_failure()
+            self._mark_degraded()
+            logger.error(f"Database connection failed on shard {shard.name}: {e}")
+            return None
+    
+    def _handle_error(self, shard, pooled, error):
+        """Record a query failure; returns True if the connection must be discarded"""
+        logger.error(f"Query execution error on shard {shard.name}: {error}")
+        self._mark_degraded()
+        if isinstance(error, (InterfaceError, OperationalError)):
+            # Lost connection or server gone away, not a bad statement
+            shard.breaker.record_failure()
+            return True
+        # The server answered, so the database itself is reachable
+        shard.breaker.record_success()
+        if pooled.raw.is_connected():
+            pooled.raw.rollback()
+        return False
+    
+    def _coalesced(self, key, run):
+        """
+        Run a read through the single-flight layer
+        Followers get their own copies of the rows, since handlers modify them,
+        and wait for the leader no longer than their own request deadline
+        """
+        remaining = self._remaining()
+        try:
+            rows, shared = self.single_flight.do(key, run, timeout=None if remaining is None else max(remaining, 0))
+        except WaitTimeout:
+            logger.warning("Request deadline passed waiting for a coalesced query")
+            self._deadline_exceeded()
+            return None
+        if rows is None:
+            # The leader's failure degraded its own request; flag this one too
+            self._mark_degraded()
+            return None
+        if not shared:
+            return rows
+        return rows.copy() if isinstance(rows, Columns) else [dict(row) for row in rows]
+    
+    def execute_query(self, query, params=None, fetch=True, shard=None, columnar=False):
         """
         Execute database queries with professional error handling
+        Runs on the primary shard unless another shard is given
+        columnar=True reads tuples into a Columns result instead of row dicts
         Returns results or None on error
         """
-        conn = self.get_connection()
-        if not conn:
+        shard = self._shard(shard)
+        if not fetch:
+            return self._run_query(query, params, fetch, shard)
+        return self._coalesced(("query", shard.name, query, repr(params), columnar),
+                               lambda: self._run_query(query, params, fetch, shard, columnar))
+    
+    def _run_query(self, query, params, fetch, shard, columnar=False):
+        pooled = self._acquire(shard)
+        if not pooled:
             return None
             
         cursor = None
+        broken = False
         try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(query, params or ())
+            cursor = pooled.raw.cursor(dictionary=not columnar)
+            if not fetch and isinstance(params, list):
+                # A list of parameter tuples is a bulk write
+                cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params or ())
             
             if fetch:
                 result = cursor.fetchall()
+                if columnar:
+                    result = Columns.from_tuples(cursor.column_names, result)
                 logger.debug(f"Query executed successfully: {len(result)} rows returned")
             else:
-                conn.commit()
+                pooled.raw.commit()
                 result = cursor.lastrowid or True
-                
+            
+            shard.breaker.record_success()
             return result
             
         except Error as e:
-            logger.error(f"Query execution error: {e}")
-            if conn.is_connected():
-                conn.rollback()
+            broken = self._handle_error(shard, pooled, e)
             return None
         finally:
             if cursor:
                 cursor.close()
-            if conn and conn.is_connected():
-                conn.close()
+            shard.pool.release(pooled, discard=broken)
+    
+    def stream_query(self, query, params=None, shard=None, chunk_size=1000, columnar=False):
+        """
+        Execute a read on an unbuffered cursor and return a RowStream, or None on error
+        The query runs before this returns, so connection and statement errors
+        surface here; rows are then fetched from the server as the stream is
+        consumed. The caller must exhaust or close() the stream.
+        columnar=True yields tuples (names in stream.columns) instead of dicts.
+        """
+        shard = self._shard(shard)
+        pooled = self._acquire(shard)
+        if not pooled:
+            return None
+        
+        cursor = None
+        try:
+            cursor = pooled.raw.cursor(dictionary=not columnar, buffered=False)
+            cursor.execute(query, params or ())
+        except Error as e:
+            broken = self._handle_error(shard, pooled, e)
+            shard.pool.release(pooled, discard=True if cursor is None else broken)
+            return None
+        
+        shard.breaker.record_success()
+        
+        def stream_failed(error):
+            # Headers are already sent, so the client sees a truncated body
+            logger.error(f"Streaming query failed on shard {shard.name}: {error}")
+            if isinstance(error, (InterfaceError, OperationalError)):
+                shard.breaker.record_failure()
+        
+        return RowStream(shard.pool, pooled, cursor, chunk_size, on_error=stream_failed)
+    
+    def prefill_pool(self, count):
+        """Open up to `count` pooled connections per shard ahead of traffic"""
+        for shard in self.shards:
+            connections = []
+            try:
+                for _ in range(min(count, shard.pool.max_size)):
+                    pooled = self._acquire(shard)
+                    if not pooled:
+                        return False
+                    connections.append(pooled)
+                shard.breaker.record_success()
+            finally:
+                for pooled in connections:
+                    shard.pool.release(pooled)
+        return True
+    
+    def execute_named(self, name, params=None, shard=None):
+        """
+        Execute a registered query as a server-side prepared statement
+        The statement is prepared once per pooled connection and re-used after that
+        """
+        query = QUERIES.get(name)
+        bound = query.bind(params)
+        shard = self._shard(shard)
+        return self._coalesced(("named", shard.name, name, bound),
+                               lambda: self._run_named(query, bound, shard))
+    
+    def _run_named(self, query, bound, shard):
+        pooled = self._acquire(shard)
+        if not pooled:
+            return None
+        
+        broken = False
+        try:
+            cursor = pooled.prepared_cursor(query.name)
+            cursor.execute(query.sql, bound)
+            rows = cursor.fetchall()
+            columns = cursor.column_names
+            shard.breaker.record_success()
+            return [dict(zip(columns, row)) for row in rows]
+            
+        except Error as e:
+            pooled.forget_statement(query.name)
+            broken = self._handle_error(shard, pooled, e)
+            return None
+        finally:
+            shard.pool.release(pooled, discard=broken)
+    
+    def target_shard(self, params):
+        """Shard owning a single-airline or single-route query, else None"""
+        params = params or {}
+        if params.get("route_id") is not None:
+            return self.shards.for_route(params["route_id"])
+        if params.get("airline"):
+            return self.shards.for_airline(params["airline"])
+        return None
+    
+    def scatter(self, run):
+        """
+        Call run(shard) on every shard in parallel
+        Returns the per-shard results, or None if any shard failed
+        """
+        futures = [self._fanout.submit(run, shard) for shard in self.shards]
+        remaining = self._remaining()
+        try:
+            partials = [future.result(timeout=None if remaining is None else max(remaining, 0))
+                        for future in futures]
+        except FutureTimeoutError:
+            logger.warning("Request deadline passed waiting for shard results")
+            self._deadline_exceeded()
+            return None
+        if any(rows is None for rows in partials):
+            # Worker threads have no request context, so flag it here
+            self._mark_degraded()
+            return None
+        return partials
+    
+    def scatter_query(self, query, params=None):
+        """Run one query on every shard; per-shard row lists or None"""
+        return self.scatter(lambda shard: self.execute_query(query, params, shard=shard))
+    
+    def stream_scatter(self, query, params=None, shards=None, columnar=False):
+        """
+        Open one RowStream per shard (all shards unless given), in parallel
+        Returns the streams, or None with every opened stream closed if any shard failed
+        """
+        shards = list(self.shards) if shards is None else shards
+        futures = [self._fanout.submit(self.stream_query, query, params, shard, columnar=columnar)
+                   for shard in shards]
+        streams = [future.result() for future in futures]
+        if any(stream is None for stream in streams):
+            for stream in streams:
+                if stream is not None:
+                    stream.close()
+            self._mark_degraded()
+            return None
+        return streams
+    
+    def execute_routed(self, name, params=None, order_by=None, descending=False):
+        """
+        Run a named query where the data lives
+        Single-airline and single-route queries go to the owning shard; anything
+        else fans out to all shards and the sorted partial results are merged.
+        """
+        target = self.target_shard(params)
+        if target is not None or not self.is_sharded:
+            return self.execute_named(name, params, shard=target)
+        
+        partials = self.scatter(lambda shard: self.execute_named(name, params, shard=shard))
+        if partials is None:
+            return None
+        if order_by is None:
+            return [row for rows in partials for row in rows]
+        return merge_sorted(partials, order_by, descending, limit=(params or {}).get("limit"))
+    
+    def execute_partials(self, name, params=None):
+        """Per-shard partial aggregates of a named query (owning shard only when routed)"""
+        target = self.target_shard(params)
+        if target is not None or not self.is_sharded:
+            rows = self.execute_named(name, params, shard=target)
+            return None if rows is None else [rows]
+        return self.scatter(lambda shard: self.execute_named(name, params, shard=shard))
+
+# On-demand profiling behind the admin token; admin endpoints are off without one
+profiling = ProfilingSession()
+ADMIN_TOKEN = os.environ.get('SKYSQL_ADMIN_TOKEN', '')
+
+def _response_cache_key():
+    """Cache key built from the request path, query string and body"""
+    args = tuple(sorted(request.args.items(multi=True)))
+    body = request.get_data(as_text=True) if request.method == 'POST' else ''
+    return (request.path, args, body)
+
+def _stale_response(entry):
+    """Serve a cached payload annotated with its age"""
+    payload, status_code, stored_at = entry
+    age = int(time.time() - stored_at)
+    body = dict(payload)
+    body["cache"] = {
+        "status": "stale",
+        "age_seconds": age,
+        "cached_at": datetime.fromtimestamp(stored_at).isoformat()
+    }
+    response = jsonify(body)
+    response.status_code = status_code
+    response.headers['Age'] = str(age)
+    response.headers['X-Cache'] = 'STALE'
+    return response
+
+def last_known_good(view=None, fresh_ttl=None, tables=()):
+    """
+    Serve the last successful response while the database is unavailable
+    Open circuit: answer from cache without calling the view at all
+    Failed query: replace the view's fallback payload with the cached one
+    fresh_ttl: also answer from cache while the entry is younger than this,
+    unless the request says Cache-Control: no-cache (full loads that a
+    change-feed token must not predate)
+    tables: tables the response is computed from; a change to any of them
+    ends the entry's freshness early (it still serves as last-known-good)
+    """
+    if view is None:
+        return lambda func: last_known_good(func, fresh_ttl=fresh_ttl, tables=tables)
+    
+    family = view.__name__
+    
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _response_cache_key()
+        
+        if fresh_ttl and 'no-cache' not in request.headers.get('Cache-Control', '').lower():
+            cached = response_cache.fresh(key, family, tables)
+            if cached:
+                response = jsonify(cached[0])
+                response.status_code = cached[1]
+                response.headers['Age'] = str(int(time.time() - cached[2]))
+                response.headers['X-Cache'] = 'HIT'
+                return response
+        
+        if db.circuit_open():
+            cached = response_cache.get(key)
+            if cached:
+                return _stale_response(cached)
+        
+        # Versions before the view runs, so a change made meanwhile invalidates the entry
+        versions = response_cache.versions(tables)
+        g.db_degraded = False
+        response = app.make_response(view(*args, **kwargs))
+        
+        if g.db_degraded:
+            cached = response_cache.get(key)
+            if cached:
+                return _stale_response(cached)
+            # Never present generated numbers as if they were real data
+            retry_after = max(db.retry_after(), 1)
+            unavailable = jsonify({
+                "error": "Database temporarily unavailable and no cached data for this request",
+                "status": "database_unavailable",
+                "retry_after_seconds": retry_after,
+                "timestamp": datetime.now().isoformat()
+            })
+            unavailable.status_code = 503
+            unavailable.headers['Retry-After'] = str(retry_after)
+            return unavailable
+        
+        if response.status_code == 200 and response.is_json and not response.is_streamed:
+            payload = response.get_json()
+            if payload.get("status") != "fallback_data":
+                response_cache.put(key, payload, response.status_code,
+                                   family=family, ttl=fresh_ttl, versions=versions)
+        return response
+    
+    return wrapper
+
+# Concurrency limits per endpoint class. Their sum matches the per-shard
+# connection pool size, so one class can never hold every connection.
+ADMISSION_CLASSES = {
+    "health": EndpointClass("health", max_concurrent=2, max_queue=8, queue_timeout=0.5, deadline=2.0),
+    "reference": EndpointClass("reference", max_concurrent=3, max_queue=32, queue_timeout=2.0, deadline=10.0),
+    "analytics": EndpointClass("analytics", max_concurrent=4, max_queue=16, queue_timeout=3.0, deadline=20.0),
+    "reports": EndpointClass("reports", max_concurrent=1, max_queue=2, queue_timeout=5.0, deadline=60.0)
+}
+
+def admit(endpoint_class):
+    """
+    Admission control for a view: bounded concurrency, bounded queue, deadline
+    Shed requests get 429 (queue full) or 503 (queued too long) with Retry-After.
+    Applied inside last_known_good so fresh cache hits never queue.
+    """
+    limiter = ADMISSION_CLASSES[endpoint_class]
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                g.request_deadline = limiter.acquire()
+            except Rejected as e:
+                response = jsonify({
+                    "error": f"Server busy: {e.reason}",
+                    "status": "overloaded",
+                    "endpoint_class": e.endpoint_class,
+                    "retry_after_seconds": e.retry_after,
+                    "timestamp": datetime.now().isoformat()
+                })
+                response.status_code = e.status_code
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+            
+            g.admission_class = limiter
+            started = time.monotonic()
+            streamed = False
+            try:
+                response = view(*args, **kwargs)
+                if isinstance(response, Response) and response.is_streamed:
+                    # The body still holds connections; keep the slot until it is sent
+                    response.call_on_close(lambda: limiter.release(time.monotonic() - started))
+                    streamed = True
+                return response
+            finally:
+                g.request_deadline = None
+                if not streamed:
+                    limiter.release(time.monotonic() - started)
+        return wrapper
+    return decorator
+
+def stream_json(rows, streams, **envelope):
+    """
+    Streamed JSON response: the envelope fields, then "data" and "count"
+    Rows are encoded in batches as they are read from the database, so memory
+    stays flat however many rows are sent. The streams are closed when the
+    response ends, including when the client disconnects mid-body.
+    """
+    def generate():
+        head = app.json.dumps(envelope)[:-1]
+        yield head + (', ' if envelope else '') + '"data": ['
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(app.json.dumps(row))
+            if len(batch) == STREAM_BATCH_ROWS:
+                yield (', ' if count else '') + ', '.join(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            yield (', ' if count else '') + ', '.join(batch)
+            count += len(batch)
+        yield f'], "count": {count}}}'
+    
+    response = Response(generate(), mimetype='application/json')
+    response.call_on_close(lambda: [stream.close() for stream in streams])
+    return response
+
+def response_format():
+    """List format requested with ?format=: 'rows' (default) or 'columnar'"""
+    fmt = request.args.get('format', 'rows')
+    if fmt not in ('rows', 'columnar'):
+        raise ValueError("format must be rows or columnar")
+    return fmt
+
+def rows_payload(rows, fmt):
+    """
+    The data part of a list response: {"data": [row, ...]} or, for columnar,
+    {"format": "columnar", "columns": [...], "data": {column: [...]}}
+    """
+    if fmt == 'columnar':
+        columns = rows if isinstance(rows, Columns) else Columns.from_dicts(rows)
+        return {"format": "columnar", **columns.payload()}
+    return {"data": rows}
+
+# Rows encoded per chunk of a streamed response body
+STREAM_BATCH_ROWS = 500
+
+def require_admin(view):
+    """Allow a view only with the X-Admin-Token header matching SKYSQL_ADMIN_TOKEN"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Admin endpoints are disabled (SKYSQL_ADMIN_TOKEN not set)"}), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return jsonify({"error": "Invalid or missing admin token"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def _bounded_int(value, name, minimum, maximum):
+    """Parse an integer request parameter, raising ValueError when out of range"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if number < minimum or number > maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return number
+
+def _bounded_float(value, name, minimum, maximum):
+    """Parse a numeric request parameter, raising ValueError when missing or out of range"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not minimum <= number <= maximum:
+        raise ValueError(f"{name} must be between {minimum} and {maximum}")
+    return number
+
+def parse_analytics_filters(source, days=90, limit=500, min_flights=1):
+    """
+    Window, airline, route and min-flight filters shared by analytics endpoints
+    `source` is request.args or a JSON body; raises ValueError on bad input
+    The airline code is also encoded to the airline_id the queries filter on.
+    """
+    filters = {
+        "days": days,
+        "airline": source.get('airline') or None,
+        "airline_id": None,
+        "route_id": None,
+        "min_flights": min_flights,
+        "limit": limit
+    }
+    if source.get('days') is not None:
+        filters["days"] = _bounded_int(source.get('days'), 'days', 1, 3650)
+    if source.get('route_id') is not None:
+        filters["route_id"] = _bounded_int(source.get('route_id'), 'route_id', 1, 2 ** 31 - 1)
+    if source.get('min_flights') is not None:
+        filters["min_flights"] = _bounded_int(source.get('min_flights'), 'min_flights', 0, 1000000)
+    if source.get('limit') is not None:
+        filters["limit"] = _bounded_int(source.get('limit'), 'limit', 1, 5000)
+    if filters["airline"] is not None:
+        filters["airline"] = str(filters["airline"]).upper()[:3]
+        filters["airline_id"] = codes.airline_id(filters["airline"])
+        if filters["airline_id"] is None:
+            raise ValueError(f"Unknown airline: {filters['airline']}")
+    return filters
 
-# Initialize database manager
-db = DatabaseManager()
+def tiered_route_rows(filters):
+    """
+    Per-route sums over hot InnoDB rows plus archived cold files
+    Returns None when no cold file overlaps the window, so callers keep the
+    single-query hot path. Archived rows are deleted from InnoDB, so hot and
+    cold partials never overlap and are simply added per route.
+    """
+    today = date.today()
+    start = today - timedelta(days=filters["days"]) if filters["days"] is not None else date.min
+    if not cold_store.has_data(start, today):
+        return None
+    
+    params = dict(filters, start=start if filters["days"] is not None else None)
+    partials = db.execute_partials("route_partials", params)
+    if partials is None:
+        return []
+    
+    routes = {row['route_id']: row for rows in partials for row in rows}
+    cold_rows = cold_store.route_partials(start, today, route_ids=set(routes))
+    merged = merge_aggregates(
+        partials + [cold_rows],
+        key_fields=("route_id",),
+        sum_fields=ColdStore.PARTIAL_FIELDS,
+        avg_fields={
+            "avg_efficiency": ("efficiency_sum", "flights"),
+            "fuel_per_km": ("fuel_per_km_sum", "flights"),
+            "avg_passengers": ("passengers_sum", "flights"),
+            "avg_fuel_used": ("fuel_used_sum", "flights")
+        }
+    )
+    for row in merged:
+        route = routes[row['route_id']]
+        for field in ("airline_id", "source_airport_id", "dest_airport_id", "distance_km"):
+            row[field] = route[field]
+    return merged
+
+def label_routes(rows, field="route_name", separator=" - "):
+    """
+    Per-route analytics rows in their API shape, in place: the airport keys
+    become one route label and the airline key (if selected) its code
+    """
+    for row in rows or ():
+        row[field] = codes.route_name(row, separator)
+        del row['source_airport_id'], row['dest_airport_id']
+        if 'airline_id' in row:
+            row['airline_code'] = codes.airline_code(row.pop('airline_id'))
+    return rows
+
+def top_routes(rows, min_flights, limit):
+    """Routes with enough flights, best average efficiency first"""
+    rows = [row for row in rows if row["flights"] >= min_flights and row["avg_efficiency"] is not None]
+    rows.sort(key=lambda row: row["avg_efficiency"], reverse=True)
+    return rows[:limit]
 
 def ensure_operational_metrics():
     """
@@ -113,7 +745,7 @@ def ensure_operational_metrics():
         logger.info("Generating operational metrics sample data...")
         
         # Get available routes to base metrics on
-        routes = db.execute_query("SELECT route_id, airline_code FROM routes LIMIT 10")
+        routes = db.execute_query("SELECT route_id, airline_id FROM routes LIMIT 10")
         if not routes:
             logger.warning("No routes found for generating operational metrics")
             return False
@@ -124,7 +756,7 @@ def ensure_operational_metrics():
             metric_date = datetime.now() - timedelta(days=(6 - i))
             
             for route in routes:
-                route_id, airline_code = route
+                route_id, airline_id = route['route_id'], route['airline_id']
                 
                 operational_data.append((
                     metric_date.date(),
@@ -135,18 +767,19 @@ def ensure_operational_metrics():
                     round(random.uniform(0.78, 0.92), 2),
                     round(random.uniform(0.85, 0.96), 2),
                     route_id,
-                    airline_code
+                    airline_id
                 ))
         
         # Insert the generated metrics
         insert_success = db.execute_query("""
             INSERT INTO operational_metrics 
             (metric_date, total_flights, avg_efficiency, total_fuel_used_kg, total_fuel_saved_kg, 
-             avg_passenger_load, on_time_performance, route_id, airline_code)
+             avg_passenger_load, on_time_performance, route_id, airline_id)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, operational_data, fetch=False)
         
         if insert_success:
+            response_cache.invalidate("operational_metrics")
             logger.info(f"Generated {len(operational_data)} operational metrics records")
             return True
         else:
@@ -169,33 +802,96 @@ def api_root():
         "status": "operational"
     })
 
+@app.before_request
+def start_warmup():
+    """Start background warm-up on first traffic when not launched via main()"""
+    warmup.start()
+
+@app.before_request
+def start_profiling():
+    """Register sampled requests with the profiler while a session is running"""
+    if profiling.expires_at is None or request.url_rule is None:
+        return
+    if request.url_rule.rule.startswith('/api/admin/'):
+        return
+    if profiling.wants(request.endpoint, request.url_rule.rule):
+        g.profile = (request.endpoint, profiling.request_started(request.endpoint))
+
+@app.teardown_request
+def finish_profiling(error=None):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiling.request_finished(*profile)
+
+@app.route('/api/live', methods=['GET'])
+def liveness_check():
+    """Liveness probe: the process is up and serving, no database access"""
+    return jsonify({
+        "status": "alive",
+        "uptime_seconds": round(time.perf_counter() - PROCESS_START, 3),
+        "timestamp": datetime.now().isoformat()
+    })
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 200 only once the connection pool and caches are warm"""
+    state = warmup.snapshot()
+    state["startup_seconds"] = STARTUP_TIMING.get("startup_seconds")
+    if warmup.completed_at is not None:
+        state["time_to_ready_seconds"] = round(warmup.completed_at - PROCESS_START, 3)
+    state["timestamp"] = datetime.now().isoformat()
+    
+    if state["ready"]:
+        state["status"] = "ready"
+        return jsonify(state)
+    state["status"] = "warming_up"
+    return jsonify(state), 503, {"Retry-After": str(max(int(warmup.retry_interval), 1))}
+
 @app.route('/api/health', methods=['GET'])
+@admit("health")
 def health_check():
-    """Comprehensive health check endpoint"""
+    """
+    Comprehensive health check endpoint
+    ?counts=exact (trigger-kept counters, default) or approximate (table
+    statistics); ?max_staleness= seconds a cached count may be old
+    """
     try:
-        # Test database connection
-        test_query = db.execute_query("SELECT 1 as status")
+        try:
+            count_mode = request.args.get('counts', 'exact')
+            if count_mode not in ('exact', 'approximate'):
+                raise ValueError("counts must be exact or approximate")
+            max_staleness = float(request.args.get('max_staleness', row_counts.default_staleness))
+            if not 0 <= max_staleness <= 3600:
+                raise ValueError("max_staleness must be between 0 and 3600 seconds")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Test database connection on every shard
+        test_query = db.scatter_query("SELECT 1 as status")
         
         if test_query:
             # Ensure operational metrics data exists
             metrics_ready = ensure_operational_metrics()
             
-            # Get basic database stats
-            stats = db.execute_query("""
-                SELECT 
-                    (SELECT COUNT(*) FROM airlines) as airline_count,
-                    (SELECT COUNT(*) FROM airports) as airport_count,
-                    (SELECT COUNT(*) FROM routes) as route_count,
-                    (SELECT COUNT(*) FROM flight_performance) as flight_count,
-                    (SELECT COUNT(*) FROM operational_metrics) as metrics_count
-            """)
+            # Counter lookups, not COUNT(*) scans: constant time at any table size
+            counts = row_counts.counts(count_mode, max_staleness)
+            statistics = {}
+            if counts:
+                for table, key in (("airlines", "airline_count"), ("airports", "airport_count"),
+                                   ("operational_metrics", "metrics_count"), ("routes", "route_count"),
+                                   ("flight_performance", "flight_count")):
+                    if table in counts:
+                        statistics[key] = counts[table]["count"]
             
             health_status = {
                 "status": "healthy",
                 "database": "connected",
                 "operational_metrics": "ready" if metrics_ready else "generating",
                 "timestamp": datetime.now().isoformat(),
-                "statistics": stats[0] if stats else {},
+                "statistics": statistics,
+                "statistics_source": counts or {},
+                "shards": db.status_snapshot(),
+                "cold_storage": cold_store.stats(),
                 "server_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
             
@@ -204,9 +900,10 @@ def health_check():
             return jsonify({
                 "status": "unhealthy",
                 "database": "disconnected",
+                "shards": db.status_snapshot(),
                 "timestamp": datetime.now().isoformat(),
                 "error": "Database connection test failed"
-            }), 503
+            }), 503, {"Retry-After": str(max(db.retry_after(), 1))}
             
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -216,7 +913,36 @@ def health_check():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@app.route('/api/system/stats', methods=['GET'])
+@admit("health")
+def system_stats():
+    """In-process counters for the database layer and in-memory analytics engines"""
+    return jsonify({
+        "timestamp": datetime.now().isoformat(),
+        "single_flight": db.single_flight.stats(),
+        "admission": {name: limiter.stats() for name, limiter in ADMISSION_CLASSES.items()},
+        "shards": db.status_snapshot(),
+        "warmup": warmup.snapshot(),
+        "code_dictionary": codes.stats(),
+        "sketches": sketch_store.stats(),
+        "leaderboards": leaderboards.stats(),
+        "metrics_pyramid": metrics_pyramid.stats(),
+        "route_graph": route_graph.stats(),
+        "fleet_simulator": fleet_simulator.stats(),
+        "cold_storage": cold_store.stats(),
+        "change_feed": change_feed.stats(),
+        "row_counts": row_counts.stats(),
+        "forecasts": forecast_engine.stats(),
+        "airport_index": geo_index.stats(),
+        "weather": weather_enricher.stats(),
+        "history": temporal_index.stats(),
+        "response_cache": response_cache.stats(),
+        "cache_versions": table_watcher.stats() if table_watcher else None
+    })
+
 @app.route('/api/airlines', methods=['GET'])
+@last_known_good(fresh_ttl=300, tables=("airlines",))
+@admit("reference")
 def get_airlines():
     """Get all airlines data"""
     try:
@@ -240,14 +966,23 @@ def get_airlines():
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/api/airports', methods=['GET'])
+@last_known_good(fresh_ttl=300, tables=("airports",))
+@admit("reference")
 def get_airports():
     """Get all airports data"""
     try:
-        airports = db.execute_query("""
-            SELECT airport_id, name, city, country, iata_code
+        try:
+            fmt = response_format()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Coordinates once the geo index has checked the columns exist
+        coordinates = ", latitude, longitude" if geo_index.has_coordinates else ""
+        airports = db.execute_query(f"""
+            SELECT airport_id, name, city, country, iata_code{coordinates}
             FROM airports 
             ORDER BY country, city
-        """)
+        """, columnar=fmt == 'columnar')
         
         if airports is None:
             return jsonify({"error": "Failed to fetch airports data"}), 500
@@ -255,38 +990,241 @@ def get_airports():
         return jsonify({
             "timestamp": datetime.now().isoformat(),
             "count": len(airports),
-            "data": airports
+            **rows_payload(airports, fmt)
         })
         
     except Exception as e:
         logger.error(f"Error fetching airports: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+def _geo_point(args):
+    """(lat, lon, airport index to exclude) from ?lat=&lon= or ?airport=IATA"""
+    if 'airport' in args:
+        code = args['airport'].upper()
+        index = geo_index.index.by_code.get(code)
+        if index is None:
+            raise LookupError(f"No coordinates for airport {code}")
+        return float(geo_index.index.lat[index]), float(geo_index.index.lon[index]), index
+    return (_bounded_float(args.get('lat'), 'lat', -90, 90),
+            _bounded_float(args.get('lon'), 'lon', -180, 180), None)
+
+@app.route('/api/airports/nearest', methods=['GET'])
+@admit("reference")
+def get_nearest_airports():
+    """k nearest airports to ?lat=&lon= (or to ?airport=IATA, excluding it)"""
+    try:
+        if not geo_index.refresh():
+            return jsonify({"error": "Airport index unavailable"}), 503
+        try:
+            lat, lon, exclude = _geo_point(request.args)
+            k = _bounded_int(request.args.get('k', 5), 'k', 1, 100)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameters: {e}"}), 400
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        
+        index = geo_index.index
+        nearest = index.nearest(lat, lon, k, exclude=exclude)
+        return jsonify({
+            "origin": {"latitude": lat, "longitude": lon},
+            "count": len(nearest),
+            "data": [index.describe(i, km) for i, km in nearest],
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error finding nearest airports: {e}")
+        return jsonify({"error": "Airport search service temporarily unavailable"}), 500
+
+@app.route('/api/airports/within', methods=['GET'])
+@admit("reference")
+def get_airports_within():
+    """Airports within ?radius_km= of ?lat=&lon= (or ?airport=IATA), closest first"""
+    try:
+        if not geo_index.refresh():
+            return jsonify({"error": "Airport index unavailable"}), 503
+        try:
+            lat, lon, _ = _geo_point(request.args)
+            radius_km = _bounded_float(request.args.get('radius_km', 500), 'radius_km', 0, 20016)
+            limit = _bounded_int(request.args.get('limit', 500), 'limit', 1, 10000)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameters: {e}"}), 400
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        
+        index = geo_index.index
+        found = index.within(lat, lon, radius_km, limit)
+        return jsonify({
+            "origin": {"latitude": lat, "longitude": lon},
+            "radius_km": radius_km,
+            "count": len(found),
+            "data": [index.describe(i, km) for i, km in found],
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error searching airports by radius: {e}")
+        return jsonify({"error": "Airport search service temporarily unavailable"}), 500
+
+@app.route('/api/airports/bbox', methods=['GET'])
+@admit("reference")
+def get_airports_in_box():
+    """Airports inside ?min_lat=&min_lon=&max_lat=&max_lon= (min_lon > max_lon wraps the antimeridian)"""
+    try:
+        if not geo_index.refresh():
+            return jsonify({"error": "Airport index unavailable"}), 503
+        try:
+            min_lat = _bounded_float(request.args.get('min_lat'), 'min_lat', -90, 90)
+            max_lat = _bounded_float(request.args.get('max_lat'), 'max_lat', -90, 90)
+            min_lon = _bounded_float(request.args.get('min_lon'), 'min_lon', -180, 180)
+            max_lon = _bounded_float(request.args.get('max_lon'), 'max_lon', -180, 180)
+            limit = _bounded_int(request.args.get('limit', 1000), 'limit', 1, 10000)
+            if min_lat > max_lat:
+                raise ValueError("min_lat must not be above max_lat")
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameters: {e}"}), 400
+        
+        index = geo_index.index
+        found = index.in_box(min_lat, min_lon, max_lat, max_lon, limit)
+        return jsonify({
+            "box": {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon},
+            "count": len(found),
+            "data": [index.describe(i) for i in found],
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error searching airports by box: {e}")
+        return jsonify({"error": "Airport search service temporarily unavailable"}), 500
+
+@app.route('/api/routes/distances', methods=['GET'])
+@last_known_good(fresh_ttl=300, tables=("routes", "airports"))
+@admit("analytics")
+def validate_route_distances():
+    """
+    Stored routes.distance_km against great-circle distances of the airport coordinates
+    ?tolerance_pct= (default 2) marks larger deviations as mismatches
+    """
+    try:
+        try:
+            tolerance = _bounded_float(request.args.get('tolerance_pct', 2), 'tolerance_pct', 0, 100)
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameters: {e}"}), 400
+        if not geo_index.refresh():
+            return jsonify({"error": "Airport index unavailable"}), 503
+        
+        partials = db.scatter_query("""
+            SELECT route_id, airline_id, source_airport_id, dest_airport_id, distance_km
+            FROM routes
+        """)
+        if partials is None:
+            return jsonify({"error": "Failed to fetch routes"}), 500
+        routes = [route for rows in partials for route in rows]
+        
+        # One vectorized haversine pass over every route
+        computed = geo_index.index.route_distances(routes)
+        mismatches, unknown = [], []
+        for route, km in zip(routes, computed.tolist()):
+            if math.isnan(km):
+                unknown.append(route['route_id'])
+                continue
+            stored = float(route['distance_km'] or 0)
+            deviation = (stored - km) / km * 100 if km else 0.0
+            if abs(deviation) > tolerance:
+                mismatches.append({
+                    "route_id": route['route_id'],
+                    "route": codes.route_name(route, "-"),
+                    "airline_code": codes.airline_code(route['airline_id']),
+                    "stored_km": stored,
+                    "great_circle_km": round(km, 1),
+                    "deviation_pct": round(deviation, 2)
+                })
+        mismatches.sort(key=lambda entry: abs(entry["deviation_pct"]), reverse=True)
+        
+        return jsonify({
+            "routes_checked": len(routes) - len(unknown),
+            "tolerance_pct": tolerance,
+            "mismatch_count": len(mismatches),
+            "mismatches": mismatches,
+            "routes_without_coordinates": unknown,
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Error validating route distances: {e}")
+        return jsonify({"error": "Route distance service temporarily unavailable"}), 500
+
+def routes_as_of(when):
+    """Routes in the /api/routes row shape as configured at `when`, longest first; None without history"""
+    try:
+        versions = temporal_index.table_as_of("routes", when)
+    except RuntimeError:
+        return None
+    airlines = db.execute_query("SELECT airline_id, name FROM airlines") or []
+    names = {airline['airline_id']: airline['name'] for airline in airlines}
+    routes = [
+        {
+            "route_id": route_id,
+            "airline_id": row["airline_id"],
+            "source_airport_id": row["source_airport_id"],
+            "dest_airport_id": row["dest_airport_id"],
+            "distance_km": row["distance_km"],
+            "base_fuel_kg": row["base_fuel_kg"],
+            "airline_name": names.get(row["airline_id"]),
+            "valid_from": row["valid_from"].isoformat()
+        }
+        for route_id, row in versions.items()
+    ]
+    routes.sort(key=lambda route: route["distance_km"], reverse=True)
+    return codes.decode(routes, dest_airport_id="destination_airport")
+
 @app.route('/api/routes', methods=['GET'])
+@last_known_good(fresh_ttl=300, tables=("routes", "airlines"))
+@admit("reference")
 def get_flight_routes():
-    """Get all flight routes with detailed information"""
+    """
+    Get all flight routes with detailed information
+    ?as_of= returns the routes as they were configured at that time
+    """
     try:
-        routes = db.execute_query("""
+        try:
+            fmt = response_format()
+            as_of = parse_as_of(request.args['as_of']) if 'as_of' in request.args else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if as_of is not None:
+            routes = routes_as_of(as_of)
+            if routes is None:
+                return jsonify({"error": "Route history unavailable"}), 503
+            return jsonify({
+                "timestamp": datetime.now().isoformat(),
+                "as_of": as_of.isoformat(),
+                "count": len(routes),
+                **rows_payload(routes, fmt)
+            })
+        
+        columnar = fmt == 'columnar'
+        partials = db.scatter(lambda shard: db.execute_query("""
             SELECT 
                 r.route_id,
-                r.airline_code,
-                r.source_airport,
-                r.dest_airport as destination_airport,
+                r.airline_id,
+                r.source_airport_id,
+                r.dest_airport_id,
                 r.distance_km,
                 r.base_fuel_kg,
                 a.name as airline_name
             FROM routes r
-            LEFT JOIN airlines a ON r.airline_code = a.iata_code
+            LEFT JOIN airlines a ON r.airline_id = a.airline_id
             ORDER BY r.distance_km DESC
-        """)
+        """, shard=shard, columnar=columnar))
+        merge = merge_sorted_columns if columnar else merge_sorted
+        routes = merge(partials, 'distance_km', descending=True) if partials is not None else None
         
         if routes is None:
             return jsonify({"error": "Failed to fetch routes data"}), 500
+        codes.decode(routes, dest_airport_id="destination_airport")
             
         return jsonify({
             "timestamp": datetime.now().isoformat(),
             "count": len(routes),
-            "data": routes
+            **rows_payload(routes, fmt)
         })
         
     except Exception as e:
@@ -294,10 +1232,26 @@ def get_flight_routes():
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/api/flights', methods=['GET'])
+@last_known_good
+@admit("reference")
 def get_flights():
-    """Get flight performance data"""
+    """
+    Get flight performance data, newest first
+    Streamed from unbuffered cursors and merged across shards as it is sent,
+    so large `limit` values do not materialize the result in memory. The
+    columnar format is collected into column lists and sent in one piece.
+    """
     try:
-        flights = db.execute_query("""
+        try:
+            fmt = response_format()
+            limit = _bounded_int(request.args.get('limit', 50), 'limit', 1, 1000000)
+            filters = parse_analytics_filters(
+                {key: value for key, value in request.args.items() if key != 'limit'}, days=None)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        target = db.target_shard(filters)
+        streams = db.stream_scatter("""
             SELECT 
                 fp.performance_id,
                 fp.route_id,
@@ -305,48 +1259,69 @@ def get_flights():
                 fp.actual_fuel_kg,
                 fp.planned_fuel_kg,
                 fp.efficiency_score,
-                r.source_airport,
-                r.dest_airport as destination_airport
+                r.source_airport_id,
+                r.dest_airport_id
             FROM flight_performance fp
             JOIN routes r ON fp.route_id = r.route_id
+            WHERE (%(days)s IS NULL OR fp.flight_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY))
+              AND (%(airline_id)s IS NULL OR r.airline_id = %(airline_id)s)
+              AND (%(route_id)s IS NULL OR fp.route_id = %(route_id)s)
             ORDER BY fp.flight_date DESC
-            LIMIT 50
-        """)
+            LIMIT %(limit)s
+        """, {
+            "days": filters["days"],
+            "airline_id": filters["airline_id"],
+            "route_id": filters["route_id"],
+            "limit": limit
+        }, shards=None if target is None else [target], columnar=fmt == 'columnar')
         
-        if flights is None:
+        if streams is None:
             return jsonify({"error": "Failed to fetch flights data"}), 500
-            
-        return jsonify({
-            "timestamp": datetime.now().isoformat(),
-            "count": len(flights),
-            "data": flights
-        })
+        
+        if fmt == 'columnar':
+            flights = Columns(streams[0].columns)
+            try:
+                flights.extend(merge_streams(streams, flights.index('flight_date'), descending=True, limit=limit))
+            finally:
+                for stream in streams:
+                    stream.close()
+            codes.decode(flights, dest_airport_id="destination_airport")
+            return jsonify({
+                "timestamp": datetime.now().isoformat(),
+                "count": len(flights),
+                **rows_payload(flights, fmt)
+            })
+        
+        rows = codes.decode_iter(merge_streams(streams, 'flight_date', descending=True, limit=limit),
+                                 dest_airport_id="destination_airport")
+        return stream_json(rows, streams, timestamp=datetime.now().isoformat())
         
     except Exception as e:
         logger.error(f"Error fetching flights: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/api/dashboard-stats', methods=['GET'])
+@last_known_good(fresh_ttl=60, tables=("routes", "flight_performance", "operational_metrics"))
+@admit("analytics")
 def get_dashboard_stats():
     """Get dashboard summary data for frontend metrics - FIXED VERSION"""
     try:
-        # Get route count
-        routes_count = db.execute_query("SELECT COUNT(*) as count FROM routes")
-        # Get analytics record count
-        flights_count = db.execute_query("SELECT COUNT(*) as count FROM flight_performance")
-        # Get total fuel analyzed
-        total_fuel = db.execute_query("SELECT SUM(base_fuel_kg) as total FROM routes")
+        try:
+            savings_days = _bounded_int(request.args.get('days', 30), 'days', 1, 3650)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Route and flight counts from the row counters, base fuel summed across shards
+        counts = row_counts.counts() or {}
+        partials = db.execute_partials("route_fuel_totals")
+        totals = merge_aggregates(partials, sum_fields=("total_base_fuel",)) if partials else []
         # Get total savings from operational metrics
-        total_savings = db.execute_query("""
-            SELECT COALESCE(SUM(total_fuel_saved_kg), 0) as savings 
-            FROM operational_metrics 
-            WHERE metric_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        """)
+        total_savings = db.execute_named("dashboard_savings", {"days": savings_days})
         
         # Handle cases where queries return None or no data
-        routes_count_val = routes_count[0]['count'] if routes_count and routes_count[0]['count'] is not None else 18
-        flights_count_val = flights_count[0]['count'] if flights_count and flights_count[0]['count'] is not None else 245
-        total_fuel_val = total_fuel[0]['total'] if total_fuel and total_fuel[0]['total'] is not None else 2850000
+        routes_count_val = counts['routes']['count'] if 'routes' in counts else 18
+        flights_count_val = counts['flight_performance']['count'] if 'flight_performance' in counts else 245
+        total_fuel_val = totals[0]['total_base_fuel'] if totals else 2850000
         estimated_savings = total_savings[0]['savings'] if total_savings and total_savings[0]['savings'] is not None else 125000
         
         # FIX: Convert Decimal to float for calculations
@@ -392,33 +1367,60 @@ def get_dashboard_stats():
         })
 
 @app.route('/api/analytics/efficiency', methods=['GET'])
+@last_known_good(fresh_ttl=60, tables=("routes", "airlines", "flight_performance"))
+@admit("analytics")
 def get_efficiency_analytics():
     """Get detailed efficiency analytics with fallback data"""
     try:
-        analytics = db.execute_query("""
-            SELECT 
-                r.route_id,
-                CONCAT(r.source_airport, ' - ', r.dest_airport) as route_name,
-                r.airline_code,
-                COUNT(fp.performance_id) as total_flights,
-                AVG(fp.efficiency_score) as avg_efficiency,
-                AVG(fp.actual_fuel_kg / r.distance_km) as fuel_per_km,
-                AVG(fp.passengers_count) as avg_passengers,
-                COALESCE(SUM(fp.fuel_savings_kg), 0) as total_fuel_saved
-            FROM flight_performance fp
-            JOIN routes r ON fp.route_id = r.route_id
-            WHERE fp.flight_date >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-            GROUP BY r.route_id, r.source_airport, r.dest_airport, r.airline_code
-            HAVING total_flights >= 1
-            ORDER BY avg_efficiency DESC
-        """)
+        try:
+            filters = parse_analytics_filters(request.args)
+            fmt = response_format()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # If no data, provide fallback
-        if not analytics:
+        tiered = tiered_route_rows(filters)
+        if tiered is not None:
+            # Window reaches into archived months: hot and cold rows together
+            analytics = [{
+                "route_id": row["route_id"],
+                "route_name": codes.route_name(row),
+                "airline_code": codes.airline_code(row["airline_id"]),
+                "total_flights": int(row["flights"]),
+                "avg_efficiency": row["avg_efficiency"],
+                "fuel_per_km": row["fuel_per_km"],
+                "avg_passengers": row["avg_passengers"],
+                "total_fuel_saved": row["fuel_saved_sum"]
+            } for row in top_routes(tiered, filters["min_flights"], filters["limit"])]
+            for row in tiered:
+                row["distance_sum"] = row["flights"] * float(row["distance_km"] or 0)
+            partials = [tiered] if tiered else None
+        else:
+            analytics = db.execute_routed("efficiency_analytics", filters,
+                                          order_by='avg_efficiency', descending=True)
+            label_routes(analytics)
+            
+            # Network totals merged from per-shard sums and counts
+            partials = db.execute_partials("efficiency_totals", filters)
+        network_summary = None
+        if partials:
+            merged = merge_aggregates(
+                partials,
+                sum_fields=("flights", "efficiency_sum", "fuel_saved_sum", "fuel_used_sum", "distance_sum"),
+                avg_fields={"avg_efficiency": ("efficiency_sum", "flights")}
+            )[0]
+            network_summary = {
+                "total_flights": int(merged["flights"]),
+                "avg_efficiency": round(merged["avg_efficiency"], 4) if merged["avg_efficiency"] is not None else None,
+                "fuel_per_km": round(merged["fuel_used_sum"] / merged["distance_sum"], 2) if merged["distance_sum"] else None,
+                "total_fuel_saved": round(merged["fuel_saved_sum"], 2)
+            }
+        
+        # If no data for the unfiltered network view, provide fallback
+        if not analytics and not filters["airline"] and not filters["route_id"]:
             logger.warning("No analytics data found, providing fallback data")
             # Generate fallback data
             fallback_routes = db.execute_query("""
-                SELECT route_id, source_airport, dest_airport, airline_code 
+                SELECT route_id, source_airport_id, dest_airport_id, airline_id 
                 FROM routes LIMIT 5
             """)
             
@@ -427,8 +1429,8 @@ def get_efficiency_analytics():
                 for route in fallback_routes:
                     analytics.append({
                         "route_id": route['route_id'],
-                        "route_name": f"{route['source_airport']} - {route['dest_airport']}",
-                        "airline_code": route['airline_code'],
+                        "route_name": codes.route_name(route),
+                        "airline_code": codes.airline_code(route['airline_id']),
                         "total_flights": random.randint(3, 12),
                         "avg_efficiency": round(random.uniform(0.75, 0.95), 3),
                         "fuel_per_km": round(random.uniform(8, 15), 2),
@@ -438,50 +1440,220 @@ def get_efficiency_analytics():
             
         return jsonify({
             "analysis_type": "Route Efficiency Analytics",
-            "period": "last_90_days",
+            "period": f"last_{filters['days']}_days",
+            "filters": filters,
             "total_routes_analyzed": len(analytics) if analytics else 0,
+            "network_summary": network_summary,
             "timestamp": datetime.now().isoformat(),
-            "data": analytics or []
+            **rows_payload(analytics or [], fmt)
         })
         
     except Exception as e:
         logger.error(f"Error fetching efficiency analytics: {e}")
         return jsonify({"error": "Analytics service temporarily unavailable"}), 500
 
+@app.route('/api/analytics/distribution', methods=['GET'])
+@last_known_good(fresh_ttl=60, tables=("routes", "flight_performance"))
+@admit("analytics")
+def get_distribution_analytics():
+    """Get efficiency and fuel-per-km percentiles from merged route/day sketches"""
+    try:
+        metric = request.args.get('metric', 'efficiency')
+        group_by = request.args.get('group_by', 'network')
+        if metric not in SketchStore.METRICS:
+            return jsonify({"error": f"metric must be one of {', '.join(SketchStore.METRICS)}"}), 400
+        if group_by not in ('network', 'route', 'airline', 'day'):
+            return jsonify({"error": "group_by must be network, route, airline or day"}), 400
+        try:
+            fmt = response_format()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        try:
+            quantiles = [float(q) for q in request.args.get('quantiles', '0.5,0.9,0.99').split(',')]
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() \
+                if 'end' in request.args else datetime.now().date()
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() \
+                if 'start' in request.args else end - timedelta(days=request.args.get('days', 90, type=int))
+        except ValueError:
+            return jsonify({"error": "Invalid quantiles or date range"}), 400
+        if any(q < 0 or q > 1 for q in quantiles):
+            return jsonify({"error": "quantiles must be between 0 and 1"}), 400
+        airline_id = codes.airline_id(request.args['airline']) if request.args.get('airline') else None
+        if request.args.get('airline') and airline_id is None:
+            return jsonify({"error": f"Unknown airline: {request.args['airline']}"}), 400
+        
+        if not sketch_store.refresh():
+            return jsonify({"error": "Failed to refresh distribution sketches"}), 500
+        
+        groups = sketch_store.distribution(
+            metric, start, end,
+            route_id=request.args.get('route_id', type=int),
+            airline=airline_id,
+            group_by=group_by
+        )
+        if group_by == 'airline':
+            groups = {codes.airline_code(group): sketch for group, sketch in groups.items()}
+        
+        data = []
+        for group, sketch in sorted(groups.items(), key=lambda item: str(item[0])):
+            data.append({
+                group_by: group,
+                "flights": sketch.count,
+                "mean": round(sketch.mean(), 4) if sketch.count else None,
+                "min": round(sketch.min, 4) if sketch.count else None,
+                "max": round(sketch.max, 4) if sketch.count else None,
+                "quantiles": {
+                    f"p{q * 100:g}": round(sketch.quantile(q), 4) if sketch.count else None
+                    for q in quantiles
+                }
+            })
+        
+        return jsonify({
+            "analysis_type": "Distribution Analytics",
+            "metric": metric,
+            "group_by": group_by,
+            "period": {"start": start.isoformat(), "end": end.isoformat()},
+            "error_guarantee": {
+                "type": "relative",
+                "relative_accuracy": sketch_store.alpha,
+                "description": f"Each quantile is within {sketch_store.alpha:.0%} of the exact value at that rank"
+            },
+            "timestamp": datetime.now().isoformat(),
+            **rows_payload(data, fmt)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error fetching distribution analytics: {e}")
+        return jsonify({"error": "Distribution analytics service temporarily unavailable"}), 500
+
+@app.route('/api/leaderboard', methods=['GET'])
+@admit("analytics")
+def get_leaderboard():
+    """
+    Best and worst routes over a rolling 7, 30 or 90 day window
+    metric: efficiency, fuel_savings or fuel_per_km; airline narrows the board
+    Served from incrementally maintained heaps, so the cost is O(k)
+    """
+    try:
+        metric = request.args.get('metric', 'efficiency')
+        if metric not in LEADERBOARD_METRICS:
+            return jsonify({"error": f"metric must be one of {', '.join(LEADERBOARD_METRICS)}"}), 400
+        try:
+            window = _bounded_int(request.args.get('window', 30), 'window', 1, 3650)
+            k = _bounded_int(request.args.get('k', 10), 'k', 1, leaderboards.k)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if window not in LEADERBOARD_WINDOWS:
+            return jsonify({"error": f"window must be one of {', '.join(map(str, LEADERBOARD_WINDOWS))}"}), 400
+        airline = str(request.args['airline']).upper()[:3] if request.args.get('airline') else None
+        airline_id = codes.airline_id(airline)
+        if airline and airline_id is None:
+            return jsonify({"error": f"Unknown airline: {airline}"}), 400
+        
+        if not leaderboards.refresh():
+            return jsonify({"error": "Failed to refresh leaderboards"}), 500
+        board = leaderboards.board(metric, window, airline=airline_id, k=k)
+        
+        return jsonify({
+            "metric": metric,
+            "higher_is_better": LEADERBOARD_METRICS[metric],
+            "window_days": window,
+            "scope": airline or "network",
+            "k": k,
+            "min_flights": leaderboards.min_flights,
+            "top": board["top"],
+            "bottom": board["bottom"],
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error fetching leaderboard: {e}")
+        return jsonify({"error": "Leaderboard service temporarily unavailable"}), 500
+
+@app.route('/api/analytics/weather', methods=['GET'])
+@last_known_good(fresh_ttl=300, tables=("routes", "flight_performance", "flight_weather"))
+@admit("analytics")
+def get_weather_analytics():
+    """Flight efficiency and fuel overrun by headwind band for weather-enriched flights"""
+    try:
+        try:
+            filters = parse_analytics_filters(request.args, days=90)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        partials = db.execute_partials("headwind_efficiency", {
+            "days": filters["days"],
+            "airline": filters["airline"],
+            "airline_id": filters["airline_id"]
+        })
+        if partials is None:
+            return jsonify({"error": "Failed to fetch weather analytics"}), 500
+        
+        bands = merge_aggregates(
+            partials,
+            key_fields=("headwind_band",),
+            sum_fields=("flights", "efficiency_sum", "efficiency_count", "fuel_used_sum",
+                        "fuel_planned_sum", "precipitation_sum"),
+            avg_fields={
+                "avg_efficiency": ("efficiency_sum", "efficiency_count"),
+                "avg_precipitation_mm": ("precipitation_sum", "flights")
+            }
+        )
+        data = []
+        for band in sorted(bands, key=lambda row: float(row["headwind_band"])):
+            planned = band["fuel_planned_sum"]
+            lower = int(band["headwind_band"])
+            data.append({
+                "headwind_kmh": f"{lower} to {lower + 10}",
+                "flights": int(band["flights"]),
+                "avg_efficiency": round(band["avg_efficiency"], 4) if band["avg_efficiency"] is not None else None,
+                "fuel_overrun_pct": round((band["fuel_used_sum"] - planned) / planned * 100, 2) if planned else None,
+                "avg_precipitation_mm": round(band["avg_precipitation_mm"], 1)
+            })
+        
+        return jsonify({
+            "analysis_type": "Headwind Attribution",
+            "period_days": filters["days"],
+            "airline": filters["airline"],
+            "enriched_flights": sum(row["flights"] for row in data),
+            "data": data,
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error fetching weather analytics: {e}")
+        return jsonify({"error": "Weather analytics service temporarily unavailable"}), 500
+
 @app.route('/api/metrics', methods=['GET'])
+@last_known_good(fresh_ttl=60, tables=("operational_metrics",))
+@admit("analytics")
 def get_operational_metrics():
     """Get operational metrics for dashboard - COMPLETELY FIXED VERSION"""
     try:
+        try:
+            filters = parse_analytics_filters(request.args, days=7, limit=7)
+            summary_days = _bounded_int(request.args.get('summary_days', 30), 'summary_days', 1, 3650)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # First, ensure we have operational metrics data
         ensure_operational_metrics()
         
         # Get recent operational metrics
-        metrics = db.execute_query("""
-            SELECT 
-                metric_date,
-                total_flights,
-                avg_efficiency,
-                total_fuel_used_kg,
-                total_fuel_saved_kg,
-                avg_passenger_load,
-                on_time_performance
-            FROM operational_metrics 
-            WHERE metric_date >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
-            ORDER BY metric_date DESC 
-            LIMIT 7
-        """)
+        metrics = db.execute_named("metrics_daily", {
+            "days": filters["days"],
+            "airline_id": filters["airline_id"],
+            "route_id": filters["route_id"],
+            "limit": filters["limit"]
+        })
         
         # Get summary statistics
-        summary = db.execute_query("""
-            SELECT 
-                COUNT(DISTINCT route_id) as active_routes,
-                COUNT(DISTINCT airline_code) as active_airlines,
-                AVG(avg_efficiency) as overall_efficiency,
-                COALESCE(SUM(total_fuel_saved_kg), 0) as total_fuel_savings,
-                COALESCE(SUM(total_flights), 0) as total_flights
-            FROM operational_metrics 
-            WHERE metric_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        """)
+        summary = db.execute_named("metrics_summary", {
+            "days": summary_days,
+            "airline_id": filters["airline_id"],
+            "route_id": filters["route_id"]
+        })
         
         # If we still don't have metrics, create comprehensive fallback
         if not metrics:
@@ -521,7 +1693,7 @@ def get_operational_metrics():
             "timestamp": datetime.now().isoformat(),
             "summary": summary_data,
             "daily_metrics": metrics,
-            "period": "last_7_days",
+            "period": f"last_{filters['days']}_days",
             "status": "operational"
         })
         
@@ -553,12 +1725,275 @@ def get_operational_metrics():
         }
         return jsonify(fallback_data)
 
+@app.route('/api/metrics/series', methods=['GET'])
+@last_known_good(fresh_ttl=60, tables=("operational_metrics",))
+@admit("analytics")
+def get_metrics_series():
+    """Get a downsampled operational metric series from the rollup pyramids"""
+    try:
+        metric = request.args.get('metric', 'avg_efficiency')
+        resolution = request.args.get('resolution')
+        if metric not in MetricsPyramid.METRICS:
+            return jsonify({"error": f"metric must be one of {', '.join(MetricsPyramid.METRICS)}"}), 400
+        if resolution is not None and resolution not in MetricsPyramid.RESOLUTIONS:
+            return jsonify({"error": "resolution must be day, week or month"}), 400
+        
+        try:
+            points = _bounded_int(request.args.get('points', 500), 'points', 3, 5000)
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() \
+                if 'end' in request.args else datetime.now().date()
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() \
+                if 'start' in request.args \
+                else end - timedelta(days=_bounded_int(request.args.get('days', 365), 'days', 1, 36500))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameters: {e}"}), 400
+        if start > end:
+            return jsonify({"error": "start must not be after end"}), 400
+        
+        if not metrics_pyramid.refresh():
+            return jsonify({"error": "Failed to refresh metric rollups"}), 500
+        
+        airline = request.args.get('airline')
+        scope = airline.upper() if airline else "network"
+        airline_id = codes.airline_id(airline)
+        if airline and airline_id is None:
+            return jsonify({"error": f"Unknown airline: {scope}"}), 400
+        resolution, source_buckets, series = metrics_pyramid.series(
+            metric, start, end, points, scope=airline_id or "network", resolution=resolution
+        )
+        
+        return jsonify({
+            "metric": metric,
+            "scope": scope,
+            "period": {"start": start.isoformat(), "end": end.isoformat()},
+            "resolution": resolution,
+            "downsampling": "lttb" if len(series) < source_buckets else "none",
+            "points_requested": points,
+            "points_returned": len(series),
+            "source_buckets": source_buckets,
+            "timestamp": datetime.now().isoformat(),
+            "data": [{"t": day.isoformat(), "v": round(value, 4)} for day, value in series]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error fetching metric series: {e}")
+        return jsonify({"error": "Metric series service temporarily unavailable"}), 500
+
+@app.route('/api/forecast', methods=['GET'])
+@last_known_good
+@admit("analytics")
+def get_forecast():
+    """
+    Daily forecast of a route (or network) metric with 80% and 95% bands
+    ?metric=, ?route_id= (omit for the whole network), ?horizon= days (1-28)
+    """
+    try:
+        metric = request.args.get('metric', 'avg_efficiency')
+        if metric not in FORECAST_SERIES:
+            return jsonify({"error": f"metric must be one of {', '.join(FORECAST_SERIES)}"}), 400
+        try:
+            horizon = _bounded_int(request.args.get('horizon', 14), 'horizon', 1, forecast_engine.horizon)
+            route_id = _bounded_int(request.args['route_id'], 'route_id', 1, 2**31 - 1) \
+                if 'route_id' in request.args else None
+        except ValueError as e:
+            return jsonify({"error": f"Invalid parameters: {e}"}), 400
+        
+        # Answered from precomputed forecasts; a new day is folded in in the background
+        if not forecast_engine.ensure_fresh():
+            return jsonify({"error": "Forecast models are not available yet"}), 503
+        
+        try:
+            forecast = forecast_engine.forecast(metric, route_id, horizon)
+        except KeyError:
+            return jsonify({"error": f"No {metric} history for route {route_id}"}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 404
+        
+        return jsonify({
+            "metric": metric,
+            "scope": "network" if route_id is None else "route",
+            "route_id": route_id,
+            "horizon_days": horizon,
+            "timestamp": datetime.now().isoformat(),
+            **forecast
+        })
+        
+    except Exception as e:
+        logger.error(f"Error serving forecast: {e}")
+        return jsonify({"error": "Forecast service temporarily unavailable"}), 500
+
 # ADD THE MISSING ENDPOINTS:
 
+@app.route('/api/changes', methods=['GET'])
+@admit("reference")
+def get_changes():
+    """
+    Rows of routes and operational_metrics changed since a client's token
+    Without `since` only the current token is returned: take it, load the
+    full /api/routes and /api/metrics payloads, then poll with it.
+    """
+    try:
+        since = request.args.get('since', '').strip()
+        if not since:
+            token = change_feed.current_token()
+            if token is None:
+                return jsonify({"error": "Failed to read change log"}), 500
+            return jsonify({
+                "timestamp": datetime.now().isoformat(),
+                "token": token,
+                "reset": True,
+                "has_more": False,
+                "change_count": 0,
+                "tables": {}
+            })
+        
+        try:
+            delta = change_feed.changes(since)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if delta is None:
+            return jsonify({"error": "Failed to read change log"}), 500
+        
+        delta["timestamp"] = datetime.now().isoformat()
+        return jsonify(delta)
+        
+    except Exception as e:
+        logger.error(f"Error reading change feed: {e}")
+        return jsonify({"error": "Change feed service temporarily unavailable"}), 500
+
+@app.route('/api/network/path', methods=['GET'])
+@admit("analytics")
+def get_network_path():
+    """Fuel- or distance-optimal connection between two airports, with alternatives"""
+    try:
+        source = request.args.get('from', '').strip().upper()
+        target = request.args.get('to', '').strip().upper()
+        metric = request.args.get('metric', 'fuel')
+        if not source or not target:
+            return jsonify({"error": "from and to airport codes are required"}), 400
+        if metric not in RouteGraph.METRICS:
+            return jsonify({"error": f"metric must be one of {', '.join(RouteGraph.METRICS)}"}), 400
+        try:
+            alternatives = _bounded_int(request.args.get('alternatives', 0), 'alternatives',
+                                        0, RouteGraph.MAX_ALTERNATIVES)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # A failed refresh keeps answering from the last graph that was built
+        refreshed = route_graph.refresh()
+        if not refreshed and not route_graph.snapshot.version:
+            return jsonify({"error": "Failed to load route network"}), 500
+        
+        started = time.perf_counter()
+        result, cached = route_graph.path(source, target, metric, alternatives)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if result is None:
+            return jsonify({"error": f"No connection from {source} to {target}"}), 404
+        
+        return jsonify({
+            "from": source,
+            "to": target,
+            "metric": metric,
+            "algorithm": result["algorithm"],
+            "path": result["best"],
+            "alternatives": result["alternatives"],
+            "graph_version": route_graph.snapshot.version,
+            "stale": not refreshed,
+            "cached": cached,
+            "query_ms": round(elapsed_ms, 3),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error finding network path: {e}")
+        return jsonify({"error": "Network path service temporarily unavailable"}), 500
+
+@app.route('/api/simulate/fleet', methods=['POST'])
+@admit("reports")
+def simulate_fleet():
+    """Monte Carlo fuel, CO2 and cost distributions for aircraft-to-route assignment scenarios"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        scenarios = data.get('scenarios')
+        if not isinstance(scenarios, list) or not 1 <= len(scenarios) <= 8:
+            return jsonify({"error": "scenarios must be a list of 1 to 8 scenarios"}), 400
+        if not all(isinstance(s, dict) and isinstance(s.get('assignments', []), list) for s in scenarios):
+            return jsonify({"error": "each scenario needs an assignments list"}), 400
+        if not all(isinstance(entry, dict) for s in scenarios for entry in s.get('assignments', [])):
+            return jsonify({"error": "each assignment must be an object"}), 400
+        try:
+            iterations = _bounded_int(data.get('iterations', 2000), 'iterations', 100, 20000)
+            seed = _bounded_int(data.get('seed', 42), 'seed', 0, 2 ** 31 - 1)
+            # Rejects nan and inf too: neither compares as within the bounds
+            fuel_price = _bounded_float(data.get('fuel_price_per_kg', 0.8), 'fuel_price_per_kg', 0, 100)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # A failed refresh keeps simulating against the last loaded flights
+        refreshed = fleet_simulator.refresh()
+        if fleet_simulator.dataset is None:
+            return jsonify({"error": "Failed to load flight distributions"}), 500
+        if not fleet_simulator.aircraft:
+            return jsonify({"error": "No aircraft configurations available"}), 404
+        
+        try:
+            results, elapsed_ms = fleet_simulator.simulate(scenarios, iterations, fuel_price, seed)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        return jsonify({
+            "simulation_type": "Fleet Assignment Monte Carlo",
+            "iterations": iterations,
+            "seed": seed,
+            "fuel_price_per_kg": fuel_price,
+            "network": fleet_simulator.stats(),
+            "stale": not refreshed,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "timestamp": datetime.now().isoformat(),
+            "scenarios": results
+        })
+        
+    except Exception as e:
+        logger.error(f"Fleet simulation error: {e}")
+        return jsonify({"error": "Fleet simulation service temporarily unavailable"}), 500
+
 @app.route('/api/config/aircraft', methods=['GET'])
+@last_known_good(fresh_ttl=300, tables=("aircraft_config",))
+@admit("reference")
 def get_aircraft_configs():
-    """Get aircraft configuration data - FIXED VERSION"""
+    """
+    Get aircraft configuration data - FIXED VERSION
+    ?as_of= returns the configurations that were in effect at that time
+    """
     try:
+        if 'as_of' in request.args:
+            try:
+                as_of = parse_as_of(request.args['as_of'])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            try:
+                versions = temporal_index.table_as_of("aircraft_config", as_of)
+            except RuntimeError:
+                return jsonify({"error": "Aircraft configuration history unavailable"}), 503
+            configs = sorted((
+                {
+                    "config_id": config_id,
+                    "aircraft_model": row["aircraft_model"],
+                    "seat_capacity": row["seat_capacity"],
+                    "fuel_efficiency": row["fuel_efficiency"],
+                    "max_range_km": row["max_range_km"],
+                    "valid_from": row["valid_from"].isoformat()
+                } for config_id, row in versions.items()
+            ), key=lambda config: config["aircraft_model"])
+            return jsonify({
+                "timestamp": datetime.now().isoformat(),
+                "as_of": as_of.isoformat(),
+                "count": len(configs),
+                "data": configs
+            })
+        
         configs = db.execute_query("""
             SELECT 
                 config_id,
@@ -625,33 +2060,47 @@ def get_aircraft_configs():
         return jsonify({"error": "Aircraft configuration service temporarily unavailable"}), 500
 
 @app.route('/api/analyze/route/<int:route_id>', methods=['GET'])
+@last_known_good
+@admit("analytics")
 def analyze_route(route_id):
-    """Analyze specific route for efficiency"""
+    """
+    Analyze specific route for efficiency
+    ?as_of= analyzes the route as configured at that time, over flights flown up to then
+    """
     try:
+        try:
+            limit = _bounded_int(request.args.get('limit', 10), 'limit', 1, 1000)
+            as_of = parse_as_of(request.args['as_of']) if 'as_of' in request.args else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Get route details
-        route = db.execute_query("""
-            SELECT r.*, a.name as airline_name 
-            FROM routes r 
-            LEFT JOIN airlines a ON r.airline_code = a.iata_code 
-            WHERE r.route_id = %s
-        """, (route_id,))
+        route_shard = db.shards.for_route(route_id)
+        route = db.execute_named("route_details", {"route_id": route_id}, shard=route_shard)
+        
+        if as_of is not None and route:
+            try:
+                version = temporal_index.row_as_of("routes", route_id, as_of)
+            except RuntimeError:
+                return jsonify({"error": "Route history unavailable"}), 503
+            route = [dict(route[0], **version)] if version else None
         
         if not route:
             return jsonify({"error": "Route not found"}), 404
+        codes.decode(route)
             
         # Get performance data for this route
-        performance = db.execute_query("""
-            SELECT 
-                efficiency_score,
-                actual_fuel_kg,
-                planned_fuel_kg,
-                flight_date,
-                passengers_count
-            FROM flight_performance 
-            WHERE route_id = %s 
-            ORDER BY flight_date DESC 
-            LIMIT 10
-        """, (route_id,))
+        until = as_of.date() if as_of is not None else None
+        performance = db.execute_named("route_performance", {
+            "route_id": route_id,
+            "limit": limit,
+            "until": until
+        }, shard=route_shard)
+        if performance is not None and len(performance) < limit:
+            # Fewer recent flights than asked for: the older ones may be archived
+            archived = cold_store.route_flights(route_id, until=until, limit=limit)
+            if archived:
+                performance = sorted(performance + archived, key=lambda p: p['flight_date'], reverse=True)[:limit]
         
         # Calculate efficiency metrics
         base_fuel = route[0]['base_fuel_kg']
@@ -659,7 +2108,7 @@ def analyze_route(route_id):
         
         # Enhanced efficiency calculation
         if performance:
-            avg_efficiency = sum(p['efficiency_score'] for p in performance) / len(performance)
+            avg_efficiency = sum(float(p['efficiency_score']) for p in performance) / len(performance)
             total_flights = len(performance)
         else:
             # Smart fallback calculation based on route characteristics
@@ -673,7 +2122,7 @@ def analyze_route(route_id):
         
         analysis_result = {
             "route_id": route_id,
-            "route_name": f"{route[0]['source_airport']} to {route[0]['dest_airport']}",
+            "route_name": codes.route_name(route[0], " to "),
             "airline": route[0]['airline_name'] or route[0]['airline_code'],
             "distance_km": distance,
             "base_fuel_kg": base_fuel,
@@ -683,6 +2132,11 @@ def analyze_route(route_id):
             "analysis_timestamp": datetime.now().isoformat(),
             "recommendations": generate_recommendations(avg_efficiency, distance)
         }
+        if as_of is not None:
+            analysis_result["as_of"] = as_of.isoformat()
+        
+        if performance and temporal_index.has_history:
+            analysis_result["configurations_flown"] = configurations_flown(route_id, performance)
         
         return jsonify(analysis_result)
         
@@ -690,6 +2144,30 @@ def analyze_route(route_id):
         logger.error(f"Route analysis error: {e}")
         return jsonify({"error": "Route analysis service temporarily unavailable"}), 500
 
+def configurations_flown(route_id, flights):
+    """Route versions the given flights flew under (end of each flight_date), with flight counts"""
+    configured = {}
+    try:
+        for flight in flights:
+            flown = datetime.combine(flight['flight_date'], datetime.max.time())
+            version = temporal_index.row_as_of("routes", route_id, flown)
+            if version is None:
+                # Flights older than the route's history count against its first version
+                history = temporal_index.versions("routes", route_id)
+                if not history or flown >= history[0][0]:
+                    continue
+                version = history[0][1]
+            entry = configured.setdefault(version["valid_from"], {
+                "valid_from": version["valid_from"].isoformat(),
+                "distance_km": version["distance_km"],
+                "base_fuel_kg": version["base_fuel_kg"],
+                "flights": 0
+            })
+            entry["flights"] += 1
+    except RuntimeError:
+        return None
+    return [configured[valid_from] for valid_from in sorted(configured)]
+
 def generate_recommendations(efficiency, distance):
     """Generate efficiency recommendations"""
     recommendations = []
@@ -722,42 +2200,72 @@ def generate_recommendations(efficiency, distance):
     return recommendations[:4]  # Return max 4 recommendations
 
 @app.route('/api/generate-report', methods=['POST'])
+@last_known_good
+@admit("reports")
 def generate_performance_report():
     """Generate performance analytics report - FIXED VERSION"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
         report_type = data.get('report_type', 'efficiency')
+        try:
+            filters = parse_analytics_filters(data, days=None)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        filters["min_flights"] = max(filters["min_flights"], 1)
         
+        if report_type == 'leaderboard':
+            # Best and worst routes for every metric, from the incremental leaderboards
+            window = filters["days"] or 30
+            if window not in LEADERBOARD_WINDOWS:
+                return jsonify({"error": f"days must be one of {', '.join(map(str, LEADERBOARD_WINDOWS))}"}), 400
+            if not leaderboards.refresh():
+                return jsonify({"error": "Failed to refresh leaderboards"}), 500
+            k = min(filters["limit"], leaderboards.k) if 'limit' in data else 10
+            return jsonify({
+                "report_type": report_type,
+                "generated_at": datetime.now().isoformat(),
+                "filters": filters,
+                "window_days": window,
+                "min_flights": leaderboards.min_flights,
+                "data": {
+                    metric: leaderboards.board(metric, window, airline=filters["airline_id"], k=k)
+                    for metric in LEADERBOARD_METRICS
+                }
+            })
+        
+        report_data = []
         if report_type == 'efficiency':
-            report_data = db.execute_query("""
-                SELECT 
-                    r.route_id,
-                    CONCAT(r.source_airport, ' to ', r.dest_airport) as route,
-                    AVG(fp.efficiency_score) as avg_efficiency,
-                    COUNT(fp.performance_id) as flights_analyzed,
-                    AVG(fp.actual_fuel_kg) as avg_fuel_used,
-                    AVG(fp.passengers_count) as avg_passengers
-                FROM routes r
-                LEFT JOIN flight_performance fp ON r.route_id = fp.route_id
-                GROUP BY r.route_id, r.source_airport, r.dest_airport
-                HAVING flights_analyzed > 0
-                ORDER BY avg_efficiency DESC
-            """)
+            tiered = tiered_route_rows(filters)
+            if tiered is not None:
+                report_data = [{
+                    "route_id": row["route_id"],
+                    "route": codes.route_name(row, " to "),
+                    "avg_efficiency": row["avg_efficiency"],
+                    "flights_analyzed": int(row["flights"]),
+                    "avg_fuel_used": row["avg_fuel_used"],
+                    "avg_passengers": row["avg_passengers"]
+                } for row in top_routes(tiered, filters["min_flights"], filters["limit"])]
+            else:
+                report_data = label_routes(db.execute_routed("efficiency_report", filters,
+                                                             order_by='avg_efficiency', descending=True),
+                                           field="route", separator=" to ")
             
             # Enhanced fallback for report data
             if report_data is None:
                 report_data = []
                 
-            if not report_data:
+            if not report_data and not filters["airline"] and not filters["route_id"]:
                 fallback_routes = db.execute_query("""
-                    SELECT route_id, source_airport, dest_airport, airline_code 
+                    SELECT route_id, source_airport_id, dest_airport_id, airline_id 
                     FROM routes LIMIT 8
                 """)
                 if fallback_routes:
                     for route in fallback_routes:
                         report_data.append({
                             "route_id": route['route_id'],
-                            "route": f"{route['source_airport']} to {route['dest_airport']}",
+                            "route": codes.route_name(route, " to "),
                             "avg_efficiency": round(random.uniform(0.75, 0.95), 3),
                             "flights_analyzed": random.randint(3, 15),
                             "avg_fuel_used": random.randint(50000, 150000),
@@ -772,6 +2280,7 @@ def generate_performance_report():
         return jsonify({
             "report_type": report_type,
             "generated_at": datetime.now().isoformat(),
+            "filters": filters,
             "data": report_data,
             "summary": {
                 "total_routes": total_routes,
@@ -785,6 +2294,7 @@ def generate_performance_report():
         return jsonify({"error": "Report generation service temporarily unavailable"}), 500
 
 @app.route('/api/debug/tables', methods=['GET'])
+@admit("reference")
 def debug_tables():
     """Debug endpoint to check table structure"""
     try:
@@ -804,6 +2314,86 @@ def debug_tables():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _profile_label(name):
+    """Endpoint name for a URL rule or endpoint name, or None if unknown"""
+    if name in app.view_functions:
+        return name
+    return next((rule.endpoint for rule in app.url_map.iter_rules() if rule.rule == name), None)
+
+@app.route('/api/admin/profile/start', methods=['POST'])
+@require_admin
+def start_profile():
+    """
+    Start a profiling session
+    Body: endpoints (names or URL rules, empty = all), sample_rate (0-1],
+    duration seconds, interval_ms between stack samples, allocations (bool)
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    try:
+        endpoints = body.get('endpoints') or []
+        if isinstance(endpoints, str):
+            endpoints = [endpoints]
+        labels = [_profile_label(name) for name in endpoints]
+        unknown = [name for name, label in zip(endpoints, labels) if label is None]
+        if unknown:
+            raise ValueError(f"Unknown endpoints: {', '.join(map(str, unknown))}")
+        sample_rate = float(body.get('sample_rate', 1.0))
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        duration = _bounded_int(body.get('duration', 60), 'duration', 1, 3600)
+        interval_ms = _bounded_int(body.get('interval_ms', 5), 'interval_ms', 1, 1000)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    profiling.start(labels, sample_rate, duration, interval_ms / 1000, bool(body.get('allocations', False)))
+    return jsonify({"timestamp": datetime.now().isoformat(), **profiling.status()})
+
+@app.route('/api/admin/profile/stop', methods=['POST'])
+@require_admin
+def stop_profile():
+    """Stop the profiling session; collected stacks stay available"""
+    profiling.stop()
+    return jsonify({"timestamp": datetime.now().isoformat(), **profiling.status()})
+
+@app.route('/api/admin/profile', methods=['GET'])
+@require_admin
+def profile_status():
+    """Session settings, sample counts and per-endpoint allocation totals"""
+    return jsonify({"timestamp": datetime.now().isoformat(), **profiling.status()})
+
+@app.route('/api/admin/profile/stacks', methods=['GET'])
+@require_admin
+def profile_stacks():
+    """Collapsed stacks (flamegraph.pl, speedscope, inferno), optionally for one endpoint"""
+    endpoint = request.args.get('endpoint')
+    label = _profile_label(endpoint) if endpoint else None
+    if endpoint and label is None:
+        return jsonify({"error": f"Unknown endpoint: {endpoint}"}), 400
+    return Response(profiling.sampler.collapsed(label), mimetype='text/plain')
+
+@app.route('/api/admin/profile/allocations', methods=['GET'])
+@require_admin
+def profile_allocations():
+    """Allocation growth since the session started, by handler or by source line"""
+    group_by = request.args.get('group_by', 'handler')
+    if group_by not in ('handler', 'line'):
+        return jsonify({"error": "group_by must be handler or line"}), 400
+    try:
+        top = _bounded_int(request.args.get('top', 20), 'top', 1, 500)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not profiling.allocations.active:
+        return jsonify({"error": "Allocation tracking is not running; start a session with allocations: true"}), 409
+    
+    return jsonify({
+        "timestamp": datetime.now().isoformat(),
+        "group_by": group_by,
+        "per_endpoint": profiling.allocations.per_endpoint(),
+        "top": profiling.allocations.top(app.view_functions, group_by, top)
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors"""
@@ -822,6 +2412,125 @@ def internal_error(error):
         "timestamp": datetime.now().isoformat()
     }), 500
 
+# Background warm-up: connections, reference data and analytics caches
+warmup = WarmupCoordinator(max_workers=4, retry_interval=5.0)
+STARTUP_TIMING = {}
+
+def _warm_endpoints(*paths):
+    """Warm-up task that fills the response cache for the given GET endpoints"""
+    def task():
+        client = app.test_client()
+        return all(client.get(path).status_code == 200 for path in paths)
+    return task
+
+def _warm_analytics():
+    """Make sure metrics exist before the analytics caches are filled"""
+    ensure_operational_metrics()
+    return _warm_endpoints(
+        '/api/metrics',
+        '/api/dashboard-stats',
+        '/api/analytics/efficiency'
+    )()
+
+def create_app():
+    """
+    Build the database manager, engines and caches behind the API, register
+    their warm-up tasks and return the Flask app
+    Runs on import, except when the module is re-imported as __mp_main__ in
+    a fleet simulator worker: spawned workers import the launch script, and
+    they only need fleet_simulator, not a second copy of the API.
+    """
+    global db, codes, sketch_store, leaderboards, cold_store, route_graph, fleet_simulator
+    global change_feed, row_counts, metrics_pyramid, geo_index, weather_enricher, temporal_index
+    global forecast_engine, shared_cache, response_cache, table_watcher
+
+    # Database manager
+    db = DatabaseManager()
+
+    # Airline/airport IATA codes <-> the integer keys routes reference them by
+    codes = CodeDictionary(db, reload_interval=60.0)
+
+    # Archived flight_performance months (see scripts/archive_flights.py)
+    cold_store = ColdStore(os.environ.get(
+        'SKYSQL_COLD_DIR',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cold')
+    ))
+
+    # Mergeable per-route per-day quantile sketches for distribution analytics
+    sketch_store = SketchStore(db, alpha=0.01, cold_store=cold_store)
+
+    # Best/worst routes per rolling window, folded in as flights arrive
+    leaderboards = RouteLeaderboards(db, codes, k=100, min_flights=2)
+
+    # Airport network for path queries; SKYSQL_GRAPH_HUBS is a hub count ("8")
+    # or a list of airport codes ("ATL,DXB,LHR") to precompute trees for
+    graph_hubs = os.environ.get('SKYSQL_GRAPH_HUBS', '').strip()
+    route_graph = RouteGraph(
+        db,
+        codes,
+        hubs=graph_hubs.split(',') if graph_hubs and not graph_hubs.isdigit() else None,
+        hub_count=int(graph_hubs) if graph_hubs.isdigit() else 0
+    )
+
+    # What-if aircraft assignments simulated in a worker process pool
+    fleet_simulator = FleetSimulator(db, codes)
+
+    # Trigger-maintained change log behind the /api/changes delta feed
+    change_feed = ChangeFeed(db, codes)
+
+    # Constant-time table counts for health and dashboard totals
+    row_counts = RowCounts(db, default_staleness=5.0)
+
+    # Daily/weekly/monthly rollups of operational_metrics for long-range charts
+    metrics_pyramid = MetricsPyramid(db)
+
+    # Airport k-d tree for nearest/radius/box queries and route distance checks
+    geo_index = GeoIndex(db, refresh_interval=300.0)
+
+    # Airport/day weather joined onto flights (see scripts/enrich_weather.py)
+    weather_enricher = WeatherEnricher(db, provider_from_env(), concurrency=16)
+
+    # Trigger-kept routes/aircraft_config history behind ?as_of= queries
+    temporal_index = TemporalIndex(db, refresh_interval=30.0)
+
+    # Per-route Holt-Winters forecasts, advanced daily and re-selected weekly
+    forecast_engine = ForecastEngine(db, history_days=180, horizon=28, reselect_days=7, cold_store=cold_store)
+
+    # Last successful response per endpoint and parameters, served during outages;
+    # shared by every worker on the host (/dev/shm) unless SKYSQL_SHARED_CACHE=off
+    shared_cache = cache_from_env(json.dumps(
+        [shard.backend.describe(shard.db_config) for shard in db.shards], sort_keys=True
+    ))
+    response_cache = shared_cache if shared_cache is not None else ResponseCache(max_entries=256)
+
+    # Table change detection behind the shared cache's version invalidation
+    table_watcher = TableVersionWatcher(db, shared_cache, interval=2.0) if shared_cache is not None else None
+
+    # Warm-up tasks, run in the background by main()
+    warmup.add_task("connection_pool", lambda: db.prefill_pool(4))
+    warmup.add_task("code_dictionary", lambda: codes.refresh(force=True))
+    if table_watcher:
+        warmup.add_task("cache_versions", table_watcher.start)
+    warmup.add_task("change_log", change_feed.ensure_schema)
+    warmup.add_task("row_counters", row_counts.ensure_schema)
+    warmup.add_task("weather_tables", weather_enricher.ensure_schema)
+    warmup.add_task("history", lambda: temporal_index.refresh(force=True))
+    warmup.add_task("reference_data", _warm_endpoints(
+        '/api/airlines', '/api/airports', '/api/routes', '/api/routes?format=columnar', '/api/config/aircraft'
+    ))
+    warmup.add_task("analytics", _warm_analytics)
+    warmup.add_task("distribution_sketches", _warm_endpoints('/api/analytics/distribution'))
+    warmup.add_task("leaderboards", lambda: leaderboards.refresh(force=True))
+    warmup.add_task("metrics_pyramid", lambda: metrics_pyramid.refresh(force=True))
+    warmup.add_task("forecasts", forecast_engine.refresh)
+    warmup.add_task("airport_index", lambda: geo_index.refresh(force=True))
+    warmup.add_task("route_graph", lambda: route_graph.refresh(force=True))
+    warmup.add_task("fleet_simulator", lambda: fleet_simulator.refresh(force=True) and fleet_simulator.start_workers())
+    return app
+
+if __name__ != '__mp_main__':
+    create_app()
+
 def main():
     """Main application entry point"""
     print("=" * 70)
@@ -832,45 +2541,17 @@ def main():
     print("Database: MariaDB (XAMPP)")
     print("API Base: http://localhost:8000")
     print("Health Check: http://localhost:8000/api/health")
+    print("Liveness: http://localhost:8000/api/live")
+    print("Readiness: http://localhost:8000/api/ready")
     print("Dashboard: http://localhost:3000/dashboard.html")
     print("=" * 70)
     
-    # Test database connection on startup
-    conn = db.get_connection()
-    if conn:
-        print("✅ Database connection: SUCCESS")
-        
-        # Ensure operational metrics are ready
-        print("📊 Checking operational metrics...")
-        if ensure_operational_metrics():
-            print("✅ Operational metrics: READY")
-        else:
-            print("⚠️  Operational metrics: USING FALLBACK DATA")
-        
-        # Display basic stats
-        stats = db.execute_query("""
-            SELECT 
-                (SELECT COUNT(*) FROM routes) as routes,
-                (SELECT COUNT(*) FROM flight_performance) as flights,
-                (SELECT COUNT(*) FROM airlines) as airlines,
-                (SELECT COUNT(*) FROM operational_metrics) as metrics_count
-        """)
-        
-        if stats:
-            print(f"📊 Database stats: {stats[0]['routes']} routes, "
-                  f"{stats[0]['flights']} flights, {stats[0]['airlines']} airlines, "
-                  f"{stats[0]['metrics_count']} metrics records")
-        
-        if conn and conn.is_connected():
-            conn.close()
-    else:
-        print("❌ Database connection: FAILED")
-        print("Please ensure:")
-        print("  - XAMPP MySQL service is running")
-        print("  - Database 'skysql_intelligence' exists")
-        print("  - Connection credentials are correct")
+    # Database checks and cache warm-up run in the background, not before app.run
+    warmup.start()
+    print("📊 Warming connections and caches in the background...")
     
-    print("Server starting...")
+    STARTUP_TIMING["startup_seconds"] = round(time.perf_counter() - PROCESS_START, 3)
+    print(f"Server starting... (startup took {STARTUP_TIMING['startup_seconds']:.3f}s)")
     print("-" * 70)
 
 if __name__ == '__main__':
@@ -0,0 +1,303 @@
+"""
+SkySQL Intelligence Change Feed
+Trigger-maintained change log per shard and opaque delta-sync tokens
+"""
+
+import base64
+import binascii
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tables the feed tracks: primary key and the row shape clients already hold
+# (the same columns /api/routes and /api/metrics return, once the integer
+# airline/airport keys are decoded to their codes)
+TRACKED_TABLES = {
+    "routes": {
+        "key": "route_id",
+        "select": """
+            SELECT
+                r.route_id,
+                r.airline_id,
+                r.source_airport_id,
+                r.dest_airport_id,
+                r.distance_km,
+                r.base_fuel_kg,
+                a.name as airline_name
+            FROM routes r
+            LEFT JOIN airlines a ON r.airline_id = a.airline_id
+            WHERE r.route_id IN ({keys})
+        """
+    },
+    "operational_metrics": {
+        "key": "metric_id",
+        "select": """
+            SELECT
+                metric_id,
+                metric_date,
+                total_flights,
+                avg_efficiency,
+                total_fuel_used_kg,
+                total_fuel_saved_kg,
+                avg_passenger_load,
+                on_time_performance,
+                route_id,
+                airline_id
+            FROM operational_metrics
+            WHERE metric_id IN ({keys})
+        """
+    }
+}
+
+_OPERATIONS = (("ai", "INSERT", "I", "NEW"), ("au", "UPDATE", "U", "NEW"), ("ad", "DELETE", "D", "OLD"))
+
+
+def schema_statements():
+    """
+    DDL for the change_log table and its triggers (idempotent)
+    Ids start from the clock, so a recreated log never reuses ids that an
+    outstanding client token may still hold.
+    """
+    statements = [f"""
+        CREATE TABLE IF NOT EXISTS change_log (
+            change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            table_name VARCHAR(64) NOT NULL,
+            row_id INT NOT NULL,
+            operation CHAR(1) NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_changed_at (changed_at)
+        ) AUTO_INCREMENT = {int(time.time()) * 1000000}
+    """]
+    for table, spec in TRACKED_TABLES.items():
+        for suffix, event, code, row in _OPERATIONS:
+            statements.append(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_change_{suffix}
+                AFTER {event} ON {table} FOR EACH ROW
+                INSERT INTO change_log (table_name, row_id, operation)
+                VALUES ('{table}', {row}.{spec['key']}, '{code}')
+            """)
+    return statements
+
+
+def encode_token(positions):
+    """Opaque token for per-shard change_log positions"""
+    raw = json.dumps(positions, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Per-shard positions from a token; ValueError if it is not one of ours"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        positions = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("since is not a valid change token")
+    if not isinstance(positions, dict) or not all(
+            isinstance(name, str) and isinstance(position, int) and not isinstance(position, bool)
+            for name, position in positions.items()):
+        raise ValueError("since is not a valid change token")
+    return positions
+
+
+class ChangeFeed:
+    """
+    Rows inserted, updated or deleted since a client's token
+
+    Triggers on the tracked tables append (table, row id, operation) to
+    change_log on every shard. A token holds the last change_id the client
+    has seen per shard, so a poll is one primary-key range scan of the log
+    plus a primary-key lookup of the rows that changed: the work and the
+    payload scale with the number of changes, not the size of the tables.
+    Entries older than `retention_days` are pruned; a token that points
+    into the pruned range gets a reset and the client reloads in full.
+
+    change_ids are assigned when a trigger fires, not when its transaction
+    commits, so on MariaDB a lower id can become visible after a client has
+    already moved past it. A poll therefore stops short of entries younger
+    than `commit_grace` seconds and serves them on a later poll; a
+    transaction that stays open longer than that can still be skipped.
+    The embedded backend runs one write transaction at a time, so its ids
+    are in commit order and no grace is needed.
+    """
+
+    def __init__(self, db, codes, retention_days=7, prune_interval=3600, max_changes=1000, commit_grace=2):
+        self.db = db
+        self.codes = codes
+        self.commit_grace = 0 if db.backend.name == "embedded" else int(commit_grace)
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval
+        self.max_changes = max_changes
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.resets = 0
+        self.changes_served = 0
+
+    def ensure_schema(self):
+        """Create change_log and the triggers on every shard"""
+        for shard in self.db.shards:
+            for statement in schema_statements():
+                if not self.db.execute_query(statement, fetch=False, shard=shard):
+                    logger.warning(f"Change log schema incomplete on shard {shard.name}")
+                    return False
+        logger.info("Change log and triggers verified")
+        return True
+
+    def _bounds(self, shard):
+        """Oldest and newest change_id on a shard; an empty log is positioned at its next id"""
+        rows = self.db.execute_query("""
+            SELECT MIN(change_id) as oldest, MAX(change_id) as newest FROM change_log
+        """, shard=shard)
+        if not rows:
+            return None
+        bounds = dict(rows[0])
+        if bounds["newest"] is None:
+            counter = self.db.execute_query("""
+                SELECT AUTO_INCREMENT as next_id FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'change_log'
+            """, shard=shard)
+            if not counter:
+                return None
+            bounds["newest"] = int(counter[0]["next_id"] or 1) - 1
+        return bounds
+
+    def current_token(self):
+        """Token for "now": everything already in the log counts as seen"""
+        bounds = self.db.scatter(self._bounds)
+        if bounds is None:
+            return None
+        return encode_token({
+            shard.name: int(row["newest"]) for shard, row in zip(self.db.shards, bounds)
+        })
+
+    def _fetch_rows(self, shard, table, ids):
+        spec = TRACKED_TABLES[table]
+        rows = self.db.execute_query(
+            spec["select"].format(keys=", ".join(["%s"] * len(ids))), tuple(ids), shard=shard)
+        if rows is None:
+            return None
+        self.codes.decode(rows, dest_airport_id="destination_airport")
+        return {row[spec["key"]]: row for row in rows}
+
+    def _shard_changes(self, shard, since, limit):
+        bounds = self._bounds(shard)
+        if bounds is None:
+            return None
+        oldest, newest = bounds["oldest"], bounds["newest"]
+        pruned = since is not None and (since < oldest - 1 if oldest is not None else since < newest)
+        if since is None or since > newest or pruned:
+            # Unknown shard, a different log, or pruned past the client's position
+            # (including a log pruned empty, which is positioned at its next id)
+            return {"reset": True, "position": int(newest)}
+
+        settled = (f"changed_at <= DATE_SUB(NOW(), INTERVAL {self.commit_grace} SECOND)"
+                   if self.commit_grace else "1")
+        entries = self.db.execute_query(f"""
+            SELECT change_id, table_name, row_id, operation, {settled} as settled
+            FROM change_log
+            WHERE change_id > %s
+            ORDER BY change_id
+            LIMIT %s
+        """, (since, limit + 1), shard=shard)
+        if entries is None:
+            return None
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        # Hold the position before the first entry still inside the commit grace,
+        # so an earlier id committing late is not jumped over
+        recent = next((i for i, entry in enumerate(entries) if not entry["settled"]), None)
+        if recent is not None:
+            entries, has_more = entries[:recent], False
+
+        # Collapse to one outcome per row: first and last operation in the window
+        touched = {}
+        for entry in entries:
+            if entry["table_name"] not in TRACKED_TABLES:
+                continue
+            ops = touched.setdefault(entry["table_name"], {})
+            first = ops[entry["row_id"]][0] if entry["row_id"] in ops else entry["operation"]
+            ops[entry["row_id"]] = (first, entry["operation"])
+
+        tables = {}
+        for table, ops in touched.items():
+            live = [row_id for row_id, (_, last) in ops.items() if last != "D"]
+            rows = self._fetch_rows(shard, table, live) if live else {}
+            if rows is None:
+                return None
+            delta = tables[table] = {"inserted": [], "updated": [], "deleted": []}
+            for row_id, (first, _) in ops.items():
+                row = rows.get(row_id)
+                if row is None:
+                    delta["deleted"].append(row_id)
+                elif first == "I":
+                    delta["inserted"].append(row)
+                else:
+                    delta["updated"].append(row)
+
+        return {
+            "reset": False,
+            "position": entries[-1]["change_id"] if entries else since,
+            "has_more": has_more,
+            "changes": len(entries),
+            "tables": tables
+        }
+
+    def changes(self, token):
+        """
+        Delta since `token` across all shards
+        Returns the response payload, or None if a shard could not be read
+        """
+        positions = decode_token(token)
+        limit = self.max_changes
+        partials = self.db.scatter(lambda shard: self._shard_changes(shard, positions.get(shard.name), limit))
+        if partials is None:
+            return None
+
+        reset = any(partial["reset"] for partial in partials)
+        tables = {table: {"inserted": [], "updated": [], "deleted": []} for table in TRACKED_TABLES}
+        if not reset:
+            for partial in partials:
+                for table, delta in partial["tables"].items():
+                    for outcome, rows in delta.items():
+                        tables[table][outcome].extend(rows)
+        count = 0 if reset else sum(partial["changes"] for partial in partials)
+
+        with self._lock:
+            self.polls += 1
+            self.resets += int(reset)
+            self.changes_served += count
+        self._maybe_prune()
+        return {
+            "token": encode_token({
+                shard.name: partial["position"] for shard, partial in zip(self.db.shards, partials)
+            }),
+            "reset": reset,
+            "has_more": not reset and any(partial["has_more"] for partial in partials),
+            "change_count": count,
+            "tables": {} if reset else tables
+        }
+
+    def _maybe_prune(self):
+        with self._lock:
+            if time.monotonic() - self._last_prune < self.prune_interval:
+                return
+            self._last_prune = time.monotonic()
+        for shard in self.db.shards:
+            self.db.execute_query("""
+                DELETE FROM change_log
+                WHERE changed_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+            """, (self.retention_days,), fetch=False, shard=shard)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked_tables": list(TRACKED_TABLES),
+                "retention_days": self.retention_days,
+                "max_changes_per_poll": self.max_changes,
+                "polls": self.polls,
+                "resets": self.resets,
+                "changes_served": self.changes_served
+            }
@@ -0,0 +1,172 @@
+"""
+SkySQL Intelligence Circuit Breaker
+Fail-fast protection for database access with last-known-good response caching
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker (closed, open, half-open)
+
+    While closed every call is allowed. Once `failure_threshold` consecutive
+    failures are recorded the circuit opens and calls are rejected without
+    touching the database. After `reset_timeout` seconds a single probe is let
+    through (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.total_rejections = 0
+        self.total_trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self._state
+
+    def allow_request(self):
+        """Return True if a database call may proceed right now"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                # Exactly one probe at a time while half-open
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = True
+                return True
+            self.total_rejections += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.total_trips += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def retry_after(self):
+        """Seconds until the next half-open probe is allowed"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            return max(0, int(remaining + 0.999))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout,
+                "total_trips": self.total_trips,
+                "total_rejections": self.total_rejections
+            }
+
+
+class ResponseCache:
+    """
+    Bounded LRU store of the last successful response per endpoint and parameters
+
+    Entries are (payload, status_code, stored_at) tuples; eviction is by least
+    recent use once `max_entries` is exceeded. The per-process counterpart of
+    shared_cache.SharedResponseCache: same interface, with table versions
+    kept in this process only.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._table_versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[:3]
+
+    def fresh(self, key, family=None, tables=()):
+        """The entry if it is inside its TTL and its tables are unchanged, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] is None or time.time() >= entry[3] \
+                    or entry[4] != self._stamp(tables):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[:3]
+
+    def _stamp(self, tables):
+        return ";".join(f"{table}={self._table_versions.get(table, 0)}" for table in sorted(set(tables)))
+
+    def versions(self, tables):
+        with self._lock:
+            return self._stamp(tables)
+
+    def put(self, key, payload, status_code=200, family=None, ttl=None, versions=""):
+        with self._lock:
+            stored_at = time.time()
+            self._entries[key] = (payload, status_code, stored_at, stored_at + ttl if ttl else None, versions or "")
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tables):
+        with self._lock:
+            for table in tables:
+                self._table_versions[table] = self._table_versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "shared": False,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,140 @@
+"""
+SkySQL Intelligence Code Dictionary
+In-process IATA code <-> integer key dictionary for airlines and airports
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Integer key columns and the code field each one decodes to
+KEY_FIELDS = {
+    "airline_id": ("airline", "airline_code"),
+    "source_airport_id": ("airport", "source_airport"),
+    "dest_airport_id": ("airport", "dest_airport")
+}
+
+
+class CodeDictionary:
+    """
+    Airline and airport IATA codes <-> their integer surrogate keys
+
+    routes and operational_metrics reference airlines and airports by
+    integer key only, so joins and filters compare integers and a route
+    row carries three INTs instead of three VARCHARs. Codes exist at the
+    API edge: request filters are encoded to keys here and result rows are
+    decoded back to the code fields clients expect, both with dict lookups
+    instead of a join against the reference tables. Airlines and airports
+    are reference data replicated to every shard, so the primary's copy is
+    loaded; an unknown code or key reloads it, at most every
+    `reload_interval` seconds.
+    """
+
+    def __init__(self, db, reload_interval=60.0):
+        self.db = db
+        self.reload_interval = reload_interval
+        self._ids = {"airline": {}, "airport": {}}      # kind -> {code: id}
+        self._codes = {"airline": {}, "airport": {}}    # kind -> {id: code}
+        self._lock = threading.Lock()
+        self._last_load = None
+        self.loads = 0
+        self.misses = 0
+
+    def refresh(self, force=False):
+        if not force and self._last_load is not None:
+            return True
+        with self._lock:
+            if not force and self._last_load is not None:
+                return True
+            airlines = self.db.execute_query("SELECT airline_id, iata_code FROM airlines")
+            airports = self.db.execute_query("SELECT airport_id, iata_code FROM airports")
+            if airlines is None or airports is None:
+                return False
+            ids, codes = {}, {}
+            for kind, rows, key in (("airline", airlines, "airline_id"), ("airport", airports, "airport_id")):
+                codes[kind] = {row[key]: row['iata_code'] for row in rows}
+                ids[kind] = {row['iata_code'].upper(): row[key] for row in rows if row['iata_code']}
+            # Swapped whole, so lookups never see a half-loaded dictionary
+            self._ids, self._codes = ids, codes
+            self._last_load = time.monotonic()
+            self.loads += 1
+            logger.info(f"Code dictionary loaded: {len(airlines)} airlines, {len(airports)} airports")
+        return True
+
+    def _lookup(self, table, kind, key):
+        if key is None:
+            return None
+        value = getattr(self, table)[kind].get(key)
+        if value is None:
+            self.misses += 1
+            if self._last_load is None or time.monotonic() - self._last_load >= self.reload_interval:
+                self.refresh(force=True)
+                value = getattr(self, table)[kind].get(key)
+        return value
+
+    def airline_id(self, code):
+        """Key of an airline IATA code, or None if there is no such airline"""
+        return self._lookup("_ids", "airline", str(code).upper()) if code else None
+
+    def airport_id(self, code):
+        return self._lookup("_ids", "airport", str(code).upper()) if code else None
+
+    def airline_code(self, airline_id):
+        return self._lookup("_codes", "airline", airline_id)
+
+    def airport_code(self, airport_id):
+        return self._lookup("_codes", "airport", airport_id)
+
+    def code(self, field, key):
+        """Code for one of the KEY_FIELDS columns"""
+        kind = KEY_FIELDS[field][0]
+        return self.airline_code(key) if kind == "airline" else self.airport_code(key)
+
+    def route_name(self, row, separator=" - "):
+        """'SYD - LAX' from a row's source_airport_id and dest_airport_id"""
+        return f"{self.airport_code(row['source_airport_id'])}{separator}{self.airport_code(row['dest_airport_id'])}"
+
+    def decode(self, rows, **names):
+        """
+        Add the code field for every KEY_FIELDS column present in `rows`
+        (row dicts or Columns), in place, and return them. A keyword renames
+        the field a key decodes to, e.g. dest_airport_id="destination_airport".
+        """
+        fields = self._fields(names)
+        if hasattr(rows, "names"):
+            for field, name, table in [entry for entry in fields if entry[0] in rows.names]:
+                keys = rows.values[rows.index(field)]
+                rows.names.append(name)
+                rows.values.append([table[key] if key in table else self.code(field, key) for key in keys])
+            return rows
+        for row in rows:
+            self._decode_row(row, fields)
+        return rows
+
+    def decode_iter(self, rows, **names):
+        """decode() for a lazily consumed row iterator, such as a streamed response"""
+        fields = self._fields(names)
+        for row in rows:
+            self._decode_row(row, fields)
+            yield row
+
+    def _fields(self, names):
+        # (key column, code field, code table) resolved once per call rather than per row
+        return [(field, names.get(field, name), self._codes[kind]) for field, (kind, name) in KEY_FIELDS.items()]
+
+    def _decode_row(self, row, fields):
+        for field, name, table in fields:
+            if field in row:
+                key = row[field]
+                code = table.get(key)
+                row[name] = code if code is not None or key is None else self.code(field, key)
+
+    def stats(self):
+        return {
+            "airlines": len(self._codes["airline"]),
+            "airports": len(self._codes["airport"]),
+            "loads": self.loads,
+            "misses": self.misses
+        }
@@ -0,0 +1,444 @@
+"""
+SkySQL Intelligence Cold Storage
+Archive of old flight_performance rows in compressed, memory-mapped columnar files
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SKYCOLD1"
+EPOCH = date(1970, 1, 1)
+# Rows per independently compressed column chunk; a query decompresses only
+# the chunks whose flight_date range it overlaps
+CHUNK_ROWS = 65536
+
+# Column name -> numpy dtype; flight_date is stored as days since 1970-01-01
+COLUMNS = {
+    "performance_id": "<i8",
+    "route_id": "<i4",
+    "flight_date": "<i4",
+    "actual_fuel_kg": "<f8",
+    "planned_fuel_kg": "<f8",
+    "passengers_count": "<i4",
+    "efficiency_score": "<f8",
+    "fuel_savings_kg": "<f8",
+    "fuel_per_km": "<f8",
+}
+
+
+def column_arrays(chunks):
+    """
+    numpy arrays per COLUMNS entry from an iterable of row chunks
+    Each chunk is converted as it arrives, so only one chunk of row dicts
+    is alive at a time.
+    """
+    parts = {name: [] for name in COLUMNS}
+    for rows in chunks:
+        for name, dtype in COLUMNS.items():
+            if name == "flight_date":
+                values = [(row[name] - EPOCH).days for row in rows]
+            else:
+                values = [row[name] if row[name] is not None else 0 for row in rows]
+            parts[name].append(np.asarray(values, dtype=dtype))
+    return {
+        name: np.concatenate(arrays) if arrays else np.empty(0, dtype=COLUMNS[name])
+        for name, arrays in parts.items()
+    }
+
+
+def write_cold_file(path, rows, shard="primary"):
+    """Write flight rows (dicts with the COLUMNS keys) to a columnar file"""
+    write_cold_columns(path, column_arrays([rows]), shard=shard)
+
+
+def write_cold_columns(path, arrays, shard="primary"):
+    """
+    Write per-column arrays (see column_arrays) to a columnar file
+
+    Layout: MAGIC, uint32 header length, JSON header, then each column as
+    zlib-compressed chunks of CHUNK_ROWS rows. The header carries row count,
+    min/max flight_date, the route ids present, each chunk's flight_date
+    range and each column's chunk offsets, so readers can prune whole files,
+    then chunks, and decompress only the columns and chunks a query touches
+    straight from the mapped file. (Older files hold one zlib block, or one
+    raw block, per column; they are still read, whole.) The file is written
+    to a temporary name and renamed into place.
+    """
+    dates = arrays["flight_date"]
+    starts = range(0, len(dates), CHUNK_ROWS)
+    blocks, layout, offset = [], {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array, dtype=COLUMNS[name])
+        chunks = []
+        for start in starts:
+            block = zlib.compress(array[start:start + CHUNK_ROWS].tobytes(), 6)
+            chunks.append([offset, len(block)])
+            blocks.append(block)
+            offset += len(block)
+        layout[name] = {"dtype": COLUMNS[name], "codec": "zlib-chunks", "chunks": chunks}
+
+    header = json.dumps({
+        "rows": len(dates),
+        "shard": shard,
+        "min_date": (EPOCH + timedelta(days=int(dates.min()))).isoformat(),
+        "max_date": (EPOCH + timedelta(days=int(dates.max()))).isoformat(),
+        "min_performance_id": int(arrays["performance_id"].min()),
+        "max_performance_id": int(arrays["performance_id"].max()),
+        "route_ids": sorted(int(r) for r in np.unique(arrays["route_id"])),
+        # Days since 1970-01-01, per chunk
+        "chunk_dates": [[int(dates[start:start + CHUNK_ROWS].min()), int(dates[start:start + CHUNK_ROWS].max())]
+                        for start in starts],
+        "columns": layout
+    }).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(MAGIC)
+        handle.write(struct.pack("<I", len(header)))
+        handle.write(header)
+        for block in blocks:
+            handle.write(block)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+class ColdFile:
+    """Read-only, memory-mapped view of one columnar archive file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._handle = open(path, "rb")
+        self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a cold storage file")
+        header_length = struct.unpack_from("<I", self._map, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._map[start:start + header_length].decode("utf-8"))
+        self._data_start = start + header_length
+        self.rows = self.header["rows"]
+        self.min_date = date.fromisoformat(self.header["min_date"])
+        self.max_date = date.fromisoformat(self.header["max_date"])
+        self.route_ids = frozenset(self.header["route_ids"])
+
+    def overlaps(self, start, end, route_ids=None):
+        if self.max_date < start or self.min_date > end:
+            return False
+        return route_ids is None or not self.route_ids.isdisjoint(route_ids)
+
+    def chunks_for(self, first, last):
+        """
+        Indexes of the chunks with flight_date days (since 1970-01-01) in
+        [first, last]; None for files without chunks (every row is read)
+        """
+        spans = self.header.get("chunk_dates")
+        if spans is None:
+            return None
+        return [i for i, (low, high) in enumerate(spans) if high >= first and low <= last]
+
+    def column(self, name, chunks=None):
+        """
+        A single column, decompressed straight from the mapped file
+        chunks: chunk indexes from chunks_for (None: all rows); only those
+        chunks are read and decompressed. Pass the same chunks for every
+        column of a query so the rows line up.
+        """
+        meta = self.header["columns"][name]
+        codec = meta.get("codec", "zlib")
+        if codec == "zlib-chunks":
+            selected = range(len(meta["chunks"])) if chunks is None else chunks
+            parts = []
+            for i in selected:
+                offset, length = meta["chunks"][i]
+                offset += self._data_start
+                parts.append(zlib.decompress(self._map[offset:offset + length]))
+            return np.frombuffer(b"".join(parts), dtype=meta["dtype"])
+        offset = self._data_start + meta["offset"]
+        if codec == "zlib":
+            raw = zlib.decompress(self._map[offset:offset + meta["length"]])
+            return np.frombuffer(raw, dtype=meta["dtype"])
+        return np.frombuffer(self._map, dtype=meta["dtype"], count=self.rows, offset=offset)
+
+    def close(self):
+        self._handle.close()
+        try:
+            self._map.close()
+        except BufferError:
+            # A query still holds a column view; the map is released with it
+            pass
+
+
+class ColdStore:
+    """
+    Directory of cold files queried together with hot InnoDB data
+
+    Archived rows are deleted from flight_performance, so hot and cold
+    partial aggregates never overlap and can simply be added.
+    """
+
+    PARTIAL_FIELDS = ("flights", "efficiency_sum", "fuel_per_km_sum", "passengers_sum",
+                      "fuel_saved_sum", "fuel_used_sum")
+
+    def __init__(self, directory, rescan_interval=60.0):
+        self.directory = directory
+        self.rescan_interval = rescan_interval
+        self._files = {}
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+        self.rescan()
+
+    def rescan(self):
+        """Pick up files written by the archiver (a separate process) since the last scan"""
+        names = set()
+        if os.path.isdir(self.directory):
+            names = {name for name in os.listdir(self.directory) if name.endswith(".skyc")}
+        with self._lock:
+            for name in sorted(set(self._files) - names):
+                self._files.pop(name).close()
+            for name in sorted(names - set(self._files)):
+                try:
+                    self._files[name] = ColdFile(os.path.join(self.directory, name))
+                except (OSError, ValueError) as e:
+                    logger.error(f"Skipping unreadable cold file {name}: {e}")
+            self._last_scan = time.monotonic()
+
+    def files_for(self, start, end, route_ids=None):
+        if time.monotonic() - self._last_scan >= self.rescan_interval:
+            self.rescan()
+        with self._lock:
+            return [f for f in self._files.values() if f.overlaps(start, end, route_ids)]
+
+    def has_data(self, start, end):
+        return bool(self.files_for(start, end))
+
+    def route_partials(self, start, end, route_ids=None):
+        """
+        Per-route sums and counts for archived flights with start <= flight_date <= end
+        Returns rows shaped like the hot route_partials query (route_id + PARTIAL_FIELDS)
+        """
+        totals = {}
+        first, last = (start - EPOCH).days, (end - EPOCH).days
+        wanted = np.asarray(sorted(route_ids), dtype="<i4") if route_ids is not None else None
+
+        for cold in self.files_for(start, end, route_ids):
+            chunks = cold.chunks_for(first, last)
+            if chunks == []:
+                continue
+            routes = cold.column("route_id", chunks)
+            dates = cold.column("flight_date", chunks)
+            mask = (dates >= first) & (dates <= last)
+            if wanted is not None:
+                mask &= np.isin(routes, wanted)
+            if not mask.any():
+                continue
+
+            ids, inverse = np.unique(routes[mask], return_inverse=True)
+            sums = {
+                "flights": np.bincount(inverse, minlength=len(ids)),
+                "efficiency_sum": np.bincount(inverse, cold.column("efficiency_score", chunks)[mask], len(ids)),
+                "fuel_per_km_sum": np.bincount(inverse, cold.column("fuel_per_km", chunks)[mask], len(ids)),
+                "passengers_sum": np.bincount(inverse, cold.column("passengers_count", chunks)[mask], len(ids)),
+                "fuel_saved_sum": np.bincount(inverse, cold.column("fuel_savings_kg", chunks)[mask], len(ids)),
+                "fuel_used_sum": np.bincount(inverse, cold.column("actual_fuel_kg", chunks)[mask], len(ids)),
+            }
+            for i, route_id in enumerate(ids.tolist()):
+                row = totals.setdefault(route_id, dict.fromkeys(self.PARTIAL_FIELDS, 0))
+                for field in self.PARTIAL_FIELDS:
+                    row[field] += sums[field][i].item()
+
+        return [dict(route_id=route_id, **fields) for route_id, fields in totals.items()]
+
+    def daily_route_rows(self, start, end):
+        """
+        Per-route, per-day flights, fuel and mean efficiency for archived flights
+        with start <= flight_date < end, shaped like the forecast_flights_daily query
+        """
+        totals = {}
+        first, last = (start - EPOCH).days, (end - EPOCH).days
+        for cold in self.files_for(start, end):
+            chunks = cold.chunks_for(first, last - 1)
+            if chunks == []:
+                continue
+            dates = cold.column("flight_date", chunks)
+            mask = (dates >= first) & (dates < last)
+            if not mask.any():
+                continue
+            keys = (cold.column("route_id", chunks)[mask].astype("<i8") << 32) | dates[mask].astype("<i8")
+            ids, inverse = np.unique(keys, return_inverse=True)
+            flights = np.bincount(inverse, minlength=len(ids))
+            fuel = np.bincount(inverse, cold.column("actual_fuel_kg", chunks)[mask], len(ids))
+            efficiency = np.bincount(inverse, cold.column("efficiency_score", chunks)[mask], len(ids))
+            for i, key in enumerate(ids.tolist()):
+                row = totals.setdefault(key, [0, 0.0, 0.0])
+                row[0] += int(flights[i])
+                row[1] += float(fuel[i])
+                row[2] += float(efficiency[i])
+        return [{
+            "route_id": key >> 32,
+            "day": EPOCH + timedelta(days=key & 0xFFFFFFFF),
+            "flights": flights,
+            "fuel_kg": fuel,
+            "efficiency_score": efficiency / flights
+        } for key, (flights, fuel, efficiency) in totals.items()]
+
+    def route_flights(self, route_id, until=None, limit=10):
+        """
+        The `limit` most recent archived flights of one route with
+        flight_date <= until, newest first, shaped like the hot
+        route_performance query
+        """
+        flights = []
+        last = (until - EPOCH).days if until is not None else None
+        for cold in self.files_for(date.min, until or date.max, {route_id}):
+            chunks = cold.chunks_for(-2 ** 31, last) if last is not None else None
+            if chunks == []:
+                continue
+            dates = cold.column("flight_date", chunks)
+            mask = cold.column("route_id", chunks) == route_id
+            if last is not None:
+                mask &= dates <= last
+            if not mask.any():
+                continue
+            rows = zip(dates[mask].tolist(),
+                       *(cold.column(name, chunks)[mask].tolist() for name in
+                         ("efficiency_score", "actual_fuel_kg", "planned_fuel_kg", "passengers_count")))
+            flights.extend(rows)
+        flights.sort(key=lambda flight: flight[0], reverse=True)
+        return [{
+            "efficiency_score": efficiency,
+            "actual_fuel_kg": actual,
+            "planned_fuel_kg": planned,
+            "flight_date": EPOCH + timedelta(days=day),
+            "passengers_count": passengers
+        } for day, efficiency, actual, planned, passengers in flights[:limit]]
+
+    def stats(self):
+        with self._lock:
+            files = list(self._files.values())
+        return {
+            "directory": self.directory,
+            "files": len(files),
+            "rows": sum(f.rows for f in files),
+            "bytes": sum(os.path.getsize(f.path) for f in files),
+            "min_date": min((f.min_date for f in files), default=EPOCH).isoformat() if files else None,
+            "max_date": max((f.max_date for f in files), default=EPOCH).isoformat() if files else None
+        }
+
+
+class ColdArchiver:
+    """
+    Moves flight_performance rows older than the hot window into cold files
+
+    Works one shard and one calendar month at a time: select the month,
+    write and re-open the file to verify row count and fuel total, then
+    delete the same rows in a single (atomic) statement. The cutoff date is
+    fixed once per run so the select and the delete see the same range, and
+    the delete is bounded by the highest archived performance_id so rows
+    inserted meanwhile stay hot.
+
+    The route aggregates (tiered_route_rows: efficiency analytics and
+    generated reports), the distribution sketches, per-route analysis and
+    the forecast history read the cold tier too. Archived flights drop out
+    of the rest, which reads flight_performance only: /api/flights, the
+    flight row counts (health, dashboard stats), the leaderboards and the
+    weather analytics. Keep hot_days at least as long as the longest window
+    those serve (90 days by default).
+    """
+
+    def __init__(self, db, store, hot_days=90):
+        self.db = db
+        self.store = store
+        self.hot_days = hot_days
+
+    def cold_months(self, shard, cutoff):
+        return self.db.execute_query("""
+            SELECT DATE_FORMAT(flight_date, '%Y-%m-01') as month_start, COUNT(*) as row_count
+            FROM flight_performance
+            WHERE flight_date < %s
+            GROUP BY month_start
+            ORDER BY month_start
+        """, (cutoff,), shard=shard)
+
+    def archive(self, dry_run=False):
+        """Archive every cold month on every shard; returns a summary per file"""
+        os.makedirs(self.store.directory, exist_ok=True)
+        cutoff = date.today() - timedelta(days=self.hot_days)
+        summary = []
+        for shard in self.db.shards.names():
+            months = self.cold_months(shard, cutoff)
+            if months is None:
+                raise RuntimeError(f"Could not list cold months on shard {shard}")
+            for month in months:
+                month_start = date.fromisoformat(str(month['month_start']))
+                if dry_run:
+                    summary.append({"shard": shard, "month": month_start.isoformat()[:7],
+                                    "rows": month['row_count'], "archived": False})
+                    continue
+                summary.append(self._archive_month(shard, month_start, cutoff))
+        self.store.rescan()
+        return summary
+
+    def _archive_month(self, shard, month_start, cutoff):
+        month_end = min((month_start + timedelta(days=32)).replace(day=1), cutoff)
+        stream = self.db.stream_query("""
+            SELECT
+                fp.performance_id,
+                fp.route_id,
+                fp.flight_date,
+                fp.actual_fuel_kg,
+                fp.planned_fuel_kg,
+                fp.passengers_count,
+                fp.efficiency_score,
+                fp.fuel_savings_kg,
+                fp.actual_fuel_kg / r.distance_km as fuel_per_km
+            FROM flight_performance fp
+            JOIN routes r ON fp.route_id = r.route_id
+            WHERE fp.flight_date >= %s AND fp.flight_date < %s
+            ORDER BY fp.performance_id
+        """, (month_start, month_end), shard=shard)
+        if stream is None:
+            raise RuntimeError(f"Could not read {month_start:%Y-%m} on shard {shard}")
+        # Rows arrive in chunks straight into column arrays, never as one big list
+        with stream:
+            arrays = column_arrays(stream.chunks())
+        row_count = len(arrays["performance_id"])
+        if not row_count:
+            return {"shard": shard, "month": month_start.isoformat()[:7], "rows": 0, "archived": False}
+
+        first_id, last_id = int(arrays["performance_id"][0]), int(arrays["performance_id"][-1])
+        name = f"flights_{shard}_{month_start:%Y-%m}_{first_id}-{last_id}.skyc"
+        path = os.path.join(self.store.directory, name)
+        write_cold_columns(path, arrays, shard=shard)
+
+        # Verify before deleting anything from the hot tier
+        check = ColdFile(path)
+        try:
+            expected_fuel = float(arrays["actual_fuel_kg"].sum())
+            if check.rows != row_count or abs(float(check.column("actual_fuel_kg").sum()) - expected_fuel) > 0.01:
+                raise RuntimeError(f"Verification failed for {name}")
+        finally:
+            check.close()
+
+        deleted = self.db.execute_query("""
+            DELETE FROM flight_performance
+            WHERE flight_date >= %s AND flight_date < %s AND performance_id <= %s
+        """, (month_start, month_end, last_id), fetch=False, shard=shard)
+        if deleted is None:
+            # Nothing was removed, so drop the file rather than double count
+            os.remove(path)
+            raise RuntimeError(f"Delete failed for {name}; archive file removed, rerun to retry")
+
+        logger.info(f"Archived {row_count} flights from shard {shard} to {name}")
+        return {"shard": shard, "month": month_start.isoformat()[:7], "rows": row_count,
+                "file": name, "bytes": os.path.getsize(path), "archived": True}
@@ -0,0 +1,57 @@
+"""
+SkySQL Intelligence Columnar Results
+Column-major result sets for the ?format=columnar response option
+"""
+
+
+class Columns:
+    """
+    Result set stored as one value list per column
+
+    Rows from a plain (tuple) cursor are transposed straight into the column
+    lists, so no per-row dict is ever built and the column names are sent
+    once instead of once per row. Serialized as
+    {"columns": [...], "data": {column: [values...]}}.
+    """
+
+    __slots__ = ("names", "values")
+
+    def __init__(self, names, values=None):
+        self.names = list(names)
+        self.values = values if values is not None else [[] for _ in self.names]
+
+    @classmethod
+    def from_tuples(cls, names, rows):
+        columns = cls(names)
+        columns.extend(rows)
+        return columns
+
+    @classmethod
+    def from_dicts(cls, rows, names=None):
+        """Transpose row dicts (already built, e.g. computed analytics rows)"""
+        if names is None:
+            names = list(rows[0]) if rows else []
+        return cls(names, [[row.get(name) for row in rows] for name in names])
+
+    def extend(self, rows):
+        """Append tuple rows, one value to each column list"""
+        appends = [column.append for column in self.values]
+        for row in rows:
+            for append, value in zip(appends, row):
+                append(value)
+
+    def index(self, name):
+        return self.names.index(name)
+
+    def rows(self):
+        """Tuples in row order (for merging)"""
+        return zip(*self.values) if self.values else iter(())
+
+    def copy(self):
+        return Columns(self.names, [list(column) for column in self.values])
+
+    def __len__(self):
+        return len(self.values[0]) if self.values else 0
+
+    def payload(self):
+        return {"columns": self.names, "data": dict(zip(self.names, self.values))}
@@ -0,0 +1,197 @@
+"""
+SkySQL Intelligence Connection Pool
+Reusable MariaDB connections with a per-connection prepared statement cache
+"""
+
+import queue
+import threading
+import time
+
+
+class PooledConnection:
+    """
+    A pooled connection plus the prepared cursors opened on it
+
+    Server-side prepared statements belong to a single session, so the cache
+    lives on the connection: the first execution of a named query prepares it,
+    later executions on the same connection only send the parameters.
+    """
+
+    __slots__ = ("raw", "statements", "prepares", "reuses", "idle_since")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.statements = {}
+        self.prepares = 0
+        self.reuses = 0
+        self.idle_since = time.monotonic()
+
+    def prepared_cursor(self, name):
+        cursor = self.statements.get(name)
+        if cursor is None:
+            cursor = self.raw.cursor(prepared=True)
+            self.statements[name] = cursor
+            self.prepares += 1
+        else:
+            self.reuses += 1
+        return cursor
+
+    def forget_statement(self, name):
+        cursor = self.statements.pop(name, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def close(self):
+        for name in list(self.statements):
+            self.forget_statement(name)
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded LIFO pool of database connections
+
+    `connect` is a zero-argument callable returning a new raw connection.
+    LIFO order keeps the most recently used (and most warmed-up) connections
+    busy while idle ones age out naturally.
+
+    Only connections idle for longer than `ping_after` seconds are pinged on
+    checkout (a server round trip); a recently used connection that has died
+    fails its query instead, and the caller's error path discards it.
+    """
+
+    def __init__(self, connect, max_size=8, acquire_timeout=5.0, ping_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._retired_prepares = 0
+        self._retired_reuses = 0
+
+    def acquire(self, timeout=None):
+        """Return an idle connection, open a new one, or wait (at most `timeout` seconds) for a release"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                can_create = self._created < self.max_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return PooledConnection(self._connect())
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                conn = self._idle.get(timeout=self.acquire_timeout if timeout is None else max(timeout, 0.001))
+            except queue.Empty:
+                raise TimeoutError("Timed out waiting for a pooled database connection")
+
+        if time.monotonic() - conn.idle_since > self.ping_after and not conn.raw.is_connected():
+            self._discard(conn)
+            return self.acquire(timeout)
+        return conn
+
+    def release(self, conn, discard=False):
+        if discard:
+            self._discard(conn)
+        else:
+            conn.idle_since = time.monotonic()
+            self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+            self._retired_prepares += conn.prepares
+            self._retired_reuses += conn.reuses
+        conn.close()
+
+    def stats(self):
+        idle = list(self._idle.queue)
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "open_connections": self._created,
+                "idle_connections": len(idle),
+                "cached_statements": sum(len(c.statements) for c in idle),
+                "statement_prepares": self._retired_prepares + sum(c.prepares for c in idle),
+                "statement_reuses": self._retired_reuses + sum(c.reuses for c in idle)
+            }
+
+
+class RowStream:
+    """
+    Rows of one query read from an unbuffered cursor, chunk by chunk
+
+    The pooled connection stays checked out until the stream is exhausted or
+    closed. A stream closed early still has unread rows on the wire, so its
+    connection is discarded instead of drained. Iterating yields rows;
+    chunks() yields lists of up to `chunk_size` rows.
+    """
+
+    def __init__(self, pool, conn, cursor, chunk_size=1000, on_error=None):
+        self._pool = pool
+        self._conn = conn
+        self._cursor = cursor
+        self.chunk_size = chunk_size
+        self._on_error = on_error
+        self._exhausted = False
+        self._closed = False
+        self.rows = 0
+
+    def chunks(self):
+        try:
+            while True:
+                rows = self._cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    self._exhausted = True
+                    return
+                self.rows += len(rows)
+                yield rows
+        except Exception as e:
+            if self._on_error is not None:
+                self._on_error(e)
+            raise
+        finally:
+            self.close()
+
+    @property
+    def columns(self):
+        """Column names of the result"""
+        return list(self._cursor.column_names)
+
+    def __iter__(self):
+        for rows in self.chunks():
+            yield from rows
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._exhausted:
+            try:
+                self._cursor.close()
+            except Exception:
+                self._exhausted = False
+        self._pool.release(self._conn, discard=not self._exhausted)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
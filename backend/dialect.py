@@ -0,0 +1,188 @@
+"""
+SkySQL Intelligence SQL Dialect
+Translation of the MariaDB SQL used by the platform into SQLite SQL
+"""
+
+import re
+from functools import lru_cache
+
+# Single-quoted literals (with '' and \' escapes) are never rewritten
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+_DIVISION = re.compile(r"(?<![/*])/(?![/*])")
+_ENGINE = re.compile(r"\bENGINE\s*=\s*\w+", re.IGNORECASE)
+_AUTO_KEY = re.compile(r"\b(?:BIG)?INT(?:EGER)?\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_ON_UPDATE = re.compile(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b", re.IGNORECASE)
+_INLINE_INDEX = re.compile(r",\s*(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+_TABLE_AUTO_INCREMENT = re.compile(r"\)\s*AUTO_INCREMENT\s*=\s*(\d+)\s*$", re.IGNORECASE)
+_CREATE_TABLE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+_ALTER_AUTO_INCREMENT = re.compile(r"^\s*ALTER\s+TABLE\s+(\w+)\s+AUTO_INCREMENT\s*=\s*(\d+)\s*$", re.IGNORECASE)
+_TRIGGER_BODY = re.compile(r"(\bFOR\s+EACH\s+ROW\s+)(?!BEGIN\b)(.*?)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+_SESSION_ONLY = re.compile(r"^\s*(?:CREATE\s+DATABASE|USE)\b", re.IGNORECASE)
+
+# MariaDB DATE_FORMAT specifiers that differ in strftime
+_DATE_FORMAT = {"%i": "%M", "%s": "%S", "%e": "%d", "%c": "%m"}
+
+
+def _split_literals(sql):
+    """Alternating (code, literal, code, ...) pieces of a statement"""
+    pieces = []
+    position = 0
+    for match in _LITERAL.finditer(sql):
+        pieces.append(sql[position:match.start()])
+        pieces.append(match.group(0))
+        position = match.end()
+    pieces.append(sql[position:])
+    return pieces
+
+
+def _map_code(sql, rewrite):
+    """Apply rewrite() to everything outside string literals"""
+    pieces = _split_literals(sql)
+    pieces[::2] = [rewrite(piece) for piece in pieces[::2]]
+    return "".join(pieces)
+
+
+def _find_call(sql, name, start=0):
+    """
+    (start, end, args) of the next NAME(...) call outside literals, or None
+    args are the top-level comma-separated argument strings
+    """
+    pattern = re.compile(rf"\b{name}\s*\(", re.IGNORECASE)
+    literals = [match.span() for match in _LITERAL.finditer(sql)]
+    for match in pattern.finditer(sql, start):
+        if any(first <= match.start() < last for first, last in literals):
+            continue
+        depth = 0
+        args = []
+        arg_start = match.end()
+        position = match.end()
+        while position < len(sql):
+            literal = next((last for first, last in literals if first == position), None)
+            if literal is not None:
+                position = literal
+                continue
+            char = sql[position]
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    args.append(sql[arg_start:position].strip())
+                    return match.start(), position + 1, [arg for arg in args if arg or len(args) > 1]
+                depth -= 1
+            elif char == "," and depth == 0:
+                args.append(sql[arg_start:position].strip())
+                arg_start = position + 1
+            position += 1
+        raise ValueError(f"Unbalanced parentheses in {name}() call")
+    return None
+
+
+def _rewrite_calls(sql, name, rewrite):
+    position = 0
+    while True:
+        call = _find_call(sql, name, position)
+        if call is None:
+            return sql
+        start, end, args = call
+        replacement = rewrite(args)
+        sql = sql[:start] + replacement + sql[end:]
+        position = start + len(replacement)
+
+
+def _interval(args, sign):
+    """DATE_SUB/DATE_ADD(date, INTERVAL n UNIT) -> date(date, '+n units')"""
+    base, interval = args
+    match = re.match(r"INTERVAL\s+(.+?)\s+(DAY|MONTH|YEAR|HOUR|MINUTE|SECOND)$", interval, re.IGNORECASE | re.DOTALL)
+    if not match:
+        raise ValueError(f"Unsupported interval: {interval}")
+    amount, unit = match.groups()
+    function = "date" if base.startswith("date(") else "datetime"
+    return f"{function}({base}, '{sign}' || ({amount}) || ' {unit.lower()}s')"
+
+
+def _date_format(args):
+    value, pattern = args
+    for mariadb, strftime in _DATE_FORMAT.items():
+        pattern = pattern.replace(mariadb, strftime)
+    return f"strftime({pattern}, {value})"
+
+
+def _expressions(sql):
+    sql = _rewrite_calls(sql, "CURDATE", lambda args: "date('now', 'localtime')")
+    # NOW(6) keeps fractional seconds (milliseconds, SQLite's finest)
+    sql = _rewrite_calls(sql, "NOW", lambda args: "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+                         if args else "datetime('now', 'localtime')")
+    sql = _rewrite_calls(sql, "DATE_SUB", lambda args: _interval(args, "-"))
+    sql = _rewrite_calls(sql, "DATE_ADD", lambda args: _interval(args, "+"))
+    sql = _rewrite_calls(sql, "DATE_FORMAT", _date_format)
+    # CONCAT is NULL if any argument is, exactly like ||
+    sql = _rewrite_calls(sql, "CONCAT", lambda args: "(" + " || ".join(args) + ")")
+
+    def code(piece):
+        piece = _NAMED_PARAM.sub(r":\1", piece)
+        piece = piece.replace("%s", "?").replace("%%", "%")
+        # MariaDB / is always fractional; SQLite divides integers as integers
+        piece = _DIVISION.sub("* 1.0 /", piece)
+        piece = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", piece, flags=re.IGNORECASE)
+        return re.sub(r"\binformation_schema\.(TABLES|COLUMNS)\b",
+                      lambda match: f"temp.information_schema_{match.group(1).lower()}",
+                      piece, flags=re.IGNORECASE)
+
+    return _map_code(sql, code)
+
+
+def _create_table(sql, table):
+    """Column types, inline indexes and table options of a CREATE TABLE"""
+    extra = []
+
+    def inline_index(match):
+        unique, name, columns = match.groups()
+        extra.append(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS "
+                     f"{table}_{name} ON {table} ({columns})")
+        return ""
+
+    sql = _ENGINE.sub("", sql).rstrip()
+    sql = _AUTO_KEY.sub("INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+    sql = _ON_UPDATE.sub("", sql)
+    sql = _INLINE_INDEX.sub(inline_index, sql)
+    start = _TABLE_AUTO_INCREMENT.search(sql)
+    if start:
+        sql = sql[:start.start()] + ")"
+        # Only seeds a new table; an existing sequence keeps counting
+        extra.append(f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', {int(start.group(1)) - 1} "
+                     f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{table}')")
+    return [sql] + extra
+
+
+@lru_cache(maxsize=1024)
+def to_sqlite(sql):
+    """
+    SQLite statements equivalent to one MariaDB statement (a tuple, possibly empty)
+
+    Covers the dialect the platform actually uses: %s / %(name)s parameters,
+    CURDATE/NOW/DATE_SUB/DATE_ADD/DATE_FORMAT/CONCAT, INSERT IGNORE,
+    AUTO_INCREMENT keys and start values, inline indexes, ENGINE options,
+    single-statement triggers and information_schema.TABLES/COLUMNS.
+    CONCAT_WS, CRC32 and DATABASE() are registered as functions on the
+    connection instead.
+    Translations are cached, so a repeated query is translated once.
+    """
+    if _SESSION_ONLY.match(sql):
+        # The embedded database is the file itself
+        return ()
+
+    alter = _ALTER_AUTO_INCREMENT.match(sql)
+    if alter:
+        table, start = alter.group(1), int(alter.group(2))
+        return (f"DELETE FROM sqlite_sequence WHERE name = '{table}'",
+                f"INSERT INTO sqlite_sequence (name, seq) VALUES ('{table}', {start - 1})")
+
+    sql = _expressions(sql)
+    create = _CREATE_TABLE.match(sql)
+    if create:
+        return tuple(_create_table(sql, create.group(1)))
+    if re.match(r"^\s*CREATE\s+TRIGGER\b", sql, re.IGNORECASE):
+        sql = _TRIGGER_BODY.sub(lambda match: f"{match.group(1)}BEGIN {match.group(2)}; END", sql)
+    return (sql,)
@@ -0,0 +1,364 @@
+"""
+SkySQL Intelligence Fleet Simulator
+Vectorized Monte Carlo fuel, CO2 and cost simulation of aircraft-to-route assignments
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CO2_PER_KG_FUEL = 3.16          # kg CO2 per kg of jet fuel burned
+PASSENGER_MASS_KG = 100.0       # passenger plus baggage
+PAYLOAD_BURN_PER_KG_KM = 2.5e-5 # extra kg fuel per kg payload per km flown
+CHUNK_CELLS = 2_000_000         # route x iteration draws per worker task
+MAX_DEFAULT_WORKERS = 4         # default pool size cap, leaving cores to the API threads
+
+
+def burn_index(aircraft):
+    """Relative trip fuel burn of an aircraft: per-seat efficiency times seats"""
+    return float(aircraft['fuel_efficiency']) * int(aircraft['seat_capacity'])
+
+
+class FleetDataset:
+    """
+    Per-route empirical fuel and passenger distributions from flight_performance
+
+    Samples for all routes are concatenated into flat arrays with per-route
+    offsets and counts, so a chunk of routes is bootstrapped with one
+    vectorized draw. Routes with no observed flights point at a shared block
+    of network-wide actual/planned fuel ratios and passenger counts, scaled
+    by the route's own base fuel per km.
+    """
+
+    def __init__(self, routes, flights, version=0):
+        self.version = version
+        self.loaded_at = time.time()
+        by_route = {}
+        for row in flights:
+            by_route.setdefault(row['route_id'], []).append(row)
+
+        ratios = [float(f['actual_fuel_kg']) / float(f['planned_fuel_kg'])
+                  for f in flights if f['actual_fuel_kg'] and f['planned_fuel_kg']]
+        network_pax = [int(f['passengers_count']) for f in flights if f['passengers_count'] is not None]
+        fuel_samples, pax_samples = [], []
+        offsets, counts, scales = [], [], []
+        fallback_routes = []
+
+        self.route_ids = np.array([r['route_id'] for r in routes], dtype=np.int64)
+        self.airlines = np.array([r['airline_id'] for r in routes], dtype=np.int64)
+        self.distance = np.array([float(r['distance_km']) for r in routes])
+        base_per_km = np.array([float(r['base_fuel_kg']) / max(float(r['distance_km']), 1.0) for r in routes])
+
+        for i, route in enumerate(routes):
+            observed = [f for f in by_route.get(route['route_id'], ())
+                        if f['actual_fuel_kg'] is not None and f['passengers_count'] is not None]
+            if observed:
+                offsets.append(len(fuel_samples))
+                counts.append(len(observed))
+                scales.append(1.0)
+                fuel_samples.extend(float(f['actual_fuel_kg']) / self.distance[i] for f in observed)
+                pax_samples.extend(int(f['passengers_count']) for f in observed)
+            else:
+                fallback_routes.append(i)
+                offsets.append(-1)
+                counts.append(0)
+                scales.append(base_per_km[i])
+
+        # Shared network block; fuel and passengers are drawn independently here
+        block = max(len(ratios), len(network_pax), 1)
+        fallback_offset = len(fuel_samples)
+        fuel_samples.extend(np.resize(np.array(ratios or [1.0]), block))
+        pax_samples.extend(np.resize(np.array(network_pax or [0]), block))
+        for i in fallback_routes:
+            offsets[i] = fallback_offset
+            counts[i] = block
+
+        self.fallback_offset = fallback_offset
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.counts = np.array(counts, dtype=np.int64)
+        self.fuel_scale = np.array(scales)
+        self.fuel_samples = np.array(fuel_samples)
+        self.pax_samples = np.array(pax_samples, dtype=np.float64)
+        self.observed_routes = len(routes) - len(fallback_routes)
+        self._positions = {route_id: i for i, route_id in enumerate(self.route_ids.tolist())}
+
+    def __len__(self):
+        return len(self.route_ids)
+
+    def position(self, route_id):
+        return self._positions.get(route_id)
+
+    def chunk(self, start, end):
+        """
+        Arrays for routes [start, end) with only the samples they reference
+        Observed samples are laid out in route order, so a block of routes
+        needs one contiguous slice plus the shared network block.
+        """
+        offsets, counts = self.offsets[start:end], self.counts[start:end]
+        observed = offsets < self.fallback_offset
+        low = int(offsets[observed].min()) if observed.any() else self.fallback_offset
+        high = int((offsets + counts)[observed].max()) if observed.any() else self.fallback_offset
+        local = np.where(observed, offsets - low, offsets - self.fallback_offset + (high - low))
+        fuel = np.concatenate([self.fuel_samples[low:high], self.fuel_samples[self.fallback_offset:]])
+        pax = np.concatenate([self.pax_samples[low:high], self.pax_samples[self.fallback_offset:]])
+        return self.distance[start:end], local, counts, self.fuel_scale[start:end], observed, fuel, pax
+
+
+def _simulate_chunk(task):
+    """
+    Worker: simulate one block of routes for every scenario
+
+    Flights are drawn once per block and shared by the baseline and all
+    scenarios (common random numbers), so deltas reflect the aircraft change
+    rather than sampling noise. The seed depends only on the block, so the
+    baseline is identical across scenarios and requests with the same seed.
+    """
+    seed, chunk_index, iterations, (distance, offsets, counts, fuel_scale, observed, fuel_samples, pax_samples), plans = task
+    rng = np.random.default_rng([seed, chunk_index])
+
+    draws = (rng.random((len(distance), iterations), dtype=np.float32) * counts[:, None]).astype(np.int64)
+    index_fuel = offsets[:, None] + draws
+    # Observed routes take fuel and passengers from the same flight; routes on
+    # the shared network block draw passengers independently
+    index_pax = index_fuel
+    fallback = np.flatnonzero(~observed)
+    if fallback.size:
+        index_pax = index_fuel.copy()
+        extra = rng.random((fallback.size, iterations), dtype=np.float32) * counts[fallback, None]
+        index_pax[fallback] = offsets[fallback, None] + extra.astype(np.int64)
+
+    demand = pax_samples[index_pax]
+    baseline = fuel_samples[index_fuel]
+    baseline *= (fuel_scale * distance)[:, None]
+    payload_per_passenger = (PASSENGER_MASS_KG * PAYLOAD_BURN_PER_KG_KM * distance)[:, None]
+    baseline_total = baseline.sum(axis=0)
+
+    results = []
+    for ratio, seats, assigned in plans:
+        # Unassigned routes keep their observed flights unchanged
+        rows = np.flatnonzero(assigned)
+        carried = np.minimum(demand[rows], seats[rows, None])
+        fuel = baseline[rows] * ratio[rows, None] + (carried - demand[rows]) * payload_per_passenger[rows]
+        unchanged = baseline_total - baseline[rows].sum(axis=0)
+        results.append({
+            "baseline_fuel": baseline_total,
+            "fuel": unchanged + fuel.sum(axis=0),
+            "passengers": demand.sum(axis=0) - (demand[rows] - carried).sum(axis=0),
+            "spilled": (demand[rows] - carried).sum(axis=0),
+            "assigned_passengers": carried.sum(axis=0),
+            "route_mean_fuel": fuel.mean(axis=1),
+            "route_mean_baseline": baseline[rows].mean(axis=1),
+            "route_load_factor": (carried / seats[rows, None]).mean(axis=1)
+        })
+    return results
+
+
+def _distribution(values):
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {"mean": round(float(values.mean()), 2), "p5": round(float(p5), 2),
+            "p50": round(float(p50), 2), "p95": round(float(p95), 2)}
+
+
+class FleetSimulator:
+    """
+    What-if engine for flying routes with different aircraft from aircraft_config
+
+    The route's current aircraft is not recorded, so candidate burn is
+    scaled from the observed flights by burn_index(candidate) divided by the
+    burn index of `current_aircraft` (when an assignment names one) or of
+    the fleet median. Seat capacity caps passengers (spill), and carrying
+    fewer passengers saves payload fuel. Assignments beyond an aircraft's
+    max_range_km are rejected and the route keeps its current aircraft.
+    Scenarios are split into route blocks and simulated in a process pool.
+    """
+
+    def __init__(self, db, codes, refresh_interval=300.0, history_days=365, max_workers=None):
+        self.db = db
+        self.codes = codes
+        self.refresh_interval = refresh_interval
+        self.history_days = history_days
+        self.max_workers = max_workers or min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)
+        self.dataset = None
+        self.aircraft = []
+        self._pool = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # spawn: no inherited DB sockets or threads. Workers still re-import the
+            # launch script as __mp_main__; app1 skips create_app() there.
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def start_workers(self):
+        """Spawn the worker processes ahead of the first simulation"""
+        return len({future.result() for future in [self.pool.submit(os.getpid) for _ in range(self.max_workers)]})
+
+    def refresh(self, force=False):
+        """Reload aircraft configurations and per-route flight samples from every shard"""
+        if not force and self.dataset is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            aircraft = self.db.execute_query("""
+                SELECT config_id, aircraft_model, fuel_efficiency, seat_capacity, max_range_km
+                FROM aircraft_config
+                ORDER BY aircraft_model
+            """)
+            partials = self.db.scatter(lambda shard: self._load_shard(shard))
+            if aircraft is None or partials is None:
+                return False
+            routes = [route for shard_routes, _ in partials for route in shard_routes]
+            flights = [flight for _, shard_flights in partials for flight in shard_flights]
+            version = self.dataset.version + 1 if self.dataset else 1
+            self.aircraft = [a for a in aircraft if a['fuel_efficiency'] and a['seat_capacity']]
+            self.dataset = FleetDataset(routes, flights, version)
+            self._last_refresh = time.monotonic()
+        return True
+
+    def _load_shard(self, shard):
+        routes = self.db.execute_query("""
+            SELECT route_id, airline_id, distance_km, base_fuel_kg
+            FROM routes
+            ORDER BY route_id
+        """, shard=shard)
+        flights = self.db.execute_query("""
+            SELECT route_id, actual_fuel_kg, planned_fuel_kg, passengers_count
+            FROM flight_performance
+            WHERE flight_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        """, (self.history_days,), shard=shard)
+        if routes is None or flights is None:
+            return None
+        return routes, flights
+
+    def find_aircraft(self, ref):
+        """Aircraft config by config_id or (case-insensitive) model name"""
+        for aircraft in self.aircraft:
+            if str(aircraft['config_id']) == str(ref) or aircraft['aircraft_model'].lower() == str(ref).lower():
+                return aircraft
+        return None
+
+    def reference_index(self):
+        return float(np.median([burn_index(a) for a in self.aircraft]))
+
+    def plan(self, assignments):
+        """
+        Resolve assignments into per-route burn ratio and seat arrays
+        Each assignment: {"aircraft", optional "route_id" or "airline", optional "current_aircraft"};
+        without route_id/airline it applies to the whole network. Later entries win.
+        Raises ValueError for unknown aircraft, routes or airlines.
+        """
+        dataset = self.dataset
+        ratio = np.ones(len(dataset))
+        seats = np.full(len(dataset), np.inf)
+        assigned = np.zeros(len(dataset), dtype=bool)
+        infeasible = []
+        default_reference = self.reference_index()
+
+        for entry in assignments:
+            aircraft = self.find_aircraft(entry.get('aircraft'))
+            if aircraft is None:
+                raise ValueError(f"Unknown aircraft: {entry.get('aircraft')}")
+            reference = default_reference
+            if entry.get('current_aircraft') is not None:
+                current = self.find_aircraft(entry['current_aircraft'])
+                if current is None:
+                    raise ValueError(f"Unknown aircraft: {entry['current_aircraft']}")
+                reference = burn_index(current)
+
+            if entry.get('route_id') is not None:
+                position = dataset.position(int(entry['route_id']))
+                if position is None:
+                    raise ValueError(f"Unknown route: {entry['route_id']}")
+                mask = np.zeros(len(dataset), dtype=bool)
+                mask[position] = True
+            elif entry.get('airline'):
+                airline_id = self.codes.airline_id(entry['airline'])
+                if airline_id is None:
+                    raise ValueError(f"Unknown airline: {entry['airline']}")
+                mask = dataset.airlines == airline_id
+            else:
+                mask = np.ones(len(dataset), dtype=bool)
+
+            in_range = dataset.distance <= float(aircraft['max_range_km'] or np.inf)
+            infeasible.extend(dataset.route_ids[mask & ~in_range].tolist())
+            mask &= in_range
+            ratio[mask] = burn_index(aircraft) / reference
+            seats[mask] = int(aircraft['seat_capacity'])
+            assigned[mask] = True
+        return ratio, seats, assigned, sorted(set(infeasible) - set(dataset.route_ids[assigned].tolist()))
+
+    def simulate(self, scenarios, iterations=2000, fuel_price_per_kg=0.8, seed=42):
+        """
+        Run every scenario over the full network; returns one result per scenario
+        scenarios: [{"name", "assignments": [...]}]
+        """
+        dataset = self.dataset
+        started = time.perf_counter()
+        chunk = max(1, CHUNK_CELLS // iterations)
+        blocks = [(start, min(start + chunk, len(dataset))) for start in range(0, len(dataset), chunk)]
+
+        plans = [self.plan(scenario.get('assignments', [])) for scenario in scenarios]
+        futures = [
+            self.pool.submit(_simulate_chunk, (
+                seed, index, iterations, dataset.chunk(a, b),
+                [(ratio[a:b], seats[a:b], assigned[a:b]) for ratio, seats, assigned, _ in plans]
+            ))
+            for index, (a, b) in enumerate(blocks)
+        ]
+        chunk_results = [future.result() for future in futures]
+
+        results = []
+        for position, (scenario, (ratio, seats, assigned, infeasible)) in enumerate(zip(scenarios, plans)):
+            parts = [chunk_result[position] for chunk_result in chunk_results]
+            totals = {key: sum(part[key] for part in parts)
+                      for key in ("baseline_fuel", "fuel", "passengers", "spilled", "assigned_passengers")}
+            route_fuel = np.concatenate([part["route_mean_fuel"] for part in parts])
+            route_baseline = np.concatenate([part["route_mean_baseline"] for part in parts])
+            route_load = np.concatenate([part["route_load_factor"] for part in parts])
+            delta = totals["fuel"] - totals["baseline_fuel"]
+            seats_offered = float(seats[assigned].sum())
+
+            # Routes with the largest expected fuel change first
+            order = np.argsort(-np.abs(route_fuel - route_baseline))[:50]
+            assigned_ids = dataset.route_ids[assigned]
+            results.append({
+                "name": scenario.get('name') or f"scenario_{len(results) + 1}",
+                "routes_assigned": int(assigned.sum()),
+                "infeasible_routes": infeasible[:50],
+                "infeasible_count": len(infeasible),
+                "fuel_kg": _distribution(totals["fuel"]),
+                "baseline_fuel_kg": _distribution(totals["baseline_fuel"]),
+                "fuel_delta_kg": _distribution(delta),
+                "co2_kg": _distribution(totals["fuel"] * CO2_PER_KG_FUEL),
+                "co2_delta_kg": _distribution(delta * CO2_PER_KG_FUEL),
+                "fuel_cost": _distribution(totals["fuel"] * fuel_price_per_kg),
+                "fuel_cost_delta": _distribution(delta * fuel_price_per_kg),
+                "fuel_per_passenger_kg": _distribution(totals["fuel"] / np.maximum(totals["passengers"], 1)),
+                "spilled_passengers": _distribution(totals["spilled"]),
+                "assigned_load_factor": _distribution(totals["assigned_passengers"] / seats_offered)
+                if seats_offered else None,
+                "route_details": [{
+                    "route_id": int(assigned_ids[i]),
+                    "mean_fuel_kg": round(float(route_fuel[i]), 2),
+                    "mean_baseline_fuel_kg": round(float(route_baseline[i]), 2),
+                    "mean_load_factor": round(float(route_load[i]), 4)
+                } for i in order]
+            })
+        return results, (time.perf_counter() - started) * 1000
+
+    def stats(self):
+        dataset = self.dataset
+        return {
+            "version": dataset.version if dataset else 0,
+            "routes": len(dataset) if dataset else 0,
+            "routes_with_observations": dataset.observed_routes if dataset else 0,
+            "flight_samples": int(dataset.fuel_samples.size) if dataset else 0,
+            "aircraft": len(self.aircraft),
+            "workers": self.max_workers
+        }
@@ -0,0 +1,421 @@
+"""
+SkySQL Intelligence Forecasting
+Vectorized damped Holt-Winters forecasts of daily per-route metrics with confidence bands
+"""
+
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Forecastable daily series: (named query, column, kind). "sum" series count
+# a missing day as zero; "mean" series carry the last observed value forward.
+SERIES = {
+    "avg_efficiency": ("forecast_metrics_daily", "avg_efficiency", "mean"),
+    "on_time_performance": ("forecast_metrics_daily", "on_time_performance", "mean"),
+    "avg_passenger_load": ("forecast_metrics_daily", "avg_passenger_load", "mean"),
+    "total_flights": ("forecast_metrics_daily", "total_flights", "sum"),
+    "total_fuel_used_kg": ("forecast_metrics_daily", "total_fuel_used_kg", "sum"),
+    "flights": ("forecast_flights_daily", "flights", "sum"),
+    "fuel_kg": ("forecast_flights_daily", "fuel_kg", "sum"),
+    "efficiency_score": ("forecast_flights_daily", "efficiency_score", "mean"),
+}
+SHARDED_SOURCES = ("forecast_flights_daily",)
+
+# Smoothing parameter grid searched for every series at once
+ALPHAS = (0.1, 0.3, 0.5, 0.8)
+BETAS = (0.01, 0.1, 0.3)
+GAMMAS = (0.05, 0.2, 0.4)
+
+Z_80 = 1.2816
+Z_95 = 1.9600
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _smooth(Y, first_day, alpha, beta, gamma, level, trend, season, phi, period):
+    """
+    Run the additive damped Holt-Winters recursion (error-correction form)
+    over the columns of Y for every series at once
+
+    State arrays share a leading shape (parameter combinations x series);
+    season is updated in place and its slot is the day ordinal modulo the
+    period, so the weekly phase carries across incremental updates.
+    Returns the final level and trend and the sum of squared one-step errors.
+    """
+    sse = np.zeros_like(level)
+    for t in range(Y.shape[1]):
+        slot = (first_day + t) % period
+        seasonal = season[..., slot]
+        error = Y[:, t] - (level + phi * trend + seasonal)
+        sse += error * error
+        level = level + phi * trend + alpha * error
+        trend = phi * trend + alpha * beta * error
+        season[..., slot] = seasonal + gamma * error
+    return level, trend, sse
+
+
+class HoltWintersBank:
+    """
+    One damped additive Holt-Winters model per series, stored as arrays
+
+    fit() evaluates the whole smoothing parameter grid for all series in a
+    single vectorized pass and keeps the best combination per series;
+    advance() folds in new days with the chosen parameters, which costs one
+    vector step per day regardless of the history length.
+    """
+
+    def __init__(self, alpha, beta, gamma, level, trend, season, sse, observations, phi, period):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.level = level
+        self.trend = trend
+        self.season = season
+        self.sse = sse
+        self.observations = observations
+        self.phi = phi
+        self.period = period
+
+    @classmethod
+    def fit(cls, Y, first_day, phi=0.98, period=7):
+        count, days = Y.shape
+        seasonal = days >= 2 * period
+        gammas = GAMMAS if seasonal else (0.0,)
+        grid = np.array([(a, b, g) for a in ALPHAS for b in BETAS for g in gammas])
+        alpha, beta, gamma = (grid[:, i][:, None] for i in range(3))
+
+        head = min(days, period)
+        level0 = Y[:, :head].mean(axis=1)
+        trend0 = (Y[:, period:2 * period].mean(axis=1) - Y[:, :period].mean(axis=1)) / period \
+            if seasonal else np.zeros(count)
+        season0 = np.zeros((count, period))
+        if seasonal:
+            slots = (first_day + np.arange(period)) % period
+            season0[:, slots] = Y[:, :period] - level0[:, None]
+
+        combos = len(grid)
+        level = np.repeat(level0[None, :], combos, axis=0)
+        trend = np.repeat(trend0[None, :], combos, axis=0)
+        season = np.repeat(season0[None, :, :], combos, axis=0)
+        level, trend, sse = _smooth(Y, first_day, alpha, beta, gamma, level, trend, season, phi, period)
+
+        best = np.argmin(sse, axis=0)
+        series = np.arange(count)
+        return cls(grid[best, 0], grid[best, 1], grid[best, 2], level[best, series], trend[best, series],
+                   season[best, series], sse[best, series], np.full(count, days), phi, period)
+
+    def advance(self, Y, first_day):
+        """A new bank with the days in Y folded in (parameters unchanged)"""
+        season = self.season.copy()
+        level, trend, sse = _smooth(Y, first_day, self.alpha, self.beta, self.gamma,
+                                    self.level, self.trend, season, self.phi, self.period)
+        return HoltWintersBank(self.alpha, self.beta, self.gamma, level, trend, season,
+                               self.sse + sse, self.observations + Y.shape[1], self.phi, self.period)
+
+    def forecast(self, horizon, next_day):
+        """(mean, standard deviation), each series x horizon"""
+        steps = np.arange(1, horizon + 1)
+        damped = np.cumsum(self.phi ** steps)
+        slots = (next_day + steps - 1) % self.period
+        mean = self.level[:, None] + damped[None, :] * self.trend[:, None] + self.season[:, slots]
+
+        # h-step variance of the additive damped model: sigma^2 (1 + sum of c_j^2, j < h)
+        sigma2 = self.sse / np.maximum(self.observations - 3, 1)
+        lags = steps[:-1]
+        c = (self.alpha[:, None] * (1 + self.beta[:, None] * np.cumsum(self.phi ** lags)[None, :])
+             + self.gamma[:, None] * (lags % self.period == 0)[None, :])
+        spread = np.concatenate([np.zeros((len(sigma2), 1)), np.cumsum(c * c, axis=1)], axis=1)
+        return mean, np.sqrt(sigma2[:, None] * (1 + spread))
+
+
+class ForecastSet:
+    """Fitted models and precomputed forecasts of one metric for every route plus the network"""
+
+    __slots__ = ("metric", "route_ids", "index", "bank", "last_values", "fitted_through",
+                 "mean", "std", "observed_days")
+
+    def __init__(self, metric, route_ids, bank, last_values, fitted_through, observed_days, horizon):
+        self.metric = metric
+        self.route_ids = route_ids
+        # Row per route id; the last row is the network-wide series
+        self.index = {route_id: row for row, route_id in enumerate(route_ids)}
+        self.bank = bank
+        self.last_values = last_values
+        self.fitted_through = fitted_through
+        self.observed_days = observed_days
+        mean, std = bank.forecast(horizon, (fitted_through + timedelta(days=1)).toordinal())
+        self.mean = mean
+        self.std = std
+
+
+def _combine_days(rows):
+    """
+    One row per route and day from hot and archived forecast_flights_daily rows
+    A day can straddle both tiers when flights for it arrived after its month
+    was archived; counts and fuel add up and efficiency is flight-weighted.
+    """
+    combined = {}
+    for row in rows:
+        key = (row['route_id'], _as_date(row['day']))
+        current = combined.get(key)
+        if current is None:
+            combined[key] = dict(row, day=key[1])
+            continue
+        flights = current['flights'] + row['flights']
+        if row['efficiency_score'] is not None and current['efficiency_score'] is not None:
+            current['efficiency_score'] = (float(current['efficiency_score']) * current['flights']
+                                           + float(row['efficiency_score']) * row['flights']) / flights
+        elif current['efficiency_score'] is None:
+            current['efficiency_score'] = row['efficiency_score']
+        current['fuel_kg'] = float(current['fuel_kg']) + float(row['fuel_kg'])
+        current['flights'] = flights
+    return list(combined.values())
+
+
+def _dense(rows, column, kind, route_ids, start, days, last_values=None):
+    """
+    Routes x days matrix (plus a network row) from daily rows, with gaps filled
+    Returns (matrix, observed day count per row)
+    """
+    index = {route_id: row for row, route_id in enumerate(route_ids)}
+    Y = np.full((len(route_ids) + 1, days), np.nan)
+    for row in rows:
+        value = row[column]
+        offset = (_as_date(row['day']) - start).days
+        if value is not None and 0 <= offset < days and row['route_id'] in index:
+            Y[index[row['route_id']], offset] = float(value)
+
+    routes = Y[:-1]
+    observed = ~np.isnan(Y)
+    if kind == "sum":
+        Y[:-1] = np.where(observed[:-1], routes, 0.0)
+        Y[-1] = Y[:-1].sum(axis=0)
+        observed[-1] = observed[:-1].any(axis=0)
+        return Y, observed.sum(axis=1)
+
+    with np.errstate(invalid="ignore"):
+        counts = observed[:-1].sum(axis=0)
+        Y[-1] = np.where(counts > 0, np.nansum(routes, axis=0) / np.maximum(counts, 1), np.nan)
+    observed[-1] = counts > 0
+
+    # Carry the last observation forward; leading gaps take the previous
+    # fit's last value, or else the first observation
+    if last_values is not None:
+        Y = np.concatenate([last_values[:, None], Y], axis=1)
+    valid = ~np.isnan(Y)
+    positions = np.where(valid, np.arange(Y.shape[1])[None, :], 0)
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    Y = np.take_along_axis(Y, positions, axis=1)
+    first = np.argmax(valid, axis=1)
+    leading = np.isnan(Y)
+    Y = np.where(leading, Y[np.arange(len(Y)), first][:, None], Y)
+    if last_values is not None:
+        Y = Y[:, 1:]
+    return np.nan_to_num(Y), observed.sum(axis=1)
+
+
+class ForecastEngine:
+    """
+    Daily forecasts of operational_metrics and flight_performance series
+
+    A full fit loads `history_days` of daily per-route aggregates and selects
+    smoothing parameters for every route at once (see HoltWintersBank).
+    After that each new complete day is folded into the existing model
+    states incrementally; parameters are re-selected every `reselect_days`
+    or when new routes appear. Forecasts and confidence bands for the next
+    `horizon` days are precomputed per fit, so a request is a dictionary
+    lookup and an array slice. Stale models are refreshed on a background
+    thread while requests keep being answered from the previous fit.
+
+    Flights older than the hot window live in `cold_store` once archived
+    (see ColdArchiver); their daily aggregates are read from there too, so
+    an archive run does not turn the older part of the history into empty days.
+    """
+
+    def __init__(self, db, history_days=180, horizon=28, reselect_days=7, phi=0.98, period=7,
+                 min_observed_days=3, cold_store=None):
+        self.db = db
+        self.cold_store = cold_store
+        self.history_days = history_days
+        self.horizon = horizon
+        self.min_observed_days = min_observed_days
+        self.reselect_days = reselect_days
+        self.phi = phi
+        self.period = period
+        self._sets = {}
+        self._selected_on = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.full_fits = 0
+        self.incremental_updates = 0
+        self.failures = 0
+        self.last_fit_seconds = None
+
+    @property
+    def fitted_through(self):
+        return next(iter(self._sets.values())).fitted_through if self._sets else None
+
+    def _load(self, query, start, end):
+        params = {"start": start, "end": end}
+        if query not in SHARDED_SOURCES:
+            # operational_metrics lives on the primary shard
+            return self.db.execute_named(query, params)
+        partials = self.db.execute_partials(query, params)
+        if partials is None:
+            return None
+        rows = [row for rows in partials for row in rows]
+        cold_rows = self.cold_store.daily_route_rows(start, end) if self.cold_store is not None else []
+        return _combine_days(rows + cold_rows) if cold_rows else rows
+
+    def refresh(self, today=None):
+        """Bring every metric up to the last complete day; False if data could not be loaded"""
+        today = today or date.today()
+        with self._lock:
+            started = time.perf_counter()
+            full = (not self._sets or self._selected_on is None
+                    or (today - self._selected_on).days >= self.reselect_days)
+            if not full and self.fitted_through >= today - timedelta(days=1):
+                return True
+
+            if not full:
+                updated = self._advance(today)
+                if updated is None:
+                    self.failures += 1
+                    return False
+                if updated:
+                    self.incremental_updates += 1
+                    return True
+                # New routes since the last fit: parameters are selected again
+
+            start = today - timedelta(days=self.history_days)
+            loaded = {}
+            for query in {source for source, _, _ in SERIES.values()}:
+                loaded[query] = self._load(query, start, today)
+                if loaded[query] is None:
+                    self.failures += 1
+                    return False
+
+            sets = {}
+            for metric, (query, column, kind) in SERIES.items():
+                rows = [row for row in loaded[query] if row[column] is not None]
+                route_ids = sorted({row['route_id'] for row in rows}) + [None]
+                Y, observed = _dense(rows, column, kind, route_ids[:-1], start, self.history_days)
+                bank = HoltWintersBank.fit(Y, start.toordinal(), self.phi, self.period)
+                sets[metric] = ForecastSet(metric, route_ids, bank, Y[:, -1].copy(),
+                                           today - timedelta(days=1), observed, self.horizon)
+            self._sets = sets
+            self._selected_on = today
+            self.full_fits += 1
+            self.last_fit_seconds = round(time.perf_counter() - started, 3)
+            logger.info(f"Forecast models fitted for {len(sets)} metrics in {self.last_fit_seconds}s")
+            return True
+
+    def _advance(self, today):
+        """Fold the days since the last fit in; None on failure, False if a full fit is needed"""
+        start = self.fitted_through + timedelta(days=1)
+        days = (today - start).days
+        sets = {}
+        loaded = {}
+        for metric, (query, column, kind) in SERIES.items():
+            if query not in loaded:
+                loaded[query] = self._load(query, start, today)
+                if loaded[query] is None:
+                    return None
+            current = self._sets[metric]
+            rows = [row for row in loaded[query] if row[column] is not None]
+            if any(row['route_id'] not in current.index for row in rows):
+                return False
+            Y, observed = _dense(rows, column, kind, current.route_ids[:-1], start, days,
+                                 last_values=current.last_values if kind == "mean" else None)
+            bank = current.bank.advance(Y, start.toordinal())
+            sets[metric] = ForecastSet(metric, current.route_ids, bank, Y[:, -1].copy(),
+                                       today - timedelta(days=1), current.observed_days + observed, self.horizon)
+        self._sets = sets
+        return True
+
+    def ensure_fresh(self):
+        """
+        Fit synchronously if nothing is fitted yet; otherwise start a background
+        refresh when a new day is complete and answer from the current models
+        """
+        if not self._sets:
+            return self.refresh()
+        today = date.today()
+        stale = (self.fitted_through < today - timedelta(days=1)
+                 or (today - self._selected_on).days >= self.reselect_days)
+        if stale and not self._refreshing:
+            self._refreshing = True
+
+            def run():
+                try:
+                    self.refresh(today)
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"Background forecast refresh failed: {e}")
+                finally:
+                    self._refreshing = False
+
+            threading.Thread(target=run, name="forecast-refresh", daemon=True).start()
+        return True
+
+    def forecast(self, metric, route_id=None, horizon=14):
+        """
+        Precomputed forecast of one metric for a route (None = network)
+        Raises KeyError for an unknown metric or a route without history,
+        ValueError if the route has too few observed days to forecast
+        """
+        forecasts = self._sets[metric]
+        row = forecasts.index[route_id]
+        if forecasts.observed_days[row] < self.min_observed_days:
+            raise ValueError(f"Only {int(forecasts.observed_days[row])} observed days of {metric}; "
+                             f"at least {self.min_observed_days} are needed")
+        mean = forecasts.mean[row, :horizon]
+        std = forecasts.std[row, :horizon]
+        bank = forecasts.bank
+        first = forecasts.fitted_through + timedelta(days=1)
+        points = []
+        for step in range(len(mean)):
+            value, spread = float(mean[step]), float(std[step])
+            points.append({
+                "date": (first + timedelta(days=step)).isoformat(),
+                "forecast": round(max(value, 0.0), 4),
+                "lower_80": round(max(value - Z_80 * spread, 0.0), 4),
+                "upper_80": round(value + Z_80 * spread, 4),
+                "lower_95": round(max(value - Z_95 * spread, 0.0), 4),
+                "upper_95": round(value + Z_95 * spread, 4)
+            })
+        return {
+            "fitted_through": forecasts.fitted_through.isoformat(),
+            "observed_days": int(forecasts.observed_days[row]),
+            "model": {
+                "type": "additive damped Holt-Winters",
+                "alpha": float(bank.alpha[row]),
+                "beta": float(bank.beta[row]),
+                "gamma": float(bank.gamma[row]),
+                "phi": bank.phi,
+                "season_days": bank.period if bank.gamma[row] > 0 else None,
+                "residual_std": round(float(std[0]), 4) if len(std) else None
+            },
+            "data": points
+        }
+
+    def stats(self):
+        sets = self._sets
+        return {
+            "metrics": len(sets),
+            "routes": {metric: len(forecasts.route_ids) - 1 for metric, forecasts in sets.items()},
+            "fitted_through": self.fitted_through.isoformat() if sets else None,
+            "parameters_selected_on": self._selected_on.isoformat() if self._selected_on else None,
+            "full_fits": self.full_fits,
+            "incremental_updates": self.incremental_updates,
+            "failures": self.failures,
+            "last_fit_seconds": self.last_fit_seconds,
+            "refreshing": self._refreshing
+        }
@@ -0,0 +1,272 @@
+"""
+SkySQL Intelligence Airport Geospatial Index
+k-d tree over airport positions with vectorized great-circle distances
+"""
+
+import heapq
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def schema_statements(present_columns):
+    """ALTERs adding the coordinate columns missing from airports"""
+    return [
+        f"ALTER TABLE airports ADD COLUMN {column} DECIMAL(9, 6)"
+        for column in ("latitude", "longitude") if column not in present_columns
+    ]
+
+
+def unit_vectors(lat_deg, lon_deg):
+    """Points on the unit sphere (n x 3) for latitude/longitude arrays in degrees"""
+    lat = np.radians(np.asarray(lat_deg, dtype=float))
+    lon = np.radians(np.asarray(lon_deg, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km, element-wise over arrays (degrees)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """Great-circle course in degrees (0 = north, clockwise) leaving point 1 for point 2"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    x = np.sin(lon2 - lon1) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def _chord(km):
+    """Straight-line distance through the unit sphere for an arc length in km"""
+    return 2 * np.sin(np.minimum(km, np.pi * EARTH_RADIUS_KM) / (2 * EARTH_RADIUS_KM))
+
+
+def _arc_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0.0, 1.0))
+
+
+class AirportIndex:
+    """
+    Immutable spatial index over one airports snapshot
+
+    Airports are stored as unit vectors in a static k-d tree: straight-line
+    (chord) distance grows with great-circle distance, so nearest-neighbour
+    and radius searches in 3-D are exact on the sphere and need no special
+    cases at the poles or the antimeridian. Leaves hold up to LEAF_SIZE
+    airports and are scanned with one vectorized distance computation.
+    Bounding-box queries use a latitude-sorted order instead (binary search
+    on latitude, vectorized longitude filter).
+    """
+
+    LEAF_SIZE = 32
+
+    def __init__(self, airports):
+        rows = [a for a in airports if a.get('latitude') is not None and a.get('longitude') is not None]
+        self.airports = rows
+        self.lat = np.array([float(a['latitude']) for a in rows])
+        self.lon = np.array([float(a['longitude']) for a in rows])
+        self.points = unit_vectors(self.lat, self.lon) if rows else np.zeros((0, 3))
+        self.by_code = {a['iata_code']: i for i, a in enumerate(rows) if a.get('iata_code')}
+        self.by_id = {a['airport_id']: i for i, a in enumerate(rows)}
+        self.by_latitude = np.argsort(self.lat, kind="stable")
+        self.sorted_lat = self.lat[self.by_latitude]
+
+        # Node arrays: children (-1 for leaves), leaf ranges into self.order, bounding boxes
+        self.order = np.arange(len(rows))
+        self._left, self._right, self._start, self._end, self._lo, self._hi = [], [], [], [], [], []
+        if rows:
+            self._build(0, len(rows))
+        self._lo = np.array(self._lo)
+        self._hi = np.array(self._hi)
+
+    def __len__(self):
+        return len(self.airports)
+
+    def _build(self, start, end):
+        node = len(self._left)
+        members = self.order[start:end]
+        points = self.points[members]
+        self._left.append(-1)
+        self._right.append(-1)
+        self._start.append(start)
+        self._end.append(end)
+        self._lo.append(points.min(axis=0))
+        self._hi.append(points.max(axis=0))
+        if end - start > self.LEAF_SIZE:
+            axis = int(np.argmax(self._hi[node] - self._lo[node]))
+            middle = (end - start) // 2
+            self.order[start:end] = members[np.argpartition(points[:, axis], middle)]
+            self._left[node] = self._build(start, start + middle)
+            self._right[node] = self._build(start + middle, end)
+        return node
+
+    def _box_distance(self, node, point):
+        gap = np.maximum(np.maximum(self._lo[node] - point, 0.0), point - self._hi[node])
+        return float(np.sqrt(gap @ gap))
+
+    def nearest(self, lat, lon, k=1, exclude=None):
+        """[(airport index, km)] of the k nearest airports, closest first"""
+        if not len(self):
+            return []
+        point = unit_vectors(lat, lon)
+        best = []   # max-heap of (-chord, index)
+        frontier = [(0.0, 0)]
+        while frontier:
+            bound, node = heapq.heappop(frontier)
+            if len(best) == k and bound > -best[0][0]:
+                break
+            if self._left[node] == -1:
+                members = self.order[self._start[node]:self._end[node]]
+                chords = np.linalg.norm(self.points[members] - point, axis=1)
+                for index, chord in zip(members.tolist(), chords.tolist()):
+                    if index == exclude:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-chord, index))
+                    elif chord < -best[0][0]:
+                        heapq.heapreplace(best, (-chord, index))
+                continue
+            for child in (self._left[node], self._right[node]):
+                heapq.heappush(frontier, (self._box_distance(child, point), child))
+        ordered = sorted((-negative, index) for negative, index in best)
+        return [(index, float(_arc_km(chord))) for chord, index in ordered]
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """[(airport index, km)] within radius_km, closest first"""
+        if not len(self):
+            return []
+        point = unit_vectors(lat, lon)
+        reach = float(_chord(radius_km))
+        hits, chords = [], []
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if self._box_distance(node, point) > reach:
+                continue
+            if self._left[node] == -1:
+                members = self.order[self._start[node]:self._end[node]]
+                distances = np.linalg.norm(self.points[members] - point, axis=1)
+                inside = distances <= reach
+                hits.append(members[inside])
+                chords.append(distances[inside])
+            else:
+                stack.extend((self._left[node], self._right[node]))
+        if not hits:
+            return []
+        hits, chords = np.concatenate(hits), np.concatenate(chords)
+        ranked = np.argsort(chords, kind="stable")[:limit]
+        return list(zip(hits[ranked].tolist(), _arc_km(chords[ranked]).tolist()))
+
+    def in_box(self, min_lat, min_lon, max_lat, max_lon, limit=None):
+        """Airport indexes inside a latitude/longitude box (min_lon > max_lon crosses the antimeridian)"""
+        first = np.searchsorted(self.sorted_lat, min_lat, side="left")
+        last = np.searchsorted(self.sorted_lat, max_lat, side="right")
+        candidates = self.by_latitude[first:last]
+        lon = self.lon[candidates]
+        if min_lon <= max_lon:
+            inside = (lon >= min_lon) & (lon <= max_lon)
+        else:
+            inside = (lon >= min_lon) | (lon <= max_lon)
+        return candidates[inside][:limit].tolist()
+
+    def describe(self, index, distance_km=None):
+        airport = self.airports[index]
+        entry = {
+            "airport_id": airport.get('airport_id'),
+            "iata_code": airport.get('iata_code'),
+            "name": airport.get('name'),
+            "city": airport.get('city'),
+            "country": airport.get('country'),
+            "latitude": float(self.lat[index]),
+            "longitude": float(self.lon[index])
+        }
+        if distance_km is not None:
+            entry["distance_km"] = round(distance_km, 1)
+        return entry
+
+    def route_distances(self, routes):
+        """
+        Great-circle km for every route (rows with source_airport_id and dest_airport_id) at once
+        Returns (computed km array, NaN where an airport has no coordinates)
+        """
+        missing = len(self.lat)
+        source = np.array([self.by_id.get(r['source_airport_id'], missing) for r in routes], dtype=int)
+        dest = np.array([self.by_id.get(r['dest_airport_id'], missing) for r in routes], dtype=int)
+        lat = np.append(self.lat, np.nan)
+        lon = np.append(self.lon, np.nan)
+        return haversine_km(lat[source], lon[source], lat[dest], lon[dest])
+
+
+class GeoIndex:
+    """
+    The current AirportIndex, rebuilt from the airports table
+
+    Airports are reference data replicated to every shard, so the primary
+    shard's copy is indexed. Queries run against the snapshot without
+    locking; refresh() swaps a new one in every `refresh_interval` seconds.
+    """
+
+    def __init__(self, db, refresh_interval=300.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self.last_build_seconds = None
+        self.has_coordinates = None
+
+    def ensure_schema(self):
+        """Add latitude/longitude to airports on every shard if they are missing"""
+        for shard in self.db.shards:
+            columns = self.db.execute_query("""
+                SELECT COLUMN_NAME as column_name FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'airports'
+            """, shard=shard)
+            if columns is None:
+                return False
+            for statement in schema_statements({row['column_name'].lower() for row in columns}):
+                logger.info(f"Adding airport coordinates on shard {shard.name}")
+                if not self.db.execute_query(statement, fetch=False, shard=shard):
+                    return False
+        self.has_coordinates = True
+        return True
+
+    def refresh(self, force=False):
+        if not force and self.index is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            if not force and self.index is not None and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return True
+            if not self.has_coordinates and not self.ensure_schema():
+                return False
+            started = time.perf_counter()
+            airports = self.db.execute_query("""
+                SELECT airport_id, name, city, country, iata_code, latitude, longitude
+                FROM airports
+                WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """)
+            if airports is None:
+                return False
+            self.index = AirportIndex(airports)
+            self._last_refresh = time.monotonic()
+            self.last_build_seconds = round(time.perf_counter() - started, 3)
+            logger.info(f"Airport index built: {len(self.index)} airports in {self.last_build_seconds}s")
+        return True
+
+    def stats(self):
+        index = self.index
+        return {
+            "airports_indexed": len(index) if index is not None else 0,
+            "tree_nodes": len(index._left) if index is not None else 0,
+            "last_build_seconds": self.last_build_seconds
+        }
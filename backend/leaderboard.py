@@ -0,0 +1,342 @@
+"""
+SkySQL Intelligence Route Leaderboards
+Incrementally maintained best/worst routes per rolling window, airline and metric
+"""
+
+import heapq
+import threading
+import time
+from datetime import date, timedelta
+
+from watermark import IdWatermark
+
+WINDOWS = (7, 30, 90)
+
+# Leaderboard metrics and whether a higher value ranks better
+METRICS = {
+    "efficiency": True,      # average efficiency_score
+    "fuel_savings": True,    # kg of fuel saved in the window
+    "fuel_per_km": False     # kg of fuel burned per km flown
+}
+
+NETWORK = "network"
+
+# Per-route running totals
+FLIGHTS, EFFICIENCY_SUM, EFFICIENCY_COUNT, SAVINGS_SUM, FUEL_SUM, DISTANCE_SUM = range(6)
+
+
+class IndexedHeap:
+    """
+    Binary min-heap of (priority, key) addressable by key
+
+    set() inserts or re-prioritizes a key and remove() drops one, both in
+    O(log n); smallest(k) walks the heap best-first without popping, so
+    reading the k best entries costs O(k log k) whatever the heap's size.
+    """
+
+    __slots__ = ("_heap", "_position")
+
+    def __init__(self):
+        self._heap = []
+        self._position = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def set(self, key, priority):
+        position = self._position.get(key)
+        if position is None:
+            self._heap.append((priority, key))
+            self._position[key] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+            return
+        previous = self._heap[position][0]
+        self._heap[position] = (priority, key)
+        if priority < previous:
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+    def remove(self, key):
+        position = self._position.pop(key, None)
+        if position is None:
+            return
+        last = self._heap.pop()
+        if position < len(self._heap):
+            self._heap[position] = last
+            self._position[last[1]] = position
+            self._sift_down(self._sift_up(position))
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i][1]] = i
+        self._position[heap[j][1]] = j
+
+    def _sift_up(self, i):
+        heap = self._heap
+        while i > 0:
+            parent = (i - 1) >> 1
+            if heap[i] >= heap[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+        return i
+
+    def _sift_down(self, i):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and heap[child] < heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return i
+            self._swap(i, smallest)
+            i = smallest
+
+    def smallest(self, k):
+        """The k smallest (priority, key) entries in order"""
+        heap = self._heap
+        result = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(result) < k:
+            entry, i = heapq.heappop(frontier)
+            result.append(entry)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return result
+
+
+def metric_value(metric, totals):
+    """A route's leaderboard value from its window totals, or None if it has none"""
+    if metric == "efficiency":
+        return totals[EFFICIENCY_SUM] / totals[EFFICIENCY_COUNT] if totals[EFFICIENCY_COUNT] else None
+    if metric == "fuel_savings":
+        return totals[SAVINGS_SUM]
+    return totals[FUEL_SUM] / totals[DISTANCE_SUM] if totals[DISTANCE_SUM] else None
+
+
+class RouteLeaderboards:
+    """
+    Top-k and bottom-k routes by efficiency, fuel savings and fuel per km,
+    network-wide and per airline, over rolling 7, 30 and 90 day windows
+
+    Flights are folded in incrementally by a per-shard performance_id
+    watermark (see IdWatermark) into per-day, per-route totals; each window keeps running
+    per-route totals that arriving flights add to and days leaving the window
+    subtract from, so nothing is re-aggregated. Every (window, scope,
+    metric) has two addressable heaps over the eligible routes (best first
+    and worst first) that are re-keyed only for routes whose totals changed.
+    The first `k` entries of each board are materialized on first read after
+    a change, so a request is a slice of a ready list: O(k).
+
+    Airline scopes are airline_ids; entries are labelled with codes from
+    the code dictionary. Folding is insert-only, as for the distribution
+    sketches: an updated or deleted flight keeps its old contribution until
+    the next full rebuild, which runs in the background every
+    `rebuild_interval` seconds (None disables it) and swaps the reloaded
+    boards in.
+    """
+
+    # Rebuilt state, swapped in as a whole
+    _STATE = ("_days", "_totals", "_routes", "_heaps", "_boards", "_dirty", "_marks", "_today", "flights_folded")
+
+    def __init__(self, db, codes, k=100, min_flights=2, refresh_interval=30.0, batch_size=20000,
+                 rebuild_interval=3600.0):
+        self.db = db
+        self.codes = codes
+        self.k = k
+        self.min_flights = min_flights
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.rebuild_interval = rebuild_interval
+        self._days = {}                                    # day -> {route_id: totals}
+        self._totals = {window: {} for window in WINDOWS}  # window -> {route_id: totals}
+        self._routes = {}                                  # route_id -> (airline_id, label)
+        self._heaps = {}                                   # (window, scope, metric, side) -> IndexedHeap
+        self._boards = {}                                  # (window, scope, metric) -> {side: entries}
+        self._dirty = set()                                # (window, route_id) to re-key
+        self._marks = {}                                   # shard name -> IdWatermark over performance_id
+        self._today = None
+        self._last_refresh = 0.0
+        self._built_at = time.monotonic()
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self.flights_folded = 0
+        self.last_refresh_seconds = None
+        self.rebuilds = 0
+
+    def refresh(self, force=False):
+        """Fold newly inserted flights in and roll the windows forward to today"""
+        if self.rebuild_interval and not self._rebuilding \
+                and time.monotonic() - self._built_at >= self.rebuild_interval:
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild, name="leaderboard-rebuild", daemon=True).start()
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            started = time.perf_counter()
+            self._advance(date.today())
+            for shard in self.db.shards:
+                if not self._refresh_shard(shard):
+                    return False
+            self._apply()
+            self._last_refresh = time.monotonic()
+            self.last_refresh_seconds = round(time.perf_counter() - started, 3)
+        return True
+
+    def _rebuild(self):
+        """Reload the windows into fresh boards off the lock, then swap them in"""
+        try:
+            fresh = RouteLeaderboards(self.db, self.codes, k=self.k, min_flights=self.min_flights,
+                                      batch_size=self.batch_size, rebuild_interval=None)
+            if fresh.refresh(force=True):
+                with self._lock:
+                    # Flights folded here meanwhile are above fresh's marks and are read again
+                    for name in self._STATE:
+                        setattr(self, name, getattr(fresh, name))
+                    self.rebuilds += 1
+        finally:
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+
+    def _refresh_shard(self, shard):
+        mark = self._marks.setdefault(shard.name, IdWatermark())
+        # Flights dated before the windows are filtered out and count as gaps
+        # until they time out; that only costs re-reading a short id range
+        after = mark.after()
+        oldest = self._today - timedelta(days=max(WINDOWS) - 1)
+        while True:
+            rows = self.db.execute_named("leaderboard_flights", {
+                "after": after, "start": oldest, "limit": self.batch_size
+            }, shard=shard)
+            if rows is None:
+                return False
+            for row in rows:
+                if mark.accept(row['performance_id']):
+                    self._fold(row)
+            if rows:
+                after = rows[-1]['performance_id']
+            if len(rows) < self.batch_size:
+                return True
+
+    def _fold(self, row):
+        day, route_id = row['flight_date'], row['route_id']
+        if day is None or day < self._today - timedelta(days=max(WINDOWS) - 1):
+            return
+        if route_id not in self._routes:
+            self._routes[route_id] = (row['airline_id'], self.codes.route_name(row))
+        flight = [1, 0.0, 0, 0.0, 0.0, 0.0]
+        if row['efficiency_score'] is not None:
+            flight[EFFICIENCY_SUM], flight[EFFICIENCY_COUNT] = float(row['efficiency_score']), 1
+        if row['fuel_savings_kg'] is not None:
+            flight[SAVINGS_SUM] = float(row['fuel_savings_kg'])
+        if row['actual_fuel_kg'] is not None and row['distance_km']:
+            flight[FUEL_SUM], flight[DISTANCE_SUM] = float(row['actual_fuel_kg']), float(row['distance_km'])
+
+        self._add(self._days.setdefault(day, {}), route_id, flight, 1)
+        for window in WINDOWS:
+            if day > self._today - timedelta(days=window):
+                self._add(self._totals[window], route_id, flight, 1)
+                self._dirty.add((window, route_id))
+        self.flights_folded += 1
+
+    @staticmethod
+    def _add(table, route_id, values, sign):
+        totals = table.get(route_id)
+        if totals is None:
+            totals = table[route_id] = [0, 0.0, 0, 0.0, 0.0, 0.0]
+        for i, value in enumerate(values):
+            totals[i] += sign * value
+        if totals[FLIGHTS] <= 0:
+            del table[route_id]
+
+    def _advance(self, today):
+        """Subtract the days that left each window since the last refresh"""
+        previous, self._today = self._today, today
+        if previous is None or previous >= today:
+            return
+        for window in WINDOWS:
+            leaving = [day for day in self._days
+                       if previous - timedelta(days=window) < day <= today - timedelta(days=window)]
+            for day in leaving:
+                for route_id, totals in self._days[day].items():
+                    self._add(self._totals[window], route_id, totals, -1)
+                    self._dirty.add((window, route_id))
+        cutoff = today - timedelta(days=max(WINDOWS) - 1)
+        for day in [day for day in self._days if day < cutoff]:
+            del self._days[day]
+
+    def _heap(self, window, scope, metric, side):
+        key = (window, scope, metric, side)
+        heap = self._heaps.get(key)
+        if heap is None:
+            heap = self._heaps[key] = IndexedHeap()
+        return heap
+
+    def _apply(self):
+        """Re-key the heaps for every route whose window totals changed"""
+        for window, route_id in self._dirty:
+            totals = self._totals[window].get(route_id)
+            airline = self._routes[route_id][0]
+            for metric, higher_is_better in METRICS.items():
+                value = metric_value(metric, totals) \
+                    if totals is not None and totals[FLIGHTS] >= self.min_flights else None
+                for scope in (NETWORK, airline):
+                    self._boards.pop((window, scope, metric), None)
+                    for side in ("top", "bottom"):
+                        heap = self._heap(window, scope, metric, side)
+                        if value is None:
+                            heap.remove(route_id)
+                        else:
+                            # Both heaps are min-heaps: best first for "top", worst first for "bottom"
+                            best_first = -value if higher_is_better else value
+                            heap.set(route_id, (best_first if side == "top" else -best_first, route_id))
+        self._dirty.clear()
+
+    def _materialize(self, window, scope, metric):
+        board = {}
+        for side in ("top", "bottom"):
+            heap = self._heaps.get((window, scope, metric, side))
+            entries = []
+            for _, route_id in heap.smallest(self.k) if heap else ():
+                totals = self._totals[window][route_id]
+                airline, label = self._routes[route_id]
+                entries.append({
+                    "route_id": route_id,
+                    "route": label,
+                    "airline_code": self.codes.airline_code(airline),
+                    "value": round(metric_value(metric, totals), 4),
+                    "flights": totals[FLIGHTS]
+                })
+            board[side] = entries
+        self._boards[(window, scope, metric)] = board
+        return board
+
+    def board(self, metric, window, airline=None, k=10):
+        """{"top": [...], "bottom": [...]} with at most k ranked routes each; airline is an airline_id"""
+        scope = airline or NETWORK
+        with self._lock:
+            board = self._boards.get((window, scope, metric)) or self._materialize(window, scope, metric)
+            return {
+                side: [dict(entry, rank=rank) for rank, entry in enumerate(entries[:k], 1)]
+                for side, entries in board.items()
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "routes": len(self._routes),
+                "days_held": len(self._days),
+                "window_routes": {str(window): len(totals) for window, totals in self._totals.items()},
+                "heap_entries": sum(len(heap) for heap in self._heaps.values()),
+                "boards_materialized": len(self._boards),
+                "flights_folded": self.flights_folded,
+                "last_refresh_seconds": self.last_refresh_seconds,
+                "high_water_performance_id": {shard: mark.last_id for shard, mark in self._marks.items()},
+                "pending_gaps": sum(len(mark.gaps) for mark in self._marks.values()),
+                "rebuilds": self.rebuilds
+            }
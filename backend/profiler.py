@@ -0,0 +1,335 @@
+"""
+SkySQL Intelligence Profiler
+On-demand sampling profiler and tracemalloc allocation tracking per endpoint
+"""
+
+import inspect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    if filename.startswith(_BACKEND_DIR):
+        filename = os.path.relpath(filename, _BACKEND_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler for the request threads being profiled
+
+    A daemon thread wakes every `interval` seconds and records the current
+    stack of each registered thread only, so unprofiled requests pay nothing
+    and profiled ones pay a dictionary insert on entry and exit. Stacks are
+    kept as flamegraph.pl / speedscope "collapsed" lines:
+    endpoint;outer (file:line);...;inner (file:line) <samples>
+    """
+
+    def __init__(self, interval=0.005, max_stacks=20000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._targets = {}
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        # Each start gets a new sampler thread; older ones exit when they see a newer generation
+        self._generation = 0
+        self.running = False
+        self.samples = 0
+        self.dropped = 0
+
+    def start(self, interval=None):
+        with self._lock:
+            if interval is not None:
+                self.interval = interval
+            self._stacks.clear()
+            self.samples = 0
+            self.dropped = 0
+            self._generation += 1
+            self.running = True
+            generation = self._generation
+        threading.Thread(target=self._run, args=(generation,), name="sampling-profiler", daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            self._generation += 1
+            self.running = False
+
+    def enter(self, label):
+        self._targets[threading.get_ident()] = label
+
+    def leave(self):
+        self._targets.pop(threading.get_ident(), None)
+
+    def _run(self, generation):
+        own = threading.get_ident()
+        while self._generation == generation:
+            targets = dict(self._targets)
+            if targets:
+                frames = sys._current_frames()
+                with self._lock:
+                    for ident, label in targets.items():
+                        frame = frames.get(ident)
+                        if frame is None or ident == own:
+                            continue
+                        stack = []
+                        while frame is not None:
+                            stack.append(_frame_label(frame.f_code))
+                            frame = frame.f_back
+                        key = label + ";" + ";".join(reversed(stack))
+                        if key in self._stacks or len(self._stacks) < self.max_stacks:
+                            self._stacks[key] += 1
+                        else:
+                            self.dropped += 1
+                        self.samples += 1
+                del frames
+            time.sleep(self.interval)
+
+    def collapsed(self, label=None):
+        """Collapsed stack text, optionally for one endpoint label only"""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()
+                     if label is None or stack.split(";", 1)[0] == label]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def stats(self):
+        with self._lock:
+            per_label = Counter()
+            for stack, count in self._stacks.items():
+                per_label[stack.split(";", 1)[0]] += count
+            return {
+                "running": self.running,
+                "interval_ms": round(self.interval * 1000, 3),
+                "samples": self.samples,
+                "distinct_stacks": len(self._stacks),
+                "dropped_samples": self.dropped,
+                "samples_by_endpoint": dict(per_label),
+                "profiled_threads": len(self._targets)
+            }
+
+
+class AllocationTracker:
+    """
+    tracemalloc-based allocation accounting per request handler
+
+    While active, every profiled request records how much traced memory it
+    added and the peak it reached (exact for a lone request, approximate when
+    profiled requests overlap, since tracemalloc counters are process-wide).
+    top() groups live allocations by source line or by the view function on
+    their traceback, compared with the baseline taken at start.
+    """
+
+    def __init__(self, nframes=64):
+        self.nframes = nframes
+        self._baseline = None
+        self._started_here = False
+        self._lock = threading.Lock()
+        self._active_requests = 0
+        self._per_endpoint = defaultdict(lambda: {"requests": 0, "overlapped": 0,
+                                                  "net_bytes": 0, "max_peak_bytes": 0})
+
+    @property
+    def active(self):
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+            self._started_here = True
+        with self._lock:
+            self._per_endpoint.clear()
+        self._baseline = tracemalloc.take_snapshot()
+
+    def stop(self):
+        if self._started_here and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_here = False
+        self._baseline = None
+
+    def request_started(self):
+        """Returns a token for request_finished"""
+        if not tracemalloc.is_tracing():
+            return None
+        with self._lock:
+            self._active_requests += 1
+            overlapped = self._active_requests > 1
+            if not overlapped:
+                tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        return current, overlapped
+
+    def request_finished(self, label, token):
+        if token is None:
+            return
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._active_requests -= 1
+            if not tracing:
+                return
+            started, overlapped = token
+            overlapped = overlapped or self._active_requests > 0
+            entry = self._per_endpoint[label]
+            entry["requests"] += 1
+            entry["overlapped"] += int(overlapped)
+            entry["net_bytes"] += current - started
+            entry["max_peak_bytes"] = max(entry["max_peak_bytes"], peak - started)
+
+    def per_endpoint(self):
+        with self._lock:
+            return {
+                label: {
+                    "requests": entry["requests"],
+                    "overlapped_requests": entry["overlapped"],
+                    "avg_net_kb": round(entry["net_bytes"] / entry["requests"] / 1024, 2),
+                    "max_peak_kb": round(entry["max_peak_bytes"] / 1024, 2)
+                }
+                for label, entry in self._per_endpoint.items() if entry["requests"]
+            }
+
+    def top(self, view_functions, group_by="handler", limit=20):
+        """Largest allocation growth since start, by 'handler' or 'line'"""
+        if not tracemalloc.is_tracing() or self._baseline is None:
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        if group_by == "line":
+            stats = snapshot.compare_to(self._baseline, "lineno")
+            return [{
+                "location": f"{os.path.relpath(stat.traceback[0].filename, _BACKEND_DIR)}:{stat.traceback[0].lineno}"
+                if stat.traceback[0].filename.startswith(_BACKEND_DIR)
+                else f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_kb": round(stat.size / 1024, 2),
+                "size_diff_kb": round(stat.size_diff / 1024, 2),
+                "count_diff": stat.count_diff
+            } for stat in stats[:limit]]
+
+        # Attribute each live block to the innermost view function on its traceback
+        ranges = _view_ranges(view_functions)
+        baseline = {trace.traceback: trace.size for trace in self._baseline.traces}
+        totals = defaultdict(lambda: {"size": 0, "blocks": 0})
+        for trace in snapshot.traces:
+            if trace.traceback in baseline:
+                continue
+            handler = "(outside handlers)"
+            for frame in trace.traceback:
+                found = ranges.get(frame.filename)
+                if found:
+                    name = next((name for first, last, name in found if first <= frame.lineno <= last), None)
+                    if name:
+                        handler = name
+                        break
+            totals[handler]["size"] += trace.size
+            totals[handler]["blocks"] += 1
+        ranked = sorted(totals.items(), key=lambda item: item[1]["size"], reverse=True)
+        return [{"handler": handler, "size_kb": round(entry["size"] / 1024, 2), "blocks": entry["blocks"]}
+                for handler, entry in ranked[:limit]]
+
+
+def _view_ranges(view_functions):
+    """filename -> [(first line, last line, endpoint)] for the undecorated view functions"""
+    ranges = defaultdict(list)
+    for endpoint, view in view_functions.items():
+        func = inspect.unwrap(view)
+        try:
+            lines, first = inspect.getsourcelines(func)
+        except (OSError, TypeError):
+            continue
+        ranges[func.__code__.co_filename].append((first, first + len(lines) - 1, endpoint))
+    return ranges
+
+
+class ProfilingSession:
+    """
+    What to profile and for how long
+
+    endpoints: Flask endpoint names or URL rules to profile (empty = all);
+    sample_rate: fraction of matching requests profiled; the session ends
+    by itself after `duration` seconds.
+    """
+
+    def __init__(self):
+        self.sampler = SamplingProfiler()
+        self.allocations = AllocationTracker()
+        self._lock = threading.Lock()
+        self.endpoints = frozenset()
+        self.sample_rate = 0.0
+        self.expires_at = None
+        self.started_at = None
+        self.track_allocations = False
+        self.profiled_requests = 0
+
+    @property
+    def active(self):
+        return self.expires_at is not None and time.monotonic() < self.expires_at
+
+    def start(self, endpoints=(), sample_rate=1.0, duration=60.0, interval=0.005, track_allocations=False):
+        with self._lock:
+            self.endpoints = frozenset(endpoints)
+            self.sample_rate = sample_rate
+            self.track_allocations = track_allocations
+            self.started_at = time.time()
+            self.expires_at = time.monotonic() + duration
+            self.profiled_requests = 0
+        self.sampler.start(interval)
+        if track_allocations:
+            self.allocations.start()
+        logger.info(f"Profiling started: endpoints={sorted(self.endpoints) or 'all'} "
+                    f"sample_rate={sample_rate} duration={duration}s allocations={track_allocations}")
+
+    def stop(self):
+        with self._lock:
+            self.expires_at = None
+        self.sampler.stop()
+        self.allocations.stop()
+        logger.info("Profiling stopped")
+
+    def wants(self, endpoint, rule):
+        """Whether to profile a request to this endpoint (also expires the session)"""
+        if self.expires_at is None:
+            return False
+        if not self.active:
+            self.stop()
+            return False
+        if self.endpoints and endpoint not in self.endpoints and rule not in self.endpoints:
+            return False
+        return random.random() < self.sample_rate
+
+    def request_started(self, label):
+        with self._lock:
+            self.profiled_requests += 1
+        self.sampler.enter(label)
+        return self.allocations.request_started() if self.track_allocations else None
+
+    def request_finished(self, label, token):
+        self.sampler.leave()
+        self.allocations.request_finished(label, token)
+
+    def status(self):
+        return {
+            "active": self.active,
+            "endpoints": sorted(self.endpoints) or "all",
+            "sample_rate": self.sample_rate,
+            "started_at": self.started_at,
+            "remaining_seconds": round(max(self.expires_at - time.monotonic(), 0), 1) if self.expires_at else 0,
+            "profiled_requests": self.profiled_requests,
+            "sampler": self.sampler.stats(),
+            "allocations": {
+                "tracking": self.allocations.active,
+                "per_endpoint": self.allocations.per_endpoint()
+            }
+        }
@@ -0,0 +1,285 @@
+"""
+SkySQL Intelligence Named Query Registry
+Parameterized analytics SQL executed as cached server-side prepared statements
+"""
+
+import re
+
+_NAMED_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+class NamedQuery:
+    """
+    A registered SQL statement with named parameters
+
+    The SQL is written with %(name)s placeholders and compiled once to
+    positional %s placeholders, so the statement text stays byte-identical
+    between executions and can be re-used as a prepared statement. Optional
+    filters use the `(%(x)s IS NULL OR col = %(x)s)` form to keep a single
+    statement per query instead of one per filter combination.
+    """
+
+    __slots__ = ("name", "sql", "param_order", "defaults", "description")
+
+    def __init__(self, name, sql, defaults=None, description=""):
+        self.name = name
+        self.param_order = tuple(_NAMED_PARAM.findall(sql))
+        self.sql = _NAMED_PARAM.sub("%s", sql)
+        self.defaults = defaults or {}
+        self.description = description
+
+    def bind(self, params=None):
+        """Positional parameter tuple for the given named parameters"""
+        values = dict(self.defaults)
+        values.update(params or {})
+        missing = [p for p in self.param_order if p not in values]
+        if missing:
+            raise KeyError(f"Query '{self.name}' missing parameters: {', '.join(sorted(set(missing)))}")
+        return tuple(values[p] for p in self.param_order)
+
+
+class QueryRegistry:
+    """Name -> NamedQuery lookup shared by the API and benchmarks"""
+
+    def __init__(self):
+        self._queries = {}
+
+    def register(self, name, sql, defaults=None, description=""):
+        if name in self._queries:
+            raise ValueError(f"Query '{name}' already registered")
+        query = NamedQuery(name, sql, defaults, description)
+        self._queries[name] = query
+        return query
+
+    def get(self, name):
+        return self._queries[name]
+
+    def names(self):
+        return sorted(self._queries)
+
+    def __iter__(self):
+        return iter(self._queries.values())
+
+
+QUERIES = QueryRegistry()
+
+QUERIES.register("efficiency_analytics", """
+    SELECT
+        r.route_id,
+        r.airline_id,
+        r.source_airport_id,
+        r.dest_airport_id,
+        COUNT(fp.performance_id) as total_flights,
+        AVG(fp.efficiency_score) as avg_efficiency,
+        AVG(fp.actual_fuel_kg / r.distance_km) as fuel_per_km,
+        AVG(fp.passengers_count) as avg_passengers,
+        COALESCE(SUM(fp.fuel_savings_kg), 0) as total_fuel_saved
+    FROM flight_performance fp
+    JOIN routes r ON fp.route_id = r.route_id
+    WHERE fp.flight_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY)
+      AND (%(airline_id)s IS NULL OR r.airline_id = %(airline_id)s)
+      AND (%(route_id)s IS NULL OR r.route_id = %(route_id)s)
+    GROUP BY r.route_id, r.airline_id, r.source_airport_id, r.dest_airport_id
+    HAVING total_flights >= %(min_flights)s
+    ORDER BY avg_efficiency DESC
+    LIMIT %(limit)s
+""", defaults={"days": 90, "airline_id": None, "route_id": None, "min_flights": 1, "limit": 500},
+    description="Per-route efficiency over a rolling window")
+
+QUERIES.register("efficiency_report", """
+    SELECT
+        r.route_id,
+        r.source_airport_id,
+        r.dest_airport_id,
+        AVG(fp.efficiency_score) as avg_efficiency,
+        COUNT(fp.performance_id) as flights_analyzed,
+        AVG(fp.actual_fuel_kg) as avg_fuel_used,
+        AVG(fp.passengers_count) as avg_passengers
+    FROM routes r
+    LEFT JOIN flight_performance fp ON r.route_id = fp.route_id
+        AND (%(days)s IS NULL OR fp.flight_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY))
+    WHERE (%(airline_id)s IS NULL OR r.airline_id = %(airline_id)s)
+      AND (%(route_id)s IS NULL OR r.route_id = %(route_id)s)
+    GROUP BY r.route_id, r.source_airport_id, r.dest_airport_id
+    HAVING flights_analyzed >= %(min_flights)s
+    ORDER BY avg_efficiency DESC
+    LIMIT %(limit)s
+""", defaults={"days": None, "airline_id": None, "route_id": None, "min_flights": 1, "limit": 500},
+    description="Per-route efficiency report, all time unless a window is given")
+
+QUERIES.register("metrics_daily", """
+    SELECT
+        metric_id,
+        metric_date,
+        total_flights,
+        avg_efficiency,
+        total_fuel_used_kg,
+        total_fuel_saved_kg,
+        avg_passenger_load,
+        on_time_performance
+    FROM operational_metrics
+    WHERE metric_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY)
+      AND (%(airline_id)s IS NULL OR airline_id = %(airline_id)s)
+      AND (%(route_id)s IS NULL OR route_id = %(route_id)s)
+    ORDER BY metric_date DESC
+    LIMIT %(limit)s
+""", defaults={"days": 7, "airline_id": None, "route_id": None, "limit": 7},
+    description="Most recent operational metric rows")
+
+QUERIES.register("metrics_summary", """
+    SELECT
+        COUNT(DISTINCT route_id) as active_routes,
+        COUNT(DISTINCT airline_id) as active_airlines,
+        AVG(avg_efficiency) as overall_efficiency,
+        COALESCE(SUM(total_fuel_saved_kg), 0) as total_fuel_savings,
+        COALESCE(SUM(total_flights), 0) as total_flights,
+        COUNT(*) as metric_rows
+    FROM operational_metrics
+    WHERE metric_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY)
+      AND (%(airline_id)s IS NULL OR airline_id = %(airline_id)s)
+      AND (%(route_id)s IS NULL OR route_id = %(route_id)s)
+""", defaults={"days": 30, "airline_id": None, "route_id": None},
+    description="Operational metrics summary over a rolling window")
+
+QUERIES.register("dashboard_savings", """
+    SELECT COALESCE(SUM(total_fuel_saved_kg), 0) as savings
+    FROM operational_metrics
+    WHERE metric_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY)
+""", defaults={"days": 30},
+    description="Fuel saved across the network over a rolling window")
+
+QUERIES.register("route_details", """
+    SELECT r.*, a.name as airline_name
+    FROM routes r
+    LEFT JOIN airlines a ON r.airline_id = a.airline_id
+    WHERE r.route_id = %(route_id)s
+""", description="Single route with airline name")
+
+QUERIES.register("route_performance", """
+    SELECT
+        efficiency_score,
+        actual_fuel_kg,
+        planned_fuel_kg,
+        flight_date,
+        passengers_count
+    FROM flight_performance
+    WHERE route_id = %(route_id)s
+      AND (%(until)s IS NULL OR flight_date <= %(until)s)
+    ORDER BY flight_date DESC
+    LIMIT %(limit)s
+""", defaults={"limit": 10, "until": None},
+    description="Most recent flights on a route, optionally up to a date")
+
+# Partial aggregates: sums and counts only, so results from several shards
+# (or hot and cold storage) can be merged exactly before averages are taken
+QUERIES.register("efficiency_totals", """
+    SELECT
+        COUNT(fp.performance_id) as flights,
+        COALESCE(SUM(fp.efficiency_score), 0) as efficiency_sum,
+        COALESCE(SUM(fp.fuel_savings_kg), 0) as fuel_saved_sum,
+        COALESCE(SUM(fp.actual_fuel_kg), 0) as fuel_used_sum,
+        COALESCE(SUM(r.distance_km), 0) as distance_sum
+    FROM flight_performance fp
+    JOIN routes r ON fp.route_id = r.route_id
+    WHERE fp.flight_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY)
+      AND (%(airline_id)s IS NULL OR r.airline_id = %(airline_id)s)
+      AND (%(route_id)s IS NULL OR r.route_id = %(route_id)s)
+""", defaults={"days": 90, "airline_id": None, "route_id": None},
+    description="Network-wide efficiency partial aggregates")
+
+QUERIES.register("route_fuel_totals", """
+    SELECT COALESCE(SUM(base_fuel_kg), 0) as total_base_fuel
+    FROM routes
+""", description="Planned base fuel over all routes of one shard")
+
+QUERIES.register("route_partials", """
+    SELECT
+        r.route_id,
+        r.airline_id,
+        r.source_airport_id,
+        r.dest_airport_id,
+        r.distance_km,
+        COUNT(fp.performance_id) as flights,
+        COALESCE(SUM(fp.efficiency_score), 0) as efficiency_sum,
+        COALESCE(SUM(fp.actual_fuel_kg / r.distance_km), 0) as fuel_per_km_sum,
+        COALESCE(SUM(fp.passengers_count), 0) as passengers_sum,
+        COALESCE(SUM(fp.fuel_savings_kg), 0) as fuel_saved_sum,
+        COALESCE(SUM(fp.actual_fuel_kg), 0) as fuel_used_sum
+    FROM routes r
+    LEFT JOIN flight_performance fp ON r.route_id = fp.route_id
+        AND (%(start)s IS NULL OR fp.flight_date >= %(start)s)
+    WHERE (%(airline_id)s IS NULL OR r.airline_id = %(airline_id)s)
+      AND (%(route_id)s IS NULL OR r.route_id = %(route_id)s)
+    GROUP BY r.route_id, r.airline_id, r.source_airport_id, r.dest_airport_id, r.distance_km
+""", defaults={"start": None, "airline_id": None, "route_id": None},
+    description="Per-route hot-tier partial aggregates, merged with archived cold files")
+
+# Daily per-route series for the forecasting models; end is exclusive so
+# only complete days are returned
+QUERIES.register("forecast_metrics_daily", """
+    SELECT
+        route_id,
+        metric_date as day,
+        COALESCE(SUM(total_flights), 0) as total_flights,
+        AVG(avg_efficiency) as avg_efficiency,
+        COALESCE(SUM(total_fuel_used_kg), 0) as total_fuel_used_kg,
+        AVG(avg_passenger_load) as avg_passenger_load,
+        AVG(on_time_performance) as on_time_performance
+    FROM operational_metrics
+    WHERE route_id IS NOT NULL
+      AND metric_date >= %(start)s AND metric_date < %(end)s
+    GROUP BY route_id, metric_date
+""", description="Daily operational metrics per route for forecasting")
+
+QUERIES.register("forecast_flights_daily", """
+    SELECT
+        route_id,
+        flight_date as day,
+        COUNT(*) as flights,
+        COALESCE(SUM(actual_fuel_kg), 0) as fuel_kg,
+        AVG(efficiency_score) as efficiency_score
+    FROM flight_performance
+    WHERE route_id IS NOT NULL
+      AND flight_date >= %(start)s AND flight_date < %(end)s
+    GROUP BY route_id, flight_date
+""", description="Daily flight performance per route for forecasting")
+
+QUERIES.register("headwind_efficiency", """
+    SELECT
+        FLOOR(fw.headwind_kmh / 10) * 10 as headwind_band,
+        COUNT(*) as flights,
+        COALESCE(SUM(fp.efficiency_score), 0) as efficiency_sum,
+        COUNT(fp.efficiency_score) as efficiency_count,
+        COALESCE(SUM(fp.actual_fuel_kg), 0) as fuel_used_sum,
+        COALESCE(SUM(fp.planned_fuel_kg), 0) as fuel_planned_sum,
+        COALESCE(SUM(fw.precipitation_mm), 0) as precipitation_sum
+    FROM flight_weather fw
+    JOIN flight_performance fp ON fp.performance_id = fw.performance_id
+    JOIN routes r ON fp.route_id = r.route_id
+    WHERE fw.headwind_kmh IS NOT NULL
+      AND fp.flight_date >= DATE_SUB(CURDATE(), INTERVAL %(days)s DAY)
+      AND (%(airline_id)s IS NULL OR r.airline_id = %(airline_id)s)
+    GROUP BY headwind_band
+""", defaults={"days": 90, "airline_id": None},
+    description="Per-shard flight efficiency partials by 10 km/h headwind band")
+
+QUERIES.register("leaderboard_flights", """
+    SELECT
+        fp.performance_id,
+        fp.route_id,
+        r.airline_id,
+        r.source_airport_id,
+        r.dest_airport_id,
+        r.distance_km,
+        fp.flight_date,
+        fp.efficiency_score,
+        fp.fuel_savings_kg,
+        fp.actual_fuel_kg
+    FROM flight_performance fp
+    JOIN routes r ON fp.route_id = r.route_id
+    WHERE fp.performance_id > %(after)s
+      AND fp.flight_date >= %(start)s
+    ORDER BY fp.performance_id
+    LIMIT %(limit)s
+""", defaults={"after": 0, "limit": 20000},
+    description="Flights after a performance_id high-water mark, for the incremental leaderboards")
@@ -0,0 +1,420 @@
+"""
+SkySQL Intelligence Route Network Graph
+In-memory airport graph with fuel/distance shortest paths, alternatives and memoized answers
+"""
+
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from watermark import IdWatermark
+
+
+class GraphSnapshot:
+    """
+    Immutable adjacency built from the route table at one version
+
+    Each airport pair keeps only its cheapest route per metric, since a
+    shortest path never uses a dearer parallel route. Queries run against a
+    snapshot without locking; refresh swaps in a new one.
+    """
+
+    def __init__(self, version, routes, fuel):
+        self.version = version
+        self.adjacency = {"fuel": {}, "distance": {}}
+        self.reverse = {"fuel": {}, "distance": {}}
+        self.routes = routes
+        airports = set()
+        for route_id, (airline, source, dest, distance, base_fuel) in routes.items():
+            airports.add(source)
+            airports.add(dest)
+            observed = fuel.get(route_id)
+            weights = {
+                "fuel": observed[0] / observed[1] if observed and observed[1] else float(base_fuel),
+                "distance": float(distance)
+            }
+            for metric, weight in weights.items():
+                edges = self.adjacency[metric].setdefault(source, {})
+                best = edges.get(dest)
+                if best is None or weight < best[0] or (weight == best[0] and route_id < best[1]):
+                    edges[dest] = (weight, route_id)
+                    self.reverse[metric].setdefault(dest, {})[source] = (weight, route_id)
+        self.airports = airports
+        self.fuel = {route_id: (values[0] / values[1]) for route_id, values in fuel.items() if values[1]}
+        self.landmarks = {"fuel": {}, "distance": {}}   # metric -> hub -> (from_hub, to_hub, prev)
+        self.landmark_vectors = {}                      # metric -> (node -> from-hub tuple, node -> to-hub tuple)
+
+    def index_landmarks(self, metric):
+        """Per-node tuples of hub distances, so the A* heuristic is one pass over tuples"""
+        trees = list(self.landmarks[metric].values())
+        self.landmark_vectors[metric] = (
+            {node: tuple(from_hub.get(node, math.inf) for from_hub, _, _ in trees) for node in self.airports},
+            {node: tuple(to_hub.get(node, math.inf) for _, to_hub, _ in trees) for node in self.airports}
+        )
+
+    def degree(self, airport):
+        return len(self.adjacency["distance"].get(airport, ())) + len(self.reverse["distance"].get(airport, ()))
+
+    def edge_fuel(self, route_id):
+        return self.fuel.get(route_id, float(self.routes[route_id][4]))
+
+
+def dijkstra(adjacency, source, target=None, heuristic=None, banned_nodes=(), banned_edges=(), bound=math.inf):
+    """
+    Dijkstra (A* when a heuristic is given) from source
+    Returns (dist, prev) where prev[node] = (previous node, route_id). Stops
+    as soon as the target is settled. Nodes whose lower-bound estimate exceeds
+    `bound` (the cost of a known path) are never queued.
+    """
+    dist = {source: 0.0}
+    prev = {}
+    settled = set()
+    heap = [(heuristic(source) if heuristic else 0.0, 0.0, source)]
+    while heap:
+        _, cost, node = heapq.heappop(heap)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node == target:
+            break
+        for neighbour, (weight, route_id) in adjacency.get(node, {}).items():
+            if neighbour in settled or neighbour in banned_nodes or (node, neighbour) in banned_edges:
+                continue
+            candidate = cost + weight
+            if candidate < dist.get(neighbour, math.inf):
+                dist[neighbour] = candidate
+                prev[neighbour] = (node, route_id)
+                estimate = candidate + heuristic(neighbour) if heuristic else candidate
+                if estimate > bound:
+                    continue
+                heapq.heappush(heap, (estimate, candidate, neighbour))
+    return dist, prev
+
+
+def _walk(prev, source, target):
+    """Node and route_id lists of the path ending at target, or None if unreachable"""
+    if source == target:
+        return [source], []
+    if target not in prev:
+        return None
+    nodes, route_ids = [target], []
+    while nodes[-1] != source:
+        node, route_id = prev[nodes[-1]]
+        nodes.append(node)
+        route_ids.append(route_id)
+    return nodes[::-1], route_ids[::-1]
+
+
+class RouteGraph:
+    """
+    Airport network built from routes (distance_km, base_fuel_kg) and observed fuel
+
+    Refresh is incremental: a per-shard checksum of the route table tells
+    whether routes were only appended (fetch route_id above the high-water
+    mark) or changed (reload that shard), and observed fuel per route is
+    folded in with a performance_id watermark like the sketch store.
+    Path answers are memoized per graph version. Hub airports can have
+    single-source trees precomputed in both directions; those answer
+    queries from a hub directly and serve as ALT landmarks, turning every
+    other query into A* with a landmark lower bound.
+    """
+
+    METRICS = ("fuel", "distance")
+    MAX_ALTERNATIVES = 5
+
+    _ROUTE_CHECKSUM = ("CRC32(CONCAT_WS(',', route_id, airline_id, source_airport_id, dest_airport_id, "
+                       "distance_km, base_fuel_kg))")
+
+    def __init__(self, db, codes, refresh_interval=30.0, cache_size=4096, hubs=None, hub_count=0,
+                 batch_size=20000):
+        self.db = db
+        self.codes = codes
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.configured_hubs = [code.upper() for code in hubs] if hubs else None
+        self.hub_count = hub_count
+        self.hubs = []
+        self._routes = {}            # route_id -> (airline, source, dest, distance_km, base_fuel_kg)
+        self._route_shard = {}       # route_id -> shard name
+        self._fuel = {}              # route_id -> [fuel sum, flights]
+        self._route_marks = {}       # shard name -> (max route_id, checksum)
+        self._fuel_marks = {}        # shard name -> IdWatermark over performance_id
+        self._snapshot = GraphSnapshot(0, {}, {})
+        self._memo = OrderedDict()
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.last_build_ms = 0.0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._memo_lock = threading.Lock()
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def refresh(self, force=False):
+        """Pick up route and flight changes; rebuilds the snapshot only if something changed"""
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            changed = False
+            for shard in self.db.shards.names():
+                routes_changed = self._refresh_routes(shard)
+                fuel_changed = self._refresh_fuel(shard)
+                if routes_changed is None or fuel_changed is None:
+                    return False
+                changed = changed or routes_changed or fuel_changed
+            if changed or not self._snapshot.version:
+                self._rebuild()
+            self._last_refresh = time.monotonic()
+        return True
+
+    def _refresh_routes(self, shard):
+        max_id, checksum = self._route_marks.get(shard, (0, 0))
+        rows = self.db.execute_query(f"""
+            SELECT
+                COALESCE(MAX(route_id), 0) as max_route_id,
+                COALESCE(SUM(CASE WHEN route_id <= %s THEN {self._ROUTE_CHECKSUM} END), 0) as known_checksum,
+                COALESCE(SUM({self._ROUTE_CHECKSUM}), 0) as checksum
+            FROM routes
+        """, (max_id,), shard=shard)
+        if not rows:
+            return None
+        current = rows[0]
+        if int(current['max_route_id']) == max_id and int(current['checksum']) == checksum:
+            return False
+
+        if int(current['known_checksum']) == checksum:
+            # Only new routes: fetch above the high-water mark
+            after = max_id
+        else:
+            # Existing routes changed or were deleted: reload this shard
+            for route_id in [r for r, s in self._route_shard.items() if s == shard]:
+                del self._routes[route_id]
+                del self._route_shard[route_id]
+            after = 0
+
+        new_routes = self.db.execute_query("""
+            SELECT route_id, airline_id, source_airport_id, dest_airport_id, distance_km, base_fuel_kg
+            FROM routes
+            WHERE route_id > %s
+        """, (after,), shard=shard)
+        if new_routes is None:
+            return None
+        # The graph's nodes are airport codes, as queries name them
+        for row in self.codes.decode(new_routes):
+            self._routes[row['route_id']] = (
+                row['airline_code'], row['source_airport'], row['dest_airport'],
+                row['distance_km'], row['base_fuel_kg']
+            )
+            self._route_shard[row['route_id']] = shard
+        self._route_marks[shard] = (int(current['max_route_id']), int(current['checksum']))
+        return True
+
+    def _refresh_fuel(self, shard):
+        # Row by row rather than summed per route: the watermark needs every
+        # id to notice the ones that commit late
+        mark = self._fuel_marks.setdefault(shard, IdWatermark())
+        after = mark.after()
+        changed = False
+        while True:
+            rows = self.db.execute_query("""
+                SELECT performance_id, route_id, actual_fuel_kg
+                FROM flight_performance
+                WHERE performance_id > %s
+                ORDER BY performance_id
+                LIMIT %s
+            """, (after, self.batch_size), shard=shard)
+            if rows is None:
+                return None
+            for row in rows:
+                if not mark.accept(row['performance_id']):
+                    continue
+                totals = self._fuel.setdefault(row['route_id'], [0.0, 0])
+                if row['actual_fuel_kg'] is not None:
+                    totals[0] += float(row['actual_fuel_kg'])
+                    totals[1] += 1
+                changed = True
+            if rows:
+                after = rows[-1]['performance_id']
+            if len(rows) < self.batch_size:
+                return changed
+
+    def load(self, routes, fuel=None):
+        """
+        Replace the graph with the given route rows and {route_id: (fuel sum, flights)}
+        Used for offline analysis and benchmarks; refresh() keeps it in sync with the database.
+        """
+        with self._lock:
+            self._routes = {
+                row['route_id']: (row['airline_code'], row['source_airport'], row['dest_airport'],
+                                  row['distance_km'], row['base_fuel_kg'])
+                for row in routes
+            }
+            self._route_shard = {}
+            self._fuel = {route_id: list(values) for route_id, values in (fuel or {}).items()}
+            self._rebuild()
+            self._last_refresh = time.monotonic()
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        snapshot = GraphSnapshot(self._snapshot.version + 1, dict(self._routes),
+                                 {route_id: tuple(values) for route_id, values in self._fuel.items()})
+        if self.configured_hubs:
+            hubs = [code for code in self.configured_hubs if code in snapshot.airports]
+        else:
+            hubs = sorted(snapshot.airports, key=snapshot.degree, reverse=True)[:self.hub_count]
+        for metric in self.METRICS:
+            for hub in hubs:
+                from_hub, prev = dijkstra(snapshot.adjacency[metric], hub)
+                to_hub, _ = dijkstra(snapshot.reverse[metric], hub)
+                snapshot.landmarks[metric][hub] = (from_hub, to_hub, prev)
+            snapshot.index_landmarks(metric)
+        self.hubs = hubs
+        self._snapshot = snapshot
+        with self._memo_lock:
+            self._memo.clear()
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+
+    def _heuristic(self, snapshot, metric, target):
+        """
+        ALT lower bound from the hub landmarks, by the triangle inequality in both directions:
+        d(n, t) >= d(L, t) - d(L, n) and d(n, t) >= d(n, L) - d(t, L)
+        """
+        if not snapshot.landmarks[metric]:
+            return None
+        from_hubs, to_hubs = snapshot.landmark_vectors[metric]
+        # Landmarks that cannot reach (or be reached from) the target give no bound
+        forward = [(i, d) for i, d in enumerate(from_hubs[target]) if d != math.inf]
+        backward = [(i, d) for i, d in enumerate(to_hubs[target]) if d != math.inf]
+
+        def estimate(node):
+            from_node, to_node = from_hubs[node], to_hubs[node]
+            best = 0.0
+            for i, hub_to_target in forward:
+                if hub_to_target - from_node[i] > best:
+                    best = hub_to_target - from_node[i]
+            for i, target_to_hub in backward:
+                if to_node[i] - target_to_hub > best:
+                    best = to_node[i] - target_to_hub
+            return best
+        return estimate
+
+    def _shortest(self, snapshot, metric, source, target, banned_nodes=(), banned_edges=()):
+        landmark = snapshot.landmarks[metric].get(source)
+        if landmark is not None and not banned_nodes and not banned_edges:
+            return _walk(landmark[2], source, target), "hub_tree"
+        heuristic = self._heuristic(snapshot, metric, target)
+        bound = math.inf
+        if not banned_nodes and not banned_edges:
+            # Any path through a hub is an upper bound on the optimum
+            for from_hub, to_hub, _ in snapshot.landmarks[metric].values():
+                if source in to_hub and target in from_hub:
+                    bound = min(bound, to_hub[source] + from_hub[target])
+            bound *= 1 + 1e-9
+        _, prev = dijkstra(snapshot.adjacency[metric], source, target, heuristic,
+                           banned_nodes, banned_edges, bound)
+        return _walk(prev, source, target), "astar" if heuristic else "dijkstra"
+
+    def _alternatives(self, snapshot, metric, source, target, best, count):
+        """Yen's k shortest loopless paths after `best`"""
+        adjacency = snapshot.adjacency[metric]
+
+        def cost(path):
+            nodes, _ = path
+            return sum(adjacency[a][b][0] for a, b in zip(nodes, nodes[1:]))
+
+        found, candidates, seen = [best], [], {tuple(best[0])}
+        while len(found) <= count:
+            nodes, route_ids = found[-1]
+            for i in range(len(nodes) - 1):
+                spur, root = nodes[i], nodes[:i + 1]
+                banned_edges = {(p[0][i], p[0][i + 1]) for p in found if p[0][:i + 1] == root and len(p[0]) > i + 1}
+                spur_path, _ = self._shortest(snapshot, metric, spur, target, set(root[:-1]), banned_edges)
+                if spur_path is None:
+                    continue
+                path = (root[:-1] + spur_path[0], route_ids[:i] + spur_path[1])
+                if tuple(path[0]) not in seen:
+                    seen.add(tuple(path[0]))
+                    heapq.heappush(candidates, (cost(path), len(path[0]), path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates)[2])
+        return found[1:]
+
+    def _describe(self, snapshot, path):
+        nodes, route_ids = path
+        legs = []
+        for source, dest, route_id in zip(nodes, nodes[1:], route_ids):
+            airline, _, _, distance, _ = snapshot.routes[route_id]
+            legs.append({
+                "route_id": route_id,
+                "airline_code": airline,
+                "from": source,
+                "to": dest,
+                "distance_km": distance,
+                "fuel_kg": round(snapshot.edge_fuel(route_id), 2)
+            })
+        return {
+            "airports": nodes,
+            "stops": max(len(nodes) - 2, 0),
+            "total_distance_km": sum(leg["distance_km"] for leg in legs),
+            "total_fuel_kg": round(sum(leg["fuel_kg"] for leg in legs), 2),
+            "legs": legs
+        }
+
+    def path(self, source, target, metric="fuel", alternatives=0):
+        """
+        Cheapest path by fuel or distance plus up to `alternatives` other connections
+        Returns (result or None if unreachable, memo hit flag)
+        """
+        if metric not in self.METRICS:
+            raise KeyError(metric)
+        snapshot = self._snapshot
+        source, target = source.upper(), target.upper()
+        alternatives = min(max(alternatives, 0), self.MAX_ALTERNATIVES)
+        key = (snapshot.version, metric, source, target, alternatives)
+        with self._memo_lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return self._memo[key], True
+            self.memo_misses += 1
+
+        result = None
+        if source in snapshot.airports and target in snapshot.airports:
+            best, algorithm = self._shortest(snapshot, metric, source, target)
+            if best is not None:
+                others = self._alternatives(snapshot, metric, source, target, best, alternatives) if alternatives else []
+                result = {
+                    "algorithm": algorithm,
+                    "best": self._describe(snapshot, best),
+                    "alternatives": [self._describe(snapshot, path) for path in others]
+                }
+
+        with self._memo_lock:
+            if snapshot.version == self._snapshot.version:
+                self._memo[key] = result
+                if len(self._memo) > self.cache_size:
+                    self._memo.popitem(last=False)
+        return result, False
+
+    def stats(self):
+        snapshot = self._snapshot
+        with self._memo_lock:
+            memo_size = len(self._memo)
+        return {
+            "version": snapshot.version,
+            "airports": len(snapshot.airports),
+            "routes": len(snapshot.routes),
+            "routes_with_observed_fuel": len(snapshot.fuel),
+            "hubs": list(self.hubs),
+            "last_build_ms": round(self.last_build_ms, 2),
+            "memo_entries": memo_size,
+            "memo_hits": self.memo_hits,
+            "memo_misses": self.memo_misses,
+            "pending_fuel_gaps": sum(len(mark.gaps) for mark in self._fuel_marks.values())
+        }
@@ -0,0 +1,215 @@
+"""
+SkySQL Intelligence Row Counts
+Trigger-maintained exact table counters and statistics-based estimates
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Counted tables; routes and flight_performance are split across shards and
+# summed, the rest are read from the primary shard
+COUNTED_TABLES = ("airlines", "airports", "routes", "flight_performance", "operational_metrics")
+SHARDED_TABLES = ("routes", "flight_performance")
+
+# Reference tables edited in place: an AFTER UPDATE trigger counts their edits
+# in a "<table>:updates" row, since row_count only moves on INSERT/DELETE and
+# the shared cache's change signatures are read from table_counts
+UPDATE_COUNTED_TABLES = ("airlines", "airports")
+
+MODES = ("exact", "approximate")
+
+
+def update_counter(table):
+    """table_counts row counting the updates of `table`"""
+    return f"{table}:updates"
+
+
+def schema_statements():
+    """DDL for the table_counts table and its insert/delete (and update) triggers (idempotent)"""
+    statements = ["""
+        CREATE TABLE IF NOT EXISTS table_counts (
+            table_name VARCHAR(64) PRIMARY KEY,
+            row_count BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """]
+    for table in COUNTED_TABLES:
+        for suffix, event, delta in (("ai", "INSERT", "+ 1"), ("ad", "DELETE", "- 1")):
+            statements.append(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_count_{suffix}
+                AFTER {event} ON {table} FOR EACH ROW
+                UPDATE table_counts SET row_count = row_count {delta}
+                WHERE table_name = '{table}'
+            """)
+    for table in UPDATE_COUNTED_TABLES:
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_count_au
+            AFTER UPDATE ON {table} FOR EACH ROW
+            UPDATE table_counts SET row_count = row_count + 1
+            WHERE table_name = '{update_counter(table)}'
+        """)
+    return statements
+
+
+def initial_count_statement(table):
+    """Seed one counter with an exact count (a full scan, run once per table)"""
+    return f"""
+        INSERT IGNORE INTO table_counts (table_name, row_count)
+        SELECT '{table}', COUNT(*) FROM {table}
+    """
+
+
+def initial_update_count_statement(table):
+    """Seed one update counter at zero"""
+    return f"""
+        INSERT IGNORE INTO table_counts (table_name, row_count)
+        VALUES ('{update_counter(table)}', 0)
+    """
+
+
+class RowCounts:
+    """
+    Constant-time table counts with a staleness bound
+
+    exact: counters kept by AFTER INSERT/DELETE triggers, so reading them is
+    a primary-key lookup instead of a COUNT(*) index scan. Rows removed by
+    TRUNCATE bypass the triggers; reconcile() recounts after bulk maintenance.
+    approximate: InnoDB's TABLE_ROWS estimate from information_schema,
+    usually within a few percent and needing no schema objects at all.
+
+    Snapshots are cached per mode; a caller passes max_staleness (seconds)
+    to accept a snapshot of up to that age without touching the database.
+    """
+
+    def __init__(self, db, default_staleness=5.0):
+        self.db = db
+        self.default_staleness = default_staleness
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refreshes = 0
+        self.failures = 0
+
+    def ensure_schema(self):
+        """Create table_counts and the triggers on every shard, seeding missing counters"""
+        for shard in self.db.shards:
+            for statement in schema_statements():
+                if not self.db.execute_query(statement, fetch=False, shard=shard):
+                    logger.warning(f"Row counters incomplete on shard {shard.name}")
+                    return False
+            present = self.db.execute_query("SELECT table_name FROM table_counts", shard=shard)
+            if present is None:
+                return False
+            present = {row["table_name"] for row in present}
+            for table in sorted(set(COUNTED_TABLES) - present):
+                logger.info(f"Seeding row counter for {table} on shard {shard.name}")
+                if not self.db.execute_query(initial_count_statement(table), fetch=False, shard=shard):
+                    return False
+            for table in UPDATE_COUNTED_TABLES:
+                if update_counter(table) not in present and not self.db.execute_query(
+                        initial_update_count_statement(table), fetch=False, shard=shard):
+                    return False
+        logger.info("Row counters and triggers verified")
+        return True
+
+    def reconcile(self, tables=COUNTED_TABLES):
+        """Recount exactly (full scans) and overwrite the counters"""
+        for shard in self.db.shards:
+            for table in tables:
+                if not self.db.execute_query(f"""
+                    REPLACE INTO table_counts (table_name, row_count)
+                    SELECT '{table}', COUNT(*) FROM {table}
+                """, fetch=False, shard=shard):
+                    return False
+        with self._lock:
+            self._snapshots.clear()
+        return True
+
+    def _read_shard(self, shard, mode):
+        if mode == "exact":
+            rows = self.db.execute_query("SELECT table_name, row_count FROM table_counts", shard=shard)
+        else:
+            placeholders = ", ".join(["%s"] * len(COUNTED_TABLES))
+            rows = self.db.execute_query(f"""
+                SELECT TABLE_NAME as table_name, TABLE_ROWS as row_count
+                FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders})
+            """, COUNTED_TABLES, shard=shard)
+        if rows is None:
+            return None
+        return {row["table_name"]: int(row["row_count"] or 0) for row in rows}
+
+    def _refresh(self, mode):
+        partials = self.db.scatter(lambda shard: self._read_shard(shard, mode))
+        if partials is None:
+            return None
+        primary = partials[0]
+        counts = {}
+        for table in COUNTED_TABLES:
+            if table in SHARDED_TABLES:
+                if all(table in partial for partial in partials):
+                    counts[table] = sum(partial[table] for partial in partials)
+            elif table in primary:
+                counts[table] = primary[table]
+        return counts
+
+    def counts(self, mode="exact", max_staleness=None):
+        """
+        {table: {"count", "mode", "age_seconds"}} for every counted table
+        Exact mode falls back to the estimate for tables without a counter.
+        Returns None only if nothing could be read and nothing is cached.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        max_staleness = self.default_staleness if max_staleness is None else max_staleness
+
+        result = {}
+        snapshot = self._snapshot(mode, max_staleness)
+        if snapshot is not None:
+            taken_at, counts = snapshot
+            age = round(time.monotonic() - taken_at, 3)
+            result = {table: {"count": count, "mode": mode, "age_seconds": age} for table, count in counts.items()}
+
+        missing = [table for table in COUNTED_TABLES if table not in result]
+        if missing and mode == "exact":
+            estimate = self._snapshot("approximate", max_staleness)
+            if estimate is not None:
+                estimated_at, estimated = estimate
+                for table in missing:
+                    if table in estimated:
+                        result[table] = {"count": estimated[table], "mode": "approximate",
+                                         "age_seconds": round(time.monotonic() - estimated_at, 3)}
+        return result or None
+
+    def _snapshot(self, mode, max_staleness):
+        with self._lock:
+            cached = self._snapshots.get(mode)
+            if cached and time.monotonic() - cached[0] <= max_staleness:
+                self.hits += 1
+                return cached
+
+        counts = self._refresh(mode)
+        with self._lock:
+            if counts is None:
+                self.failures += 1
+                # Better an older count than none; the age says how old
+                return self._snapshots.get(mode)
+            self.refreshes += 1
+            self._snapshots[mode] = (time.monotonic(), counts)
+            return self._snapshots[mode]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "default_staleness_seconds": self.default_staleness,
+                "cache_hits": self.hits,
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "snapshot_age_seconds": {
+                    mode: round(time.monotonic() - taken_at, 3)
+                    for mode, (taken_at, _) in self._snapshots.items()
+                }
+            }
@@ -0,0 +1,189 @@
+"""
+SkySQL Intelligence Sharding
+Airline-based shard map for routes/flight_performance and scatter-gather merge helpers
+"""
+
+import bisect
+import heapq
+import json
+import os
+from decimal import Decimal
+from itertools import islice
+
+from circuit_breaker import CircuitBreaker
+from columnar import Columns
+from db_pool import ConnectionPool
+from storage import MariaDBBackend
+
+
+class Shard:
+    """
+    One MariaDB database holding the routes and flights of a set of airlines
+
+    Reference tables (airlines, airports, aircraft_config) are replicated to
+    every shard so route-level joins stay local. `airlines=None` marks the
+    catch-all shard for airlines not assigned anywhere else. Route ids are
+    globally unique because each shard's routes AUTO_INCREMENT starts at its
+    own `route_id_base`. `backend` opens the connections (MariaDB unless an
+    embedded backend is configured).
+    """
+
+    def __init__(self, name, db_config, airlines=None, route_id_base=1, pool_size=10, backend=None):
+        self.name = name
+        self.db_config = db_config
+        self.backend = backend or MariaDBBackend()
+        self.airlines = frozenset(code.upper() for code in airlines) if airlines else None
+        self.route_id_base = route_id_base
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=15.0)
+        self.pool = ConnectionPool(lambda: self.backend.connect(self.db_config), max_size=pool_size)
+
+
+class ShardMap:
+    """
+    Airline -> shard and route_id -> shard routing
+
+    The first shard is the primary: it also owns operational_metrics and
+    answers reference-data queries.
+    """
+
+    def __init__(self, shards):
+        if not shards:
+            raise ValueError("At least one shard is required")
+        self._shards = {shard.name: shard for shard in shards}
+        self.primary = shards[0]
+        self._by_airline = {}
+        for shard in shards:
+            for code in shard.airlines or ():
+                if code in self._by_airline:
+                    raise ValueError(f"Airline {code} assigned to more than one shard")
+                self._by_airline[code] = shard
+        catch_all = [shard for shard in shards if shard.airlines is None]
+        self.default = catch_all[0] if catch_all else self.primary
+        self._route_bases = sorted((shard.route_id_base, shard.name) for shard in shards)
+        self._route_base_ids = [base for base, _ in self._route_bases]
+
+    @classmethod
+    def from_env(cls, base_config, env_var="SKYSQL_SHARDS", backend=None):
+        """
+        Build the shard map from a JSON list in the environment (or a path to one)
+        Each entry: {"name", "airlines", "route_id_base", plus any db_config overrides}
+        Without configuration the single base database is the only shard.
+        """
+        raw = os.environ.get(env_var, "").strip()
+        if not raw:
+            return cls([Shard("primary", dict(base_config), backend=backend)])
+        if not raw.startswith("["):
+            with open(raw) as handle:
+                raw = handle.read()
+
+        shards = []
+        for spec in json.loads(raw):
+            spec = dict(spec)
+            name = spec.pop("name")
+            airlines = spec.pop("airlines", None)
+            route_id_base = spec.pop("route_id_base", 1)
+            config = dict(base_config)
+            config.update(spec)
+            shards.append(Shard(name, config, airlines, route_id_base, backend=backend))
+        return cls(shards)
+
+    def __iter__(self):
+        return iter(self._shards.values())
+
+    def __len__(self):
+        return len(self._shards)
+
+    def get(self, name):
+        return self._shards[name]
+
+    def names(self):
+        return list(self._shards)
+
+    def for_airline(self, airline_code):
+        return self._by_airline.get(airline_code.upper(), self.default)
+
+    def for_route(self, route_id):
+        index = bisect.bisect_right(self._route_base_ids, route_id) - 1
+        return self._shards[self._route_bases[max(index, 0)][1]]
+
+
+def _number(value):
+    if value is None:
+        return 0
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def merge_aggregates(partials, key_fields=(), sum_fields=(), avg_fields=None, max_fields=(), min_fields=()):
+    """
+    Combine per-shard partial aggregates into final rows
+
+    partials: iterable of row lists, one per shard
+    sum_fields: additive columns (counts and sums) added across shards
+    avg_fields: {output_name: (sum_field, count_field)}; averages are recomputed
+                from merged sums and counts, never averaged across shards
+    """
+    avg_fields = avg_fields or {}
+    merged = {}
+    for rows in partials:
+        for row in rows or ():
+            key = tuple(row[field] for field in key_fields)
+            target = merged.get(key)
+            if target is None:
+                target = merged[key] = {field: row[field] for field in key_fields}
+                for field in sum_fields:
+                    target[field] = 0
+            for field in sum_fields:
+                target[field] += _number(row[field])
+            for field in max_fields:
+                if row[field] is not None and (target.get(field) is None or row[field] > target[field]):
+                    target[field] = row[field]
+            for field in min_fields:
+                if row[field] is not None and (target.get(field) is None or row[field] < target[field]):
+                    target[field] = row[field]
+
+    for target in merged.values():
+        for output, (sum_field, count_field) in avg_fields.items():
+            count = target.get(count_field) or 0
+            target[output] = target[sum_field] / count if count else None
+    return list(merged.values())
+
+
+def merge_sorted(partials, order_by, descending=False, limit=None):
+    """
+    Merge per-shard result lists that are each already sorted by `order_by`
+    A top-N across shards only needs each shard's own top-N.
+    """
+    # NULLs sort first ascending and last descending, as in MariaDB
+    merged = heapq.merge(
+        *[rows or [] for rows in partials],
+        key=lambda row: (row[order_by] is not None, 0 if row[order_by] is None else row[order_by]),
+        reverse=descending
+    )
+    return list(islice(merged, limit) if limit else merged)
+
+
+def merge_streams(streams, order_by, descending=False, limit=None):
+    """
+    Lazily merge per-shard row iterators that are each sorted by `order_by`
+    Same ordering as merge_sorted, but rows are pulled only as they are consumed;
+    `order_by` is a key for dict rows or a position for tuple rows
+    """
+    merged = heapq.merge(
+        *streams,
+        key=lambda row: (row[order_by] is not None, 0 if row[order_by] is None else row[order_by]),
+        reverse=descending
+    )
+    return islice(merged, limit) if limit else merged
+
+
+def merge_sorted_columns(partials, order_by, descending=False, limit=None):
+    """merge_sorted for per-shard Columns results; returns one Columns"""
+    partials = [columns for columns in partials if columns is not None and columns.names]
+    if not partials:
+        return Columns([])
+    merged = Columns(partials[0].names)
+    position = merged.index(order_by)
+    merged.extend(merge_streams([columns.rows() for columns in partials], position, descending, limit))
+    return merged
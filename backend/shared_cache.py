@@ -0,0 +1,445 @@
+"""
+SkySQL Intelligence Shared Response Cache
+Host-wide response cache in shared memory, shared by every worker process
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+SHM_DIR = "/dev/shm"
+COMPRESS_ABOVE = 16 * 1024
+FAMILY_COUNTERS = ("hits", "misses", "invalidated", "expired", "stale_served", "stores", "evictions")
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        family TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        compressed INTEGER NOT NULL,
+        status INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        expires_at REAL,
+        last_used REAL NOT NULL,
+        size INTEGER NOT NULL,
+        versions TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)",
+    """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        signature TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS family_stats (
+        family TEXT PRIMARY KEY,
+        hits INTEGER NOT NULL DEFAULT 0,
+        misses INTEGER NOT NULL DEFAULT 0,
+        invalidated INTEGER NOT NULL DEFAULT 0,
+        expired INTEGER NOT NULL DEFAULT 0,
+        stale_served INTEGER NOT NULL DEFAULT 0,
+        stores INTEGER NOT NULL DEFAULT 0,
+        evictions INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value REAL NOT NULL)",
+    "INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('bytes', 0), ('next_poll', 0)"
+)
+
+
+class SharedResponseCache:
+    """
+    Response cache shared by all worker processes on a host
+
+    Entries live in an SQLite database on tmpfs (/dev/shm), so every worker
+    reads and fills the same cache and a response computed by one worker is
+    a hit for the others; nothing is written to disk. Same interface as
+    the in-process ResponseCache, plus:
+
+    - size-bounded LRU: payload bytes are capped at `max_bytes`, least
+      recently used entries are evicted first
+    - TTLs: put() takes the entry's freshness TTL; fresh() only returns
+      entries inside it, get() returns any entry (the last-known-good copy
+      served during outages) until `retention` seconds after it was stored
+    - version invalidation: an entry records the versions of the tables it
+      was computed from; bumping a table's version (invalidate(), or the
+      TableVersionWatcher on a detected change) makes it stale for fresh()
+      in every worker at once
+    - hit-rate counters per key family (the endpoint), summed across workers
+
+    Any SQLite error degrades to a cache miss; the cache never fails a request.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, retention=86400.0, flush_interval=5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.retention = retention
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._last_flush = time.monotonic()
+        self.errors = 0
+        with self._connection() as connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        # One connection per thread, reopened in a forked worker
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _failed(self, operation, error):
+        with self._lock:
+            self.errors += 1
+        logger.warning(f"Shared cache {operation} failed: {error}")
+
+    def _count(self, family, counter, amount=1):
+        with self._lock:
+            counters = self._counters.setdefault(family, dict.fromkeys(FAMILY_COUNTERS, 0))
+            counters[counter] += amount
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Add this process's counters to the shared per-family totals"""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+            self._last_flush = time.monotonic()
+        if not counters:
+            return
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in FAMILY_COUNTERS)
+        try:
+            self._connection().executemany(f"""
+                INSERT INTO family_stats (family, {", ".join(FAMILY_COUNTERS)})
+                VALUES (?, {", ".join("?" * len(FAMILY_COUNTERS))})
+                ON CONFLICT (family) DO UPDATE SET {updates}
+            """, [(family,) + tuple(values[name] for name in FAMILY_COUNTERS)
+                  for family, values in counters.items()])
+        except sqlite3.Error as e:
+            self._failed("flush", e)
+
+    @staticmethod
+    def _key(key):
+        return key if isinstance(key, str) else json.dumps(key, separators=(",", ":"))
+
+    @staticmethod
+    def _versions(connection, tables):
+        if not tables:
+            return ""
+        tables = sorted(set(tables))
+        current = dict(connection.execute(
+            f"SELECT table_name, version FROM table_versions WHERE table_name IN ({', '.join('?' * len(tables))})",
+            tables).fetchall())
+        return ";".join(f"{table}={current.get(table, 0)}" for table in tables)
+
+    def versions(self, tables):
+        """Current version stamp of `tables`; pass it to put() for a response computed now"""
+        try:
+            return self._versions(self._connection(), tables)
+        except sqlite3.Error as e:
+            self._failed("version read", e)
+            return None
+
+    def _read(self, key):
+        row = self._connection().execute("""
+            SELECT family, payload, compressed, status, stored_at, expires_at, last_used, versions
+            FROM entries WHERE key = ?
+        """, (key,)).fetchone()
+        if row is None or time.time() - row[4] > self.retention:
+            return None
+        return row
+
+    def _touch(self, key, row):
+        now = time.time()
+        if now - row[6] >= 1.0:   # LRU position to the second; saves a write per hit
+            self._connection().execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+
+    @staticmethod
+    def _entry(row):
+        payload = zlib.decompress(row[1]) if row[2] else row[1]
+        return json.loads(payload), row[3], row[4]
+
+    def fresh(self, key, family, tables=()):
+        """(payload, status_code, stored_at) if the entry is inside its TTL and table versions, else None"""
+        key = self._key(key)
+        try:
+            row = self._read(key)
+            if row is None:
+                self._count(family, "misses")
+                return None
+            if row[5] is None or time.time() >= row[5]:
+                self._count(family, "expired")
+                return None
+            if row[7] != self._versions(self._connection(), tables):
+                self._count(family, "invalidated")
+                return None
+            self._touch(key, row)
+            entry = self._entry(row)
+        except (sqlite3.Error, ValueError) as e:
+            self._failed("read", e)
+            return None
+        self._count(family, "hits")
+        return entry
+
+    def get(self, key):
+        """(payload, status_code, stored_at) of the last stored response, however old, or None"""
+        key = self._key(key)
+        try:
+            row = self._read(key)
+            if row is None:
+                return None
+            self._touch(key, row)
+            entry = self._entry(row)
+        except (sqlite3.Error, ValueError) as e:
+            self._failed("read", e)
+            return None
+        self._count(row[0], "stale_served")
+        return entry
+
+    def put(self, key, payload, status_code=200, family="default", ttl=None, versions=""):
+        encoded = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        compressed = len(encoded) > COMPRESS_ABOVE
+        if compressed:
+            encoded = zlib.compress(encoded, 1)
+        if len(encoded) > self.max_bytes // 8:
+            return
+        key, now = self._key(key), time.time()
+        connection = None
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            previous = connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            connection.execute("""
+                REPLACE INTO entries (key, family, payload, compressed, status, stored_at, expires_at,
+                                      last_used, size, versions)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (key, family, encoded, int(compressed), status_code, now, now + ttl if ttl else None,
+                  now, len(encoded), versions or ""))
+            connection.execute("UPDATE cache_meta SET value = value + ? WHERE name = 'bytes'",
+                               (len(encoded) - (previous[0] if previous else 0),))
+            evicted = self._evict(connection, now)
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection is not None and connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self._failed("write", e)
+            return
+        self._count(family, "stores")
+        for evicted_family, count in evicted.items():
+            self._count(evicted_family, "evictions", count)
+
+    def _evict(self, connection, now):
+        """Drop expired-retention entries, then least recently used ones until under max_bytes"""
+        evicted = {}
+        total = connection.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+        victims = connection.execute(
+            "SELECT key, family, size FROM entries WHERE stored_at < ?", (now - self.retention,)).fetchall()
+        target = self.max_bytes * 0.9
+        remaining = total - sum(size for _, _, size in victims)
+        if remaining > target:
+            for key, family, size in connection.execute(
+                    "SELECT key, family, size FROM entries WHERE stored_at >= ? ORDER BY last_used",
+                    (now - self.retention,)):
+                victims.append((key, family, size))
+                remaining -= size
+                if remaining <= target:
+                    break
+        connection.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _, _ in victims])
+        connection.execute("UPDATE cache_meta SET value = ? WHERE name = 'bytes'", (max(remaining, 0),))
+        for _, family, _ in victims:
+            evicted[family] = evicted.get(family, 0) + 1
+        return evicted
+
+    def invalidate(self, *tables):
+        """Bump the version of `tables`: every worker's entries computed from them stop being fresh"""
+        try:
+            self._connection().executemany("""
+                INSERT INTO table_versions (table_name, version) VALUES (?, 1)
+                ON CONFLICT (table_name) DO UPDATE SET version = version + 1
+            """, [(table,) for table in tables])
+        except sqlite3.Error as e:
+            self._failed("invalidate", e)
+
+    def observe(self, table, signature):
+        """
+        Bump `table` if its change signature differs from the last one seen
+        Idempotent across workers: only the first to see a new signature bumps.
+        """
+        try:
+            connection = self._connection()
+            connection.execute("INSERT OR IGNORE INTO table_versions (table_name, signature) VALUES (?, ?)",
+                               (table, signature))
+            changed = connection.execute("""
+                UPDATE table_versions SET version = version + 1, signature = ?
+                WHERE table_name = ? AND signature IS NOT ?
+            """, (signature, table, signature)).rowcount
+            return bool(changed)
+        except sqlite3.Error as e:
+            self._failed("invalidate", e)
+            return False
+
+    def claim_poll(self, interval):
+        """True for exactly one worker per `interval` seconds"""
+        now = time.time()
+        try:
+            return bool(self._connection().execute(
+                "UPDATE cache_meta SET value = ? WHERE name = 'next_poll' AND value <= ?",
+                (now + interval, now)).rowcount)
+        except sqlite3.Error as e:
+            self._failed("poll lease", e)
+            return False
+
+    def clear(self):
+        try:
+            connection = self._connection()
+            connection.execute("DELETE FROM entries")
+            connection.execute("UPDATE cache_meta SET value = 0 WHERE name = 'bytes'")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def __len__(self):
+        try:
+            return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self):
+        self.flush()
+        try:
+            connection = self._connection()
+            total = connection.execute("SELECT value FROM cache_meta WHERE name = 'bytes'").fetchone()[0]
+            entries = dict(connection.execute("SELECT family, COUNT(*) FROM entries GROUP BY family").fetchall())
+            rows = connection.execute(f"SELECT family, {', '.join(FAMILY_COUNTERS)} FROM family_stats").fetchall()
+            versions = dict(connection.execute("SELECT table_name, version FROM table_versions").fetchall())
+        except sqlite3.Error as e:
+            self._failed("stats", e)
+            return {"shared": True, "path": self.path, "errors": self.errors}
+        families = {}
+        for row in rows:
+            counters = dict(zip(FAMILY_COUNTERS, row[1:]))
+            lookups = counters["hits"] + counters["misses"] + counters["invalidated"] + counters["expired"]
+            counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else None
+            counters["entries"] = entries.get(row[0], 0)
+            families[row[0]] = counters
+        return {
+            "shared": True,
+            "path": self.path,
+            "entries": sum(entries.values()),
+            "bytes": int(total),
+            "max_bytes": self.max_bytes,
+            "table_versions": versions,
+            "families": families,
+            "errors": self.errors
+        }
+
+
+class TableVersionWatcher:
+    """
+    Bumps shared cache table versions when the database changes
+
+    Change signatures come from what the triggers already maintain: the
+    table_counts counters (inserts/deletes, plus the update counters of
+    airlines and airports), the newest change_log id (any write to routes or
+    operational_metrics) and the newest aircraft_config_history id. Updates
+    to flight_performance rows are not tracked (flights are treated as
+    append-only); such entries refresh when their TTL runs out. Each is a primary-key read, so a poll costs a
+    few lookups per shard; a lease in the shared cache lets only one worker
+    per host poll each interval. Runs on a daemon thread, off the request path.
+    """
+
+    def __init__(self, db, cache, interval=2.0):
+        self.db = db
+        self.cache = cache
+        self.interval = interval
+        self._thread = None
+        self.polls = 0
+        self.bumps = 0
+
+    def signatures(self):
+        """{table: signature} for every table whose change markers could be read"""
+        parts = {}
+        for shard in self.db.shards:
+            counts = self.db.execute_query("SELECT table_name, row_count, updated_at FROM table_counts", shard=shard)
+            for row in counts or ():
+                # "<table>:updates" counters belong to their table's signature
+                parts.setdefault(row["table_name"].split(":")[0], []).append(
+                    f"{shard.name}:{row['row_count']}@{row['updated_at']}")
+            newest = self.db.execute_query("SELECT MAX(change_id) as newest FROM change_log", shard=shard)
+            if newest:
+                for table in ("routes", "operational_metrics"):
+                    parts.setdefault(table, []).append(f"{shard.name}:log{newest[0]['newest']}")
+        history = self.db.execute_query("SELECT MAX(history_id) as newest FROM aircraft_config_history")
+        if history:
+            parts.setdefault("aircraft_config", []).append(f"history{history[0]['newest']}")
+        return {table: "|".join(values) for table, values in parts.items()}
+
+    def poll(self):
+        """Compare signatures and bump changed tables; returns the tables bumped"""
+        if self.db.circuit_open() or not self.cache.claim_poll(self.interval):
+            return []
+        self.polls += 1
+        bumped = [table for table, signature in self.signatures().items() if self.cache.observe(table, signature)]
+        if bumped:
+            self.bumps += len(bumped)
+            logger.info(f"Shared cache invalidated for {', '.join(sorted(bumped))}")
+        return bumped
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.warning(f"Table version poll failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cache-versions", daemon=True)
+            self._thread.start()
+        return True
+
+    def stats(self):
+        return {"interval_seconds": self.interval, "polls": self.polls, "tables_bumped": self.bumps}
+
+
+def cache_from_env(namespace):
+    """
+    SKYSQL_SHARED_CACHE=off keeps the per-process cache; a path puts the
+    shared cache there; by default it goes in /dev/shm when that exists,
+    one file per `namespace` (the databases served). SKYSQL_SHARED_CACHE_MB
+    caps its payload size (default 64). Returns None for the per-process cache.
+    """
+    setting = os.environ.get("SKYSQL_SHARED_CACHE", "").strip()
+    if setting.lower() in ("off", "0", "false", "none"):
+        return None
+    path = setting or (os.path.join(SHM_DIR, f"skysql-cache-{hashlib.sha1(namespace.encode()).hexdigest()[:12]}.db")
+                       if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK) else None)
+    if path is None:
+        return None
+    try:
+        cache = SharedResponseCache(path, max_bytes=int(os.environ.get("SKYSQL_SHARED_CACHE_MB", "64")) * 1024 * 1024)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Shared cache unavailable at {path}, using the per-process cache: {e}")
+        return None
+    logger.info(f"Using shared response cache at {path}")
+    return cache
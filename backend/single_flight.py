@@ -0,0 +1,96 @@
+"""
+SkySQL Intelligence Single-Flight
+Coalesces identical concurrent database reads into one execution
+"""
+
+import threading
+
+
+class WaitTimeout(TimeoutError):
+    """A follower's timeout passed before the leader finished"""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Share one in-flight execution between concurrent callers with the same key
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running (followers) wait and receive the leader's
+    result. Nothing is cached: once the leader finishes the key is released
+    and the next caller runs the query again, so results are never older
+    than the request that asked for them.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+        self.max_followers = 0
+        self.follower_timeouts = 0
+
+    def do(self, key, func, timeout=None):
+        """
+        Returns (result, shared); shared is True whenever other callers received
+        the same result object (always for followers, for the leader only if it had followers)
+        A follower waits at most `timeout` seconds (None: as long as the
+        leader runs) and then raises WaitTimeout; the leader is unaffected.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.followers += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.follower_timeouts += 1
+                raise WaitTimeout(f"Timed out after {timeout:.3f}s waiting for a shared call")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.max_followers = max(self.max_followers, call.followers)
+            call.done.set()
+        return call.result, call.followers > 0
+
+    def stats(self):
+        with self._lock:
+            calls = self.leaders + self.followers
+            return {
+                "calls": calls,
+                "executions": self.leaders,
+                "saved_queries": self.followers,
+                "coalescing_rate": round(self.followers / calls, 4) if calls else 0.0,
+                "max_followers": self.max_followers,
+                "errors": self.errors,
+                "follower_timeouts": self.follower_timeouts,
+                "in_flight": len(self._calls)
+            }
@@ -0,0 +1,301 @@
+"""
+SkySQL Intelligence Quantile Sketches
+Mergeable relative-error quantile sketches kept per route per day
+"""
+
+import math
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from cold_storage import EPOCH
+from watermark import IdWatermark
+
+
+class QuantileSketch:
+    """
+    Log-bucketed quantile sketch (DDSketch style)
+
+    Every positive value x lands in bucket ceil(log_gamma(x)) with
+    gamma = (1 + alpha) / (1 - alpha), so any quantile estimate is within a
+    relative error of `alpha` of the true value at that rank. Two sketches
+    with the same alpha merge exactly by adding bucket counts, which is what
+    lets per-route per-day sketches be combined for any window on demand.
+    """
+
+    __slots__ = ("alpha", "gamma", "_log_gamma", "max_buckets", "buckets", "zero_count",
+                 "count", "min", "max", "sum")
+
+    def __init__(self, alpha=0.01, max_buckets=2048):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def add(self, value, weight=1):
+        value = float(value)
+        if value <= 0:
+            # Non-positive values are not expected for scores or fuel rates
+            self.zero_count += weight
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + weight
+            if len(self.buckets) > self.max_buckets:
+                self._collapse()
+        self.count += weight
+        self.sum += value * weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values):
+        """add() for a numpy array of values, bucketed in one vectorized pass"""
+        values = np.asarray(values, dtype=float)
+        if not values.size:
+            return
+        positive = values[values > 0]
+        self.zero_count += int(values.size - positive.size)
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                    return_counts=True)
+        for index, bucket_count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+        while len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _collapse(self):
+        """Fold the two lowest buckets together to keep memory bounded"""
+        lowest, second = sorted(self.buckets)[:2]
+        self.buckets[second] += self.buckets.pop(lowest)
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+        while len(self.buckets) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1); None for an empty sketch"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+
+class SketchStore:
+    """
+    Per-route, per-day sketches of efficiency_score and fuel per km
+
+    Flights are folded in incrementally using a per-shard performance_id
+    watermark, so each refresh only reads rows inserted since the previous
+    one (and ids that committed late, see IdWatermark). Flights are assumed
+    append-only: an updated or deleted flight stays in its day's sketch.
+    Days older than `retention_days` are dropped.
+
+    Archived flights are read from `cold_store` files as they appear. A
+    file's flights that were already folded in while hot (ids the shard's
+    watermark has seen) are skipped, so nothing is counted twice.
+    """
+
+    METRICS = ("efficiency", "fuel_per_km")
+
+    def __init__(self, db, alpha=0.01, retention_days=400, refresh_interval=30.0, batch_size=20000,
+                 cold_store=None):
+        self.db = db
+        self.cold_store = cold_store
+        self.alpha = alpha
+        self.retention_days = retention_days
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._sketches = {}          # (route_id, day) -> {metric: QuantileSketch}
+        self._route_airline = {}     # route_id -> airline_id
+        self._marks = {}             # shard name -> IdWatermark over performance_id
+        self._cold_files = set()     # paths of cold files folded in
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Fold newly inserted flights into the day sketches"""
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            # Cold first: on a fresh start no flight has been folded in yet
+            if self.cold_store is not None and not self._refresh_cold():
+                return False
+            for shard in self.db.shards.names():
+                if not self._refresh_shard(shard):
+                    return False
+            self._expire()
+            self._last_refresh = time.monotonic()
+        return True
+
+    def _refresh_shard(self, shard):
+        mark = self._marks.setdefault(shard, IdWatermark())
+        after = mark.after()
+        while True:
+            rows = self.db.execute_query("""
+                SELECT
+                    fp.performance_id,
+                    fp.route_id,
+                    r.airline_id,
+                    fp.flight_date,
+                    fp.efficiency_score,
+                    fp.actual_fuel_kg / r.distance_km as fuel_per_km
+                FROM flight_performance fp
+                JOIN routes r ON fp.route_id = r.route_id
+                WHERE fp.performance_id > %s
+                ORDER BY fp.performance_id
+                LIMIT %s
+            """, (after, self.batch_size), shard=shard)
+            if rows is None:
+                return False
+            for row in rows:
+                if mark.accept(row['performance_id']):
+                    self._add_flight(row)
+            if rows:
+                after = rows[-1]['performance_id']
+            if len(rows) < self.batch_size:
+                return True
+
+    def _refresh_cold(self):
+        today = date.today()
+        cutoff = today - timedelta(days=self.retention_days)
+        first = (cutoff - EPOCH).days
+        airlines = {}
+        for cold in self.cold_store.files_for(cutoff, today):
+            if cold.path in self._cold_files:
+                continue
+            shard = cold.header.get("shard", "primary")
+            if shard not in airlines:
+                rows = self.db.execute_query("SELECT route_id, airline_id FROM routes", shard=shard)
+                if rows is None:
+                    return False
+                airlines[shard] = {row['route_id']: row['airline_id'] for row in rows}
+            mark = self._marks.setdefault(shard, IdWatermark())
+
+            chunks = cold.chunks_for(first, (today - EPOCH).days)
+            ids = cold.column("performance_id", chunks)
+            dates = cold.column("flight_date", chunks)
+            # Seen: at or below the watermark and not an open gap
+            seen = (ids <= mark.last_id) & ~np.isin(ids, list(mark.gaps))
+            mask = (dates >= first) & ~seen
+            for row_id in ids[mask].tolist():
+                mark.gaps.pop(row_id, None)
+            if mask.any():
+                self._add_cold_flights(cold.column("route_id", chunks)[mask], dates[mask],
+                                       cold.column("efficiency_score", chunks)[mask],
+                                       cold.column("fuel_per_km", chunks)[mask], airlines[shard])
+            self._cold_files.add(cold.path)
+        return True
+
+    def _add_cold_flights(self, routes, days, efficiency, fuel_per_km, airlines):
+        """Fold archived flights in, one vectorized sketch update per route and day"""
+        keys = (routes.astype("<i8") << 32) | days.astype("<i8")
+        order = np.argsort(keys, kind="stable")
+        keys, efficiency, fuel_per_km = keys[order], efficiency[order], fuel_per_km[order]
+        groups, starts = np.unique(keys, return_index=True)
+        ends = np.append(starts[1:], len(keys))
+        for key, start, end in zip(groups.tolist(), starts.tolist(), ends.tolist()):
+            route_id, day = key >> 32, EPOCH + timedelta(days=key & 0xFFFFFFFF)
+            day_sketches = self._sketches.get((route_id, day))
+            if day_sketches is None:
+                day_sketches = {metric: QuantileSketch(self.alpha) for metric in self.METRICS}
+                self._sketches[(route_id, day)] = day_sketches
+            if route_id in airlines:
+                self._route_airline[route_id] = airlines[route_id]
+            day_sketches['efficiency'].add_many(efficiency[start:end])
+            day_sketches['fuel_per_km'].add_many(fuel_per_km[start:end])
+
+    def _add_flight(self, row):
+        if row['flight_date'] is None:
+            return
+        key = (row['route_id'], row['flight_date'])
+        day_sketches = self._sketches.get(key)
+        if day_sketches is None:
+            day_sketches = {metric: QuantileSketch(self.alpha) for metric in self.METRICS}
+            self._sketches[key] = day_sketches
+        self._route_airline[row['route_id']] = row['airline_id']
+        if row['efficiency_score'] is not None:
+            day_sketches['efficiency'].add(row['efficiency_score'])
+        if row['fuel_per_km'] is not None:
+            day_sketches['fuel_per_km'].add(row['fuel_per_km'])
+
+    def _expire(self):
+        cutoff = date.today() - timedelta(days=self.retention_days)
+        for key in [k for k in self._sketches if k[1] < cutoff]:
+            del self._sketches[key]
+
+    def distribution(self, metric, start, end, route_id=None, airline=None, group_by="network"):
+        """
+        Merge day sketches in [start, end] into one sketch per group
+        group_by: network, route, airline (keyed by airline_id) or day
+        """
+        groups = {}
+        with self._lock:
+            for (key_route, key_day), day_sketches in self._sketches.items():
+                if key_day < start or key_day > end:
+                    continue
+                if route_id is not None and key_route != route_id:
+                    continue
+                key_airline = self._route_airline.get(key_route)
+                if airline is not None and key_airline != airline:
+                    continue
+
+                if group_by == "route":
+                    group = key_route
+                elif group_by == "airline":
+                    group = key_airline
+                elif group_by == "day":
+                    group = key_day.isoformat()
+                else:
+                    group = "network"
+
+                merged = groups.get(group)
+                if merged is None:
+                    merged = groups[group] = QuantileSketch(self.alpha)
+                merged.merge(day_sketches[metric])
+        return groups
+
+    def stats(self):
+        with self._lock:
+            return {
+                "day_sketches": len(self._sketches),
+                "routes": len(self._route_airline),
+                "high_water_performance_id": {shard: mark.last_id for shard, mark in self._marks.items()},
+                "pending_gaps": sum(len(mark.gaps) for mark in self._marks.values()),
+                "cold_files": len(self._cold_files)
+            }
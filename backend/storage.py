@@ -0,0 +1,280 @@
+"""
+SkySQL Intelligence Storage Backends
+MariaDB server connections or an embedded in-process SQLite database
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import errors
+
+from dialect import to_sqlite
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("mariadb", "embedded")
+
+
+class MariaDBBackend:
+    """MariaDB/MySQL server over the network (the default)"""
+
+    name = "mariadb"
+
+    def connect(self, db_config):
+        return mysql.connector.connect(**db_config)
+
+    def describe(self, db_config):
+        return {"backend": self.name, "host": db_config.get("host"), "port": db_config.get("port"),
+                "database": db_config.get("database")}
+
+
+# Values go in and come out as the MariaDB driver would hand them over
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DECIMAL", lambda raw: Decimal(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+def _concat_ws(separator, *values):
+    if separator is None:
+        return None
+    return str(separator).join(str(value) for value in values if value is not None)
+
+
+def _crc32(value):
+    if value is None:
+        return None
+    return zlib.crc32(str(value).encode())
+
+
+def _driver_error(error):
+    """The mysql.connector exception a MariaDB server would have raised"""
+    message = str(error)
+    if isinstance(error, sqlite3.IntegrityError):
+        return errors.IntegrityError(msg=message)
+    if isinstance(error, sqlite3.OperationalError):
+        if "locked" in message or "busy" in message or "disk" in message or "unable to open" in message:
+            return errors.OperationalError(msg=message)
+        # No such table/column, syntax errors: the database answered
+        return errors.ProgrammingError(msg=message)
+    if isinstance(error, sqlite3.ProgrammingError):
+        return errors.InterfaceError(msg=message)
+    return errors.DatabaseError(msg=message)
+
+
+class EmbeddedCursor:
+    """
+    mysql.connector cursor interface over a sqlite3 cursor
+
+    Every statement is translated from the MariaDB dialect (cached); rows are
+    tuples or, with dictionary=True, dicts, and column_names is available
+    after execute just like on the MariaDB cursors the backend uses.
+    """
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._dictionary = dictionary
+        self.column_names = ()
+
+    def _row(self, row):
+        return dict(zip(self.column_names, row)) if self._dictionary else row
+
+    def _run(self, sql, params, many=False):
+        statements = to_sqlite(sql)
+        if any("information_schema_" in statement for statement in statements):
+            self._connection.refresh_catalog()
+        try:
+            for statement in statements:
+                if many:
+                    self._cursor.executemany(statement, params)
+                else:
+                    self._cursor.execute(statement, params if params is not None else ())
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        description = self._cursor.description
+        self.column_names = tuple(column[0] for column in description) if description else ()
+
+    def execute(self, sql, params=None):
+        self._run(sql, params)
+
+    def executemany(self, sql, seq_params):
+        self._run(sql, seq_params, many=True)
+
+    def fetchone(self):
+        try:
+            row = self._cursor.fetchone()
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        return None if row is None else self._row(row)
+
+    def fetchmany(self, size=1):
+        try:
+            rows = self._cursor.fetchmany(size)
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        return [self._row(row) for row in rows] if self._dictionary else rows
+
+    def fetchall(self):
+        try:
+            rows = self._cursor.fetchall()
+        except sqlite3.Error as e:
+            raise _driver_error(e) from e
+        return [self._row(row) for row in rows] if self._dictionary else rows
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class EmbeddedConnection:
+    """
+    mysql.connector connection interface over a sqlite3 connection
+
+    Runs in autocommit mode like the MariaDB pool connections, so commit()
+    is a no-op outside explicit transactions. information_schema.TABLES and
+    COLUMNS are emulated by temporary views rebuilt when the schema changes:
+    TABLE_ROWS is the highest rowid (an upper-bound estimate, like InnoDB's)
+    and AUTO_INCREMENT comes from sqlite_sequence.
+    """
+
+    def __init__(self, raw, database):
+        self.raw = raw
+        self.database = database
+        self._catalog_version = None
+        self._open = True
+
+    def cursor(self, dictionary=False, buffered=None, prepared=False):
+        # sqlite3 steps rows lazily (unbuffered) and caches compiled statements
+        # per connection, which is what a prepared cursor buys on MariaDB
+        return EmbeddedCursor(self, dictionary=dictionary)
+
+    def refresh_catalog(self):
+        version = self.raw.execute("PRAGMA schema_version").fetchone()[0]
+        if version == self._catalog_version:
+            return
+        tables = [row[0] for row in self.raw.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        has_sequence = self.raw.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone() is not None
+        selects = [
+            f"SELECT '{self.database}' AS TABLE_SCHEMA, '{table}' AS TABLE_NAME, "
+            f"(SELECT MAX(rowid) FROM \"{table}\") AS TABLE_ROWS, "
+            + (f"(SELECT seq + 1 FROM sqlite_sequence WHERE name = '{table}')" if has_sequence else "NULL")
+            + " AS AUTO_INCREMENT"
+            for table in tables
+        ] or ["SELECT NULL AS TABLE_SCHEMA, NULL AS TABLE_NAME, NULL AS TABLE_ROWS, NULL AS AUTO_INCREMENT "
+              "WHERE 0"]
+        self.raw.execute("DROP VIEW IF EXISTS temp.information_schema_tables")
+        self.raw.execute("CREATE TEMP VIEW information_schema_tables AS " + " UNION ALL ".join(selects))
+        self.raw.execute("DROP VIEW IF EXISTS temp.information_schema_columns")
+        self.raw.execute(f"""
+            CREATE TEMP VIEW information_schema_columns AS
+            SELECT '{self.database}' AS TABLE_SCHEMA, m.name AS TABLE_NAME, c.name AS COLUMN_NAME,
+                   lower(CASE WHEN instr(c.type, '(') THEN substr(c.type, 1, instr(c.type, '(') - 1)
+                              ELSE c.type END) AS DATA_TYPE,
+                   CASE WHEN c."notnull" OR c.pk THEN 'NO' ELSE 'YES' END AS IS_NULLABLE,
+                   c.cid + 1 AS ORDINAL_POSITION
+            FROM main.sqlite_master m JOIN pragma_table_info(m.name) c
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+        """)
+        # Creating the temp view bumps only the temp schema, not main's version
+        self._catalog_version = version
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.commit()
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.rollback()
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+        self.raw.close()
+
+
+class EmbeddedBackend:
+    """
+    In-process SQLite database per logical database name
+
+    Each MariaDB database (db_config["database"], so also each shard) maps
+    to <directory>/<database>.db. Connections open in WAL mode, so the pool's
+    readers do not block the writer, and queries skip the network round trip
+    entirely. directory=":memory:" keeps every database in shared memory for
+    tests and CI.
+    """
+
+    name = "embedded"
+
+    def __init__(self, directory, busy_timeout=5.0):
+        self.directory = directory
+        self.busy_timeout = busy_timeout
+        self._lock = threading.Lock()
+        # Shared in-memory databases vanish with their last connection
+        self._keepalive = {}
+
+    def path(self, database):
+        if self.directory == ":memory:":
+            return f"file:skysql_{database}?mode=memory&cache=shared"
+        return os.path.join(self.directory, f"{database}.db")
+
+    def connect(self, db_config):
+        database = db_config.get("database") or "skysql_intelligence"
+        path = self.path(database)
+        try:
+            if self.directory != ":memory:":
+                os.makedirs(self.directory, exist_ok=True)
+            raw = sqlite3.connect(path, timeout=self.busy_timeout, isolation_level=None,
+                                  detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                                  uri=self.directory == ":memory:", cached_statements=256)
+            if self.directory == ":memory:":
+                with self._lock:
+                    self._keepalive.setdefault(database, sqlite3.connect(path, uri=True, check_same_thread=False))
+            else:
+                raw.execute("PRAGMA journal_mode = WAL")
+                raw.execute("PRAGMA synchronous = NORMAL")
+        except (sqlite3.Error, OSError) as e:
+            raise errors.InterfaceError(msg=f"Cannot open embedded database {path}: {e}") from e
+        raw.create_function("CONCAT_WS", -1, _concat_ws, deterministic=True)
+        raw.create_function("CRC32", 1, _crc32, deterministic=True)
+        raw.create_function("DATABASE", 0, lambda: database, deterministic=True)
+        return EmbeddedConnection(raw, database)
+
+    def describe(self, db_config):
+        return {"backend": self.name, "path": self.path(db_config.get("database") or "skysql_intelligence")}
+
+
+def backend_from_env():
+    """
+    SKYSQL_BACKEND=mariadb (default) or embedded; SKYSQL_EMBEDDED_DIR sets
+    the embedded database directory (default data/embedded, or :memory:)
+    """
+    kind = os.environ.get("SKYSQL_BACKEND", "mariadb").strip().lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"SKYSQL_BACKEND must be one of {', '.join(BACKENDS)}")
+    if kind == "mariadb":
+        return MariaDBBackend()
+    directory = os.environ.get("SKYSQL_EMBEDDED_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "data", "embedded")
+    logger.info(f"Using embedded SQLite storage in {directory}")
+    return EmbeddedBackend(directory)
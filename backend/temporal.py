@@ -0,0 +1,292 @@
+"""
+SkySQL Intelligence Temporal History
+Trigger-maintained system-versioned history for routes and aircraft_config
+"""
+
+import bisect
+import logging
+import threading
+import time
+from datetime import date, datetime, time as day_time, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Versioned tables: key column, the versioned columns with their types, and
+# whether the table is split across shards (otherwise read from the primary)
+VERSIONED_TABLES = {
+    "routes": {
+        "key": "route_id",
+        "columns": {
+            "airline_id": "INT",
+            "source_airport_id": "INT",
+            "dest_airport_id": "INT",
+            "distance_km": "INT",
+            "base_fuel_kg": "INT",
+        },
+        "sharded": True
+    },
+    "aircraft_config": {
+        "key": "config_id",
+        "columns": {
+            "aircraft_model": "VARCHAR(50)",
+            "fuel_efficiency": "DECIMAL(8, 4)",
+            "seat_capacity": "INT",
+            "max_range_km": "INT",
+        },
+        "sharded": False
+    }
+}
+
+_OPERATIONS = (("ai", "INSERT", "I", "NEW"), ("au", "UPDATE", "U", "NEW"), ("ad", "DELETE", "D", "OLD"))
+
+
+def schema_statements():
+    """
+    DDL for the <table>_history tables and their triggers (idempotent)
+    Every insert and update appends the new row version, every delete a
+    tombstone; a version is valid from its valid_from until the next
+    version of the same key.
+    """
+    statements = []
+    for table, spec in VERSIONED_TABLES.items():
+        key, columns = spec["key"], spec["columns"]
+        column_ddl = "".join(f"{name} {kind},\n                " for name, kind in columns.items())
+        statements.append(f"""
+            CREATE TABLE IF NOT EXISTS {table}_history (
+                history_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                {key} INT NOT NULL,
+                {column_ddl}operation CHAR(1) NOT NULL,
+                valid_from DATETIME(6) NOT NULL,
+                INDEX idx_{key}_valid_from ({key}, valid_from)
+            )
+        """)
+        names = ", ".join((key,) + tuple(columns))
+        for suffix, event, code, row in _OPERATIONS:
+            values = ", ".join(f"{row}.{name}" for name in (key,) + tuple(columns))
+            statements.append(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_history_{suffix}
+                AFTER {event} ON {table} FOR EACH ROW
+                INSERT INTO {table}_history ({names}, operation, valid_from)
+                VALUES ({values}, '{code}', NOW(6))
+            """)
+    return statements
+
+
+def seed_statement(table):
+    """
+    First version for rows that predate their history (or the triggers),
+    valid from the row's created_at
+    """
+    spec = VERSIONED_TABLES[table]
+    key = spec["key"]
+    names = ", ".join((key,) + tuple(spec["columns"]))
+    return f"""
+        INSERT INTO {table}_history ({names}, operation, valid_from)
+        SELECT {", ".join(f"t.{name}" for name in (key,) + tuple(spec["columns"]))}, 'I',
+               COALESCE(t.created_at, NOW())
+        FROM {table} t
+        WHERE NOT EXISTS (SELECT 1 FROM {table}_history h WHERE h.{key} = t.{key})
+    """
+
+
+def parse_as_of(value):
+    """
+    Point in time for an as_of parameter: a datetime, or a date meaning the
+    end of that day. History is stamped in the server's local time (NOW(6)),
+    so a datetime with an offset or Z is converted to local time and returned
+    naive. Raises ValueError for anything else.
+    """
+    try:
+        if len(value) == 10:
+            return datetime.combine(date.fromisoformat(value) + timedelta(days=1), day_time.min) \
+                - timedelta(microseconds=1)
+        when = datetime.fromisoformat(value.replace("T", " ").replace("Z", "+00:00"))
+        return when.astimezone().replace(tzinfo=None) if when.tzinfo is not None else when
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("as_of must be an ISO date (YYYY-MM-DD) or datetime (YYYY-MM-DDTHH:MM:SS)")
+
+
+class _Versions:
+    """Row versions of one table: per key, valid_from times and rows in order"""
+
+    __slots__ = ("starts", "rows", "last_id", "gaps")
+
+    def __init__(self):
+        self.starts = {}
+        self.rows = {}
+        self.last_id = {}   # shard name -> highest history_id loaded
+        self.gaps = {}      # shard name -> {history_id below last_id not seen yet: first missed (monotonic)}
+
+    def add(self, key, valid_from, row):
+        starts = self.starts.setdefault(key, [])
+        rows = self.rows.setdefault(key, [])
+        # Ordered by valid_from; equal timestamps keep arrival order
+        position = bisect.bisect_right(starts, valid_from)
+        starts.insert(position, valid_from)
+        rows.insert(position, row)
+
+    def at(self, key, when):
+        starts = self.starts.get(key)
+        if not starts:
+            return None
+        position = bisect.bisect_right(starts, when) - 1
+        return self.rows[key][position] if position >= 0 else None
+
+
+class TemporalIndex:
+    """
+    In-memory interval index over the history tables
+
+    Each key's versions are kept sorted by valid_from, so resolving a row as
+    of a point in time is one binary search and a whole table as of a point
+    in time is one search per key; the history table is never scanned for a
+    query. The index loads history incrementally by history_id. History is
+    append-only and stamped with the database clock, so any point in time
+    before the database time of the last load is complete; only later as_of
+    values wait for a refresh (at most every `refresh_interval` seconds).
+
+    history_ids are assigned at insert, not at commit, so a version can
+    become visible after a higher id has been loaded. Ids skipped over are
+    kept as gaps and re-read on every refresh until they show up or are
+    older than `gap_timeout` seconds (rolled back, or never used).
+    """
+
+    MAX_GAP = 1000
+
+    def __init__(self, db, refresh_interval=30.0, gap_timeout=300.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.gap_timeout = gap_timeout
+        self._tables = {table: _Versions() for table in VERSIONED_TABLES}
+        self._lock = threading.Lock()
+        self._loaded_until = None
+        self._last_refresh = 0.0
+        self.has_history = None
+        self.lookups = 0
+        self.versions_loaded = 0
+
+    def ensure_schema(self):
+        """Create the history tables and triggers on every shard and seed existing rows"""
+        for shard in self.db.shards:
+            for statement in schema_statements():
+                if not self.db.execute_query(statement, fetch=False, shard=shard):
+                    logger.warning(f"History schema incomplete on shard {shard.name}")
+                    return False
+            for table in VERSIONED_TABLES:
+                if not self.db.execute_query(seed_statement(table), fetch=False, shard=shard):
+                    return False
+        self.has_history = True
+        logger.info("History tables and triggers verified")
+        return True
+
+    def _load(self, table, shard):
+        spec = VERSIONED_TABLES[table]
+        versions = self._tables[table]
+        columns = ", ".join(spec["columns"])
+        last_id = versions.last_id.get(shard.name, 0)
+        now = time.monotonic()
+        gaps = {history_id: missed for history_id, missed in versions.gaps.get(shard.name, {}).items()
+                if now - missed < self.gap_timeout}
+        rows = self.db.execute_query(f"""
+            SELECT history_id, {spec['key']}, {columns}, operation, valid_from
+            FROM {table}_history
+            WHERE history_id > %s
+            ORDER BY history_id
+        """, (min(gaps, default=last_id + 1) - 1,), shard=shard)
+        if rows is None:
+            return False
+        loaded = 0
+        started = shard.name in versions.last_id
+        for row in rows:
+            history_id = row["history_id"]
+            if history_id <= last_id and gaps.pop(history_id, None) is None:
+                continue  # loaded on an earlier refresh
+            if history_id > last_id:
+                # Ids in flight are a handful; ids before the first one loaded
+                # or a counter jump are not gaps
+                if started and history_id - last_id <= self.MAX_GAP:
+                    gaps.update(dict.fromkeys(range(last_id + 1, history_id), now))
+                last_id, started = history_id, True
+            version = None
+            if row["operation"] != "D":
+                version = {name: row[name] for name in spec["columns"]}
+                version["valid_from"] = row["valid_from"]
+            versions.add(row[spec["key"]], row["valid_from"], version)
+            loaded += 1
+        versions.last_id[shard.name] = last_id
+        versions.gaps[shard.name] = gaps
+        self.versions_loaded += loaded
+        return True
+
+    def _database_now(self, shard):
+        rows = self.db.execute_query("SELECT NOW(6) as now", shard=shard)
+        if not rows:
+            return None
+        now = rows[0]["now"]
+        return now if isinstance(now, datetime) else datetime.fromisoformat(str(now))
+
+    def refresh(self, force=False):
+        if not force and self._loaded_until is not None \
+                and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            if not force and self._loaded_until is not None \
+                    and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return True
+            if not self.has_history and not self.ensure_schema():
+                return False
+            # Versions stamped after this instant (database clock) may still be missing
+            clocks = [self._database_now(shard) for shard in self.db.shards]
+            if None in clocks:
+                return False
+            loaded_until = min(clocks) - timedelta(seconds=1)
+            for table, spec in VERSIONED_TABLES.items():
+                shards = self.db.shards if spec["sharded"] else [self.db.shards.primary]
+                for shard in shards:
+                    if not self._load(table, shard):
+                        return False
+            self._loaded_until = loaded_until
+            self._last_refresh = time.monotonic()
+        return True
+
+    def _ready_for(self, when):
+        if self._loaded_until is not None and when <= self._loaded_until:
+            return True
+        return self.refresh()
+
+    def row_as_of(self, table, key, when):
+        """The row version of `key` valid at `when`, or None if it did not exist"""
+        if not self._ready_for(when):
+            raise RuntimeError("History unavailable")
+        self.lookups += 1
+        return self._tables[table].at(key, when)
+
+    def table_as_of(self, table, when):
+        """{key: row} of every row that existed at `when`"""
+        if not self._ready_for(when):
+            raise RuntimeError("History unavailable")
+        versions = self._tables[table]
+        rows = {}
+        for key in versions.starts:
+            row = versions.at(key, when)
+            if row is not None:
+                rows[key] = row
+        self.lookups += len(rows)
+        return rows
+
+    def versions(self, table, key):
+        """Every version of `key` as (valid_from, row or None for a deletion)"""
+        versions = self._tables[table]
+        return list(zip(versions.starts.get(key, ()), versions.rows.get(key, ())))
+
+    def stats(self):
+        return {
+            "tables": {
+                table: {"keys": len(versions.starts), "versions": sum(map(len, versions.starts.values()))}
+                for table, versions in self._tables.items()
+            },
+            "loaded_until": self._loaded_until.isoformat() if self._loaded_until else None,
+            "versions_loaded": self.versions_loaded,
+            "pending_gaps": sum(len(gaps) for versions in self._tables.values() for gaps in versions.gaps.values()),
+            "lookups": self.lookups
+        }
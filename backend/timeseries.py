@@ -0,0 +1,252 @@
+"""
+SkySQL Intelligence Time-Series Pyramids
+Incrementally maintained daily/weekly/monthly rollups of operational_metrics with LTTB downsampling
+"""
+
+import bisect
+import threading
+import time
+from datetime import date, timedelta
+
+from watermark import IdWatermark
+
+
+class Bucket:
+    """
+    Additive aggregate for one time bucket
+
+    Rates (efficiency, passenger load, on-time performance) are stored as
+    flight-weighted sums so buckets can be merged and rolled up exactly. A
+    row without flights weighs 1, in the sums and in `weight` alike.
+    """
+
+    __slots__ = ("rows", "flights", "weight", "fuel_used", "fuel_saved", "efficiency_w", "load_w", "on_time_w")
+
+    def __init__(self):
+        self.rows = 0
+        self.flights = 0
+        self.weight = 0
+        self.fuel_used = 0.0
+        self.fuel_saved = 0.0
+        self.efficiency_w = 0.0
+        self.load_w = 0.0
+        self.on_time_w = 0.0
+
+    def add(self, row):
+        flights = int(row['total_flights'] or 0)
+        weight = flights or 1
+        self.rows += 1
+        self.flights += flights
+        self.weight += weight
+        self.fuel_used += float(row['total_fuel_used_kg'] or 0)
+        self.fuel_saved += float(row['total_fuel_saved_kg'] or 0)
+        self.efficiency_w += float(row['avg_efficiency'] or 0) * weight
+        self.load_w += float(row['avg_passenger_load'] or 0) * weight
+        self.on_time_w += float(row['on_time_performance'] or 0) * weight
+
+    def value(self, metric):
+        weight = self.weight
+        if metric == "total_flights":
+            return self.flights
+        if metric == "total_fuel_used_kg":
+            return self.fuel_used
+        if metric == "total_fuel_saved_kg":
+            return self.fuel_saved
+        if not weight:
+            return None
+        if metric == "avg_efficiency":
+            return self.efficiency_w / weight
+        if metric == "avg_passenger_load":
+            return self.load_w / weight
+        if metric == "on_time_performance":
+            return self.on_time_w / weight
+        raise KeyError(metric)
+
+
+def bucket_start(day, resolution):
+    if resolution == "day":
+        return day
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    points: list of (x, y) sorted by x with numeric x and y
+    Keeps the first and last point and, for every bucket in between, the
+    point forming the largest triangle with its neighbours, which preserves
+    the visual shape of the series at a fixed point budget.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, count)
+        span = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in span) / len(span)
+        avg_y = sum(p[1] for p in span) / len(span)
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+        best_area, best = -1.0, start
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+class MetricsPyramid:
+    """
+    Daily, weekly and monthly rollups of operational_metrics
+
+    Rows are folded in once, using a metric_id watermark (see IdWatermark),
+    into every resolution for the network and for the row's airline. A
+    series request picks the finest resolution whose bucket count fits the
+    point budget (allowing LTTB to trim the rest), so the work per request
+    depends on the point budget rather than on the length of the history.
+
+    Folding is insert-only: an updated or deleted operational_metrics row
+    keeps its old contribution until the next full rebuild, which runs in
+    the background every `rebuild_interval` seconds (None disables it) and
+    swaps the reloaded pyramid in.
+    """
+
+    RESOLUTIONS = ("day", "week", "month")
+    METRICS = ("total_flights", "avg_efficiency", "total_fuel_used_kg", "total_fuel_saved_kg",
+               "avg_passenger_load", "on_time_performance")
+
+    def __init__(self, db, refresh_interval=30.0, batch_size=20000, oversample=4, rebuild_interval=3600.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.oversample = oversample
+        self.rebuild_interval = rebuild_interval
+        self._levels = {}            # (scope: "network" or airline_id, resolution) -> {bucket_start: Bucket}
+        self._keys = {}              # same key -> sorted bucket starts, for range lookups
+        self._mark = IdWatermark()   # over metric_id
+        self._last_refresh = 0.0
+        self._built_at = time.monotonic()
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def refresh(self, force=False):
+        """Fold newly inserted operational_metrics rows into the pyramids"""
+        if self.rebuild_interval and not self._rebuilding \
+                and time.monotonic() - self._built_at >= self.rebuild_interval:
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild, name="metrics-pyramid-rebuild", daemon=True).start()
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return True
+        with self._lock:
+            after = self._mark.after()
+            while True:
+                rows = self.db.execute_query("""
+                    SELECT
+                        metric_id,
+                        metric_date,
+                        airline_id,
+                        total_flights,
+                        avg_efficiency,
+                        total_fuel_used_kg,
+                        total_fuel_saved_kg,
+                        avg_passenger_load,
+                        on_time_performance
+                    FROM operational_metrics
+                    WHERE metric_id > %s
+                    ORDER BY metric_id
+                    LIMIT %s
+                """, (after, self.batch_size))
+                if rows is None:
+                    return False
+                for row in rows:
+                    if self._mark.accept(row['metric_id']):
+                        self._fold(row)
+                if rows:
+                    after = rows[-1]['metric_id']
+                if len(rows) < self.batch_size:
+                    break
+            self._last_refresh = time.monotonic()
+        return True
+
+    def _rebuild(self):
+        """Reload every row into a fresh pyramid off the lock, then swap it in"""
+        try:
+            fresh = MetricsPyramid(self.db, batch_size=self.batch_size, rebuild_interval=None)
+            if fresh.refresh(force=True):
+                with self._lock:
+                    # Rows folded here meanwhile are above fresh's mark and are read again
+                    self._levels, self._keys, self._mark = fresh._levels, fresh._keys, fresh._mark
+                    self.rebuilds += 1
+        finally:
+            self._built_at = time.monotonic()
+            self._rebuilding = False
+
+    def _fold(self, row):
+        day = row['metric_date']
+        if day is None:
+            return
+        scopes = ("network", row['airline_id']) if row['airline_id'] else ("network",)
+        for scope in scopes:
+            for resolution in self.RESOLUTIONS:
+                level = self._levels.setdefault((scope, resolution), {})
+                start = bucket_start(day, resolution)
+                bucket = level.get(start)
+                if bucket is None:
+                    bucket = level[start] = Bucket()
+                    bisect.insort(self._keys.setdefault((scope, resolution), []), start)
+                bucket.add(row)
+
+    def choose_resolution(self, start, end, points):
+        """Finest resolution whose bucket count is within the oversampled budget"""
+        days = (end - start).days + 1
+        budget = points * self.oversample
+        if days <= budget:
+            return "day"
+        if days / 7 <= budget:
+            return "week"
+        return "month"
+
+    def series(self, metric, start, end, points, scope="network", resolution=None):
+        """(resolution, source bucket count, [(bucket_start, value)]) for a range"""
+        if metric not in self.METRICS:
+            raise KeyError(metric)
+        resolution = resolution or self.choose_resolution(start, end, points)
+        first = bucket_start(start, resolution)
+        with self._lock:
+            level = self._levels.get((scope, resolution), {})
+            keys = self._keys.get((scope, resolution), [])
+            days = keys[bisect.bisect_left(keys, first):bisect.bisect_right(keys, end)]
+            raw = [(day, level[day].value(metric)) for day in days]
+        raw = [(day, value) for day, value in raw if value is not None]
+
+        epoch = date(1970, 1, 1)
+        numeric = [((day - epoch).days, float(value)) for day, value in raw]
+        sampled = lttb(numeric, points)
+        return resolution, len(raw), [(epoch + timedelta(days=x), y) for x, y in sampled]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "levels": {f"{scope}:{res}": len(level) for (scope, res), level in self._levels.items()
+                           if scope == "network"},
+                "scopes": len({scope for scope, _ in self._levels}),
+                "high_water_metric_id": self._mark.last_id,
+                "pending_gaps": len(self._mark.gaps),
+                "rebuilds": self.rebuilds
+            }
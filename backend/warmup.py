@@ -0,0 +1,95 @@
+"""
+SkySQL Intelligence Warm-up Coordinator
+Background, concurrent cache warm-up behind a readiness gate
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupCoordinator:
+    """
+    Runs named warm-up tasks concurrently in the background
+
+    Each task is a zero-argument callable returning a truthy value on success.
+    Failed tasks are retried every `retry_interval` seconds until they succeed,
+    and the coordinator only reports ready once every task has succeeded.
+    """
+
+    def __init__(self, max_workers=4, retry_interval=5.0):
+        self.max_workers = max_workers
+        self.retry_interval = retry_interval
+        self._tasks = {}
+        self._status = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.started_at = None
+        self.completed_at = None
+
+    def add_task(self, name, func):
+        self._tasks[name] = func
+        self._status[name] = {"state": "pending", "attempts": 0, "duration_ms": None, "error": None}
+
+    def start(self):
+        """Start warming in a daemon thread; returns immediately"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="cache-warmup", daemon=True)
+            self._thread.start()
+
+    def _run_task(self, name):
+        with self._lock:
+            status = self._status[name]
+            status["state"] = "running"
+            status["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            ok = bool(self._tasks[name]())
+            error = None if ok else "task reported failure"
+        except Exception as e:
+            ok, error = False, str(e)
+        with self._lock:
+            status["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            status["state"] = "done" if ok else "failed"
+            status["error"] = error
+        if not ok:
+            logger.warning(f"Warm-up task '{name}' failed: {error}")
+        return ok
+
+    def _run(self):
+        pending = list(self._tasks)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="warmup") as pool:
+            while pending:
+                results = dict(zip(pending, pool.map(self._run_task, pending)))
+                pending = [name for name, ok in results.items() if not ok]
+                if pending:
+                    time.sleep(self.retry_interval)
+        self.completed_at = time.perf_counter()
+        self._ready.set()
+        logger.info(f"Warm-up completed in {self.completed_at - self.started_at:.2f}s")
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def snapshot(self):
+        with self._lock:
+            tasks = {name: dict(status) for name, status in self._status.items()}
+        elapsed = None
+        if self.started_at is not None:
+            end = self.completed_at or time.perf_counter()
+            elapsed = round(end - self.started_at, 3)
+        return {
+            "ready": self.is_ready(),
+            "warmup_seconds": elapsed,
+            "tasks": tasks
+        }
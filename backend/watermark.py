@@ -0,0 +1,48 @@
+"""
+SkySQL Intelligence Id Watermarks
+Incremental-load high-water marks over AUTO_INCREMENT ids that tolerate late commits
+"""
+
+import time
+
+
+class IdWatermark:
+    """
+    Highest id folded in, plus the ids below it that have not been seen yet
+
+    AUTO_INCREMENT ids are assigned at insert, not at commit, so a row can
+    become visible after a higher id has been loaded. Ids skipped over are
+    kept as gaps and re-read on every load until they show up or are older
+    than `gap_timeout` seconds (rolled back, or never used), the same
+    handling as the history loads in temporal.TemporalIndex.
+
+    A load reads ids above after(), in id order, and folds in only the rows
+    accept() returns True for.
+    """
+
+    MAX_GAP = 1000
+
+    __slots__ = ("last_id", "gaps", "gap_timeout", "_started")
+
+    def __init__(self, gap_timeout=300.0):
+        self.last_id = 0
+        self.gaps = {}      # id below last_id not seen yet -> first missed (monotonic)
+        self.gap_timeout = gap_timeout
+        self._started = False
+
+    def after(self):
+        """Read rows with ids above this: just below the oldest open gap, else last_id"""
+        now = time.monotonic()
+        self.gaps = {row_id: missed for row_id, missed in self.gaps.items() if now - missed < self.gap_timeout}
+        return min(self.gaps, default=self.last_id + 1) - 1
+
+    def accept(self, row_id):
+        """True for an id not folded in before; advances the mark and records skipped ids"""
+        if row_id <= self.last_id:
+            return self.gaps.pop(row_id, None) is not None
+        # Ids in flight are a handful; ids before the first one loaded or a
+        # counter jump are not gaps
+        if self._started and row_id - self.last_id <= self.MAX_GAP:
+            self.gaps.update(dict.fromkeys(range(self.last_id + 1, row_id), time.monotonic()))
+        self.last_id, self._started = row_id, True
+        return True
@@ -0,0 +1,450 @@
+"""
+SkySQL Intelligence Weather Enrichment
+Concurrent per-(airport, day) weather lookups joined onto flight_performance
+"""
+
+import asyncio
+import csv
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+import requests
+
+from geo import initial_bearing
+
+logger = logging.getLogger(__name__)
+
+# Daily observation fields every provider returns
+FIELDS = ("wind_speed_kmh", "wind_direction_deg", "temperature_c", "precipitation_mm")
+
+PROVIDERS = ("file", "open-meteo")
+
+
+def schema_statements(primary=True):
+    """
+    DDL for flight_weather (per-flight context, on every shard next to
+    flight_performance) and, on the primary, weather_observations (the
+    persistent lookup cache)
+    """
+    statements = ["""
+        CREATE TABLE IF NOT EXISTS flight_weather (
+            performance_id BIGINT PRIMARY KEY,
+            origin_wind_kmh DECIMAL(5, 1),
+            dest_wind_kmh DECIMAL(5, 1),
+            headwind_kmh DECIMAL(6, 1),
+            temperature_c DECIMAL(4, 1),
+            precipitation_mm DECIMAL(6, 1),
+            source VARCHAR(20),
+            enriched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """]
+    if primary:
+        statements.append("""
+            CREATE TABLE IF NOT EXISTS weather_observations (
+                iata_code VARCHAR(3) NOT NULL,
+                obs_date DATE NOT NULL,
+                wind_speed_kmh DECIMAL(5, 1),
+                wind_direction_deg INT,
+                temperature_c DECIMAL(4, 1),
+                precipitation_mm DECIMAL(6, 1),
+                source VARCHAR(20),
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (iata_code, obs_date)
+            )
+        """)
+    return statements
+
+
+class WeatherProvider:
+    """
+    Source of daily airport weather
+
+    fetch(airport, days) is a coroutine returning {day: {FIELDS...}} for the
+    days it has data for; airport is a dict with iata_code, latitude and
+    longitude. Days a provider cannot answer are simply left out.
+    """
+
+    name = "provider"
+
+    async def fetch(self, airport, days):
+        raise NotImplementedError
+
+
+class FileWeatherProvider(WeatherProvider):
+    """
+    Local stand-in for a weather API, read from a CSV file with the columns
+    iata_code, obs_date and FIELDS. latency (seconds per lookup) emulates a
+    remote service, so concurrency can be exercised offline.
+    """
+
+    name = "file"
+
+    def __init__(self, path, latency=0.0):
+        self.path = path
+        self.latency = latency
+        self._observations = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._observations is None:
+                observations = {}
+                if os.path.exists(self.path):
+                    with open(self.path, newline='') as handle:
+                        for row in csv.DictReader(handle):
+                            observations[(row['iata_code'], date.fromisoformat(row['obs_date']))] = {
+                                field: float(row[field]) if row.get(field) not in (None, '') else None
+                                for field in FIELDS
+                            }
+                else:
+                    logger.warning(f"Weather file {self.path} not found; no observations available")
+                self._observations = observations
+        return self._observations
+
+    async def fetch(self, airport, days):
+        observations = self._observations
+        if observations is None:
+            observations = await asyncio.to_thread(self._load)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        code = airport['iata_code']
+        return {day: observations[(code, day)] for day in days if (code, day) in observations}
+
+
+class OpenMeteoProvider(WeatherProvider):
+    """
+    Open-Meteo historical daily weather (no API key), one request per
+    airport covering the requested days. requests is blocking, so calls run
+    on the default executor and the enricher's semaphore bounds them.
+    """
+
+    name = "open-meteo"
+    DAILY = "wind_speed_10m_max,wind_direction_10m_dominant,temperature_2m_mean,precipitation_sum"
+
+    def __init__(self, base_url="https://archive-api.open-meteo.com/v1/archive", timeout=10.0):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def _get(self, airport, first, last):
+        response = requests.get(self.base_url, timeout=self.timeout, params={
+            "latitude": float(airport['latitude']),
+            "longitude": float(airport['longitude']),
+            "start_date": first.isoformat(),
+            "end_date": last.isoformat(),
+            "daily": self.DAILY,
+            "wind_speed_unit": "kmh",
+            "timezone": "UTC"
+        })
+        response.raise_for_status()
+        return response.json().get("daily") or {}
+
+    async def fetch(self, airport, days):
+        if airport.get('latitude') is None or airport.get('longitude') is None:
+            return {}
+        daily = await asyncio.to_thread(self._get, airport, min(days), max(days))
+        wanted = set(days)
+        result = {}
+        for i, day in enumerate(daily.get("time", ())):
+            day = date.fromisoformat(day)
+            if day in wanted:
+                result[day] = {
+                    "wind_speed_kmh": daily["wind_speed_10m_max"][i],
+                    "wind_direction_deg": daily["wind_direction_10m_dominant"][i],
+                    "temperature_c": daily["temperature_2m_mean"][i],
+                    "precipitation_mm": daily["precipitation_sum"][i]
+                }
+        return result
+
+
+def provider_from_env():
+    """
+    SKYSQL_WEATHER_PROVIDER=file (default) or open-meteo; SKYSQL_WEATHER_FILE
+    sets the file provider's CSV (default data/weather/observations.csv)
+    """
+    kind = os.environ.get("SKYSQL_WEATHER_PROVIDER", "file").strip().lower()
+    if kind not in PROVIDERS:
+        raise ValueError(f"SKYSQL_WEATHER_PROVIDER must be one of {', '.join(PROVIDERS)}")
+    if kind == "open-meteo":
+        return OpenMeteoProvider()
+    return FileWeatherProvider(os.environ.get("SKYSQL_WEATHER_FILE") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "data", "weather", "observations.csv"))
+
+
+class WeatherEnricher:
+    """
+    Joins daily airport weather onto flights in bulk
+
+    Flights without a flight_weather row are streamed per shard in chunks.
+    Each chunk needs weather for its (origin, day) and (destination, day)
+    pairs; the unique pairs are resolved from an in-process LRU cache, then
+    from weather_observations, and only the rest are fetched from the
+    provider, one coroutine per airport with at most `concurrency` in
+    flight. Fetched observations are stored for the next run, and
+    flight_weather rows (with the headwind component along the route's
+    great-circle course) are written with one bulk REPLACE per chunk while
+    the next chunk is already being resolved.
+    """
+
+    FLIGHTS_QUERY = """
+        SELECT f.performance_id, f.flight_date, r.source_airport_id, r.dest_airport_id
+        FROM flight_performance f
+        JOIN routes r ON f.route_id = r.route_id
+        LEFT JOIN flight_weather w ON w.performance_id = f.performance_id
+        WHERE w.performance_id IS NULL
+          AND f.flight_date >= %s AND f.flight_date < %s
+    """
+
+    def __init__(self, db, provider, concurrency=16, chunk_size=5000, cache_size=200000):
+        self.db = db
+        self.provider = provider
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # (iata_code, day) -> observation dict, or None when unavailable
+        self._run_lock = threading.Lock()
+        self.cache_hits = 0
+        self.stored_hits = 0
+        self.fetched = 0
+        self.fetch_failures = 0
+        self.last_run = None
+
+    def ensure_schema(self):
+        for shard in self.db.shards:
+            for statement in schema_statements(primary=shard is self.db.shards.primary):
+                if not self.db.execute_query(statement, fetch=False, shard=shard):
+                    logger.warning(f"Weather tables incomplete on shard {shard.name}")
+                    return False
+        return True
+
+    # Lookup resolution
+
+    def _remember(self, key, observation):
+        self._cache[key] = observation
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _stored(self, keys):
+        """Observations already in weather_observations for the given keys"""
+        codes = sorted({code for code, _ in keys})
+        days = [day for _, day in keys]
+        placeholders = ", ".join(["%s"] * len(codes))
+        rows = self.db.execute_query(f"""
+            SELECT iata_code, obs_date, {", ".join(FIELDS)}
+            FROM weather_observations
+            WHERE obs_date >= %s AND obs_date <= %s AND iata_code IN ({placeholders})
+        """, (min(days), max(days), *codes))
+        if rows is None:
+            return {}
+        return {
+            (row['iata_code'], row['obs_date']): {
+                field: float(row[field]) if row[field] is not None else None for field in FIELDS
+            }
+            for row in rows if (row['iata_code'], row['obs_date']) in keys
+        }
+
+    async def _fetch(self, keys, airports):
+        """Fetch the keys from the provider, one bounded coroutine per airport"""
+        by_airport = {}
+        for code, day in keys:
+            by_airport.setdefault(code, []).append(day)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(code, days):
+            airport = airports.get(code) or {"iata_code": code}
+            async with semaphore:
+                try:
+                    return code, days, await self.provider.fetch(airport, sorted(days))
+                except Exception as e:
+                    logger.warning(f"Weather fetch failed for {code}: {e}")
+                    return code, days, None
+
+        return await asyncio.gather(*(one(code, days) for code, days in by_airport.items()))
+
+    async def _resolve(self, keys, airports):
+        """{key: observation or None} for every key, fetching what is not known yet"""
+        resolved, missing = {}, set()
+        for key in keys:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                resolved[key] = self._cache[key]
+                self.cache_hits += 1
+            else:
+                missing.add(key)
+        if missing:
+            stored = await asyncio.to_thread(self._stored, missing)
+            self.stored_hits += len(stored)
+            for key, observation in stored.items():
+                resolved[key] = observation
+                self._remember(key, observation)
+            missing -= stored.keys()
+        if missing:
+            fetched_rows = []
+            for code, days, result in await self._fetch(missing, airports):
+                if result is None:
+                    # Not cached, so a later run retries the lookup
+                    self.fetch_failures += len(days)
+                    continue
+                for day in days:
+                    observation = result.get(day)
+                    resolved[(code, day)] = observation
+                    self._remember((code, day), observation)
+                    if observation is not None:
+                        fetched_rows.append((code, day, *(observation[field] for field in FIELDS),
+                                             self.provider.name))
+            self.fetched += len(fetched_rows)
+            if fetched_rows:
+                await asyncio.to_thread(self.db.execute_query, f"""
+                    REPLACE INTO weather_observations (iata_code, obs_date, {", ".join(FIELDS)}, source)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, fetched_rows, False)
+        return resolved
+
+    # Joining onto flights
+
+    def _flight_rows(self, flights, weather, positions):
+        """flight_weather rows for the flights with weather at both ends"""
+        usable, origins, dests = [], [], []
+        for flight in flights:
+            origin = weather.get((flight['source_airport'], flight['flight_date']))
+            dest = weather.get((flight['dest_airport'], flight['flight_date']))
+            if origin and dest:
+                usable.append(flight)
+                origins.append([origin[field] for field in FIELDS])
+                dests.append([dest[field] for field in FIELDS])
+        if not usable:
+            return []
+
+        # One (flights x FIELDS) matrix per end; None becomes NaN
+        origin, dest = np.array(origins, dtype=float), np.array(dests, dtype=float)
+        unknown = (np.nan, np.nan)
+        src = np.array([positions.get(flight['source_airport'], unknown) for flight in usable], dtype=float)
+        dst = np.array([positions.get(flight['dest_airport'], unknown) for flight in usable], dtype=float)
+
+        # Wind direction is where the wind blows from, so wind from the
+        # course heading is a headwind; the arriving course is the reverse
+        # of the destination's course back to the origin
+        departing = initial_bearing(src[:, 0], src[:, 1], dst[:, 0], dst[:, 1])
+        arriving = (initial_bearing(dst[:, 0], dst[:, 1], src[:, 0], src[:, 1]) + 180) % 360
+        speed, direction, temperature, precipitation = range(len(FIELDS))
+        headwind = (origin[:, speed] * np.cos(np.radians(origin[:, direction] - departing))
+                    + dest[:, speed] * np.cos(np.radians(dest[:, direction] - arriving))) / 2
+
+        columns = np.round(np.column_stack([
+            origin[:, speed],
+            dest[:, speed],
+            headwind,
+            (origin[:, temperature] + dest[:, temperature]) / 2,
+            np.fmax(origin[:, precipitation], dest[:, precipitation])
+        ]), 1).tolist()
+        return [
+            (flight['performance_id'], *(None if value != value else value for value in values), self.provider.name)
+            for flight, values in zip(usable, columns)
+        ]
+
+    def _write(self, rows, shard):
+        return self.db.execute_query("""
+            REPLACE INTO flight_weather (performance_id, origin_wind_kmh, dest_wind_kmh, headwind_kmh,
+                                         temperature_c, precipitation_mm, source)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows, fetch=False, shard=shard)
+
+    async def _enrich_shard(self, shard, start, end, airports, airport_codes, positions, summary):
+        stream = await asyncio.to_thread(self.db.stream_query, self.FLIGHTS_QUERY, (start, end),
+                                         shard, self.chunk_size)
+        if stream is None:
+            raise RuntimeError(f"Could not read flights on shard {shard.name}")
+        chunks = stream.chunks()
+        pending = None
+        try:
+            while True:
+                flights = await asyncio.to_thread(next, chunks, None)
+                if flights is None:
+                    break
+                keys = set()
+                for flight in flights:
+                    # Observations are keyed by IATA code; routes hold airport keys
+                    flight['source_airport'] = airport_codes.get(flight['source_airport_id'])
+                    flight['dest_airport'] = airport_codes.get(flight['dest_airport_id'])
+                    keys.update((code, flight['flight_date']) for code in (flight['source_airport'],
+                                                                           flight['dest_airport']) if code)
+                summary["flights_seen"] += len(flights)
+                summary["lookups"] += 2 * len(flights)
+                summary["unique_lookups"] += len(keys)
+                weather = await self._resolve(keys, airports)
+                rows = self._flight_rows(flights, weather, positions)
+                # One bulk write in flight while the next chunk is resolved
+                if pending is not None and not await pending:
+                    raise RuntimeError(f"Writing flight weather failed on shard {shard.name}")
+                pending = asyncio.ensure_future(asyncio.to_thread(self._write, rows, shard)) if rows else None
+                summary["flights_enriched"] += len(rows)
+            if pending is not None and not await pending:
+                raise RuntimeError(f"Writing flight weather failed on shard {shard.name}")
+        finally:
+            stream.close()
+
+    async def _enrich(self, start, end):
+        airports = await asyncio.to_thread(self.db.execute_query,
+                                           "SELECT airport_id, iata_code, latitude, longitude FROM airports")
+        if airports is None:
+            raise RuntimeError("Could not read airports")
+        airport_codes = {row['airport_id']: row['iata_code'] for row in airports}
+        airports = {row['iata_code']: row for row in airports if row['iata_code']}
+        positions = {
+            code: (float(row['latitude']), float(row['longitude']))
+            for code, row in airports.items() if row['latitude'] is not None and row['longitude'] is not None
+        }
+        summary = {"flights_seen": 0, "flights_enriched": 0, "lookups": 0, "unique_lookups": 0}
+        for shard in self.db.shards:
+            await self._enrich_shard(shard, start, end, airports, airport_codes, positions, summary)
+        return summary
+
+    def enrich(self, days=None, start=None, end=None):
+        """
+        Enrich flights that have no weather yet, flown in [start, end) or the
+        last `days` days (all history by default). Returns a run summary with
+        throughput in flights enriched per second. Raises RuntimeError when
+        the database cannot be read or written.
+        """
+        end = end or date.today() + timedelta(days=1)
+        start = start or (end - timedelta(days=days + 1) if days else date(1900, 1, 1))
+        if not self._run_lock.acquire(blocking=False):
+            raise RuntimeError("Weather enrichment already running")
+        try:
+            counters = (self.cache_hits, self.stored_hits, self.fetched, self.fetch_failures)
+            started = time.perf_counter()
+            summary = asyncio.run(self._enrich(start, end))
+            seconds = time.perf_counter() - started
+            summary.update({
+                "cache_hits": self.cache_hits - counters[0],
+                "stored_hits": self.stored_hits - counters[1],
+                "fetched": self.fetched - counters[2],
+                "fetch_failures": self.fetch_failures - counters[3],
+                "seconds": round(seconds, 3),
+                "flights_per_second": round(summary["flights_enriched"] / seconds, 1) if seconds else None,
+                "provider": self.provider.name,
+                "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+            })
+            self.last_run = summary
+            logger.info(f"Weather enrichment: {summary['flights_enriched']} flights in {summary['seconds']}s "
+                        f"({summary['flights_per_second']}/s), {summary['fetched']} observations fetched")
+            return summary
+        finally:
+            self._run_lock.release()
+
+    def stats(self):
+        return {
+            "provider": self.provider.name,
+            "concurrency": self.concurrency,
+            "cached_lookups": len(self._cache),
+            "cache_hits": self.cache_hits,
+            "stored_hits": self.stored_hits,
+            "fetched": self.fetched,
+            "fetch_failures": self.fetch_failures,
+            "last_run": self.last_run
+        }
@@ -0,0 +1,56 @@
+"""
+SkySQL Intelligence Flight Archiver
+
+Moves flight_performance rows older than the hot analytics window out of
+MariaDB into compressed, memory-mapped columnar files (one per shard per
+month). Route analytics, distributions, route analysis, reports and
+forecasts read the files together with the remaining InnoDB rows, so they
+keep working after archiving; /api/flights, flight counts and leaderboards
+only see the hot rows (see ColdArchiver).
+
+Run it from cron, e.g. nightly:  python scripts/archive_flights.py --older-than 90
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app1 import db, cold_store, response_cache  # noqa: E402
+from cold_storage import ColdArchiver  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--older-than', type=int, default=90,
+                        help='Archive flights older than this many days (default: 90)')
+    parser.add_argument('--dir', default=None,
+                        help='Cold file directory (default: SKYSQL_COLD_DIR or data/cold)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='List the months that would be archived without moving anything')
+    args = parser.parse_args()
+
+    if args.dir:
+        cold_store.directory = args.dir
+    archiver = ColdArchiver(db, cold_store, hot_days=args.older_than)
+
+    print(f"Archiving flights older than {args.older_than} days to {cold_store.directory}")
+    try:
+        summary = archiver.archive(dry_run=args.dry_run)
+    except RuntimeError as e:
+        print(f"Archiving failed: {e}")
+        sys.exit(1)
+
+    if not args.dry_run:
+        response_cache.invalidate("flight_performance")
+    for entry in summary:
+        status = entry.get('file', 'archived') if entry['archived'] else 'pending (dry run)' if args.dry_run else 'empty'
+        print(f"  {entry['shard']:<10} {entry['month']}  {entry['rows']:>8} rows  {status}")
+    print(f"{sum(e['rows'] for e in summary if e['archived'])} flights archived")
+    stats = cold_store.stats()
+    print(f"Cold tier: {stats['files']} files, {stats['rows']} rows, {stats['bytes'] / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+SkySQL Intelligence Storage Backend Benchmark
+
+Per-endpoint latency of the same API on the MariaDB server and on the
+embedded SQLite backend (SKYSQL_BACKEND=embedded). Each mode runs in its own
+process, since the backend is chosen when app1 is imported; requests go
+through the Flask test client with the response cache cleared before each
+one, so every request reaches the database layer.
+
+Prepare the embedded databases first:
+    python scripts/setup_database.py --embedded data/embedded
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+ENDPOINTS = (
+    '/api/health',
+    '/api/airlines',
+    '/api/airports',
+    '/api/routes',
+    '/api/flights?limit=500',
+    '/api/dashboard-stats',
+    '/api/analytics/efficiency',
+    '/api/analytics/distribution',
+    '/api/metrics',
+    '/api/analyze/route/1',
+)
+
+
+def run_worker(iterations):
+    """Time every endpoint in this process and print the samples as JSON"""
+    sys.path.insert(0, BACKEND_DIR)
+    import app1
+
+    client = app1.app.test_client()
+    samples = {}
+
+    started = time.perf_counter()
+    round_trip = [app1.db.execute_query("SELECT 1 as status") for _ in range(iterations)]
+    samples["(SELECT 1 round trip)"] = {
+        "ms": [(time.perf_counter() - started) * 1000 / iterations],
+        "status": 200 if all(round_trip) else 503
+    }
+
+    for path in ENDPOINTS:
+        client.get(path).close()  # warm connections, statement caches and translations
+        timings = []
+        status = None
+        for _ in range(iterations):
+            app1.response_cache.clear()
+            started = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            timings.append((time.perf_counter() - started) * 1000)
+            # Runs call_on_close handlers (streamed responses release their admission slot)
+            response.close()
+            status = response.status_code
+        samples[path] = {"ms": timings, "status": status}
+    print(json.dumps({"backend": app1.db.backend.name, "samples": samples}))
+
+
+def measure(mode, iterations, embedded_dir):
+    env = dict(os.environ, SKYSQL_BACKEND=mode)
+    if embedded_dir:
+        env["SKYSQL_EMBEDDED_DIR"] = embedded_dir
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", "--iterations", str(iterations)],
+        env=env, capture_output=True, text=True
+    )
+    for line in reversed(result.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)["samples"]
+    print(f"{mode} run failed:\n{result.stderr[-2000:]}")
+    return None
+
+
+def summary(entry):
+    if entry is None or entry["status"] != 200:
+        return None
+    timings = sorted(entry["ms"])
+    return statistics.median(timings), timings[int(0.95 * (len(timings) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--embedded-dir', help='Embedded database directory (default: SKYSQL_EMBEDDED_DIR or data/embedded)')
+    parser.add_argument('--modes', default='mariadb,embedded')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.iterations)
+        return
+
+    modes = args.modes.split(',')
+    results = {mode: measure(mode, args.iterations, args.embedded_dir) or {} for mode in modes}
+
+    header = f"{'endpoint':<32}" + "".join(f"{mode + ' p50/p95 ms':>26}" for mode in modes)
+    if len(modes) == 2:
+        header += f"{'p50 speedup':>14}"
+    print(header)
+    print("-" * len(header))
+    for path in ("(SELECT 1 round trip)",) + ENDPOINTS:
+        line = f"{path:<32}"
+        medians = []
+        for mode in modes:
+            stats = summary(results[mode].get(path))
+            medians.append(stats[0] if stats else None)
+            line += f"{'unavailable':>26}" if stats is None else f"{stats[0]:>16.2f} / {stats[1]:>7.2f}"
+        if len(modes) == 2 and None not in medians and medians[1] > 0:
+            line += f"{medians[0] / medians[1]:>13.1f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+SkySQL Intelligence Columnar Format Benchmark
+
+Compares the row format ({"data": [{...}, ...]}) with ?format=columnar
+({"columns": [...], "data": {column: [...]}}) for route- and flight-shaped
+results:
+  memory   - tracemalloc peak while building the result from cursor tuples
+             and serializing it (dict per row vs one list per column)
+  payload  - JSON body size, raw and gzip-compressed
+  time     - build plus serialization
+
+By default the rows are generated in-process, so no database is needed.
+With --live the real endpoints are fetched in both formats instead.
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from columnar import Columns  # noqa: E402
+
+SHAPES = {
+    "routes": ("route_id", "airline_code", "source_airport", "destination_airport",
+               "distance_km", "base_fuel_kg", "airline_name"),
+    "flights": ("performance_id", "route_id", "flight_date", "actual_fuel_kg", "planned_fuel_kg",
+                "efficiency_score", "source_airport", "destination_airport")
+}
+
+LIVE_ENDPOINTS = ('/api/routes', '/api/flights?limit=5000', '/api/airports', '/api/analytics/efficiency?limit=5000')
+
+
+def synthetic_tuples(shape, count, seed):
+    """Rows as a plain cursor returns them (tuples with DB driver value types)"""
+    rng = random.Random(seed)
+    codes = ["".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)) for _ in range(500)]
+    airlines = [("QF", "Qantas Airways"), ("SQ", "Singapore Airlines"), ("LH", "Lufthansa"), ("CX", "Cathay Pacific")]
+    rows = []
+    for i in range(count):
+        source, dest = rng.sample(codes, 2)
+        if shape == "routes":
+            code, name = rng.choice(airlines)
+            distance = rng.randint(300, 15000)
+            rows.append((i + 1, code, source, dest, distance, distance * rng.randint(3, 5), name))
+        else:
+            planned = Decimal(rng.randint(5000, 90000))
+            actual = planned * Decimal("0.95")
+            rows.append((i + 1, rng.randint(1, 5000), date(2025, 1, 1) + timedelta(days=i % 365),
+                         actual, planned, Decimal(f"{rng.uniform(0.7, 0.99):.3f}"), source, dest))
+    return rows
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    body = func()
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return body, peak / (1024 * 1024), elapsed
+
+
+def report(label, body, peak, elapsed):
+    compressed = len(gzip.compress(body, 6))
+    print(f"  {label:<10} peak {peak:8.2f} MiB  {elapsed:8.1f} ms  "
+          f"body {len(body) / 1024:9.1f} KiB  gzip {compressed / 1024:8.1f} KiB")
+
+
+def synthetic(counts, seed):
+    import app1
+    for shape, names in SHAPES.items():
+        for count in counts:
+            tuples = synthetic_tuples(shape, count, seed)
+            print(f"\n{shape}: {count} rows")
+            with app1.app.test_request_context():
+                def rows_format():
+                    rows = [dict(zip(names, row)) for row in tuples]
+                    return app1.jsonify({"count": len(rows), "data": rows}).get_data()
+
+                def columnar_format():
+                    columns = Columns.from_tuples(names, tuples)
+                    return app1.jsonify({"count": len(columns), "format": "columnar",
+                                         **columns.payload()}).get_data()
+
+                report("rows", *measure(rows_format))
+                report("columnar", *measure(columnar_format))
+
+
+def live():
+    import app1
+    client = app1.app.test_client()
+    for path in LIVE_ENDPOINTS:
+        separator = '&' if '?' in path else '?'
+        print(f"\n{path}")
+        for label, url in (("rows", path), ("columnar", f"{path}{separator}format=columnar")):
+            response, peak, elapsed = measure(lambda: client.get(url))
+            if response.status_code != 200:
+                print(f"  {label:<10} HTTP {response.status_code}")
+                continue
+            report(label, response.get_data(), peak, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000,100000', help='Comma-separated synthetic result sizes')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--live', action='store_true', help='Fetch the real endpoints instead')
+    args = parser.parse_args()
+
+    if args.live:
+        live()
+    else:
+        synthetic([int(value) for value in args.rows.split(',')], args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+SkySQL Intelligence Airport Geospatial Benchmark
+
+Loads a global airport dataset into the airports table, builds the airport
+index and times nearest, radius and bounding-box queries both on the index
+directly and through the API endpoints, plus the vectorized great-circle
+pass over all routes. Brute-force numpy scans are timed alongside for
+comparison.
+
+Use a real dataset (OurAirports airports.csv or OpenFlights airports.dat):
+    python scripts/benchmark_geo.py --file data/airports.csv
+Without --file a synthetic global dataset in OurAirports format is generated.
+
+Run against the configured backend, or an embedded one prepared with
+    python scripts/setup_database.py --embedded /tmp/skysql
+    python scripts/benchmark_geo.py --embedded-dir /tmp/skysql
+"""
+
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+
+def synthetic_airports(path, count, seed=7):
+    """Write `count` airports in OurAirports CSV layout, clustered like real airports"""
+    rng = random.Random(seed)
+    # Population-weighted land clusters: (lat, lon, spread in degrees, weight)
+    clusters = [(40, -95, 12, 30), (50, 10, 8, 20), (35, 105, 12, 10), (-15, -55, 12, 8),
+                (-25, 135, 12, 6), (5, 20, 15, 8), (22, 78, 8, 6), (60, 90, 20, 5),
+                (62, -150, 8, 4), (-40, 173, 4, 1), (0, 115, 10, 2)]
+    weights = [cluster[3] for cluster in clusters]
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["id", "ident", "type", "name", "latitude_deg", "longitude_deg",
+                         "iso_country", "municipality", "iata_code"])
+        for number in range(count):
+            lat, lon, spread, _ = rng.choices(clusters, weights)[0]
+            latitude = max(-90.0, min(90.0, rng.gauss(lat, spread)))
+            longitude = (rng.gauss(lon, spread * 1.5) + 180) % 360 - 180
+            code = ""
+            if number % 10 == 0:
+                value = number // 10
+                code = "".join(chr(65 + (value // 26 ** p) % 26) for p in range(3))
+            writer.writerow([number, f"SX{number:05d}", "small_airport", f"Synthetic Field {number}",
+                             f"{latitude:.6f}", f"{longitude:.6f}", "XX", f"Town {number}", code])
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(0.95 * (len(timings) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', help='OurAirports airports.csv or OpenFlights airports.dat')
+    parser.add_argument('--synthetic-count', type=int, default=80000,
+                        help='Airports to generate without --file (default: 80000, roughly OurAirports)')
+    parser.add_argument('--embedded-dir', help='Use the embedded backend in this directory')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.embedded_dir:
+        os.environ["SKYSQL_BACKEND"] = "embedded"
+        os.environ["SKYSQL_EMBEDDED_DIR"] = args.embedded_dir
+
+    import app1
+    from geo import haversine_km, unit_vectors
+    from load_airports import load, read_airports
+
+    path = args.file
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "airports.csv")
+        synthetic_airports(path, args.synthetic_count)
+        print(f"Generated {args.synthetic_count} synthetic airports in {path}")
+
+    if not app1.geo_index.ensure_schema():
+        print("Could not add airport coordinate columns")
+        sys.exit(1)
+    started = time.perf_counter()
+    result = load(read_airports(path))
+    if result is None:
+        print("Loading airports failed")
+        sys.exit(1)
+    print(f"Loaded airports ({result[0]} updated, {result[1]} inserted) in {time.perf_counter() - started:.2f}s")
+
+    app1.geo_index.refresh(force=True)
+    index = app1.geo_index.index
+    print(f"Index: {len(index)} airports, {len(index._left)} nodes, built in "
+          f"{app1.geo_index.last_build_seconds}s (including the read)")
+
+    rng = random.Random(11)
+    points = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(args.queries)]
+    cycle = iter(points * 1000)
+
+    def brute_nearest(k):
+        lat, lon = next(cycle)
+        distances = np.linalg.norm(index.points - unit_vectors(lat, lon), axis=1)
+        return np.argpartition(distances, k)[:k]
+
+    def brute_within(radius_km):
+        lat, lon = next(cycle)
+        distances = haversine_km(lat, lon, index.lat, index.lon)
+        return np.nonzero(distances <= radius_km)[0]
+
+    def wrap(lon):
+        return (lon + 180) % 360 - 180
+
+    def box():
+        lat, lon = next(cycle)
+        return index.in_box(lat - 5, wrap(lon - 5), lat + 5, wrap(lon + 5))
+
+    def brute_box():
+        lat, lon = next(cycle)
+        inside = ((index.lat >= lat - 5) & (index.lat <= lat + 5)
+                  & (index.lon >= lon - 5) & (index.lon <= lon + 5))
+        return np.nonzero(inside)[0]
+
+    cases = [
+        ("nearest k=10", lambda: index.nearest(*next(cycle), k=10), lambda: brute_nearest(10)),
+        ("within 250 km", lambda: index.within(*next(cycle), 250), lambda: brute_within(250)),
+        ("within 1000 km", lambda: index.within(*next(cycle), 1000), lambda: brute_within(1000)),
+        ("bbox 10x10 deg", box, brute_box),
+    ]
+    header = f"{'query':<18}{'index p50/p95 ms':>22}{'brute force p50/p95 ms':>28}"
+    print(header)
+    print("-" * len(header))
+    for name, indexed, brute in cases:
+        fast = timed(indexed, args.queries)
+        slow = timed(brute, args.queries)
+        print(f"{name:<18}{fast[0]:>12.3f} / {fast[1]:>7.3f}{slow[0]:>18.3f} / {slow[1]:>7.3f}")
+
+    # Correctness spot check against brute force
+    for lat, lon in points[:20]:
+        expected = np.argsort(np.linalg.norm(index.points - unit_vectors(lat, lon), axis=1))[:5].tolist()
+        assert [i for i, _ in index.nearest(lat, lon, k=5)] == expected, (lat, lon)
+
+    client = app1.app.test_client()
+    endpoints = [
+        ("/api/airports/nearest", lambda lat, lon: f"/api/airports/nearest?lat={lat}&lon={lon}&k=10"),
+        ("/api/airports/within", lambda lat, lon: f"/api/airports/within?lat={lat}&lon={lon}&radius_km=250"),
+        ("/api/airports/bbox", lambda lat, lon: f"/api/airports/bbox?min_lat={lat - 5}&min_lon={wrap(lon - 5)}"
+                                                f"&max_lat={lat + 5}&max_lon={wrap(lon + 5)}&limit=500"),
+    ]
+    print(f"\n{'endpoint':<26}{'p50/p95 ms':>20}{'status':>8}")
+    for name, url in endpoints:
+        statuses = set()
+
+        def request():
+            response = client.get(url(*next(cycle)))
+            response.get_data()
+            statuses.add(response.status_code)
+            response.close()
+        p50, p95 = timed(request, args.queries)
+        print(f"{name:<26}{p50:>11.3f} / {p95:>6.3f}{','.join(map(str, sorted(statuses))):>8}")
+
+    routes = [route for rows in app1.db.scatter_query(
+        "SELECT route_id, source_airport_id, dest_airport_id FROM routes") or [] for route in rows]
+    many = routes * max(1, 100000 // max(1, len(routes)))
+    p50, _ = timed(lambda: index.route_distances(many), 5)
+    print(f"\nGreat-circle distances for {len(many)} routes: {p50:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
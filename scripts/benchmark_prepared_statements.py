@@ -0,0 +1,141 @@
+"""
+SkySQL Intelligence Prepared Statement Benchmark
+
+Replays dashboard traffic against every registered analytics query in three modes:
+  fresh     - new connection and text-protocol query per call (the original behaviour)
+  pooled    - reused connection, text-protocol query per call
+  prepared  - reused connection, cached server-side prepared statement
+
+Parse and plan time is taken from the server's own statement profiling stages.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from query_registry import QUERIES  # noqa: E402
+
+# Profiling stages that belong to parsing, resolving and optimizing a statement
+PLAN_STAGES = {
+    'starting', 'checking permissions', 'opening tables', 'after opening tables',
+    'system lock', 'table lock', 'init', 'init for update', 'optimizing',
+    'statistics', 'preparing', 'query end'
+}
+
+# Parameters a dashboard refresh would typically send
+DASHBOARD_PARAMS = {
+    "efficiency_analytics": {"days": 90},
+    "efficiency_report": {},
+    "metrics_daily": {"days": 7, "limit": 7},
+    "metrics_summary": {"days": 30},
+    "dashboard_savings": {"days": 30},
+    "route_details": {"route_id": 1},
+    "route_performance": {"route_id": 1, "limit": 10}
+}
+
+
+class PreparedStatementBenchmark:
+    """Compare text-protocol and prepared execution of the named analytics queries"""
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+        self.config = {
+            'host': 'localhost',
+            'user': 'root',
+            'password': '',
+            'database': 'skysql_intelligence',
+            'port': 3306,
+            'autocommit': True
+        }
+
+    def connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def plan_time_ms(self, cursor):
+        """Sum of parse/plan stage durations for the last profiled statement"""
+        # SHOW PROFILE(S) statements are not themselves profiled
+        cursor.execute("SHOW PROFILES")
+        profiles = cursor.fetchall()
+        if not profiles:
+            return 0.0
+        cursor.execute(f"SHOW PROFILE FOR QUERY {max(row[0] for row in profiles)}")
+        return sum(float(duration) for state, duration in cursor.fetchall()
+                   if state.lower() in PLAN_STAGES) * 1000
+
+    def run_fresh(self, query, params):
+        timings = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            conn = self.connect()
+            cursor = conn.cursor()
+            cursor.execute(query.sql, params)
+            cursor.fetchall()
+            cursor.close()
+            conn.close()
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, None
+
+    def run_pooled(self, query, params, prepared):
+        conn = self.connect()
+        control = conn.cursor()
+        control.execute("SET profiling = 1")
+        cursor = conn.cursor(prepared=True) if prepared else conn.cursor()
+        timings, plan = [], []
+        try:
+            for _ in range(self.iterations):
+                start = time.perf_counter()
+                cursor.execute(query.sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+                plan.append(self.plan_time_ms(control))
+        finally:
+            cursor.close()
+            control.close()
+            conn.close()
+        return timings, plan
+
+    def report(self, label, timings, plan):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        line = f"    {label:9} mean {statistics.mean(timings):7.3f} ms   p95 {p95:7.3f} ms"
+        if plan:
+            line += f"   parse+plan {statistics.mean(plan):6.3f} ms"
+        print(line)
+        return statistics.mean(timings)
+
+    def run(self):
+        print("SkySQL Intelligence Prepared Statement Benchmark")
+        print(f"{self.iterations} executions per query and mode")
+        print("=" * 70)
+
+        for query in QUERIES:
+            params = query.bind(DASHBOARD_PARAMS.get(query.name, {}))
+            print(f"\n{query.name}: {query.description}")
+            fresh = self.report('fresh', *self.run_fresh(query, params))
+            pooled = self.report('pooled', *self.run_pooled(query, params, prepared=False))
+            prepared = self.report('prepared', *self.run_pooled(query, params, prepared=True))
+            print(f"    saving vs fresh {fresh - prepared:6.3f} ms/call, "
+                  f"vs pooled text {pooled - prepared:6.3f} ms/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        PreparedStatementBenchmark(args.iterations).run()
+    except Error as e:
+        print(f"Benchmark failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+SkySQL Intelligence Route Graph Benchmark
+
+Builds a synthetic hub-and-spoke network (tens of thousands of routes by
+default) and times:
+  build     - snapshot build, with and without hub tree precomputation
+  dijkstra  - uncached path queries without landmarks
+  astar     - uncached path queries with hub landmarks (ALT heuristic)
+  memo      - repeated queries answered from the memo
+  endpoint  - GET /api/network/path through the Flask test client
+
+No database is needed; the graph is loaded straight from generated rows.
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from route_graph import RouteGraph  # noqa: E402
+
+
+def airport_code(index):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return letters[index // 676 % 26] + letters[index // 26 % 26] + letters[index % 26]
+
+
+def synthetic_network(airports, routes, hubs, seed):
+    """Route rows for random airports on a 10,000 km square, wired hub-and-spoke plus regional links"""
+    rng = random.Random(seed)
+    codes = [airport_code(i) for i in range(airports)]
+    position = {code: (rng.uniform(0, 10000), rng.uniform(0, 10000)) for code in codes}
+    hub_codes = codes[:hubs]
+    airlines = ["AA", "BA", "DL", "EK", "LH", "QF", "SQ", "UA"]
+
+    def route(route_id, source, dest):
+        (x1, y1), (x2, y2) = position[source], position[dest]
+        distance = max(int(math.hypot(x2 - x1, y2 - y1)), 100)
+        return {
+            "route_id": route_id,
+            "airline_code": rng.choice(airlines),
+            "source_airport": source,
+            "dest_airport": dest,
+            "distance_km": distance,
+            "base_fuel_kg": int(distance * rng.uniform(2.5, 4.0))
+        }
+
+    rows = []
+    pairs = set()
+
+    def add(source, dest):
+        if source != dest and (source, dest) not in pairs and len(rows) < routes:
+            pairs.add((source, dest))
+            rows.append(route(len(rows) + 1, source, dest))
+
+    for a in hub_codes:
+        for b in hub_codes:
+            add(a, b)
+    for code in codes[hubs:]:
+        nearest = sorted(hub_codes, key=lambda h: math.dist(position[h], position[code]))[:2]
+        for hub in nearest:
+            add(code, hub)
+            add(hub, code)
+    while len(rows) < routes:
+        add(rng.choice(codes), rng.choice(codes))
+    return codes, rows
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(f"  {label:<28} mean {statistics.mean(samples):9.3f} ms   p95 {p95:9.3f} ms   n={len(samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--airports', type=int, default=5000)
+    parser.add_argument('--routes', type=int, default=40000)
+    parser.add_argument('--hubs', type=int, default=40, help='Hub airports in the synthetic network')
+    parser.add_argument('--landmarks', type=int, default=8, help='Hubs with precomputed trees')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    codes, rows = synthetic_network(args.airports, args.routes, args.hubs, args.seed)
+    rng = random.Random(args.seed)
+    pairs = [(rng.choice(codes), rng.choice(codes)) for _ in range(args.queries)]
+    print(f"Synthetic network: {len(codes)} airports, {len(rows)} routes, {args.queries} random queries")
+
+    plain = RouteGraph(db=None, codes=None, hub_count=0)
+    _, plain_ms = timed(plain.load, rows)
+    landmarked = RouteGraph(db=None, codes=None, hub_count=args.landmarks)
+    _, landmark_ms = timed(landmarked.load, rows)
+    print("\nbuild")
+    print(f"  {'snapshot only':<28} {plain_ms:9.1f} ms")
+    print(f"  {f'with {args.landmarks} hub trees':<28} {landmark_ms:9.1f} ms")
+
+    for metric in RouteGraph.METRICS:
+        print(f"\n{metric}")
+        report("dijkstra (no landmarks)", [timed(plain.path, s, t, metric)[1] for s, t in pairs])
+        report("astar (hub landmarks)", [timed(landmarked.path, s, t, metric)[1] for s, t in pairs])
+        report("memoized repeat", [timed(landmarked.path, s, t, metric)[1] for s, t in pairs])
+        hub = landmarked.hubs[0] if landmarked.hubs else codes[0]
+        report("from a hub (tree lookup)", [timed(landmarked.path, hub, t, metric, 0)[1]
+                                            for _, t in pairs if t != hub])
+        report("with 3 alternatives", [timed(landmarked.path, s, t, metric, 3)[1] for s, t in pairs[:50]])
+
+        field = "total_fuel_kg" if metric == "fuel" else "total_distance_km"
+        costs = [(plain.path(s, t, metric)[0], landmarked.path(s, t, metric)[0]) for s, t in pairs]
+        reachable = [(a, b) for a, b in costs if a is not None]
+        agree = sum(1 for a, b in reachable if b is not None and abs(a["best"][field] - b["best"][field]) < 1e-6)
+        print(f"  A* and Dijkstra agree on {agree}/{len(reachable)} path costs")
+
+    # Endpoint latency, answered from the same in-memory graph
+    import app1
+    landmarked.db = app1.db
+    landmarked.refresh_interval = float('inf')
+    app1.route_graph = landmarked
+    client = app1.app.test_client()
+    fresh_pairs = [(rng.choice(codes), rng.choice(codes)) for _ in range(args.queries)]
+    print("\nendpoint /api/network/path")
+    report("uncached", [timed(client.get, f"/api/network/path?from={s}&to={t}")[1] for s, t in fresh_pairs])
+    report("memoized", [timed(client.get, f"/api/network/path?from={s}&to={t}")[1] for s, t in fresh_pairs])
+    print(f"\n{landmarked.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+SkySQL Intelligence Streaming Benchmark
+
+Peak Python memory and time to serve large flight_performance results:
+  buffered  - execute_query (fetchall into a list of dicts), then jsonify
+  streamed  - GET /api/flights, read from unbuffered cursors and encoded
+              batch by batch while the body is consumed
+
+Peak memory is measured with tracemalloc around each request. Runs against
+the configured database, so load enough flights first (setup_database.py
+with a larger sample, or production-sized data).
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+import app1  # noqa: E402
+from sharding import merge_sorted  # noqa: E402
+
+FLIGHTS_QUERY = """
+    SELECT
+        fp.performance_id,
+        fp.route_id,
+        fp.flight_date,
+        fp.actual_fuel_kg,
+        fp.planned_fuel_kg,
+        fp.efficiency_score,
+        r.source_airport_id,
+        r.dest_airport_id
+    FROM flight_performance fp
+    JOIN routes r ON fp.route_id = r.route_id
+    ORDER BY fp.flight_date DESC
+    LIMIT %s
+"""
+
+
+def measure(func):
+    """(result, peak MiB, elapsed ms) of one call"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - started) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak / (1024 * 1024), elapsed
+
+
+def buffered(limit):
+    partials = app1.db.scatter_query(FLIGHTS_QUERY, (limit,))
+    if partials is None:
+        raise RuntimeError("Query failed; is the database reachable?")
+    rows = merge_sorted(partials, 'flight_date', descending=True, limit=limit)
+    with app1.app.test_request_context():
+        body = app1.jsonify({"count": len(rows), "data": rows}).get_data()
+    return len(rows), len(body)
+
+
+def streamed(client, limit):
+    response = client.get(f'/api/flights?limit={limit}', buffered=False)
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/flights returned {response.status_code}")
+    size = 0
+    for chunk in response.iter_encoded():
+        size += len(chunk)
+    response.close()
+    return None, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limits', default='1000,10000,100000',
+                        help='Comma-separated result sizes to compare')
+    args = parser.parse_args()
+
+    client = app1.app.test_client()
+    print(f"{'rows':>9} {'mode':<9} {'peak MiB':>9} {'ms':>9} {'body MiB':>9}")
+    for limit in (int(value) for value in args.limits.split(',')):
+        (rows, size), peak, elapsed = measure(lambda: buffered(limit))
+        print(f"{rows:>9} {'buffered':<9} {peak:9.1f} {elapsed:9.1f} {size / (1024 * 1024):9.1f}")
+        (_, size), peak, elapsed = measure(lambda: streamed(client, limit))
+        print(f"{rows:>9} {'streamed':<9} {peak:9.1f} {elapsed:9.1f} {size / (1024 * 1024):9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+SkySQL Intelligence Surrogate Key Benchmark
+
+Join cost and table size of the two routes layouts on the same generated
+network:
+  codes  - routes and operational_metrics carry VARCHAR airline/airport
+           IATA codes joined to airlines/airports.iata_code, with the
+           duplicate route rows the old sample data accumulated
+  keys   - integer airline_id / source_airport_id / dest_airport_id
+           foreign keys, one route per airline and city pair (unique
+           index), codes decoded in-process by the code dictionary
+
+Each layout is seeded into its own scratch database (<database>_codes and
+<database>_keys) and every query is timed as the median of --repeat runs;
+the keys timings include encoding the filter and decoding the result rows
+through CodeDictionary. Sizes are data plus index bytes per table:
+information_schema.TABLES on MariaDB, dbstat pages on the embedded backend.
+
+    python scripts/benchmark_surrogate_keys.py --scale 1
+    python scripts/benchmark_surrogate_keys.py --backend embedded --embedded-dir /tmp/keys --scale 1
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'backend'))
+
+from code_dictionary import CodeDictionary  # noqa: E402
+from setup_database import DatabaseSetup  # noqa: E402
+from storage import EmbeddedBackend, MariaDBBackend  # noqa: E402
+
+# Rows per scale factor unit
+SCALE_ROWS = {"airports": 3000, "airlines": 500, "routes": 20000, "flight_performance": 200000, "metric_days": 30}
+
+REFERENCE_SCHEMA = [
+    """
+    CREATE TABLE airlines (
+        airline_id INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        iata_code VARCHAR(3),
+        country VARCHAR(50),
+        INDEX idx_airlines_iata (iata_code)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE airports (
+        airport_id INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        iata_code VARCHAR(3),
+        latitude DECIMAL(9, 6),
+        longitude DECIMAL(9, 6)
+    ) ENGINE=InnoDB
+    """,
+    """
+    CREATE TABLE flight_performance (
+        performance_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        route_id INT,
+        flight_date DATE,
+        actual_fuel_kg DECIMAL(10, 2),
+        efficiency_score DECIMAL(4, 3),
+        INDEX idx_flight_performance_date (flight_date),
+        INDEX idx_flight_performance_route_date (route_id, flight_date)
+    ) ENGINE=InnoDB
+    """
+]
+
+LAYOUTS = {
+    "codes": {
+        "schema": REFERENCE_SCHEMA + [
+            """
+            CREATE TABLE routes (
+                route_id INT AUTO_INCREMENT PRIMARY KEY,
+                airline_code VARCHAR(3) NOT NULL,
+                source_airport VARCHAR(3) NOT NULL,
+                dest_airport VARCHAR(3) NOT NULL,
+                distance_km INT NOT NULL,
+                base_fuel_kg INT NOT NULL
+            ) ENGINE=InnoDB
+            """,
+            """
+            CREATE TABLE operational_metrics (
+                metric_id INT AUTO_INCREMENT PRIMARY KEY,
+                metric_date DATE NOT NULL,
+                avg_efficiency DECIMAL(4, 3),
+                route_id INT,
+                airline_code VARCHAR(3),
+                INDEX idx_operational_metrics_date (metric_date)
+            ) ENGINE=InnoDB
+            """
+        ],
+        "queries": {
+            "routes with airline name": ("""
+                SELECT r.route_id, r.airline_code, r.source_airport, r.dest_airport, r.distance_km,
+                       a.name AS airline_name
+                FROM routes r
+                LEFT JOIN airlines a ON r.airline_code = a.iata_code
+                ORDER BY r.distance_km DESC
+            """, ()),
+            "route endpoints": ("""
+                SELECT r.route_id, s.latitude AS source_lat, s.longitude AS source_lon,
+                       d.latitude AS dest_lat, d.longitude AS dest_lon
+                FROM routes r
+                JOIN airports s ON r.source_airport = s.iata_code
+                JOIN airports d ON r.dest_airport = d.iata_code
+            """, ()),
+            "route by identity": ("""
+                SELECT route_id, distance_km FROM routes
+                WHERE airline_code = %s AND source_airport = %s AND dest_airport = %s
+            """, ("route",)),
+            "airline flights": ("""
+                SELECT fp.performance_id, fp.flight_date, fp.efficiency_score, r.source_airport, r.dest_airport
+                FROM flight_performance fp
+                JOIN routes r ON fp.route_id = r.route_id
+                WHERE r.airline_code = %s
+                ORDER BY fp.flight_date DESC
+                LIMIT 500
+            """, ("airline",)),
+            "efficiency by airline": ("""
+                SELECT a.iata_code AS airline_code, COUNT(*) AS flights, AVG(fp.efficiency_score) AS efficiency
+                FROM flight_performance fp
+                JOIN routes r ON fp.route_id = r.route_id
+                JOIN airlines a ON r.airline_code = a.iata_code
+                WHERE fp.flight_date >= %s
+                GROUP BY a.iata_code
+            """, ("since",)),
+            "airline daily metrics": ("""
+                SELECT metric_date, AVG(avg_efficiency) AS efficiency
+                FROM operational_metrics
+                WHERE airline_code = %s AND metric_date >= %s
+                GROUP BY metric_date
+            """, ("airline", "since"))
+        }
+    },
+    "keys": {
+        "schema": REFERENCE_SCHEMA + [
+            """
+            CREATE TABLE routes (
+                route_id INT AUTO_INCREMENT PRIMARY KEY,
+                airline_id INT NOT NULL,
+                source_airport_id INT NOT NULL,
+                dest_airport_id INT NOT NULL,
+                distance_km INT NOT NULL,
+                base_fuel_kg INT NOT NULL,
+                UNIQUE KEY uq_routes_identity (airline_id, source_airport_id, dest_airport_id),
+                FOREIGN KEY (airline_id) REFERENCES airlines(airline_id),
+                FOREIGN KEY (source_airport_id) REFERENCES airports(airport_id),
+                FOREIGN KEY (dest_airport_id) REFERENCES airports(airport_id)
+            ) ENGINE=InnoDB
+            """,
+            """
+            CREATE TABLE operational_metrics (
+                metric_id INT AUTO_INCREMENT PRIMARY KEY,
+                metric_date DATE NOT NULL,
+                avg_efficiency DECIMAL(4, 3),
+                route_id INT,
+                airline_id INT,
+                INDEX idx_operational_metrics_date (metric_date)
+            ) ENGINE=InnoDB
+            """
+        ],
+        "queries": {
+            "routes with airline name": ("""
+                SELECT r.route_id, r.airline_id, r.source_airport_id, r.dest_airport_id, r.distance_km,
+                       a.name AS airline_name
+                FROM routes r
+                LEFT JOIN airlines a ON r.airline_id = a.airline_id
+                ORDER BY r.distance_km DESC
+            """, ()),
+            "route endpoints": ("""
+                SELECT r.route_id, s.latitude AS source_lat, s.longitude AS source_lon,
+                       d.latitude AS dest_lat, d.longitude AS dest_lon
+                FROM routes r
+                JOIN airports s ON r.source_airport_id = s.airport_id
+                JOIN airports d ON r.dest_airport_id = d.airport_id
+            """, ()),
+            "route by identity": ("""
+                SELECT route_id, distance_km FROM routes
+                WHERE airline_id = %s AND source_airport_id = %s AND dest_airport_id = %s
+            """, ("route",)),
+            "airline flights": ("""
+                SELECT fp.performance_id, fp.flight_date, fp.efficiency_score, r.source_airport_id, r.dest_airport_id
+                FROM flight_performance fp
+                JOIN routes r ON fp.route_id = r.route_id
+                WHERE r.airline_id = %s
+                ORDER BY fp.flight_date DESC
+                LIMIT 500
+            """, ("airline",)),
+            "efficiency by airline": ("""
+                SELECT r.airline_id, COUNT(*) AS flights, AVG(fp.efficiency_score) AS efficiency
+                FROM flight_performance fp
+                JOIN routes r ON fp.route_id = r.route_id
+                WHERE fp.flight_date >= %s
+                GROUP BY r.airline_id
+            """, ("since",)),
+            "airline daily metrics": ("""
+                SELECT metric_date, AVG(avg_efficiency) AS efficiency
+                FROM operational_metrics
+                WHERE airline_id = %s AND metric_date >= %s
+                GROUP BY metric_date
+            """, ("airline", "since"))
+        }
+    }
+}
+
+MEASURED_TABLES = ("airlines", "airports", "routes", "flight_performance", "operational_metrics")
+
+
+class ScratchDatabase:
+    """One layout's scratch database; execute_query is all CodeDictionary needs"""
+
+    def __init__(self, backend, db_name, config):
+        self.backend = backend
+        self.db_name = db_name
+        config = dict(config)
+        if backend.name == "mariadb":
+            server = backend.connect(dict(config, autocommit=True))
+            server.cursor().execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
+            server.close()
+            config["autocommit"] = True
+        self.connection = backend.connect(dict(config, database=db_name))
+
+    def execute_query(self, query, params=None):
+        cursor = self.connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params or ())
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def execute_many(self, query, rows, batch=10000):
+        cursor = self.connection.cursor()
+        try:
+            for start in range(0, len(rows), batch):
+                cursor.executemany(query, rows[start:start + batch])
+        finally:
+            cursor.close()
+        self.connection.commit()
+
+    def execute(self, statement):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def sizes(self):
+        """{table: (data bytes, index bytes)} after refreshing the size statistics"""
+        if self.backend.name == "embedded":
+            self.connection.raw.execute("VACUUM")
+            owners = dict(self.connection.raw.execute("SELECT name, tbl_name FROM sqlite_master"))
+            sizes = {}
+            for name, size in self.connection.raw.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"):
+                table = owners.get(name)
+                if table is None:
+                    continue
+                data, index = sizes.get(table, (0, 0))
+                sizes[table] = (data + size, index) if name == table else (data, index + size)
+            return sizes
+        for table in MEASURED_TABLES:
+            self.execute_query(f"ANALYZE TABLE {table}")
+        rows = self.execute_query("""
+            SELECT TABLE_NAME, DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = %s
+        """, (self.db_name,))
+        return {row['TABLE_NAME']: (row['DATA_LENGTH'], row['INDEX_LENGTH']) for row in rows}
+
+    def close(self):
+        self.connection.close()
+
+
+def network(scale, duplicate_ratio, seed):
+    """Reference rows, unique route identities and the extra duplicate rows of the codes layout"""
+    rng = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+    def codes(length, count):
+        taken = set()
+        while len(taken) < count:
+            taken.add("".join(rng.choice(letters[:26] if length == 3 else letters) for _ in range(length)))
+        return sorted(taken)
+
+    rows = {table: max(1, int(count * scale)) for table, count in SCALE_ROWS.items() if table != "metric_days"}
+    rows["airports"] = min(rows["airports"], 26 ** 3)
+    rows["airlines"] = min(rows["airlines"], 36 ** 2)
+    airlines = [(i + 1, f"Airline {code}", code, f"Country {i % 60}")
+                for i, code in enumerate(codes(2, rows["airlines"]))]
+    airports = [(i + 1, f"Airport {code}", code, round(rng.uniform(-60, 70), 6), round(rng.uniform(-180, 180), 6))
+                for i, code in enumerate(codes(3, rows["airports"]))]
+
+    identities, routes = set(), []
+    while len(routes) < rows["routes"]:
+        airline = rng.randrange(len(airlines))
+        source, dest = rng.sample(range(len(airports)), 2)
+        if (airline, source, dest) in identities:
+            continue
+        identities.add((airline, source, dest))
+        distance = rng.randint(300, 14000)
+        routes.append((airline, source, dest, distance, distance * 12))
+    duplicates = [rng.choice(routes) for _ in range(int(len(routes) * duplicate_ratio))]
+
+    today = date.today()
+    flights = [(rng.randrange(len(routes)), today - timedelta(days=rng.randint(0, 364)),
+                round(rng.uniform(3e3, 1.6e5), 2), round(rng.uniform(0.7, 0.98), 3))
+               for _ in range(rows["flight_performance"])]
+    return {"airlines": airlines, "airports": airports, "routes": routes, "duplicates": duplicates,
+            "flights": flights}
+
+
+def seed(db, layout, data, metric_days):
+    for table in ("operational_metrics", "flight_performance", "routes", "airports", "airlines"):
+        db.execute(f"DROP TABLE IF EXISTS {table}")
+    for statement in LAYOUTS[layout]["schema"]:
+        db.execute(statement)
+    airlines, airports = data["airlines"], data["airports"]
+    db.execute_many("INSERT INTO airlines (airline_id, name, iata_code, country) VALUES (%s, %s, %s, %s)", airlines)
+    db.execute_many("INSERT INTO airports (airport_id, name, iata_code, latitude, longitude) "
+                    "VALUES (%s, %s, %s, %s, %s)", airports)
+
+    # Route n of the generated network is route_id n + 1 in both layouts
+    routes = data["routes"] + (data["duplicates"] if layout == "codes" else [])
+    if layout == "codes":
+        db.execute_many("""
+            INSERT INTO routes (route_id, airline_code, source_airport, dest_airport, distance_km, base_fuel_kg)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [(i + 1, airlines[a][2], airports[s][2], airports[d][2], distance, fuel)
+              for i, (a, s, d, distance, fuel) in enumerate(routes)])
+    else:
+        db.execute_many("""
+            INSERT INTO routes (route_id, airline_id, source_airport_id, dest_airport_id, distance_km, base_fuel_kg)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [(i + 1, airlines[a][0], airports[s][0], airports[d][0], distance, fuel)
+              for i, (a, s, d, distance, fuel) in enumerate(routes)])
+
+    db.execute_many("""
+        INSERT INTO flight_performance (route_id, flight_date, actual_fuel_kg, efficiency_score)
+        VALUES (%s, %s, %s, %s)
+    """, [(route + 1, day, fuel, score) for route, day, fuel, score in data["flights"]])
+
+    today = date.today()
+    airline_key = (lambda a: airlines[a][2]) if layout == "codes" else (lambda a: airlines[a][0])
+    db.execute_many(f"""
+        INSERT INTO operational_metrics (metric_date, avg_efficiency, route_id, {'airline_code' if layout == 'codes' else 'airline_id'})
+        VALUES (%s, %s, %s, %s)
+    """, [(today - timedelta(days=day), 0.85, i + 1, airline_key(route[0]))
+          for day in range(metric_days) for i, route in enumerate(routes)])
+
+
+def time_queries(db, layout, data, repeat):
+    """{query name: (median ms, rows)}"""
+    codes = CodeDictionary(db) if layout == "keys" else None
+    if codes:
+        codes.refresh(force=True)
+    airline = data["airlines"][0][2]
+    a, s, d = data["routes"][0][:3]
+    route = (data["airlines"][a][2], data["airports"][s][2], data["airports"][d][2])
+    since = date.today() - timedelta(days=90)
+
+    results = {}
+    for name, (query, param_names) in LAYOUTS[layout]["queries"].items():
+        def run():
+            if codes is None:
+                values = {"airline": (airline,), "route": route, "since": (since,)}
+                params = tuple(value for param in param_names for value in values[param])
+                return db.execute_query(query, params)
+            values = {"airline": (codes.airline_id(airline),),
+                      "route": (codes.airline_id(route[0]), codes.airport_id(route[1]), codes.airport_id(route[2])),
+                      "since": (since,)}
+            params = tuple(value for param in param_names for value in values[param])
+            return codes.decode(db.execute_query(query, params))
+
+        rows = run()  # warm the buffer pool / page cache and statement caches
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (statistics.median(timings), len(rows))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('mariadb', 'embedded'), default='mariadb')
+    parser.add_argument('--embedded-dir', default=os.path.join(SCRIPT_DIR, '..', 'data', 'surrogate_keys'),
+                        help='Directory for the embedded scratch databases')
+    parser.add_argument('--database', default='skysql_key_bench',
+                        help='Scratch database name prefix (<name>_codes and <name>_keys are recreated)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f"Scale factor: {SCALE_ROWS['routes']} routes and "
+                             f"{SCALE_ROWS['flight_performance']} flights per unit (default: 1)")
+    parser.add_argument('--duplicate-ratio', type=float, default=0.25,
+                        help='Duplicate route rows in the codes layout, as a share of unique routes (default: 0.25)')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed executions per query (median kept)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if args.database == 'skysql_intelligence':
+        print("Refusing to seed the live database; choose another --database")
+        sys.exit(1)
+    backend = EmbeddedBackend(args.embedded_dir) if args.backend == 'embedded' else MariaDBBackend()
+    if args.backend == 'embedded':
+        os.makedirs(args.embedded_dir, exist_ok=True)
+
+    data = network(args.scale, args.duplicate_ratio, args.seed)
+    timings, sizes = {}, {}
+    for layout in LAYOUTS:
+        db = ScratchDatabase(backend, f"{args.database}_{layout}", DatabaseSetup().config)
+        try:
+            started = time.perf_counter()
+            seed(db, layout, data, SCALE_ROWS["metric_days"])
+            print(f"Seeded {layout} layout in {time.perf_counter() - started:.1f}s")
+            timings[layout] = time_queries(db, layout, data, args.repeat)
+            sizes[layout] = db.sizes()
+        finally:
+            db.close()
+
+    print(f"\n{len(data['routes'])} routes (+{len(data['duplicates'])} duplicates in codes), "
+          f"{len(data['flights'])} flights on {backend.name} at scale {args.scale}\n")
+    header = f"{'query':<28}{'codes ms':>12}{'keys ms':>12}{'speedup':>10}{'rows codes/keys':>20}"
+    print(header)
+    print("-" * len(header))
+    for name in LAYOUTS["codes"]["queries"]:
+        (before, rows_before), (after, rows_after) = timings["codes"][name], timings["keys"][name]
+        speedup = f"{before / after:.1f}x" if after > 0 else "-"
+        print(f"{name:<28}{before:>12.2f}{after:>12.2f}{speedup:>10}{f'{rows_before}/{rows_after}':>20}")
+
+    header = f"\n{'table':<22}{'codes data/index KiB':>24}{'keys data/index KiB':>24}{'total change':>14}"
+    print(header)
+    print("-" * (len(header) - 1))
+    for table in MEASURED_TABLES:
+        before, after = sizes["codes"].get(table, (0, 0)), sizes["keys"].get(table, (0, 0))
+        change = f"{(sum(after) - sum(before)) / sum(before):+.0%}" if sum(before) else "-"
+        print(f"{table:<22}{f'{before[0] // 1024} / {before[1] // 1024}':>24}"
+              f"{f'{after[0] // 1024} / {after[1] // 1024}':>24}{change:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+"""
+SkySQL Intelligence Query Plan Check
+
+Plan regression check for the SQL the API runs: every registered named
+query plus every literal SELECT passed to the database layer in app1.py
+(found by parsing its source, so new endpoints are covered without listing
+them here). A scratch database is seeded at a realistic scale factor and
+each statement is planned and timed:
+
+  mariadb   ANALYZE <statement> (actual rows per plan step)
+  embedded  EXPLAIN QUERY PLAN <statement> (table sizes as row counts)
+
+A statement fails when a plan step does a full table or index scan,
+a filesort or a temporary table over more rows than its budget
+(--row-budget, or the per-statement allowance in BUDGETS). Statements
+with optional filters are checked unfiltered and filtered. Timings are
+appended to a history file and compared with the previous run at the
+same backend and scale; the exit status is 1 on any failure.
+
+    python scripts/check_query_plans.py --scale 1
+    python scripts/check_query_plans.py --backend embedded --embedded-dir /tmp/plans --scale 0.2
+"""
+
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'backend'))
+
+from query_registry import QUERIES, NamedQuery  # noqa: E402
+from setup_database import DatabaseSetup  # noqa: E402
+from storage import EmbeddedBackend, MariaDBBackend  # noqa: E402
+
+APP_SOURCE = os.path.join(SCRIPT_DIR, '..', 'backend', 'app1.py')
+DEFAULT_HISTORY = os.path.join(SCRIPT_DIR, '..', 'data', 'query_plans', 'history.jsonl')
+
+# Database layer calls whose first argument is SQL
+SQL_CALLS = {"execute_query", "stream_query", "scatter_query", "stream_scatter"}
+
+# Rows per scale factor unit
+SCALE_ROWS = {"airports": 2000, "airlines": 40, "routes": 1000, "flight_performance": 200000, "metric_days": 180}
+
+DEFAULT_ROW_BUDGET = 10000
+
+# Statements that read a whole window by design: rows per scale unit they may touch
+# on top of the default budget, and why
+BUDGETS = {
+    "forecast_flights_daily": (SCALE_ROWS["flight_performance"],
+                               "daily forecast refresh aggregates every flight in its window"),
+    "forecast_metrics_daily": (SCALE_ROWS["routes"] * SCALE_ROWS["metric_days"],
+                               "daily forecast refresh aggregates every metric row in its window"),
+    "efficiency_report": (SCALE_ROWS["flight_performance"],
+                          "all-time report endpoint, one pass over flight_performance"),
+    "route_partials": (SCALE_ROWS["flight_performance"],
+                       "all-time per-route partials, one pass over flight_performance"),
+    "app1.get_flights": (SCALE_ROWS["flight_performance"],
+                         "newest-first walk of the flight_date index, stopped by LIMIT; SQLite cannot "
+                         "use the route index through the optional-filter form, MariaDB folds it"),
+}
+
+# Parameter values a dashboard would send; optional filters stay NULL unless FILTERS apply
+SAMPLE_PARAMS = {"days": 90, "limit": 50, "min_flights": 1, "until": None, "start": None, "end": None,
+                 "airline_id": None, "route_id": None}
+FILTERS = {"airline_id": 1, "route_id": 1}
+
+_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|INNER\b|GROUP\b|ORDER\b)(\w+))?",
+                    re.IGNORECASE)
+
+
+def _sql_text(node):
+    """Literal SQL of a string or f-string argument (interpolated parts left out)"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(part.value for part in node.values if isinstance(part, ast.Constant))
+    return None
+
+
+def extract_statements(source_path=APP_SOURCE):
+    """[(name, NamedQuery)] for the registry and every literal SELECT in app1.py"""
+    statements = [(query.name, query) for query in QUERIES]
+    tree = ast.parse(open(source_path).read())
+    seen = {}
+
+    def visit(node, function):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                visit(child, child.name)
+                continue
+            if isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute) \
+                    and child.func.attr in SQL_CALLS and child.args:
+                sql = _sql_text(child.args[0])
+                if sql and re.match(r"\s*SELECT\b", sql, re.IGNORECASE) and re.search(r"\bFROM\b", sql, re.IGNORECASE) \
+                        and "information_schema" not in sql.lower() and "%s" not in sql:
+                    seen[function] = seen.get(function, 0) + 1
+                    name = f"app1.{function}" + (f"#{seen[function]}" if seen[function] > 1 else "")
+                    statements.append((name, NamedQuery(name, sql)))
+            visit(child, function)
+
+    visit(tree, "<module>")
+    return statements
+
+
+def cases(query):
+    """(case, params) pairs: unfiltered, plus filtered when the statement takes a filter"""
+    today = date.today()
+    base = dict(SAMPLE_PARAMS, start=today - timedelta(days=180), end=today)
+    base.update(query.defaults)
+    result = [("unfiltered", base)]
+    if any(name in query.param_order for name in FILTERS):
+        result.append(("filtered", dict(base, **FILTERS)))
+    return result
+
+
+class PlanSeed:
+    """Scratch database at a scale factor: the regular schema plus generated fact rows"""
+
+    def __init__(self, backend, db_name, scale, config=None):
+        self.backend = backend
+        self.db_name = db_name
+        self.scale = scale
+        self.config = dict(config or {})
+        self.rng = random.Random(42)
+
+    def rows(self, table):
+        return max(1, int(SCALE_ROWS[table] * self.scale))
+
+    def run(self):
+        setup = DatabaseSetup(db_name=self.db_name, config_overrides=self.config, backend=self.backend,
+                              reset_versioned=True)
+        if not setup.setup_database():
+            raise RuntimeError("Schema setup failed")
+        connection = connect(self.backend, self.db_name, setup.config)
+        cursor = connection.cursor()
+        try:
+            airports = self._airports(cursor)
+            airlines = self._airlines(cursor)
+            routes = self._routes(cursor, airlines, airports)
+            self._flights(cursor, routes)
+            self._metrics(cursor, routes)
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def _codes(length, count, taken):
+        letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        codes = []
+        index = 0
+        while len(codes) < count and index < 26 ** length:
+            code, value = "", index
+            for _ in range(length):
+                value, digit = divmod(value, 26)
+                code = letters[digit] + code
+            if code not in taken:
+                codes.append(code)
+            index += 1
+        return codes
+
+    def _insert(self, cursor, sql, rows, batch=10000):
+        for start in range(0, len(rows), batch):
+            cursor.executemany(sql, rows[start:start + batch])
+
+    def _airports(self, cursor):
+        cursor.execute("SELECT airport_id, iata_code FROM airports")
+        existing = cursor.fetchall()
+        next_id = max((row[0] for row in existing), default=0) + 1
+        codes = self._codes(3, self.rows("airports"), {row[1] for row in existing})
+        self._insert(cursor, """
+            INSERT INTO airports (airport_id, name, city, country, iata_code, latitude, longitude)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, [(next_id + i, f"Airport {code}", f"City {code}", f"Country {i % 120}", code,
+               round(self.rng.uniform(-60, 70), 6), round(self.rng.uniform(-180, 180), 6))
+              for i, code in enumerate(codes)])
+        return [row[0] for row in existing] + [next_id + i for i in range(len(codes))]
+
+    def _airlines(self, cursor):
+        cursor.execute("SELECT airline_id, iata_code FROM airlines")
+        existing = cursor.fetchall()
+        next_id = max((row[0] for row in existing), default=0) + 1
+        codes = self._codes(2, self.rows("airlines"), {row[1] for row in existing})
+        self._insert(cursor, "INSERT INTO airlines (airline_id, name, iata_code, country) VALUES (%s, %s, %s, %s)",
+                     [(next_id + i, f"Airline {code}", code, f"Country {i % 60}") for i, code in enumerate(codes)])
+        return [row[0] for row in existing] + [next_id + i for i in range(len(codes))]
+
+    def _routes(self, cursor, airlines, airports):
+        rows, identities = [], set()
+        while len(rows) < self.rows("routes"):
+            source, dest = self.rng.sample(airports, 2)
+            airline = self.rng.choice(airlines)
+            if (airline, source, dest) in identities:
+                continue
+            identities.add((airline, source, dest))
+            distance = self.rng.randint(300, 14000)
+            rows.append((airline, source, dest, distance, distance * 12))
+        self._insert(cursor, """
+            INSERT INTO routes (airline_id, source_airport_id, dest_airport_id, distance_km, base_fuel_kg)
+            VALUES (%s, %s, %s, %s, %s)
+        """, rows)
+        cursor.execute("SELECT route_id, airline_id, base_fuel_kg FROM routes")
+        return cursor.fetchall()
+
+    def _flights(self, cursor, routes):
+        today = date.today()
+        rows = []
+        for _ in range(self.rows("flight_performance")):
+            route_id, _, base_fuel = self.rng.choice(routes)
+            actual = base_fuel * self.rng.uniform(0.82, 1.08)
+            rows.append((route_id, today - timedelta(days=self.rng.randint(0, 729)), round(actual, 2), base_fuel,
+                         self.rng.randint(120, 350), round(self.rng.uniform(0.7, 0.98), 3),
+                         round(max(0.0, base_fuel - actual), 2)))
+        self._insert(cursor, """
+            INSERT INTO flight_performance (route_id, flight_date, actual_fuel_kg, planned_fuel_kg,
+                                            passengers_count, efficiency_score, fuel_savings_kg)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+        cursor.execute("SELECT performance_id FROM flight_performance")
+        enriched = [row[0] for row in cursor.fetchall() if self.rng.random() < 0.5]
+        self._insert(cursor, """
+            INSERT INTO flight_weather (performance_id, origin_wind_kmh, dest_wind_kmh, headwind_kmh,
+                                        temperature_c, precipitation_mm, source)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, [(performance_id, round(self.rng.uniform(0, 60), 1), round(self.rng.uniform(0, 60), 1),
+               round(self.rng.uniform(-60, 60), 1), round(self.rng.uniform(-20, 35), 1),
+               round(self.rng.expovariate(0.5), 1), "seed") for performance_id in enriched])
+
+    def _metrics(self, cursor, routes):
+        today = date.today()
+        rows = [(today - timedelta(days=day), self.rng.randint(2, 8), round(self.rng.uniform(0.75, 0.95), 3),
+                 round(self.rng.uniform(8e5, 1.2e6), 2), round(self.rng.uniform(5e3, 2.5e4), 2),
+                 round(self.rng.uniform(0.75, 0.92), 2), round(self.rng.uniform(0.82, 0.96), 2),
+                 route_id, airline_id)
+                for day in range(SCALE_ROWS["metric_days"]) for route_id, airline_id, _ in routes]
+        self._insert(cursor, """
+            INSERT INTO operational_metrics (metric_date, total_flights, avg_efficiency, total_fuel_used_kg,
+                                             total_fuel_saved_kg, avg_passenger_load, on_time_performance,
+                                             route_id, airline_id)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+
+
+def connect(backend, db_name, config=None):
+    config = dict(config or {}, database=db_name)
+    if backend.name == "mariadb":
+        config.setdefault("autocommit", True)
+    return backend.connect(config)
+
+
+class PlanChecker:
+    """Plans, budgets and timings for the extracted statements on one database"""
+
+    def __init__(self, connection, backend_name, scale, row_budget, repeat):
+        self.connection = connection
+        self.backend_name = backend_name
+        self.scale = scale
+        self.row_budget = row_budget
+        self.repeat = repeat
+        self._table_rows = {}
+
+    def table_rows(self, table):
+        if table not in self._table_rows:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                self._table_rows[table] = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        return self._table_rows[table]
+
+    def steps(self, query, params):
+        """[{table, access, rows, filesort, temporary}] of the statement's plan"""
+        cursor = self.connection.cursor(dictionary=True)
+        try:
+            if self.backend_name == "mariadb":
+                cursor.execute("ANALYZE " + query.sql, query.bind(params))
+                return [self._mariadb_step(row) for row in cursor.fetchall()]
+            cursor.execute("EXPLAIN QUERY PLAN " + query.sql, query.bind(params))
+            return self._sqlite_steps(query.sql, cursor.fetchall())
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _mariadb_step(row):
+        extra = row.get("Extra") or ""
+        rows = row.get("r_rows") if row.get("r_rows") is not None else row.get("rows")
+        return {
+            "table": row.get("table"),
+            "access": {"ALL": "full_scan", "index": "index_scan"}.get(row.get("type"), row.get("type")),
+            "key": row.get("key"),
+            "rows": int(float(rows)) if rows is not None else None,
+            "filesort": "Using filesort" in extra,
+            "temporary": "Using temporary" in extra
+        }
+
+    def _sqlite_steps(self, sql, rows):
+        aliases = {}
+        for table, alias in _ALIAS.findall(sql):
+            aliases[table] = table
+            if alias:
+                aliases[alias] = table
+        steps, scanned = [], []
+        for row in rows:
+            detail = row["detail"]
+            match = re.match(r"(SCAN|SEARCH) (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", detail)
+            if match:
+                table = aliases.get(match.group(2), match.group(2))
+                full = match.group(1) == "SCAN"
+                step_rows = self.table_rows(table) if full else None
+                steps.append({"table": table, "access": ("index_scan" if match.group(3) else "full_scan") if full
+                              else "index_lookup", "key": match.group(3), "rows": step_rows,
+                              "filesort": False, "temporary": False})
+                if full:
+                    scanned.append(step_rows)
+            elif detail.startswith("USE TEMP B-TREE"):
+                # Sorts what the scans produced; unknown after index lookups only
+                steps.append({"table": None, "access": "temp_btree", "key": None,
+                              "rows": max(scanned) if scanned else None,
+                              "filesort": "ORDER BY" in detail,
+                              "temporary": "ORDER BY" not in detail})
+        return steps
+
+    def budget(self, name):
+        allowance = BUDGETS.get(name)
+        return self.row_budget + int(allowance[0] * self.scale) if allowance else self.row_budget
+
+    def violations(self, name, steps):
+        budget = self.budget(name)
+        found = []
+        for step in steps:
+            problems = [label for label, flagged in (
+                (step["access"], step["access"] in ("full_scan", "index_scan")),
+                ("filesort", step["filesort"]),
+                ("temporary", step["temporary"])
+            ) if flagged]
+            if problems and step["rows"] is not None and step["rows"] > budget:
+                found.append(f"{'/'.join(problems)} over {step['rows']} rows of "
+                             f"{step['table'] or 'intermediate result'} (budget {budget})")
+        return found
+
+    def time_ms(self, query, params):
+        bound = query.bind(params)
+        timings = []
+        for _ in range(self.repeat):
+            cursor = self.connection.cursor()
+            started = time.perf_counter()
+            cursor.execute(query.sql, bound)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+            cursor.close()
+        return round(statistics.median(timings), 3)
+
+    def check(self, statements):
+        results = {}
+        for name, query in statements:
+            for case, params in cases(query):
+                key = f"{name} [{case}]"
+                try:
+                    steps = self.steps(query, params)
+                    results[key] = {"ms": self.time_ms(query, params), "steps": steps,
+                                    "violations": self.violations(name, steps)}
+                except Exception as e:
+                    results[key] = {"error": str(e), "violations": [f"statement failed: {e}"]}
+        return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def previous_run(path, backend_name, scale):
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("backend") == backend_name and record.get("scale") == scale:
+                previous = record
+    return previous
+
+
+def describe(steps):
+    return ", ".join(f"{step['table'] or '-'}:{step['access']}" + (f"({step['key']})" if step.get("key") else "")
+                     + ("+filesort" if step["filesort"] else "") + ("+temp" if step["temporary"] else "")
+                     for step in steps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('mariadb', 'embedded'), default='mariadb')
+    parser.add_argument('--embedded-dir', default=os.path.join(SCRIPT_DIR, '..', 'data', 'query_plans', 'db'),
+                        help='Directory for the embedded scratch database')
+    parser.add_argument('--database', default='skysql_plan_check', help='Scratch database name (recreated)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f"Scale factor: {SCALE_ROWS['flight_performance']} flights and "
+                             f"{SCALE_ROWS['routes']} routes per unit (default: 1)")
+    parser.add_argument('--row-budget', type=int, default=DEFAULT_ROW_BUDGET,
+                        help=f'Rows a scan, filesort or temporary table may touch (default: {DEFAULT_ROW_BUDGET})')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed executions per statement (median kept)')
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the scratch database from the last run')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON lines file of past runs')
+    parser.add_argument('--slowdown', type=float, default=2.0,
+                        help='Report statements this many times slower than the previous run (default: 2)')
+    parser.add_argument('--fail-on-slowdown', action='store_true', help='Treat reported slowdowns as failures')
+    args = parser.parse_args()
+
+    if args.database == 'skysql_intelligence':
+        print("Refusing to seed the live database; choose another --database")
+        sys.exit(1)
+    backend = EmbeddedBackend(args.embedded_dir) if args.backend == 'embedded' else MariaDBBackend()
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        PlanSeed(backend, args.database, args.scale).run()
+        print(f"\nSeeded {args.database} at scale {args.scale} in {time.perf_counter() - started:.1f}s")
+
+    statements = extract_statements()
+    connection = connect(backend, args.database, DatabaseSetup().config)
+    try:
+        checker = PlanChecker(connection, backend.name, args.scale, args.row_budget, args.repeat)
+        results = checker.check(statements)
+    finally:
+        connection.close()
+
+    previous = previous_run(args.history, backend.name, args.scale)
+    earlier = previous["statements"] if previous else {}
+    failures = slowdowns = 0
+    print(f"\n{len(statements)} statements, {len(results)} plans on {backend.name} at scale {args.scale}\n")
+    for key, result in results.items():
+        status = "FAIL" if result["violations"] else "ok"
+        timing = f"{result['ms']:9.2f} ms" if "ms" in result else "        -   "
+        before = earlier.get(key, {}).get("ms")
+        trend = ""
+        if before and "ms" in result:
+            trend = f" ({result['ms'] / before:.2f}x)" if before > 0 else ""
+            if before > 0 and result["ms"] / before >= args.slowdown and result["ms"] - before > 1:
+                trend += " SLOWER"
+                slowdowns += 1
+        print(f"  {status:4} {timing}{trend:14} {key}")
+        print(f"       {describe(result.get('steps', [])) or result.get('error')}")
+        for violation in result["violations"]:
+            print(f"       ! {violation}")
+        failures += bool(result["violations"])
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'a') as handle:
+        handle.write(json.dumps({
+            "run_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "backend": backend.name,
+            "scale": args.scale,
+            "row_budget": args.row_budget,
+            "statements": {key: {"ms": result.get("ms"), "violations": result["violations"],
+                                 "plan": describe(result.get("steps", []))}
+                           for key, result in results.items()}
+        }) + "\n")
+
+    print(f"\n{failures} failing plan(s), {slowdowns} slowdown(s) of {args.slowdown}x or more"
+          + (f" since {previous['run_at']}" if previous else "") + f"; history in {args.history}")
+    if failures or (args.fail_on_slowdown and slowdowns):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
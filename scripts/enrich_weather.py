@@ -0,0 +1,129 @@
+"""
+SkySQL Intelligence Weather Enrichment
+
+Joins daily origin/destination weather onto flights that have none yet
+(flight_weather, one row per flight with the headwind component along the
+route) and reports throughput in flights enriched per second.
+
+The provider comes from SKYSQL_WEATHER_PROVIDER (file or open-meteo) unless
+--provider is given. For offline use the file provider reads a local CSV;
+--synthesize first writes a deterministic synthetic one covering every
+airport and day in the window:
+
+    python scripts/enrich_weather.py --days 365 --synthesize --latency 0.02
+
+Run it from cron after the daily flight load, e.g.  --days 3
+"""
+
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app1 import db, response_cache, weather_enricher  # noqa: E402
+from weather import FIELDS, FileWeatherProvider, OpenMeteoProvider  # noqa: E402
+
+
+def synthesize(path, start, end):
+    """Write seasonal, deterministic daily weather for every airport in [start, end)"""
+    airports = db.execute_query("SELECT iata_code, latitude FROM airports WHERE iata_code IS NOT NULL")
+    if airports is None:
+        raise RuntimeError("Could not read airports")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rows = 0
+    with open(path, 'w', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(("iata_code", "obs_date") + FIELDS)
+        for airport in airports:
+            code = airport['iata_code']
+            rng = random.Random(code)
+            latitude = float(airport['latitude'] or 0)
+            prevailing = 270 if abs(latitude) > 30 else 90   # westerlies / trade winds
+            day = start
+            while day < end:
+                season = math.cos(2 * math.pi * (day.timetuple().tm_yday - 15) / 365.25)
+                winter = season if latitude >= 0 else -season
+                writer.writerow((
+                    code, day.isoformat(),
+                    round(max(0.0, rng.gauss(25 + 10 * winter, 9)), 1),
+                    int(rng.gauss(prevailing, 50)) % 360,
+                    round(25 - abs(latitude) * 0.4 - 8 * winter + rng.gauss(0, 3), 1),
+                    round(max(0.0, rng.expovariate(0.4) - 1.5), 1)
+                ))
+                rows += 1
+                day += timedelta(days=1)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=None,
+                        help='Only flights from the last N days (default: all history)')
+    parser.add_argument('--provider', choices=('file', 'open-meteo'),
+                        help='Override SKYSQL_WEATHER_PROVIDER')
+    parser.add_argument('--weather-file', help='CSV for the file provider (default: SKYSQL_WEATHER_FILE)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds per file-provider lookup, to emulate a remote API')
+    parser.add_argument('--synthesize', action='store_true',
+                        help='Write a synthetic weather file for the window before enriching')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help=f'Provider lookups in flight (default: {weather_enricher.concurrency})')
+    parser.add_argument('--reset', action='store_true',
+                        help='Delete existing flight_weather rows first (re-enrich everything)')
+    args = parser.parse_args()
+
+    if not weather_enricher.ensure_schema():
+        print("Could not create the weather tables")
+        sys.exit(1)
+
+    if args.provider == 'open-meteo':
+        weather_enricher.provider = OpenMeteoProvider()
+    elif args.provider == 'file' or args.weather_file or args.synthesize or args.latency:
+        path = args.weather_file or getattr(weather_enricher.provider, 'path', None) or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'weather', 'observations.csv')
+        weather_enricher.provider = FileWeatherProvider(path, latency=args.latency)
+    if args.concurrency:
+        weather_enricher.concurrency = args.concurrency
+
+    if args.synthesize:
+        if weather_enricher.provider.name != 'file':
+            print("--synthesize needs the file provider")
+            sys.exit(1)
+        end = date.today() + timedelta(days=1)
+        start = end - timedelta(days=(args.days or 730) + 1)
+        rows = synthesize(weather_enricher.provider.path, start, end)
+        print(f"Synthesized {rows} airport-day observations in {weather_enricher.provider.path}")
+
+    if args.reset:
+        for shard in db.shards:
+            if not db.execute_query("DELETE FROM flight_weather", fetch=False, shard=shard):
+                print(f"Could not reset flight_weather on shard {shard.name}")
+                sys.exit(1)
+
+    print(f"Enriching flights with {weather_enricher.provider.name} weather "
+          f"(concurrency {weather_enricher.concurrency})")
+    try:
+        summary = weather_enricher.enrich(days=args.days)
+    except RuntimeError as e:
+        print(f"Enrichment failed: {e}")
+        sys.exit(1)
+
+    if summary['flights_enriched']:
+        response_cache.invalidate("flight_weather")
+
+    print(f"  flights without weather: {summary['flights_seen']}")
+    print(f"  flights enriched:        {summary['flights_enriched']}")
+    print(f"  weather lookups:         {summary['lookups']} ({summary['unique_lookups']} unique per chunk)")
+    print(f"  resolved from cache:     {summary['cache_hits']} in-process, {summary['stored_hits']} stored")
+    print(f"  fetched from provider:   {summary['fetched']} ({summary['fetch_failures']} failed)")
+    print(f"  elapsed:                 {summary['seconds']}s")
+    print(f"  throughput:              {summary['flights_per_second']} flights/s")
+
+
+if __name__ == "__main__":
+    main()
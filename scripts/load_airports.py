@@ -0,0 +1,162 @@
+"""
+SkySQL Intelligence Airport Loader
+
+Loads a global airport dataset with coordinates into the airports table on
+every shard (airports are reference data replicated to each shard).
+Airports already present are matched on iata_code and get their coordinates
+updated; the rest are inserted with new airport ids.
+
+Accepted formats (detected from the file):
+  - OurAirports airports.csv (header row with latitude_deg/longitude_deg)
+  - OpenFlights airports.dat (no header, \\N for missing values)
+
+With --update-routes, routes.distance_km is rewritten from the great-circle
+distance between the route's airports.
+
+    python scripts/load_airports.py data/airports.csv --update-routes
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app1 import db, geo_index, response_cache  # noqa: E402
+from geo import AirportIndex  # noqa: E402
+
+# OurAirports types that are not airports a route can use
+SKIPPED_TYPES = {"closed", "heliport", "balloonport", "seaplane_base"}
+
+BATCH_SIZE = 5000
+
+
+def _clip(value, length):
+    value = (value or "").strip()
+    return value[:length] if value else None
+
+
+def read_airports(path):
+    """(name, city, country, iata_code, latitude, longitude) tuples from either format"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        sample = handle.readline()
+        handle.seek(0)
+        if 'latitude_deg' in sample:
+            for row in csv.DictReader(handle):
+                if row.get('type') in SKIPPED_TYPES:
+                    continue
+                try:
+                    latitude, longitude = float(row['latitude_deg']), float(row['longitude_deg'])
+                except (TypeError, ValueError):
+                    continue
+                yield (_clip(row['name'], 100), _clip(row.get('municipality'), 50),
+                       _clip(row.get('iso_country'), 50), _clip(row.get('iata_code'), 3), latitude, longitude)
+        else:
+            for row in csv.reader(handle):
+                if len(row) < 8:
+                    continue
+                row = [None if value == '\\N' else value for value in row]
+                try:
+                    latitude, longitude = float(row[6]), float(row[7])
+                except (TypeError, ValueError):
+                    continue
+                yield (_clip(row[1], 100), _clip(row[2], 50), _clip(row[3], 50), _clip(row[4], 3),
+                       latitude, longitude)
+
+
+def load(records):
+    """Write the records to every shard; returns (updated, inserted) counts or None on error"""
+    existing = db.execute_query("SELECT airport_id, iata_code FROM airports")
+    if existing is None:
+        return None
+    known_codes = {row['iata_code'] for row in existing if row['iata_code']}
+    next_id = max((row['airport_id'] for row in existing), default=0) + 1
+
+    updates, inserts, seen = [], [], set()
+    for name, city, country, code, latitude, longitude in records:
+        if code and code in seen:
+            continue
+        if code:
+            seen.add(code)
+        if code in known_codes:
+            updates.append((round(latitude, 6), round(longitude, 6), code))
+        elif name:
+            inserts.append((next_id, name, city, country, code, round(latitude, 6), round(longitude, 6)))
+            next_id += 1
+
+    for shard in db.shards:
+        for first in range(0, len(updates), BATCH_SIZE):
+            if not db.execute_query("UPDATE airports SET latitude = %s, longitude = %s WHERE iata_code = %s",
+                                    updates[first:first + BATCH_SIZE], fetch=False, shard=shard):
+                return None
+        for first in range(0, len(inserts), BATCH_SIZE):
+            if not db.execute_query("""
+                INSERT INTO airports (airport_id, name, city, country, iata_code, latitude, longitude)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, inserts[first:first + BATCH_SIZE], fetch=False, shard=shard):
+                return None
+    return len(updates), len(inserts)
+
+
+def update_route_distances():
+    """Rewrite routes.distance_km from the airport coordinates on every shard"""
+    airports = db.execute_query("""
+        SELECT airport_id, iata_code, latitude, longitude FROM airports
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """)
+    if airports is None:
+        return None
+    index = AirportIndex(airports)
+    changed = 0
+    for shard in db.shards:
+        routes = db.execute_query("SELECT route_id, source_airport_id, dest_airport_id, distance_km FROM routes",
+                                  shard=shard)
+        if routes is None:
+            return None
+        distances = index.route_distances(routes)
+        rewrites = [
+            (int(round(km)), route['route_id'])
+            for route, km in zip(routes, distances.tolist())
+            if km == km and int(round(km)) != route['distance_km']
+        ]
+        if rewrites and not db.execute_query("UPDATE routes SET distance_km = %s WHERE route_id = %s",
+                                             rewrites, fetch=False, shard=shard):
+            return None
+        changed += len(rewrites)
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', help='OurAirports airports.csv or OpenFlights airports.dat')
+    parser.add_argument('--update-routes', action='store_true',
+                        help='Rewrite routes.distance_km from great-circle distances')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if not geo_index.ensure_schema():
+        print("Could not add airport coordinate columns")
+        sys.exit(1)
+
+    result = load(read_airports(args.file))
+    if result is None:
+        print("Loading airports failed")
+        sys.exit(1)
+    updated, inserted = result
+    response_cache.invalidate("airports")
+    print(f"Airports: {updated} updated, {inserted} inserted on {len(db.shards)} shard(s) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    if args.update_routes:
+        changed = update_route_distances()
+        if changed is None:
+            print("Updating route distances failed")
+            sys.exit(1)
+        response_cache.invalidate("routes")
+        print(f"Routes: distance_km rewritten on {changed} route(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,30 +4,64 @@ SkySQL Intelligence Database Setup
 
 """
 
-import mysql.connector
 from mysql.connector import Error
+import argparse
+import json
 import sys
 import time
 import random
 from datetime import datetime, timedelta
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from change_feed import TRACKED_TABLES, schema_statements  # noqa: E402
+import row_counts  # noqa: E402
+import temporal  # noqa: E402
+import weather  # noqa: E402
+from storage import EmbeddedBackend, MariaDBBackend  # noqa: E402
 
 class DatabaseSetup:
     """Professional database setup class for SkySQL Intelligence"""
     
-    def __init__(self):
+    def __init__(self, db_name='skysql_intelligence', config_overrides=None,
+                 airlines=None, excluded_airlines=None, route_id_base=1, is_primary=True, backend=None,
+                 reset_versioned=False, primary=None):
         self.config = {
             'host': 'localhost',
             'user': 'root',
             'password': '',
             'port': 3306
         }
-        self.db_name = 'skysql_intelligence'
+        self.config.update(config_overrides or {})
+        self.db_name = db_name
+        # Shard layout: only routes of these airlines (None = all but the excluded ones)
+        self.airlines = set(airlines) if airlines else None
+        self.excluded_airlines = set(excluded_airlines or ())
+        self.route_id_base = route_id_base
+        # operational_metrics lives on the primary shard only
+        self.is_primary = is_primary
+        # The primary shard's setup (None on the primary): it allocates reference keys
+        self.primary = primary
+        # MariaDB server, or an embedded SQLite file per database
+        self.backend = backend or MariaDBBackend()
+        # routes, aircraft_config (with history), airlines and airports are kept unless reset
+        self.reset_versioned = reset_versioned
+    
+    def owns_airline(self, airline_code):
+        """True if this database holds the routes of the given airline"""
+        if self.airlines is not None:
+            return airline_code in self.airlines
+        return airline_code not in self.excluded_airlines
     
     def create_connection(self):
-        """Create connection to MariaDB server"""
+        """Create connection to MariaDB server (or open the embedded database)"""
+        config = dict(self.config)
+        if self.backend.name == "embedded":
+            config['database'] = self.db_name
         try:
-            conn = mysql.connector.connect(**self.config)
-            print("Connected to MariaDB server successfully")
+            conn = self.backend.connect(config)
+            print(f"Connected to {self.backend.describe(config)} successfully")
             return conn
         except Error as err:
             print(f"Connection failed: {err}")
@@ -50,14 +84,19 @@ class DatabaseSetup:
             print("1. Creating database...")
             cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.db_name}")
             cursor.execute(f"USE {self.db_name}")
-            print("   Database 'skysql_intelligence' created")
+            print(f"   Database '{self.db_name}' created")
             
-            # Drop existing tables to avoid conflicts
+            # Drop existing tables to avoid conflicts; the system-versioned
+            # tables and their history survive unless explicitly reset
             print("2. Dropping existing tables...")
+            # airlines and airports are kept too: routes reference them by key
             tables_to_drop = [
-                'operational_metrics', 'flight_performance', 'aircraft_config', 
-                'routes', 'airports', 'airlines'
+                'change_log', 'table_counts', 'flight_weather', 'operational_metrics', 'flight_performance'
             ]
+            if self.reset_versioned:
+                for table in temporal.VERSIONED_TABLES:
+                    tables_to_drop += [f"{table}_history", table]
+                tables_to_drop += ['airports', 'airlines']
             
             for table in tables_to_drop:
                 try:
@@ -65,6 +104,13 @@ class DatabaseSetup:
                 except Error:
                     pass  # Table might not exist
             
+            # Kept tables' triggers into change_log and table_counts go with them
+            # (recreated below), so migrating kept rows does not write to missing tables
+            for table in set(TRACKED_TABLES) | set(row_counts.COUNTED_TABLES):
+                for suffix in ("ai", "au", "ad"):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_change_{suffix}")
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {table}_count_{suffix}")
+            
             # Create tables with CORRECTED structure
             print("3. Creating tables...")
             
@@ -86,6 +132,8 @@ class DatabaseSetup:
                     city VARCHAR(50),
                     country VARCHAR(50),
                     iata_code VARCHAR(3),
+                    latitude DECIMAL(9, 6),
+                    longitude DECIMAL(9, 6),
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 ) ENGINE=InnoDB
                 """,
@@ -93,12 +141,15 @@ class DatabaseSetup:
                 """
                 CREATE TABLE IF NOT EXISTS routes (
                     route_id INT AUTO_INCREMENT PRIMARY KEY,
-                    airline_code VARCHAR(3) NOT NULL,
-                    source_airport VARCHAR(3) NOT NULL,
-                    dest_airport VARCHAR(3) NOT NULL,
+                    airline_id INT NOT NULL,
+                    source_airport_id INT NOT NULL,
+                    dest_airport_id INT NOT NULL,
                     distance_km INT NOT NULL,
                     base_fuel_kg INT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (airline_id) REFERENCES airlines(airline_id),
+                    FOREIGN KEY (source_airport_id) REFERENCES airports(airport_id),
+                    FOREIGN KEY (dest_airport_id) REFERENCES airports(airport_id)
                 ) ENGINE=InnoDB
                 """,
                 
@@ -139,7 +190,7 @@ class DatabaseSetup:
                     avg_passenger_load DECIMAL(5, 2),
                     on_time_performance DECIMAL(5, 2),
                     route_id INT,
-                    airline_code VARCHAR(3),
+                    airline_id INT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 ) ENGINE=InnoDB
                 """
@@ -152,6 +203,58 @@ class DatabaseSetup:
                 cursor.execute(sql)
                 print(f"   {table_names[i]} table created")
             
+            # Routes kept from before integer keys are converted in place
+            self.migrate_route_keys(cursor)
+            
+            # One route per airline and city pair, created once kept routes are migrated;
+            # secondary indexes behind the windowed and per-route queries
+            # (scripts/check_query_plans.py fails the plans that lose them)
+            index_sql = [
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_routes_identity "
+                "ON routes (airline_id, source_airport_id, dest_airport_id)",
+                "CREATE INDEX IF NOT EXISTS idx_airlines_iata ON airlines (iata_code)",
+                "CREATE INDEX IF NOT EXISTS idx_flight_performance_date ON flight_performance (flight_date)",
+                "CREATE INDEX IF NOT EXISTS idx_flight_performance_route_date "
+                "ON flight_performance (route_id, flight_date)",
+                "CREATE INDEX IF NOT EXISTS idx_operational_metrics_date ON operational_metrics (metric_date)"
+            ]
+            for sql in index_sql:
+                cursor.execute(sql)
+            print("   indexes created")
+            
+            cursor.execute("SELECT COUNT(*) FROM routes")
+            existing_routes = cursor.fetchone()[0]
+            if self.route_id_base > 1 and not existing_routes:
+                # Keep route ids globally unique across airline shards
+                cursor.execute(f"ALTER TABLE routes AUTO_INCREMENT = {int(self.route_id_base)}")
+                print(f"   routes ids start at {self.route_id_base}")
+            
+            # Change log first, so the sample data shows up in the delta feed
+            for sql in schema_statements():
+                cursor.execute(sql)
+            print("   change_log table and triggers created")
+            
+            # Row counters start at zero and are kept current by triggers
+            for sql in row_counts.schema_statements():
+                cursor.execute(sql)
+            for table in row_counts.COUNTED_TABLES:
+                cursor.execute(row_counts.initial_count_statement(table))
+            for table in row_counts.UPDATE_COUNTED_TABLES:
+                cursor.execute(row_counts.initial_update_count_statement(table))
+            print("   table_counts table and triggers created")
+            
+            # History before the sample data, so new rows get their first version
+            for sql in temporal.schema_statements():
+                cursor.execute(sql)
+            for table in temporal.VERSIONED_TABLES:
+                cursor.execute(temporal.seed_statement(table))
+            print("   history tables and triggers created")
+            
+            # Weather context per flight; fetched observations survive re-setup
+            for sql in weather.schema_statements(primary=self.is_primary):
+                cursor.execute(sql)
+            print("   weather tables created")
+            
             # Insert sample data
             print("4. Inserting sample data...")
             self.insert_sample_data(cursor)
@@ -168,6 +271,126 @@ class DatabaseSetup:
             cursor.close()
             conn.close()
 
+    def table_columns(self, cursor, table):
+        """Lower-case column names of a table in the current database (empty if it does not exist)"""
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """, (table,))
+        return {row[0].lower() for row in cursor.fetchall()}
+
+    def reference_keys(self, cursor):
+        """({airline code: airline_id}, {airport code: airport_id}) from the reference tables"""
+        keys = []
+        for table, key in (("airlines", "airline_id"), ("airports", "airport_id")):
+            cursor.execute(f"SELECT iata_code, MIN({key}) FROM {table} WHERE iata_code IS NOT NULL GROUP BY iata_code")
+            keys.append({code.upper(): key_id for code, key_id in cursor.fetchall()})
+        return tuple(keys)
+
+    def allocate_reference_keys(self, cursor, reference, key, codes):
+        """
+        {code: key} for IATA codes in airlines or airports, adding a reference
+        row (named after its code) for every code that has none yet
+        """
+        known = self.reference_keys(cursor)[0 if reference == "airlines" else 1]
+        missing = sorted(set(codes) - set(known))
+        if missing:
+            cursor.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {reference}")
+            next_id = cursor.fetchone()[0] + 1
+            added = {code: next_id + i for i, code in enumerate(missing)}
+            cursor.executemany(f"INSERT INTO {reference} ({key}, name, iata_code) VALUES (%s, %s, %s)",
+                               [(key_id, code, code) for code, key_id in added.items()])
+            known.update(added)
+            print(f"   {len(missing)} {reference} added for route codes: {', '.join(missing)}")
+        return {code: known[code] for code in codes}
+
+    def reference_keys_for(self, reference, key, codes):
+        """allocate_reference_keys on this (primary) database, over its own connection"""
+        conn = self.create_connection()
+        if not conn:
+            raise Error(msg="Primary database unavailable for reference key allocation")
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"USE {self.db_name}")
+            keys = self.allocate_reference_keys(cursor, reference, key, codes)
+            conn.commit()
+            return keys
+        finally:
+            cursor.close()
+            conn.close()
+
+    def migrate_route_keys(self, cursor):
+        """
+        Convert kept routes (and their history) from VARCHAR airline/airport
+        codes to integer keys: duplicate routes collapse onto the lowest
+        route_id, codes missing from airlines/airports get a reference row,
+        and the triggers naming the old columns are dropped (they are
+        recreated with the new ones further on). Missing codes are given ids
+        on the primary and the same rows are added here, so keys agree
+        across shards.
+        """
+        if 'airline_code' not in self.table_columns(cursor, 'routes'):
+            return
+        print("   Migrating routes to integer airline/airport keys...")
+        
+        # One route per airline and city pair; the history triggers still record the removed duplicates
+        cursor.execute("""
+            SELECT r.route_id FROM routes r
+            WHERE EXISTS (
+                SELECT 1 FROM routes k
+                WHERE k.airline_code = r.airline_code AND k.source_airport = r.source_airport
+                  AND k.dest_airport = r.dest_airport AND k.route_id < r.route_id
+            )
+        """)
+        duplicates = [(row[0],) for row in cursor.fetchall()]
+        cursor.executemany("DELETE FROM routes WHERE route_id = %s", duplicates)
+        print(f"   {len(duplicates)} duplicate routes removed")
+        
+        tables = ['routes']
+        if 'airline_code' in self.table_columns(cursor, 'routes_history'):
+            tables.append('routes_history')
+        for suffix in ("ai", "au", "ad"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS routes_history_{suffix}")
+        
+        columns = (("airline_code", "airline_id", "airlines"),
+                   ("source_airport", "source_airport_id", "airports"),
+                   ("dest_airport", "dest_airport_id", "airports"))
+        keys = {}
+        for reference, key in (("airlines", "airline_id"), ("airports", "airport_id")):
+            used = set()
+            for table in tables:
+                for code_column, _, target in columns:
+                    if target == reference:
+                        cursor.execute(f"SELECT DISTINCT {code_column} FROM {table}")
+                        used.update(row[0].upper() for row in cursor.fetchall() if row[0])
+            # Keys come from the primary, so every shard decodes a code to the same id
+            if self.primary is None:
+                keys[reference] = self.allocate_reference_keys(cursor, reference, key, used)
+            else:
+                keys[reference] = self.primary.reference_keys_for(reference, key, used)
+            cursor.executemany(f"INSERT IGNORE INTO {reference} ({key}, name, iata_code) VALUES (%s, %s, %s)",
+                               [(key_id, code, code) for code, key_id in keys[reference].items()])
+        
+        for table in tables:
+            for code_column, key_column, reference in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {key_column} INT")
+                cursor.executemany(f"UPDATE {table} SET {key_column} = %s WHERE UPPER({code_column}) = %s",
+                                   [(key_id, code) for code, key_id in keys[reference].items()])
+            for code_column, _, _ in columns:
+                cursor.execute(f"ALTER TABLE {table} DROP COLUMN {code_column}")
+        
+        if self.backend.name != "embedded":
+            cursor.execute("""
+                ALTER TABLE routes
+                    MODIFY airline_id INT NOT NULL,
+                    MODIFY source_airport_id INT NOT NULL,
+                    MODIFY dest_airport_id INT NOT NULL,
+                    ADD FOREIGN KEY (airline_id) REFERENCES airlines(airline_id),
+                    ADD FOREIGN KEY (source_airport_id) REFERENCES airports(airport_id),
+                    ADD FOREIGN KEY (dest_airport_id) REFERENCES airports(airport_id)
+            """)
+        print(f"   {', '.join(tables)} migrated")
+
     def insert_sample_data(self, cursor):
         """Insert sample data with CORRECTED column names"""
         try:
@@ -193,42 +416,37 @@ class DatabaseSetup:
             )
             print("   Airlines data inserted")
             
-            # Airports data
+            # Airports data, with coordinates for the geospatial index
             airports_data = [
-                (1, 'Sydney Kingsford Smith Airport', 'Sydney', 'Australia', 'SYD'),
-                (2, 'Los Angeles International Airport', 'Los Angeles', 'United States', 'LAX'),
-                (3, 'Hong Kong International Airport', 'Hong Kong', 'China', 'HKG'),
-                (4, 'Heathrow Airport', 'London', 'United Kingdom', 'LHR'),
-                (5, 'Changi Airport', 'Singapore', 'Singapore', 'SIN'),
-                (6, 'Frankfurt Airport', 'Frankfurt', 'Germany', 'FRA'),
-                (7, 'John F Kennedy International Airport', 'New York', 'United States', 'JFK'),
-                (8, 'Dubai International Airport', 'Dubai', 'United Arab Emirates', 'DXB'),
-                (9, 'Charles de Gaulle Airport', 'Paris', 'France', 'CDG'),
-                (10, 'Tokyo Haneda Airport', 'Tokyo', 'Japan', 'HND')
+                (1, 'Sydney Kingsford Smith Airport', 'Sydney', 'Australia', 'SYD', -33.946111, 151.177222),
+                (2, 'Los Angeles International Airport', 'Los Angeles', 'United States', 'LAX', 33.9425, -118.408056),
+                (3, 'Hong Kong International Airport', 'Hong Kong', 'China', 'HKG', 22.308889, 113.914444),
+                (4, 'Heathrow Airport', 'London', 'United Kingdom', 'LHR', 51.4775, -0.461389),
+                (5, 'Changi Airport', 'Singapore', 'Singapore', 'SIN', 1.359167, 103.989444),
+                (6, 'Frankfurt Airport', 'Frankfurt', 'Germany', 'FRA', 50.033333, 8.570556),
+                (7, 'John F Kennedy International Airport', 'New York', 'United States', 'JFK', 40.639722, -73.778889),
+                (8, 'Dubai International Airport', 'Dubai', 'United Arab Emirates', 'DXB', 25.252778, 55.364444),
+                (9, 'Charles de Gaulle Airport', 'Paris', 'France', 'CDG', 49.009722, 2.547778),
+                (10, 'Tokyo Haneda Airport', 'Tokyo', 'Japan', 'HND', 35.553333, 139.781111),
+                # Endpoints of the sample routes that were missing above
+                (11, "O'Hare International Airport", 'Chicago', 'United States', 'ORD', 41.978611, -87.904722),
+                (12, 'Auckland Airport', 'Auckland', 'New Zealand', 'AKL', -37.008056, 174.791667),
+                (13, 'Hamad International Airport', 'Doha', 'Qatar', 'DOH', 25.273056, 51.608056)
             ]
             
             cursor.executemany(
-                "INSERT IGNORE INTO airports (airport_id, name, city, country, iata_code) VALUES (%s, %s, %s, %s, %s)",
+                "INSERT IGNORE INTO airports (airport_id, name, city, country, iata_code, latitude, longitude) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
                 airports_data
             )
             print("   Airports data inserted")
             
-            # Routes data - matching the frontend display exactly
+            # Routes data - matching the frontend display exactly, one row per
+            # airline and city pair (routes_identity)
             routes_data = [
-                # SYD to LAX - Qantas (multiple entries for different airlines)
-                ('QF', 'SYD', 'LAX', 12051, 144000),
                 ('QF', 'SYD', 'LAX', 12051, 144000),
-                ('QF', 'SYD', 'LAX', 12051, 144000),
-                # HKG to LHR - Cathay Pacific
-                ('CX', 'HKG', 'LHR', 9625, 115000),
                 ('CX', 'HKG', 'LHR', 9625, 115000),
-                # SIN to SYD - Singapore Airlines
-                ('SQ', 'SIN', 'SYD', 6302, 75500),
                 ('SQ', 'SIN', 'SYD', 6302, 75500),
-                ('SQ', 'SIN', 'SYD', 6302, 75500),
-                # FRA to JFK - Lufthansa
-                ('LH', 'FRA', 'JFK', 6200, 74500),
-                ('LH', 'FRA', 'JFK', 6200, 74500),
                 ('LH', 'FRA', 'JFK', 6200, 74500),
                 # Additional routes for analytics
                 ('EK', 'DXB', 'LHR', 5500, 82000),
@@ -241,11 +459,21 @@ class DatabaseSetup:
                 ('QR', 'DOH', 'LHR', 5213, 76500)
             ]
             
-            cursor.executemany(
-                "INSERT INTO routes (airline_code, source_airport, dest_airport, distance_km, base_fuel_kg) VALUES (%s, %s, %s, %s, %s)",
-                routes_data
-            )
-            print("   Flight routes inserted")
+            routes_data = [route for route in routes_data if self.owns_airline(route[0])]
+            
+            # Versioned tables are kept across runs; sample rows only seed empty ones
+            cursor.execute("SELECT COUNT(*) FROM routes")
+            if cursor.fetchone()[0]:
+                print("   Flight routes kept (versioned)")
+            else:
+                airline_ids, airport_ids = self.reference_keys(cursor)
+                cursor.executemany(
+                    "INSERT INTO routes (airline_id, source_airport_id, dest_airport_id, distance_km, base_fuel_kg) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    [(airline_ids[airline], airport_ids[source], airport_ids[dest], distance, fuel)
+                     for airline, source, dest, distance, fuel in routes_data]
+                )
+                print("   Flight routes inserted")
             
             # Aircraft configurations - CORRECTED column name: fuel_efficiency
             config_data = [
@@ -256,19 +484,24 @@ class DatabaseSetup:
                 ('Boeing 737 MAX', 0.0011, 204, 6570)
             ]
             
-            cursor.executemany(
-                "INSERT INTO aircraft_config (aircraft_model, fuel_efficiency, seat_capacity, max_range_km) VALUES (%s, %s, %s, %s)",
-                config_data
-            )
-            print("   Aircraft configurations inserted")
+            cursor.execute("SELECT COUNT(*) FROM aircraft_config")
+            if cursor.fetchone()[0]:
+                print("   Aircraft configurations kept (versioned)")
+            else:
+                cursor.executemany(
+                    "INSERT INTO aircraft_config (aircraft_model, fuel_efficiency, seat_capacity, max_range_km) VALUES (%s, %s, %s, %s)",
+                    config_data
+                )
+                print("   Aircraft configurations inserted")
             
             # Generate flight performance data with fuel savings
             print("   Generating flight performance data...")
             self.generate_performance_data(cursor)
             
             # Generate operational metrics with enhanced fields
-            print("   Generating operational metrics...")
-            self.generate_operational_metrics(cursor)
+            if self.is_primary:
+                print("   Generating operational metrics...")
+                self.generate_operational_metrics(cursor)
             
             return True
             
@@ -280,6 +513,9 @@ class DatabaseSetup:
         """Generate realistic flight performance data with fuel savings"""
         cursor.execute("SELECT route_id, base_fuel_kg FROM routes")
         routes = cursor.fetchall()
+        if not routes:
+            print("   No routes on this database, skipping flight performance")
+            return
         
         start_date = datetime.now() - timedelta(days=90)
         
@@ -317,7 +553,7 @@ class DatabaseSetup:
 
     def generate_operational_metrics(self, cursor):
         """Generate operational metrics data with enhanced fields"""
-        cursor.execute("SELECT route_id, airline_code FROM routes LIMIT 5")
+        cursor.execute("SELECT route_id, airline_id FROM routes LIMIT 5")
         routes = cursor.fetchall()
         
         operational_data = []
@@ -326,7 +562,7 @@ class DatabaseSetup:
             metric_date = datetime.now() - timedelta(days=(5 - i))
             
             for route in routes:
-                route_id, airline_code = route
+                route_id, airline_id = route
                 
                 operational_data.append((
                     metric_date.date(),
@@ -337,14 +573,18 @@ class DatabaseSetup:
                     round(random.uniform(0.75, 0.92), 2),
                     round(random.uniform(0.82, 0.96), 2),
                     route_id,
-                    airline_code
+                    airline_id
                 ))
         
+        if not operational_data:
+            print("   No routes on this database, skipping operational metrics")
+            return
+        
         # Insert all operational metrics
         cursor.executemany("""
             INSERT INTO operational_metrics 
             (metric_date, total_flights, avg_efficiency, total_fuel_used_kg, total_fuel_saved_kg, 
-             avg_passenger_load, on_time_performance, route_id, airline_code)
+             avg_passenger_load, on_time_performance, route_id, airline_id)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """, operational_data)
         
@@ -379,10 +619,12 @@ class DatabaseSetup:
             
             # Check routes match frontend
             cursor.execute("""
-                SELECT r.route_id, r.airline_code, r.source_airport, r.dest_airport, 
-                       r.distance_km, r.base_fuel_kg, a.name as airline_name
+                SELECT r.route_id, a.iata_code as airline_code, s.iata_code as source_airport,
+                       d.iata_code as dest_airport, r.distance_km, r.base_fuel_kg, a.name as airline_name
                 FROM routes r
-                LEFT JOIN airlines a ON r.airline_code = a.iata_code
+                JOIN airlines a ON r.airline_id = a.airline_id
+                JOIN airports s ON r.source_airport_id = s.airport_id
+                JOIN airports d ON r.dest_airport_id = d.airport_id
                 ORDER BY r.distance_km DESC
                 LIMIT 5
             """)
@@ -409,7 +651,7 @@ class DatabaseSetup:
             """)
             perf = cursor.fetchone()
             print(f"\nPerformance Stats: {perf['total_flights']} flights, "
-                  f"avg efficiency: {perf['avg_efficiency']:.3f}")
+                  f"avg efficiency: {perf['avg_efficiency'] or 0:.3f}")
             
             print("\nDatabase setup verified successfully!")
             return True
@@ -421,15 +663,61 @@ class DatabaseSetup:
             cursor.close()
             conn.close()
 
+def build_shard_setups(shard_file, backend=None, reset_versioned=False):
+    """
+    One DatabaseSetup per shard from the same JSON layout the backend reads
+    via SKYSQL_SHARDS: [{"name", "database", "airlines", "route_id_base", ...}]
+    """
+    with open(shard_file) as handle:
+        specs = json.load(handle)
+    
+    assigned = set()
+    for spec in specs:
+        assigned.update(spec.get('airlines') or ())
+    
+    setups = []
+    for index, spec in enumerate(specs):
+        spec = dict(spec)
+        spec.pop('name', None)
+        db_name = spec.pop('database', 'skysql_intelligence')
+        airlines = spec.pop('airlines', None)
+        route_id_base = spec.pop('route_id_base', 1)
+        setups.append(DatabaseSetup(
+            db_name=db_name,
+            config_overrides=spec,
+            airlines=airlines,
+            excluded_airlines=None if airlines else assigned,
+            route_id_base=route_id_base,
+            is_primary=(index == 0),
+            backend=backend,
+            reset_versioned=reset_versioned,
+            primary=setups[0] if setups else None
+        ))
+    return setups
+
 def main():
     """Main execution function"""
-    start_time = time.time()
+    parser = argparse.ArgumentParser(description="SkySQL Intelligence Database Setup")
+    parser.add_argument('--shards', help="JSON shard layout file (same format as SKYSQL_SHARDS)")
+    parser.add_argument('--embedded', nargs='?', metavar='DIR',
+                        const=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'embedded'),
+                        help="Create embedded SQLite databases in DIR (run the backend with "
+                             "SKYSQL_BACKEND=embedded SKYSQL_EMBEDDED_DIR=DIR)")
+    parser.add_argument('--reset-versioned', action='store_true',
+                        help="Also drop routes, aircraft_config, their history and the airlines/airports "
+                             "they reference (kept by default)")
+    args = parser.parse_args()
     
-    setup = DatabaseSetup()
-    success = setup.setup_database()
+    start_time = time.time()
     
-    if success:
-        setup.verify_setup()
+    backend = EmbeddedBackend(args.embedded) if args.embedded else MariaDBBackend()
+    setups = build_shard_setups(args.shards, backend, args.reset_versioned) if args.shards \
+        else [DatabaseSetup(backend=backend, reset_versioned=args.reset_versioned)]
+    success = True
+    for setup in setups:
+        success = setup.setup_database() and success
+        if success:
+            setup.verify_setup()
     
     end_time = time.time()
     elapsed = end_time - start_time